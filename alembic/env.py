@@ -1,3 +1,4 @@
+import os
 from logging.config import fileConfig
 from sqlalchemy.ext.asyncio import create_async_engine,AsyncConnection
 from sqlalchemy import engine_from_config
@@ -16,7 +17,17 @@ from app.config import DATABASE_URL
 config = context.config
 # DATABASE_URL=os.getenv('DATABASE_URL')
 # print("DATABASE_URL",DATABASE_URL)
-config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
+# Target another database (e.g. a dedicated tenant) with
+# `alembic -x db_url=...` or ALEMBIC_DATABASE_URL; app.db.migrate_tenants uses
+# the environment variable so credentials stay out of the process list.
+TARGET_DATABASE_URL = (
+    context.get_x_argument(as_dictionary=True).get("db_url")
+    or os.getenv("ALEMBIC_DATABASE_URL")
+    or DATABASE_URL
+)
+# ConfigParser interpolation treats "%" specially
+config.set_main_option("sqlalchemy.url", TARGET_DATABASE_URL.replace("%", "%%"))
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -79,7 +90,7 @@ async def run_migrations_online():
 
     #     with context.begin_transaction():
     #         context.run_migrations()
-    connectable = create_async_engine(DATABASE_URL, poolclass=pool.NullPool)
+    connectable = create_async_engine(TARGET_DATABASE_URL, poolclass=pool.NullPool)
 
     async with connectable.connect() as connection:
         await connection.run_sync(do_run_migrations)
@@ -0,0 +1,32 @@
+"""Add saas_catalog_version counter for catalog response caching
+
+Revision ID: 2f6c8e0d9b14
+Revises: e91b3d5f7a20
+Create Date: 2026-10-19 16:21:09.334871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f6c8e0d9b14'
+down_revision: Union[str, None] = 'e91b3d5f7a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('saas_catalog_version',
+    sa.Column('id', sa.SmallInteger(), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO saas_catalog_version (id, version) VALUES (1, 0)")
+
+
+def downgrade() -> None:
+    op.drop_table('saas_catalog_version')
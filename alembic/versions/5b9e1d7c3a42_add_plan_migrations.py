@@ -0,0 +1,48 @@
+"""Add saas_plan_migrations checkpoints for bulk plan-version moves
+
+Revision ID: 5b9e1d7c3a42
+Revises: 2f6c8e0d9b14
+Create Date: 2026-10-19 17:05:42.118604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e1d7c3a42'
+down_revision: Union[str, None] = '2f6c8e0d9b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('saas_plan_migrations',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('from_version_id', sa.UUID(), nullable=False),
+    sa.Column('to_version_id', sa.UUID(), nullable=False),
+    sa.Column('effective_date', sa.Date(), nullable=False),
+    sa.Column('prorate', sa.Boolean(), server_default='true', nullable=False),
+    sa.Column('chunk_size', sa.Integer(), server_default='500', nullable=False),
+    sa.Column('status', sa.Enum('running', 'completed', 'failed', name='planmigrationstatus'), nullable=False),
+    sa.Column('last_subscription_id', sa.UUID(), nullable=True),
+    sa.Column('subscriptions_migrated', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('proration_total', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['from_version_id'], ['saas_plan_versions.id'], ),
+    sa.ForeignKeyConstraint(['to_version_id'], ['saas_plan_versions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Chunk scan: cycles of one plan version, walked by subscription id
+    op.create_index('ix_subscription_cycles_version_subscription', 'subscription_cycles', ['plan_version_id', 'subscription_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subscription_cycles_version_subscription', table_name='subscription_cycles')
+    op.drop_table('saas_plan_migrations')
+    sa.Enum(name='planmigrationstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,182 @@
+"""Partition transactions, orders and saas_subscription_billings by month
+
+Revision ID: 7c1f4a9b2d3e
+Revises: 3528ecdac2f8
+Create Date: 2026-10-19 10:12:04.518233
+
+Each table is converted online:
+
+1. a ``<table>_partitioned`` shadow is created, partitioned by RANGE
+   (created_at). It gets one partition per month from the oldest row up to
+   three months ahead, plus a default partition.
+2. a row trigger on the live table mirrors every INSERT/UPDATE/DELETE into
+   the shadow while existing rows are copied month by month. Each month is
+   copied in its own autocommitted transaction.
+3. a short ACCESS EXCLUSIVE swap checks row counts, drops the old table and
+   renames the shadow into place.
+
+The primary keys become (id, created_at). transactions.order_id loses its
+foreign key, since orders.id on its own is no longer unique-constrained.
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f4a9b2d3e'
+down_revision: Union[str, None] = '3528ecdac2f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+
+# table -> (foreign keys as (column, target, ondelete), indexed columns)
+TABLES = {
+    "orders": (
+        [("tenant_id", "tenants(id)", None)],
+        ["tenant_id", "provider_order_id"],
+    ),
+    "transactions": (
+        [
+            ("tenant_id", "tenants(id)", None),
+            ("subscription_id", "subscriptions(id)", None),
+            ("tenant_link_id", "tenant_links(id)", None),
+        ],
+        ["tenant_id", "order_id", "provider_order_id"],
+    ),
+    "saas_subscription_billings": (
+        [("subscription_id", "subscriptions(id)", "CASCADE")],
+        ["subscription_id"],
+    ),
+}
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _utc(day: date) -> str:
+    return f"{day.isoformat()} 00:00:00+00"
+
+
+def _months(first: date, last: date):
+    month = first
+    while month <= last:
+        yield month
+        month = _add_months(month, 1)
+
+
+def _month_range(table: str):
+    oldest = op.get_bind().execute(sa.text(f"SELECT min(created_at) FROM {table}")).scalar()
+    today = datetime.now(timezone.utc).date().replace(day=1)
+    first = oldest.astimezone(timezone.utc).date().replace(day=1) if oldest else today
+    return first, _add_months(today, MONTHS_AHEAD)
+
+
+def _columns(table: str):
+    return [column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)]
+
+
+def _create_shadow(table: str):
+    shadow = f"{table}_partitioned"
+    foreign_keys, indexed = TABLES[table]
+    first, last = _month_range(table)
+    columns = _columns(table)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in ("id", "created_at"))
+
+    op.execute(f"UPDATE {table} SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL")
+    op.execute(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)")
+    op.execute(f"ALTER TABLE {shadow} ALTER COLUMN created_at SET NOT NULL")
+    op.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY (id, created_at)")
+    for column, target, ondelete in foreign_keys:
+        on_delete = f" ON DELETE {ondelete}" if ondelete else ""
+        op.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) REFERENCES {target}{on_delete}")
+    for column in indexed:
+        op.execute(f"CREATE INDEX ix_{table}_{column} ON {shadow} ({column})")
+    for month in _months(first, last):
+        op.execute(
+            f"CREATE TABLE {table}_p{month.year:04d}_{month.month:02d} PARTITION OF {shadow} "
+            f"FOR VALUES FROM ('{_utc(month)}') TO ('{_utc(_add_months(month, 1))}')"
+        )
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {shadow} DEFAULT")
+
+    # Mirror live writes into the shadow until the swap. UPDATE deletes by id
+    # first so a changed created_at moves the row to its new partition.
+    op.execute(f"""
+        CREATE FUNCTION {table}_partition_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {shadow} WHERE id = OLD.id;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            NEW.created_at := coalesce(NEW.created_at, now());
+            INSERT INTO {shadow} SELECT (NEW).*
+                ON CONFLICT (id, created_at) DO UPDATE SET {updates};
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute(
+        f"CREATE TRIGGER {table}_partition_sync BEFORE INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_partition_sync()"
+    )
+    return first, last
+
+
+def _backfill(table: str, first: date, last: date):
+    shadow = f"{table}_partitioned"
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_created_at_backfill ON {table} (created_at)")
+    for month in _months(first, last):
+        # Rows mirrored by the trigger win: they are at least as new as the copy
+        op.execute(
+            f"INSERT INTO {shadow} SELECT * FROM {table} "
+            f"WHERE created_at >= '{_utc(month)}' AND created_at < '{_utc(_add_months(month, 1))}' "
+            f"ON CONFLICT DO NOTHING"
+        )
+    op.execute(f"INSERT INTO {shadow} SELECT * FROM {table} WHERE created_at >= '{_utc(_add_months(last, 1))}' ON CONFLICT DO NOTHING")
+
+
+def _swap(table: str):
+    shadow = f"{table}_partitioned"
+    bind = op.get_bind()
+    op.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    live = bind.execute(sa.text(f"SELECT count(*) FROM {table}")).scalar()
+    copied = bind.execute(sa.text(f"SELECT count(*) FROM {shadow}")).scalar()
+    if live != copied:
+        raise RuntimeError(f"{shadow} has {copied} rows but {table} has {live}; aborting the swap")
+    op.execute(f"DROP TABLE {table}")
+    op.execute(f"DROP FUNCTION {table}_partition_sync()")
+    op.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {shadow}_pkey TO {table}_pkey")
+
+
+def upgrade() -> None:
+    op.drop_constraint("transactions_order_id_fkey", "transactions", type_="foreignkey")
+    for table in TABLES:
+        with op.get_context().autocommit_block():
+            first, last = _create_shadow(table)
+            _backfill(table, first, last)
+        _swap(table)
+
+
+def downgrade() -> None:
+    # Offline: copies every row back into a plain table inside one transaction
+    for table, (foreign_keys, indexed) in TABLES.items():
+        plain = f"{table}_plain"
+        op.execute(f"CREATE TABLE {plain} (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {plain} SELECT * FROM {table}")
+        op.execute(f"DROP TABLE {table}")
+        op.execute(f"ALTER TABLE {plain} RENAME TO {table}")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL")
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        for column, target, ondelete in foreign_keys:
+            on_delete = f" ON DELETE {ondelete}" if ondelete else ""
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) REFERENCES {target}{on_delete}")
+    op.create_foreign_key("transactions_order_id_fkey", "transactions", "orders", ["order_id"], ["id"])
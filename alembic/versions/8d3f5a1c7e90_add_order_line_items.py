@@ -0,0 +1,56 @@
+"""Add order_line_items, normalized from orders.items
+
+Revision ID: 8d3f5a1c7e90
+Revises: f1b6c9d3e527
+Create Date: 2026-10-19 20:41:36.905214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f5a1c7e90'
+down_revision: Union[str, None] = 'f1b6c9d3e527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_line_items',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('order_id', sa.UUID(), nullable=False),
+    sa.Column('order_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('tenant_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.Enum('plan', 'app', 'feature', 'coupon', name='lineitemkind'), nullable=False),
+    sa.Column('plan_code', sa.String(length=100), nullable=True),
+    sa.Column('app_id', sa.UUID(), nullable=True),
+    sa.Column('feature_id', sa.UUID(), nullable=True),
+    sa.Column('code', sa.String(length=100), nullable=True),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('is_base', sa.Boolean(), server_default='false', nullable=False),
+    sa.Column('quantity', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_line_items_order_id'), 'order_line_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_line_items_tenant_id'), 'order_line_items', ['tenant_id'], unique=False)
+    op.create_index('ix_order_line_items_app', 'order_line_items', ['app_id', 'kind'], unique=False)
+    op.create_index('ix_order_line_items_feature', 'order_line_items', ['feature_id'], unique=False,
+                    postgresql_where=sa.text('feature_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_line_items_feature', table_name='order_line_items')
+    op.drop_index('ix_order_line_items_app', table_name='order_line_items')
+    op.drop_index(op.f('ix_order_line_items_tenant_id'), table_name='order_line_items')
+    op.drop_index(op.f('ix_order_line_items_order_id'), table_name='order_line_items')
+    op.drop_table('order_line_items')
+    sa.Enum(name='lineitemkind').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,90 @@
+"""Add daily finance rollup tables and high-water marks
+
+Revision ID: 9a4c2e7f1b38
+Revises: 8d3f5a1c7e90
+Create Date: 2026-10-19 21:37:52.118407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c2e7f1b38'
+down_revision: Union[str, None] = '8d3f5a1c7e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitioned tables cannot be indexed CONCURRENTLY; the parent index cascades to each partition
+PARTITIONED_INDEXES = (
+    ('ix_transactions_updated_at', 'transactions'),
+    ('ix_orders_updated_at', 'orders'),
+    ('ix_saas_subscription_billings_updated_at', 'saas_subscription_billings'),
+)
+INDEXES = (
+    ('ix_subscription_cycles_updated_at', 'subscription_cycles'),
+    ('ix_subscriptions_updated_at', 'subscriptions'),
+)
+
+
+def upgrade() -> None:
+    op.create_table('rollup_revenue_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dimension', sa.String(length=10), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'dimension', 'key', 'currency')
+    )
+    op.create_table('rollup_mrr_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('plan_code', sa.String(length=100), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('active_subscriptions', sa.Integer(), nullable=False),
+    sa.Column('mrr', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'plan_code', 'currency')
+    )
+    op.create_table('rollup_tenants_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('plan_code', sa.String(length=100), nullable=False),
+    sa.Column('new_tenants', sa.Integer(), nullable=False),
+    sa.Column('churned_tenants', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'plan_code')
+    )
+    op.create_table('rollup_payments_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('provider', sa.String(length=50), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('succeeded', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('amount_succeeded', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'provider', 'currency')
+    )
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('high_water', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    for name, table in PARTITIONED_INDEXES:
+        op.create_index(name, table, ['updated_at'], unique=False)
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(name, table, ['updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    for name, table in PARTITIONED_INDEXES:
+        op.drop_index(name, table_name=table)
+    op.drop_table('rollup_watermarks')
+    op.drop_table('rollup_payments_daily')
+    op.drop_table('rollup_tenants_daily')
+    op.drop_table('rollup_mrr_daily')
+    op.drop_table('rollup_revenue_daily')
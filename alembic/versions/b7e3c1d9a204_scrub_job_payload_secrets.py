@@ -0,0 +1,50 @@
+"""Remove passwords and activation links from queued job payloads
+
+Email jobs used to carry the root user's password and the activation URL
+(blanked only once a job succeeded). They now carry the root user id and
+the tenant uuid, and the worker makes the secret when it sends the email.
+This rewrites the old payloads of every job, whatever its status.
+
+Revision ID: b7e3c1d9a204
+Revises: 9a4c2e7f1b38
+Create Date: 2026-10-20 09:12:40.551093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c1d9a204'
+down_revision: Union[str, None] = '9a4c2e7f1b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE jobs
+        SET payload = (
+            (payload::jsonb - 'root_password' - 'activation_url')
+            || CASE
+                WHEN kind = 'email.tenant_registration' THEN jsonb_build_object(
+                    'tenant_uuid',
+                    (SELECT tenant_uuid::text FROM tenants WHERE tenant_email = jobs.payload->>'tenant_email')
+                )
+                WHEN kind = 'email.subscription_confirmation'
+                     AND coalesce(jobs.payload->>'root_password', '[redacted]') <> '[redacted]'
+                     AND status IN ('queued', 'running') THEN jsonb_build_object(
+                    'root_user_id',
+                    (SELECT id FROM auth_users WHERE email = jobs.payload->>'tenant_email' AND is_root_user LIMIT 1)
+                )
+                ELSE '{}'::jsonb
+            END
+        )::json
+        WHERE payload::jsonb ?| array['root_password', 'activation_url']
+    """)
+
+
+def downgrade() -> None:
+    # The secrets are gone; the new payloads are not converted back
+    pass
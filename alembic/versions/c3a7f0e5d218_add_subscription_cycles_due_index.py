@@ -0,0 +1,31 @@
+"""Index due subscription cycles for the lifecycle scheduler
+
+Revision ID: c3a7f0e5d218
+Revises: 5b9e1d7c3a42
+Create Date: 2026-10-19 18:02:17.640935
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7f0e5d218'
+down_revision: Union[str, None] = '5b9e1d7c3a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_subscription_cycles_due', 'subscription_cycles', ['end_date'], unique=False,
+            postgresql_where=sa.text("status IN ('active', 'grace')"), postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_subscription_cycles_due', table_name='subscription_cycles', postgresql_concurrently=True)
@@ -0,0 +1,31 @@
+"""Index renewal invoices by their gateway order
+
+The capture webhook of a renewal's gateway order finds its invoice by
+payment_reference.
+
+Revision ID: d52f8b0e6c13
+Revises: b7e3c1d9a204
+Create Date: 2026-10-20 14:26:03.218457
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52f8b0e6c13'
+down_revision: Union[str, None] = 'b7e3c1d9a204'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Partitioned table: no CONCURRENTLY, the parent index cascades to each partition
+    op.create_index(
+        'ix_saas_subscription_billings_payment_reference', 'saas_subscription_billings', ['payment_reference'], unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_saas_subscription_billings_payment_reference', table_name='saas_subscription_billings')
@@ -0,0 +1,47 @@
+"""Add saas_notification_campaigns checkpoints for bulk tenant notices
+
+Revision ID: d5e2a8c4f613
+Revises: c3a7f0e5d218
+Create Date: 2026-10-19 19:12:08.402517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e2a8c4f613'
+down_revision: Union[str, None] = 'c3a7f0e5d218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('saas_notification_campaigns',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.Enum('plan_change', 'renewal', 'maintenance', name='notificationkind'), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('content', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('include_inactive', sa.Boolean(), server_default='false', nullable=False),
+    sa.Column('batch_size', sa.Integer(), server_default='500', nullable=False),
+    sa.Column('status', sa.Enum('running', 'completed', 'failed', name='notificationcampaignstatus'), nullable=False),
+    sa.Column('last_tenant_id', sa.Integer(), nullable=True),
+    sa.Column('sent', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('failed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('failure_reasons', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+    sa.Column('failure_domains', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('saas_notification_campaigns')
+    sa.Enum(name='notificationcampaignstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='notificationkind').drop(op.get_bind(), checkfirst=True)
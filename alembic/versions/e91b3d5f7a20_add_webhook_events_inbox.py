@@ -0,0 +1,44 @@
+"""Add webhook_events inbox for Razorpay webhooks
+
+Revision ID: e91b3d5f7a20
+Revises: a4d8e2c61f07
+Create Date: 2026-10-19 15:02:37.860411
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91b3d5f7a20'
+down_revision: Union[str, None] = 'a4d8e2c61f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('webhook_events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('provider', sa.String(length=50), nullable=False),
+    sa.Column('event_id', sa.String(length=200), nullable=False),
+    sa.Column('event_type', sa.String(length=100), nullable=False),
+    sa.Column('order_key', sa.String(length=200), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.Enum('received', 'processed', 'failed', name='webhookeventstatus'), server_default='received', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('event_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('provider', 'event_id', name='uq_webhook_events_provider_event')
+    )
+    op.create_index('ix_webhook_events_order_queue', 'webhook_events', ['provider', 'order_key', 'event_created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_webhook_events_order_queue', table_name='webhook_events')
+    op.drop_table('webhook_events')
+    sa.Enum(name='webhookeventstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,29 @@
+"""Record stored invoice PDFs on saas_subscription_billings
+
+Revision ID: f1b6c9d3e527
+Revises: d5e2a8c4f613
+Create Date: 2026-10-19 20:04:51.337120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6c9d3e527'
+down_revision: Union[str, None] = 'd5e2a8c4f613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Added on the partitioned parent, so every monthly partition gets the columns
+    op.add_column('saas_subscription_billings', sa.Column('invoice_sha256', sa.String(length=64), nullable=True))
+    op.add_column('saas_subscription_billings', sa.Column('invoice_size', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('saas_subscription_billings', 'invoice_size')
+    op.drop_column('saas_subscription_billings', 'invoice_sha256')
@@ -1,25 +1,35 @@
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import Boolean, and_, exists, false, func, literal, literal_column, or_, true, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, lazyload
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from passlib.context import CryptContext
+import secrets
 from uuid import UUID
 from typing import Optional
 from .base_controller import BaseController
 from fastapi import BackgroundTasks
 
-from app.schemas.tanent import TenantCreate
+from app.schemas.tanent import TenantCreate, TenantProfileCreate
 from app.schemas.auth_schemas import UserRegisterSchema
-from app.models.tenant import Tenant, Role, Permission
+from app.models.tenant import Tenant, Role, Permission, TenantProfile
 from app.models.auth import User, UserProfile
 from app.models.transactions import Transaction, TransactionStatus
 from app.models.subscriptions import Subscription, SubscriptionStatus, SubscriptionCycle, SubscriptionApp, SubscriptionFeature
 from app.models.plans import Plan, PlanVersion
 from app.models.apps import App
+from app.core.db_helpers import FOREIGN_KEY_VIOLATION, NOT_NULL_VIOLATION, integrity_error_code
+from app.db.partitioning import created_between
+from app.db.tenancy import tenant_session
+from app.core.status_cache import invalidate_on_commit, onboarding_status_cache
 
 
 pwd_context = CryptContext(schemes=["bcrypt"])
 
+# Onboarding status ETags go stale whenever a tenant's payments change
+invalidate_on_commit(onboarding_status_cache, Transaction, Subscription)
+
 
 class AccountController(BaseController):
     def __init__(self, db: AsyncSession, tenant_uuid: Optional[UUID] = None, background_tasks: Optional[BackgroundTasks] = None):
@@ -45,41 +55,97 @@ class AccountController(BaseController):
         self.tenant_id = tenant.id
 
     async def create_tenant(self, client: TenantCreate):
-        """Create a new tenant"""
-        result = await self.db.execute(
-            select(Tenant).filter(
-                or_(
-                    Tenant.tenant_name == str(client.tenant_name).lower(),
-                    Tenant.tenant_email == client.tenant_email,
-                )
+        """
+        Create a new tenant.
+
+        Single INSERT ... ON CONFLICT DO NOTHING RETURNING: a name / email
+        clash returns no row instead of racing a separate existence check.
+        """
+        stmt = (
+            pg_insert(Tenant)
+            .values(
+                tenant_name=str(client.tenant_name).lower(),
+                tenant_email=client.tenant_email,
             )
+            .on_conflict_do_nothing()
+            .returning(Tenant)
+            # roles are selectin-loaded by default; a new tenant has none
+            .options(lazyload(Tenant.roles))
         )
-        existing_in_db = result.scalars().first()
+        result = await self.db.execute(stmt)
+        db_client = result.scalars().first()
 
-        if existing_in_db:
+        if db_client is None:
+            await self.db.rollback()
             raise ValueError("Tenant with this name or email already exists")
 
-        db_client = Tenant(
-            tenant_name=str(client.tenant_name).lower(),
-            tenant_email=client.tenant_email
-        )
-
-        self.db.add(db_client)
         await self.db.commit()
-        await self.db.refresh(db_client)
-
         return db_client
 
     async def register_user(self, user_data: UserRegisterSchema, is_active: bool = True, is_root_user: bool = False, is_superuser: bool = False):
-        """Register a new user"""
-        result = await self.db.execute(
-            select(User).filter(
-                (User.username == user_data.username) | (User.email == user_data.email)
+        """
+        Register a new user (and optional profile) in one statement.
+
+        The tenant is resolved by a scalar subquery, the user is inserted with
+        ON CONFLICT DO NOTHING and the profile insert reads the new user id from
+        that CTE, so the whole write is a single round trip and one commit.
+        """
+        tenant_id = (
+            select(Tenant.id)
+            .where(Tenant.tenant_name == user_data.tenant_name)
+            .scalar_subquery()
+        )
+        users = User.__table__
+        new_user = (
+            pg_insert(User)
+            .values(
+                first_name=user_data.first_name,
+                last_name=user_data.last_name,
+                username=user_data.username,
+                email=user_data.email,
+                phone_number=user_data.phone_number,
+                hashed_password=pwd_context.hash(user_data.password),
+                tenant_id=tenant_id,
+                is_active=is_active,
+                is_root_user=is_root_user,
+                is_superuser=is_superuser,
             )
+            .on_conflict_do_nothing()
+            .returning(*users.c)
+            .cte("new_user")
         )
-        existing_user = result.scalars().first()
+        stmt = select(new_user)
 
-        if existing_user:
+        if user_data.profile:
+            profile = user_data.profile
+            profile_columns = ["user_id", "bio", "profile_picture", "address", "city", "country"]
+            profile_insert = pg_insert(UserProfile).from_select(
+                profile_columns,
+                select(
+                    new_user.c.id,
+                    literal(profile.bio, UserProfile.bio.type),
+                    literal(profile.profile_picture, UserProfile.profile_picture.type),
+                    literal(profile.address, UserProfile.address.type),
+                    literal(profile.city, UserProfile.city.type),
+                    literal(profile.country, UserProfile.country.type),
+                ),
+            )
+            stmt = stmt.add_cte(profile_insert.cte("new_user_profile"))
+
+        try:
+            result = await self.db.execute(select(User).from_statement(stmt))
+            new_user_obj = result.scalars().first()
+        except IntegrityError as exc:
+            await self.db.rollback()
+            # tenant_id resolved to NULL: unknown tenant name
+            if integrity_error_code(exc) in (NOT_NULL_VIOLATION, FOREIGN_KEY_VIOLATION):
+                raise ValueError(
+                    {"value": {"tenant_name": {"msg": "Invalid tenant name or May not found"}}}
+                )
+            raise
+
+        if new_user_obj is None:
+            await self.db.rollback()
             raise ValueError(
                 {
                     "value": {
@@ -89,49 +155,81 @@ class AccountController(BaseController):
                 }
             )
 
-        tenant_result = await self.db.execute(
-            select(Tenant).filter(Tenant.tenant_name == user_data.tenant_name)
-        )
-        tenant = tenant_result.scalars().first()
-        if not tenant:
-            raise ValueError(
-                {"value": {"tenant_name": {"msg": "Invalid tenant name or May not found"}}}
-            )
-
-        new_user = User(
-            first_name=user_data.first_name,
-            last_name=user_data.last_name,
-            username=user_data.username,
-            email=user_data.email,
-            phone_number=user_data.phone_number,
-            hashed_password=pwd_context.hash(user_data.password),
-            tenant_id=tenant.id,
-            is_active=is_active,
-            is_root_user=is_root_user,
-            is_superuser=is_superuser,
-        )
-        self.db.add(new_user)
         await self.db.commit()
-        await self.db.refresh(new_user)
+        return new_user_obj
 
-        if user_data.profile:
-            user_profile = UserProfile(
-                user_id=new_user.id,
-                bio=user_data.profile.bio,
-                profile_picture=user_data.profile.profile_picture,
-                address=user_data.profile.address,
-                city=user_data.profile.city,
-                country=user_data.profile.country,
+    async def upsert_tenant_profile(self, tenant_id: int, profile_data: TenantProfileCreate):
+        """
+        Create or update a tenant's business profile in one statement.
+
+        New profiles take every field (with schema defaults); existing ones are
+        updated only with the fields the client sent, and only when one of them
+        actually differs. The unchanged row is returned from the same query.
+
+        Returns (profile, outcome) where outcome is "created", "updated" or
+        "unchanged". Raises LookupError when the tenant does not exist.
+        """
+        profiles = TenantProfile.__table__
+        changes = profile_data.model_dump(exclude_unset=True)
+
+        stmt = pg_insert(TenantProfile).values(tenant_id=tenant_id, **profile_data.model_dump())
+        if changes:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[profiles.c.tenant_id],
+                set_={**{key: stmt.excluded[key] for key in changes}, "updated_at": func.now()},
+                where=or_(*(profiles.c[key].is_distinct_from(stmt.excluded[key]) for key in changes)),
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[profiles.c.tenant_id])
+
+        upserted = stmt.returning(
+            *profiles.c,
+            # xmax is 0 for a freshly inserted row version
+            literal_column("xmax = 0", Boolean).label("inserted"),
+        ).cte("upserted")
+
+        unchanged = select(
+            *profiles.c,
+            false().label("inserted"),
+            false().label("changed"),
+        ).where(profiles.c.tenant_id == tenant_id, ~exists(select(upserted.c.id)))
+
+        combined = union_all(
+            select(upserted, true().label("changed")),
+            unchanged,
+        ).subquery("profile")
+        profile_entity = aliased(TenantProfile, combined)
+
+        try:
+            result = await self.db.execute(
+                select(profile_entity, combined.c.inserted, combined.c.changed)
             )
-            self.db.add(user_profile)
-            await self.db.commit()
+            row = result.first()
+        except IntegrityError as exc:
+            await self.db.rollback()
+            if integrity_error_code(exc) == FOREIGN_KEY_VIOLATION:
+                raise LookupError("Tenant not found")
+            raise
+
+        if row is None:
+            # Nothing upserted and no existing row: only possible when the
+            # tenant itself is missing and there was nothing to insert.
+            await self.db.rollback()
+            raise LookupError("Tenant not found")
+
+        profile, inserted, changed = row
+        if not changed:
+            return profile, "unchanged"
 
-        return new_user
+        await self.db.commit()
+        return profile, "created" if inserted else "updated"
 
     async def create_root_user(self, tenant_id: int, tenant_email: str, tenant_name: str):
         """
         Create a root/admin user for a tenant upon subscription activation.
-        Uses tenant email as username and generates a default password.
+        Uses tenant email as username. Returns ``(user, created)``; the user
+        gets a random password nobody knows until ``issue_password`` sets
+        the one that is emailed.
         """
         # Check if root user already exists
         result = await self.db.execute(
@@ -143,10 +241,7 @@ class AccountController(BaseController):
 
         if existing_user:
             # Root user already exists, skip creation
-            return existing_user, None
-
-        # Generate a default password (tenant should change this later)
-        default_password = f"Welcome@{tenant_name[:8]}123"
+            return existing_user, False
 
         # Build registration schema to reuse validation and profile handling
         root_user_data = UserRegisterSchema(
@@ -154,7 +249,7 @@ class AccountController(BaseController):
             last_name="User",
             username=tenant_email,
             email=tenant_email,
-            password=default_password,
+            password=secrets.token_urlsafe(32),
             tenant_name=tenant_name,
             profile=None,
         )
@@ -166,75 +261,103 @@ class AccountController(BaseController):
             is_root_user=True, 
             is_superuser=False
         )
-        return root_user, default_password
+        return root_user, True
 
+    async def issue_password(self, user_id: int) -> str:
+        """
+        Give the user a new random password and commit it; the caller emails
+        it. Called when the email goes out, so the password is never stored
+        anywhere but as this hash.
+        """
+        password = secrets.token_urlsafe(12)
+        await self.db.execute(
+            update(User).where(User.id == user_id).values(hashed_password=pwd_context.hash(password))
+        )
+        await self.db.commit()
+        return password
 
 
-    async def check_onboarding_status(self, request_id: int):
-        """
-        Check the status of a payment transaction and its associated subscription.
-        Returns detailed history and status for frontend polling.
+
+    def _onboarding_status_query(self, request_id: int):
         """
-        # Ensure we have the tenant loaded
-        await self._ensure_tenant_loaded()
+        One round trip for the status poll: the activation link (to validate
+        it), the tenant's transaction totals, the transaction to report and
+        the latest subscription status.
 
-        # Determine a query to fetch related transactions for counting/history
-        transactions_query = None
-        transaction = None
-        link = None
-        
+        The lateral subquery orders successes first, then newest; the window
+        counts are computed over every row before LIMIT 1 keeps the winner.
+        """
         from app.models.tenant_link import TenantLink
 
-        # 1. Validate Request ID belongs to this tenant
-        if request_id:
-             # Find Link by ID
-             stmt = select(TenantLink).filter(TenantLink.id == request_id)
-             result = await self.db.execute(stmt)
-             link = result.scalars().first()
-             if not link:
-                 raise ValueError({"detail": "Invalid request ID"})
-             
-             # Check if link belongs to the current tenant (the one initialized in controller)
-             if str(link.tenant_id) != str(self.tenant_uuid):
-                 raise ValueError({"detail": "Request ID does not belong to this tenant"})
-        else:
-             raise ValueError({"detail": "Request ID is required"})
-
-        # 2. Fetch ALL transactions for this tenant
-        # User requirement: history of all attempts and success check across all.
-        transactions_query = select(Transaction).filter(Transaction.tenant_id == self.tenant_id).order_by(Transaction.created_at.desc())
+        is_success = Transaction.status == TransactionStatus.SUCCESS
+        current = (
+            select(
+                Transaction.id.label("transaction_id"),
+                Transaction.amount,
+                Transaction.currency,
+                Transaction.status,
+                Transaction.provider_order_id,
+                func.count().over().label("transaction_count"),
+                func.count().filter(is_success).over().label("success_count"),
+            )
+            # A tenant's transactions cannot predate the tenant, so its
+            # created_at bounds the scan to the relevant monthly partitions
+            # (legacy tenants without one fall back to every partition).
+            .where(
+                Transaction.tenant_id == Tenant.id,
+                created_between(Transaction, since=func.coalesce(Tenant.created_at, Transaction.created_at)),
+            )
+            .order_by(is_success.desc().nulls_last(), Transaction.created_at.desc())
+            .limit(1)
+            .correlate(Tenant)
+            .lateral("current_transaction")
+        )
+        subscription_status = (
+            select(Subscription.status)
+            .where(Subscription.tenant_id == Tenant.id)
+            .order_by(Subscription.created_at.desc())
+            .limit(1)
+            .correlate(Tenant)
+            .scalar_subquery()
+        )
+        return (
+            select(
+                TenantLink.tenant_id.label("link_tenant_uuid"),
+                Tenant.id.label("tenant_id"),
+                subscription_status.label("subscription_status"),
+                current,
+            )
+            .select_from(TenantLink)
+            .join(Tenant, Tenant.tenant_uuid == TenantLink.tenant_id)
+            .outerjoin(current, true())
+            .where(TenantLink.id == request_id)
+        )
 
-        # Execute the query to get the related transactions list
-        result = await self.db.execute(transactions_query)
-        transactions = result.scalars().all()
+    def _require_request(self, request_id: int) -> None:
+        if not self.tenant_uuid:
+            raise ValueError("Tenant UUID not set in controller")
+        if not request_id:
+            raise ValueError({"detail": "Request ID is required"})
 
-        # Build history and count
-        history = []
-        success_count = 0
-        for txn in transactions:
-            history.append({
-                "id": str(txn.id),
-                "amount": float(txn.amount),
-                "status": txn.status.value if hasattr(txn.status, 'value') else str(txn.status),
-                "date": txn.created_at.strftime("%b %d, %Y %H:%M") if txn.created_at else "N/A",
-                "method": txn.payment_method or "N/A",
-                "provider_order_id": txn.provider_order_id
-            })
-            if txn.status == TransactionStatus.SUCCESS:
-                success_count += 1
+    def _check_link_owner(self, link_tenant_uuid) -> None:
+        if link_tenant_uuid is None:
+            raise ValueError({"detail": "Invalid request ID"})
+        # The link must belong to the tenant the controller was created for
+        if str(link_tenant_uuid) != str(self.tenant_uuid):
+            raise ValueError({"detail": "Request ID does not belong to this tenant"})
 
-        transaction_count = len(transactions)
-        payment_completed = success_count > 0
+    async def check_onboarding_status(self, request_id: int):
+        """
+        Check the status of a payment transaction and its associated subscription.
+        Returns the current status for frontend polling; the attempt history
+        is paginated separately by ``onboarding_history``.
+        """
+        self._require_request(request_id)
+        row = (await self.db.execute(self._onboarding_status_query(request_id))).first()
+        self._check_link_owner(row.link_tenant_uuid if row else None)
+        self.tenant_id = row.tenant_id
 
-        
-        # Prioritize finding a SUCCESS transaction to return as the current status
-        # If multiple exist, the first one in the list (most recent) is fine.
-        # If none exist, fallback to the most recent attempt.
-        success_transaction = next((t for t in transactions if t.status == TransactionStatus.SUCCESS), None)
-        
-        transaction = success_transaction if success_transaction else (transactions[0] if transactions else None)
-        
-        if not transaction:
+        if row.transaction_id is None:
              # No transactions yet?
              return {
                 "valid": True,
@@ -247,30 +370,22 @@ class AccountController(BaseController):
                 "message": "No transactions found",
                 "transaction_count": 0,
                 "payment_completed": False,
-                "history": [],
                 "retry_allowed": True
             }
 
-        # Check Subscription status if payment completed (look for THE subscription)
+        success_count = row.success_count
+        payment_completed = success_count > 0
+
         subscription_status = "inactive"
-        if payment_completed:
-            # Find the active subscription
-            from sqlalchemy import desc
-            # Ensure we use self.tenant_id here too!
-            sub_stmt = select(Subscription).filter(
-                Subscription.tenant_id == self.tenant_id
-            ).order_by(desc(Subscription.created_at))
-            sub_result = await self.db.execute(sub_stmt)
-            subscription = sub_result.scalars().first()
-            if subscription:
-                subscription_status = subscription.status.value if hasattr(subscription.status, 'value') else str(subscription.status)
+        if payment_completed and row.subscription_status is not None:
+            subscription_status = row.subscription_status.value if hasattr(row.subscription_status, 'value') else str(row.subscription_status)
 
         status_map = {
             TransactionStatus.SUCCESS: "SUCCESS",
             TransactionStatus.PENDING: "PENDING",
             TransactionStatus.FAILED: "FAILED"
         }
-        status_str = status_map.get(transaction.status, "PENDING")
+        status_str = status_map.get(row.status, "PENDING")
 
         refund_eligible = False
         message = f"Transaction is current {status_str}"
@@ -283,18 +398,73 @@ class AccountController(BaseController):
             "valid": True,
             "status": status_str,
             "subscription_status": subscription_status,
-            "razorpay_order_id": transaction.provider_order_id,
-            "transaction_id": str(transaction.id),
-            "amount": float(transaction.amount),
-            "currency": transaction.currency,
+            "razorpay_order_id": row.provider_order_id,
+            "transaction_id": str(row.transaction_id),
+            "amount": float(row.amount),
+            "currency": row.currency,
             "message": message,
-            "transaction_count": transaction_count,
+            "transaction_count": row.transaction_count,
             "payment_completed": payment_completed,
-            "history": history,
             "retry_allowed": not payment_completed,
             "refund_eligible": refund_eligible
         }
 
+    async def onboarding_history(self, request_id: int, offset: int = 0, limit: int = 10):
+        """
+        One page of the tenant's payment attempts, newest first.
+        Returns ``(total, items)``.
+        """
+        from app.models.tenant_link import TenantLink
+
+        self._require_request(request_id)
+        link = (await self.db.execute(
+            select(TenantLink.tenant_id, Tenant.id, Tenant.created_at)
+            .join(Tenant, Tenant.tenant_uuid == TenantLink.tenant_id)
+            .where(TenantLink.id == request_id)
+        )).first()
+        self._check_link_owner(link.tenant_id if link else None)
+        _, self.tenant_id, tenant_created_at = link
+        filters = [Transaction.tenant_id == self.tenant_id]
+        if tenant_created_at is not None:
+            filters.append(created_between(Transaction, since=tenant_created_at))
+
+        page = (await self.db.execute(
+            select(
+                Transaction.id,
+                Transaction.amount,
+                Transaction.status,
+                Transaction.created_at,
+                Transaction.payment_method,
+                Transaction.provider_order_id,
+                func.count().over().label("total"),
+            )
+            .where(*filters)
+            .order_by(Transaction.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )).all()
+
+        if page:
+            total = page[0].total
+        else:
+            # Past the last page: the window count has no row to ride on
+            total = await self.db.scalar(
+                select(func.count()).select_from(Transaction).where(*filters)
+            )
+
+        items = [
+            {
+                "id": str(txn.id),
+                "amount": float(txn.amount),
+                "status": txn.status.value if hasattr(txn.status, 'value') else str(txn.status),
+                "date": txn.created_at.strftime("%b %d, %Y %H:%M") if txn.created_at else "N/A",
+                "method": txn.payment_method or "N/A",
+                "provider_order_id": txn.provider_order_id
+            }
+            for txn in page
+        ]
+        return total, items
+
 
     async def build_account_authorization_context(self):
         """
@@ -339,12 +509,14 @@ class AccountController(BaseController):
             features = subscription.all_active_features
             context["subscription"]["features"] = [f.code for f in features]
 
-        # 2. Fetch Roles and Permissions for the tenant
+        # 2. Fetch Roles and Permissions for the tenant, from its own
+        # database when it is dedicated
         stmt = select(Role).filter(Role.tenant_id == self.tenant_id).options(
             selectinload(Role.permissions)
         )
-        roles_result = await self.db.execute(stmt)
-        roles = roles_result.scalars().all()
+        tenant_key = str(self.tenant_uuid) if self.tenant_uuid else None
+        async with tenant_session(tenant_key, shared_session=self.db) as roles_db:
+            roles = (await roles_db.execute(stmt)).scalars().all()
         
         for role in roles:
             if role.is_active:
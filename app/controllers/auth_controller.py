@@ -6,9 +6,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.osecurity import verify_password
 from app.models.auth import User
+from app.core.logger import create_logger
 from sqlalchemy.orm import selectinload
 
 
+logger = create_logger("auth")
+
+
 # 🔹 Authenticate User Function
 async def authenticateLoginUser(db: AsyncSession, loginData: OAuth2PasswordRequestForm):
     result = await db.execute(
@@ -32,7 +36,7 @@ async def authenticateLoginUser(db: AsyncSession, loginData: OAuth2PasswordReque
     # 🔹 Build Authorization Context
     account_controller = AccountController(db, tenant_uuid=user.tenant.tenant_uuid)
     auth_context = await account_controller.build_account_authorization_context()
-    print("====AUTH CONTEXT====", auth_context)
+    logger.debug("Auth context: %s", auth_context)
     return user, auth_context
 
 
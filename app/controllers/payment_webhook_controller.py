@@ -2,10 +2,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.transactions import Transaction, TransactionStatus
 from app.models.orders import Order, OrderStatus
-from app.models.subscriptions import Subscription, SubscriptionStatus
-from app.controllers.subscription_controller import SubscriptionController
-import razorpay
-import os
+from app.models.subscriptions import PaymentStatus, Subscription, SubscriptionBilling, SubscriptionStatus
+from app.db.partitioning import first_recent
+from app.jobs import ACTIVATE_ORDER, enqueue
+from app.services.status_events import PAYMENT_CAPTURED, PAYMENT_FAILED, publish_status_event
+from app.services.subscription_lifecycle import settle_renewal
 from .base_controller import BaseController
 from fastapi import BackgroundTasks
 from typing import Optional
@@ -14,27 +15,10 @@ class PaymentWebhookController(BaseController):
     def __init__(self, db: AsyncSession, background_tasks: Optional[BackgroundTasks] = None):
         super().__init__(db, background_tasks=background_tasks, logger_name='webhooks')
 
-    def verify_razorpay_signature(self, body: bytes, signature: str):
-        """
-        Verifies the Razorpay webhook signature.
-        """
-        webhook_secret = os.getenv("RAZORPAY_WEBHOOK_SECRET")
-        if not webhook_secret:
-            self.logger.warning("RAZORPAY_WEBHOOK_SECRET not set. Skipping signature verification.")
-            return
-
-        client = razorpay.Client(auth=(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET")))
-        
-        try:
-            client.utility.verify_webhook_signature(body.decode('utf-8'), signature, webhook_secret)
-            self.logger.info("Signature verification successful")
-        except Exception as e:
-            self.logger.error(f"Signature verification failed: {e}")
-            raise ValueError("Invalid signature")
-
     async def handle_payment_success(self, payment_data: dict, order_data: dict):
         """
-        Handle successful payment (payment.captured).
+        Handle successful payment (payment.captured): activate the order it
+        paid for, or settle the renewal invoice whose gateway order it is.
         """
         try:
             razorpay_payment_id = payment_data.get("id")
@@ -43,37 +27,42 @@ class PaymentWebhookController(BaseController):
             self.logger.info(f"Processing successful payment: {razorpay_payment_id} for order {razorpay_order_id}")
 
             stmt = select(Transaction).filter(Transaction.provider_order_id == razorpay_order_id)
-            result = await self.db.execute(stmt)
-            transaction = result.scalars().first()
+            transaction = await first_recent(self.db, stmt, Transaction)
 
             if transaction:
-                # Fetch Order first as we need it for both cases
                 order_stmt = select(Order).filter(Order.provider_order_id == razorpay_order_id)
-                order_result = await self.db.execute(order_stmt)
-                order = order_result.scalars().first()
-                
-                sub_controller = SubscriptionController(
-                    self.db,
-                    tenant_id=transaction.tenant_id,
-                    plan_code=transaction.plan_code,
-                    background_tasks=self.background_tasks
-                )
-                
+                order = await first_recent(self.db, order_stmt, Order)
+
+                transaction.provider_payment_id = razorpay_payment_id
                 if order:
-                    self.logger.info(f"Creating new subscription from Order {order.id}")
-                    new_sub = await sub_controller.create_subscription_from_order(order)
-                    transaction.subscription_id = new_sub.id
-                    self.logger.info(f"Created and activated new subscription {new_sub.id}")
-                    
-                    transaction.status = TransactionStatus.SUCCESS
-                    transaction.provider_payment_id = razorpay_payment_id
+                    # Activation runs on the job worker. The idempotency key makes
+                    # Razorpay's redeliveries of this event a no-op.
+                    await enqueue(
+                        self.db, ACTIVATE_ORDER,
+                        {"order_id": order.id, "transaction_id": transaction.id, "free": False},
+                        idempotency_key=f"activate-order:{order.id}",
+                    )
+                    self.logger.info(f"Queued activation of Order {order.id}")
                 else:
                     self.logger.warning("No Order found to create subscription.")
 
                 await self.db.commit()
-                self.logger.info("Transaction and Subscription processed.")
+                if order:
+                    await publish_status_event(
+                        transaction.tenant_id, PAYMENT_CAPTURED,
+                        transaction_id=transaction.id, razorpay_order_id=razorpay_order_id, status="SUCCESS",
+                    )
             else:
-                self.logger.warning(f"Transaction not found for order id: {razorpay_order_id}")
+                billing_stmt = select(SubscriptionBilling).filter(SubscriptionBilling.payment_reference == razorpay_order_id)
+                billing = await first_recent(self.db, billing_stmt, SubscriptionBilling)
+                if billing is None:
+                    self.logger.warning(f"Transaction not found for order id: {razorpay_order_id}")
+                elif billing.payment_status == PaymentStatus.paid:
+                    self.logger.info(f"Renewal invoice {billing.id} already paid")
+                else:
+                    await settle_renewal(self.db, billing)
+                    await self.db.commit()
+                    self.logger.info(f"Renewal invoice {billing.id} paid by {razorpay_payment_id}")
 
         except Exception as e:
             self.logger.error(f"Failed to handle payment success: {e}")
@@ -91,8 +80,7 @@ class PaymentWebhookController(BaseController):
             self.logger.info(f"Processing failed payment: {razorpay_payment_id}")
 
             stmt = select(Transaction).filter(Transaction.provider_order_id == razorpay_order_id)
-            result = await self.db.execute(stmt)
-            transaction = result.scalars().first()
+            transaction = await first_recent(self.db, stmt, Transaction)
 
             if transaction:
                 transaction.status = TransactionStatus.FAILED
@@ -100,6 +88,10 @@ class PaymentWebhookController(BaseController):
                 transaction.payment_details = payment_data
                 await self.db.commit()
                 self.logger.info("Transaction marked as FAILED.")
+                await publish_status_event(
+                    transaction.tenant_id, PAYMENT_FAILED,
+                    transaction_id=transaction.id, razorpay_order_id=razorpay_order_id, status="FAILED",
+                )
             else:
                 self.logger.warning(f"Transaction not found for order id: {razorpay_order_id}")
 
@@ -116,8 +108,7 @@ class PaymentWebhookController(BaseController):
             razorpay_order_id = order_data.get("id")
             
             stmt = select(Order).filter(Order.provider_order_id == razorpay_order_id)
-            result = await self.db.execute(stmt)
-            order = result.scalars().first()
+            order = await first_recent(self.db, stmt, Order)
 
             if order:
                 order.status = OrderStatus.COMPLETED
@@ -5,6 +5,7 @@ from uuid import UUID
 from app.models.plans import Plan as PlanModel, PlanVersion as PlanVersionModel
 from app.schemas.plan import PlanCreate
 from sqlalchemy.orm import selectinload
+from app.services.catalog_cache import bump_catalog_version, catalog_cache
 
 async def create_plan(db: AsyncSession, plan_data: PlanCreate):
     # Check if plan_code already exists
@@ -38,8 +39,10 @@ async def create_plan(db: AsyncSession, plan_data: PlanCreate):
         is_current=True
     )
     db.add(db_version)
+    catalog_version = await bump_catalog_version(db)
     
     await db.commit()
+    catalog_cache.observe(catalog_version)
     await db.refresh(db_plan)
 
     # Reload with versions
@@ -85,8 +88,10 @@ async def update_plan(db: AsyncSession, plan_uuid: UUID, plan_data: PlanCreate):
         is_current=True
     )
     db.add(new_version)
+    catalog_version = await bump_catalog_version(db)
     
     await db.commit()
+    catalog_cache.observe(catalog_version)
     await db.refresh(plan)
     return plan
 
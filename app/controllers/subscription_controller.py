@@ -10,11 +10,14 @@ import uuid
 from app.models.subscriptions import Subscription, SubscriptionStatus, SubscriptionApp, SubscriptionFeature, SubscriptionCycle
 from app.models.plans import Plan, PlanVersion
 from app.models.transactions import Transaction
-from app.models.orders import Order
+from app.models.orders import LineItemKind, Order
 from app.models.apps import App
 from app.models.features import Feature
 
 from app.core.logger import create_logger
+from app.jobs import SEND_SUBSCRIPTION_CONFIRMATION, enqueue
+from app.services.order_line_items import invoice_lines, order_line_items
+from app.services.plan_migration import PlanMigrationError, check_compatible, load_versions, migrate_chunk
 from .base_controller import BaseController
 from fastapi import BackgroundTasks
 
@@ -94,7 +97,7 @@ class SubscriptionController(BaseController):
             self.logger.exception(f"Unexpected error creating subscription for tenant {self.tenant_id}")
             raise SubscriptionError(f"Failed to create subscription: {str(e)}")
 
-    async def create_subscription_from_order(self, order: Order, background_tasks = None):
+    async def create_subscription_from_order(self, order: Order):
         """
         Creates and activates a subscription based on a paid order.
         """
@@ -108,7 +111,7 @@ class SubscriptionController(BaseController):
             
             # Activate and Link Items
             # This will also set tenant to active and link apps/features
-            await self.activate_subscription(subscription.id, order_items=order.items, background_tasks=background_tasks, order=order)
+            await self.activate_subscription(subscription.id, order=order)
             
             return subscription
         except SubscriptionError:
@@ -143,10 +146,10 @@ class SubscriptionController(BaseController):
         )
         self.db.add(sub_feat)
 
-    async def activate_subscription(self, subscription_id: UUID, order_items: dict = None, background_tasks = None, order: Order = None):
+    async def activate_subscription(self, subscription_id: UUID, order: Order = None):
         """
         Activates a subscription, tenant, and links apps/features.
-        Sends a confirmation email with PDF invoice in the background.
+        Queues the confirmation email (with PDF invoice) in the same commit.
         """
         try:
             self.logger.info(f"Activating subscription {subscription_id}")
@@ -171,7 +174,7 @@ class SubscriptionController(BaseController):
             tenant = t_result.scalars().first()
             
             root_username = None
-            root_password = None
+            root_user_id = None
             
             if tenant:
                  self.logger.info(f"Activating tenant {tenant.id} for subscription {subscription_id}")
@@ -182,41 +185,30 @@ class SubscriptionController(BaseController):
                  try:
                      from app.controllers.account_controller import AccountController
                      account_controller = AccountController(db=self.db)
-                     root_user, root_password = await account_controller.create_root_user(
+                     root_user, created = await account_controller.create_root_user(
                          tenant_id=tenant.id,
                          tenant_email=tenant.tenant_email,
                          tenant_name=tenant.tenant_name
                      )
                      root_username = root_user.username
+                     # Its password is set and emailed by the confirmation job
+                     root_user_id = root_user.id if created else None
                      self.logger.info(f"Root user {root_username} created/verified for tenant {tenant.id}")
                  except Exception as e:
                      self.logger.error(f"Failed to create root user for tenant {tenant.id}: {e}")
 
-            # 4. Link Apps and Features from Order Items (Optimized - bulk insert)
-            if order_items and "apps" in order_items:
-                apps_to_add = []
-                features_to_add = []
-                
-                for app_data in order_items["apps"]:
-                    app_id_str = app_data.get("app_id")
-                    if app_id_str:
-                        apps_to_add.append(SubscriptionApp(
-                            subscription_id=subscription.id,
-                            app_id=UUID(app_id_str),
-                            is_active=True,
-                            status="active"
-                        ))
-                    
-                    for feat_data in app_data.get("features", []):
-                        feat_id_str = feat_data.get("feature_id")
-                        if feat_id_str:
-                            features_to_add.append(SubscriptionFeature(
-                                subscription_id=subscription.id,
-                                feature_id=UUID(feat_id_str),
-                                is_active=True,
-                                status="active"
-                            ))
-                
+            # 4. Link Apps and Features from the order's line items (bulk insert)
+            line_items = await order_line_items(self.db, order) if order else []
+            if line_items:
+                apps_to_add = [
+                    SubscriptionApp(subscription_id=subscription.id, app_id=item.app_id, is_active=True, status="active")
+                    for item in line_items if item.kind == LineItemKind.app and item.app_id
+                ]
+                features_to_add = [
+                    SubscriptionFeature(subscription_id=subscription.id, feature_id=item.feature_id, is_active=True, status="active")
+                    for item in line_items if item.kind == LineItemKind.feature and item.feature_id
+                ]
+
                 if apps_to_add:
                     self.db.add_all(apps_to_add)
                 if features_to_add:
@@ -241,43 +233,22 @@ class SubscriptionController(BaseController):
                 self.db.add(billing_record)
                 await self.db.flush() # Populate ID and other defaults
                 
-                # Capture itemized billing for invoice/email
-                line_items = []
-                if order.items:
-                    # 1. Base Plan
-                    line_items.append({
-                        "name": f"Plan: {order.items.get('plan_code', 'Standard')}",
-                        "price": float(order.items.get('plan_price', 0.0))
-                    })
-                    
-                    # 1b. Included Plan Features (Eagerly load from PlanVersion)
+                # Capture itemized billing for invoice/email: the order's lines,
+                # with the plan's included features listed under the plan
+                invoice_items = invoice_lines(line_items)
+                if invoice_items:
+                    included = []
                     try:
                         from app.models.plans import PlanVersion
                         plan_stmt = select(PlanVersion).options(selectinload(PlanVersion.features)).filter(PlanVersion.id == subscription.cycles[0].plan_version_id)
                         plan_res = await self.db.execute(plan_stmt)
                         plan_ver = plan_res.scalars().first()
                         if plan_ver and plan_ver.features:
-                            for feat in plan_ver.features:
-                                line_items.append({
-                                    "name": f"  - Included: {feat.name}",
-                                    "price": 0.0
-                                })
+                            included = [{"name": f"  - Included: {feat.name}", "price": 0.0} for feat in plan_ver.features]
                     except Exception as e:
                         self.logger.warning(f"Could not load plan features for invoice: {e}")
-
-                    # 2. Apps and their features
-                    for app_item in order.items.get('apps', []):
-                        line_items.append({
-                            "name": f"App: {app_item.get('name', 'Unknown App')}",
-                            "price": float(app_item.get('base_price', 0.0))
-                        })
-                        for feat_item in app_item.get('features', []):
-                            price = float(feat_item.get('price', 0.0))
-                            label = "Addon" if price > 0 else "Included"
-                            line_items.append({
-                                "name": f"  - {label}: {feat_item.get('code', 'Feature')}",
-                                "price": price
-                            })
+                    after_plan = 1 if line_items[0].kind == LineItemKind.plan else 0
+                    invoice_items[after_plan:after_plan] = included
 
                 # Capture for invoice BEFORE commit expires it
                 invoice_summary = {
@@ -288,104 +259,31 @@ class SubscriptionController(BaseController):
                     'discount': float(billing_record.discount_amount),
                     'total': float(billing_record.total_amount),
                     'currency': str(billing_record.currency.value if hasattr(billing_record.currency, 'value') else billing_record.currency),
-                    'items': line_items # NEW
+                    'items': invoice_items
                 }
 
-            # Capture essential info before commit (which expires the objects)
-            target_email = tenant.tenant_email if tenant else None
-            target_name = tenant.tenant_name if tenant else None
+            # 5. Mark Tenant Activation Link as Used
+            if tenant:
+                from app.models.tenant_link import TenantLink
+                link_stmt = select(TenantLink).filter(
+                    TenantLink.tenant_id == tenant.tenant_uuid,
+                    TenantLink.request_type == "activation",
+                    TenantLink.is_used == False
+                )
+                link_obj = (await self.db.execute(link_stmt)).scalars().first()
+                if link_obj:
+                    link_obj.is_used = True
+
+            # 6. Queue the Confirmation Email. It commits with the activation,
+            # and the worker renders the invoice PDF and sends it.
+            if tenant and tenant.tenant_email:
+                await enqueue(
+                    self.db, SEND_SUBSCRIPTION_CONFIRMATION,
+                    self._confirmation_email_payload(subscription, tenant, order, invoice_summary, root_username, root_user_id),
+                    idempotency_key=f"subscription-confirmation:{subscription.id}",
+                )
 
             await self.db.commit()
-            
-            # 5. Generate and Send Confirmation Email (Background)
-            if target_email and subscription:
-                 try:
-                     from app.services.email_service import send_subscription_confirmation_email
-                     from app.services.invoice_service import generate_invoice_pdf
-                     
-                     # Re-fetch cycles specifically to ensure they are loaded for this session
-                     # We already did this above for features, but let's be sure for the background task
-                     stmt = select(Subscription).options(selectinload(Subscription.cycles)).filter(Subscription.id == subscription_id)
-                     sub_result = await self.db.execute(stmt)
-                     sub_with_cycles = sub_result.scalars().first()
-
-                     attachments = []
-                     plan_name = "Selected Plan"
-                     start_date_str = "N/A"
-                     end_date_str = "N/A"
-
-                     if sub_with_cycles and sub_with_cycles.current_cycle:
-                         cycle = sub_with_cycles.current_cycle
-                         plan_name = cycle.plan_code or "Selected Plan"
-                         start_date_str = cycle.start_date.strftime("%Y-%m-%d") if cycle.start_date else "N/A"
-                         end_date_str = cycle.end_date.strftime("%Y-%m-%d") if cycle.end_date else "N/A"
-
-                     if invoice_summary:
-                         invoice_data = {
-                             'invoice_number': invoice_summary['id'][:8].upper(),
-                             'date': invoice_summary['date'],
-                             'amount': invoice_summary['amount'],
-                             'tax': invoice_summary['tax'],
-                             'discount': invoice_summary['discount'],
-                             'total': invoice_summary['total'],
-                             'currency': invoice_summary['currency'],
-                             'plan_name': plan_name,
-                             'line_items': invoice_summary.get('items', []) # RENAMED
-                         }
-                         tenant_info = {
-                             'name': target_name,
-                             'email': target_email,
-                             'address': "" # Future: Add from tenant profile
-                         }
-                         pdf_content = generate_invoice_pdf(invoice_data, tenant_info)
-                         attachments.append({
-                             "filename": f"Invoice_{invoice_data['invoice_number']}.pdf",
-                             "content": pdf_content,
-                             "content_type": "application/pdf"
-                         })
-
-                     payment_info = {
-                         "order_id": order.provider_order_id if order else "N/A",
-                         "amount": str(order.total_amount) if order else "0.00",
-                         "currency": str(order.currency) if order else "INR",
-                         "line_items": invoice_summary.get('items', []) if invoice_summary else [] # RENAMED
-                     }
-
-                     email_args = (
-                         target_email,
-                         target_name,
-                         plan_name,
-                         start_date_str,
-                         end_date_str,
-                         root_username,
-                         root_password,
-                         attachments,
-                         payment_info
-                     )
-                     # 6. Mark Tenant Activation Link as Used (NEW)
-                     try:
-                         from app.controllers.tenant_link_controller import mark_link_used
-                         from app.models.tenant_link import TenantLink
-                         link_stmt = select(TenantLink).filter(
-                             TenantLink.tenant_id == tenant.tenant_uuid,
-                             TenantLink.request_type == "activation",
-                             TenantLink.is_used == False
-                         )
-                         link_res = await self.db.execute(link_stmt)
-                         link_obj = link_res.scalars().first()
-                         if link_obj:
-                             await mark_link_used(self.db, link_obj)
-                             self.logger.info(f"Activation link for tenant {tenant.id} marked as used.")
-                     except Exception as link_err:
-                         self.logger.warning(f"Failed to mark activation link as used: {link_err}")
-
-                     if background_tasks:
-                         background_tasks.add_task(send_subscription_confirmation_email, *email_args)
-                     else:
-                         import asyncio
-                         asyncio.create_task(send_subscription_confirmation_email(*email_args))
-                 except Exception as e:
-                     self.logger.error(f"Failed to prepare/dispatch confirmation email: {e}")
 
             self.logger.info(f"Subscription {subscription_id} fully activated")
             return subscription
@@ -395,13 +293,108 @@ class SubscriptionController(BaseController):
             await self.db.rollback()
             raise SubscriptionError(f"Activation failed: {str(e)}")
 
+    @staticmethod
+    def _confirmation_email_payload(subscription, tenant, order, invoice_summary, root_username, root_user_id) -> dict:
+        plan_name = "Selected Plan"
+        start_date_str = "N/A"
+        end_date_str = "N/A"
+        cycle = subscription.current_cycle
+        if cycle:
+            plan_name = cycle.plan_code or "Selected Plan"
+            start_date_str = cycle.start_date.strftime("%Y-%m-%d") if cycle.start_date else "N/A"
+            end_date_str = cycle.end_date.strftime("%Y-%m-%d") if cycle.end_date else "N/A"
+
+        invoice = None
+        if invoice_summary:
+            invoice = {
+                'billing_id': invoice_summary['id'],
+                'invoice_number': invoice_summary['id'][:8].upper(),
+                'date': invoice_summary['date'],
+                'amount': invoice_summary['amount'],
+                'tax': invoice_summary['tax'],
+                'discount': invoice_summary['discount'],
+                'total': invoice_summary['total'],
+                'currency': invoice_summary['currency'],
+                'plan_name': plan_name,
+                'line_items': invoice_summary.get('items', [])
+            }
+
+        return {
+            "tenant_email": tenant.tenant_email,
+            "tenant_name": tenant.tenant_name,
+            "plan_name": plan_name,
+            "start_date": start_date_str,
+            "end_date": end_date_str,
+            "root_username": root_username,
+            "root_user_id": root_user_id,
+            "invoice": invoice,
+            "tenant_info": {
+                'name': tenant.tenant_name,
+                'email': tenant.tenant_email,
+                'address': "" # Future: Add from tenant profile
+            },
+            "payment_info": {
+                "order_id": order.provider_order_id if order else "N/A",
+                "amount": str(order.total_amount) if order else "0.00",
+                "currency": str(order.currency) if order else "INR",
+                "line_items": invoice_summary.get('items', []) if invoice_summary else []
+            },
+        }
+
     async def upgrade_subscription(self, subscription_id: UUID, new_plan_code: str):
         """
-        Upgrades subscription to a new plan.
+        Moves the subscription to the current version of a pricier plan from
+        today, billing the prorated difference. Commits.
         """
-        # This is complex: proration, changing plan_version_id, etc.
-        # For now, just basic Skeleton
-        pass
+        return await self._change_plan(subscription_id, new_plan_code, upgrade=True)
 
     async def downgrade_subscription(self, subscription_id: UUID, new_plan_code: str):
-        pass
+        """Same as upgrade_subscription for a cheaper plan; the difference is credited."""
+        return await self._change_plan(subscription_id, new_plan_code, upgrade=False)
+
+    async def _change_plan(self, subscription_id: UUID, new_plan_code: str, upgrade: bool):
+        # A one-subscription run of the bulk plan migration engine
+        cycle_stmt = select(SubscriptionCycle).join(Subscription).filter(
+            SubscriptionCycle.subscription_id == subscription_id,
+            Subscription.tenant_id == self.tenant_id
+        ).order_by(desc(SubscriptionCycle.start_date)).limit(1)
+        cycle = (await self.db.execute(cycle_stmt)).scalars().first()
+        if not cycle:
+            raise SubscriptionError(f"Subscription {subscription_id} not found")
+
+        current = await self.db.get(PlanVersion, cycle.plan_version_id)
+        target_stmt = select(PlanVersion.id).join(Plan).filter(
+            Plan.plan_code == new_plan_code,
+            PlanVersion.is_current == True,
+            PlanVersion.currency == current.currency,
+            PlanVersion.country == current.country,
+            PlanVersion.billing_cycle == current.billing_cycle
+        )
+        target_id = (await self.db.execute(target_stmt)).scalar()
+        if not target_id:
+            raise PlanNotFoundError(f"Plan not found: {new_plan_code}")
+
+        try:
+            source, target = await load_versions(self.db, cycle.plan_version_id, target_id)
+            check_compatible(source, target)
+        except PlanMigrationError as e:
+            raise SubscriptionError(str(e))
+        if (target.price < source.price) if upgrade else (target.price > source.price):
+            raise SubscriptionError(f"{new_plan_code} is not a{'n upgrade' if upgrade else ' downgrade'} from {source.plan.plan_code}")
+
+        chunk = await migrate_chunk(
+            self.db, source, target, date.today(),
+            reference=f"plan-change:{subscription_id}:{uuid.uuid4().hex[:12]}",
+            limit=1, subscription_id=subscription_id,
+        )
+        if not chunk.subscription_ids:
+            raise SubscriptionError(f"Subscription {subscription_id} is not active")
+        await self.db.commit()
+
+        self.logger.info(f"Subscription {subscription_id} moved from {source.plan.plan_code} to {new_plan_code}")
+        return {
+            "subscription_id": subscription_id,
+            "from_version_id": source.id,
+            "to_version_id": target.id,
+            "proration": chunk.proration_total,
+        }
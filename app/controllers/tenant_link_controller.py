@@ -7,13 +7,20 @@ import jwt
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.tenant_link import TenantLink
+from app.core.logger import create_logger
 
 
 JWT_ALGO = os.getenv("LINK_JWT_ALGO", "HS256")
 JWT_SECRET = os.getenv("LINK_JWT_SECRET", os.getenv("JWT_SECRET", "change-me"))
 
+logger = create_logger("accounts")
 
-async def create_tenant_link(db: AsyncSession, tenant_uuid: str, hours_valid: int = 24, extra_payload: dict = None):
+
+async def create_tenant_link(db: AsyncSession, tenant_uuid: str, hours_valid: int = 24, extra_payload: dict = None, commit: bool = True):
+    """
+    Create an activation link. With ``commit=False`` the link is only flushed,
+    so the caller can commit it together with the job that emails it.
+    """
     if isinstance(tenant_uuid, str):
         try:
             tenant_uuid_obj = UUID(tenant_uuid)
@@ -41,7 +48,7 @@ async def create_tenant_link(db: AsyncSession, tenant_uuid: str, hours_valid: in
     
     if extra_payload:
         payload.update(extra_payload)
-    print(payload)
+    logger.debug("Activation token for tenant %s, expires %s", tenant_id, payload["exp"])
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
 
     # store only hash of token
@@ -49,12 +56,21 @@ async def create_tenant_link(db: AsyncSession, tenant_uuid: str, hours_valid: in
 
     link = TenantLink(tenant_id=tenant_uuid_obj, token_hash=token_hash, expires_at=expires_at)
     db.add(link)
-    await db.commit()
-    await db.refresh(link)
+    if commit:
+        await db.commit()
+        await db.refresh(link)
+    else:
+        await db.flush()
 
     return link, token
 
 
+def activation_url(raw_token: str) -> str:
+    """The onboarding page a tenant activates from (DOMAIN_NAME env, the frontend)."""
+    domain = os.getenv("DOMAIN_NAME", "http://localhost:5173")
+    return f"{domain}/onboarding/{raw_token}"
+
+
 async def get_tenant_link(db: AsyncSession, raw_token: str):
     # Hash incoming token and lookup
     token_hash = hashlib.sha256(raw_token.encode()).hexdigest()
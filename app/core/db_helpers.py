@@ -1,30 +1,43 @@
 # from sqlalchemy.orm import De
 
 
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
 from app.db.database import Base
+from app.core.serializers import get_serializer
+
+
+# Postgres SQLSTATE codes raised by constraint checks
+NOT_NULL_VIOLATION = "23502"
+FOREIGN_KEY_VIOLATION = "23503"
+UNIQUE_VIOLATION = "23505"
 
 
 def model_to_dict(model, exclude_fields=None):
     """
     Convert a SQLAlchemy model instance to a dictionary, 
     excluding specified fields.
+
+    Uses the compiled serializer for the model, so values come back as
+    JSON-ready primitives (UUID/Enum/Decimal/datetime already converted).
     
     :param model: SQLAlchemy model instance
     :param exclude_fields: List of fields to exclude
     :return: Dictionary representation of the model
     """
-    if not exclude_fields:
-        exclude_fields = []
-
     try:
-        return {
-            column.name: getattr(model, column.name)
-            for column in model.__table__.columns
-            if column.name not in exclude_fields
-        }
+        return get_serializer(type(model), exclude=exclude_fields or ())(model)
     except Exception as e:
         return {}
-    
+
+
+def integrity_error_code(exc: IntegrityError) -> Optional[str]:
+    """Return the Postgres SQLSTATE of an IntegrityError (e.g. "23505"), if known."""
+    orig = getattr(exc, "orig", None)
+    return getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
   
 
 
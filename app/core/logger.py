@@ -1,29 +1,188 @@
+"""
+Application logging.
 
+``create_logger(category)`` returns the category's logger, configured once
+per process. Records go through one in-memory queue to a background
+listener thread, which formats them as JSON lines and writes them to
+``LOG_DIR/<category>/<category>.log``, rotated at midnight to
+``<category>.log.YYYY-MM-DD.gz`` and kept for LOG_BACKUP_DAYS. Logging on
+the event loop is an enqueue; file I/O, formatting and compression happen
+on the listener thread.
+
+Use %-style arguments (``logger.info("order %s paid", order_id)``) so a
+message below LOG_LEVEL is never formatted. ``extra={"fields": {...}}``
+adds structured fields to the JSON record, and the current request id
+(set by the request logging middleware) is attached to every record
+logged while handling that request.
+"""
+import atexit
+import copy
+import gzip
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
-current_date=datetime.now().strftime('%Y-%m-%d')
-
-# Function to create and configure the logger
-def create_logger(project_name):
-    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '../logs', project_name)
-    # Create logs directory if it doesn't exist
-    os.makedirs(log_dir, exist_ok=True)
-
-    logger = logging.getLogger(project_name)
-
-    # Set up a handler to write logs to a file
-    handler = logging.handlers.TimedRotatingFileHandler(
-        os.path.join(log_dir, f'{current_date}.log'),
-        when="midnight",  # Rotate log files daily
-        backupCount=14,   # Keep logs for 14 days
-    )
-
-    # Set log format
-    formatter = logging.Formatter('%(asctime)s [%(levelname)s]: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-    handler.setFormatter(formatter)
-    # Add handler to the logger
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-
-    return logger
+import queue
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config import LOG_BACKUP_DAYS, LOG_COMPRESS_ROTATED, LOG_DIR, LOG_GZIP_MEMBER_BYTES, LOG_LEVEL
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, category, message, request_id, fields, exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "category": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry["fields"] = fields
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records as they are, with the caller's request id attached.
+    The stdlib handler formats the message here, on the caller's thread;
+    the listener formats it instead.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        return record
+
+
+class CategoryHandler(logging.Handler):
+    """Listener-side handler: routes each record to its category's file handler."""
+
+    def __init__(self):
+        super().__init__()
+        self.handlers: Dict[str, logging.Handler] = {}
+
+    def add(self, category: str, handler: logging.Handler):
+        self.handlers[category] = handler
+
+    def emit(self, record: logging.LogRecord):
+        handler = self.handlers.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.close()
+        super().close()
+
+
+def _gzip_name(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    """
+    Compress the rotated file; runs on the listener thread, like every write.
+    It is written as gzip members of about LOG_GZIP_MEMBER_BYTES, each ending
+    at a line end: still one gzip file to every reader, but the log search
+    (app/services/log_index.py) can decompress a single member.
+    """
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        pending = b""
+        while True:
+            chunk = src.read(LOG_GZIP_MEMBER_BYTES)
+            if not chunk:
+                break
+            data = pending + chunk
+            cut = data.rfind(b"\n") + 1 or len(data)
+            dst.write(gzip.compress(data[:cut], mtime=0))
+            pending = data[cut:]
+        if pending:
+            dst.write(gzip.compress(pending, mtime=0))
+    os.remove(source)
+
+
+class LoggingPipeline:
+    """The process-wide queue, listener thread and per-category file handlers."""
+
+    def __init__(
+        self,
+        log_dir: str = LOG_DIR,
+        level: str = LOG_LEVEL,
+        backup_days: int = LOG_BACKUP_DAYS,
+        compress: bool = LOG_COMPRESS_ROTATED,
+    ):
+        self.log_dir = log_dir
+        self.compress = compress
+        self.level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        self.backup_days = backup_days
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.router = CategoryHandler()
+        self.queue_handler = ContextQueueHandler(self.queue)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.loggers: Dict[str, logging.Logger] = {}
+        self._lock = threading.Lock()
+
+    def file_handler(self, category: str) -> logging.Handler:
+        directory = os.path.join(self.log_dir, category)
+        os.makedirs(directory, exist_ok=True)
+        handler = logging.handlers.TimedRotatingFileHandler(
+            os.path.join(directory, f"{category}.log"),
+            when="midnight",
+            backupCount=self.backup_days,
+            encoding="utf-8",
+            delay=True,
+        )
+        if self.compress:
+            handler.namer = _gzip_name
+            handler.rotator = _gzip_rotator
+        handler.setFormatter(JsonFormatter())
+        return handler
+
+    def get(self, category: str) -> logging.Logger:
+        logger = self.loggers.get(category)
+        if logger is not None:
+            return logger
+        with self._lock:
+            if category not in self.loggers:
+                self.router.add(category, self.file_handler(category))
+                logger = logging.getLogger(category)
+                logger.handlers = [self.queue_handler]
+                logger.setLevel(self.level)
+                logger.propagate = False
+                self.loggers[category] = logger
+                self.start()
+            return self.loggers[category]
+
+    def start(self):
+        if self.listener is None:
+            self.listener = logging.handlers.QueueListener(self.queue, self.router)
+            self.listener.start()
+
+    def stop(self):
+        """Drain the queue and close the files."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.router.close()
+
+
+pipeline = LoggingPipeline()
+atexit.register(pipeline.stop)
+
+
+def create_logger(project_name: str) -> logging.Logger:
+    """The logger of a category (``logs/<project_name>/``); handlers are set up on first use only."""
+    return pipeline.get(project_name)
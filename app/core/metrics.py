@@ -0,0 +1,41 @@
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyMetrics:
+    """Per-operation call counts, errors and a window of recent latencies."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        # Observed from worker threads too (SMTP pool)
+        self._lock = threading.Lock()
+
+    def observe(self, operation: str, seconds: float, ok: bool):
+        with self._lock:
+            self._latencies.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+            self._calls[operation] = self._calls.get(operation, 0) + 1
+            if not ok:
+                self._errors[operation] = self._errors.get(operation, 0) + 1
+
+    def snapshot(self) -> dict:
+        report = {}
+        with self._lock:
+            latencies = {operation: sorted(samples) for operation, samples in self._latencies.items()}
+        for operation, ordered in latencies.items():
+
+            def percentile(q):
+                return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+            report[operation] = {
+                "calls": self._calls[operation],
+                "errors": self._errors.get(operation, 0),
+                "p50_ms": percentile(0.50),
+                "p95_ms": percentile(0.95),
+                "p99_ms": percentile(0.99),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        return report
@@ -1,10 +1,11 @@
 from fastapi import HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
 from typing import List, Optional, Union, Any
 from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
 from fastapi import status  # To use HTTP status codes like 404, 403, etc.
+import orjson
 
 
 # Define the custom response model
@@ -16,6 +17,62 @@ class APIResponse(BaseModel):
     error: Optional[dict] = None  # Optional error details, default is None
 
 
+_DATA_TYPES = (list, tuple, dict, str, int, float, bool)
+
+
+def _json_default(obj: Any):
+    """
+    Fallback for types orjson does not encode natively (Decimal, sets,
+    Pydantic models, timedelta, ...).
+
+    The envelope used to be dumped through the APIResponse model, so these go
+    through Pydantic's own JSON conversion to keep the output identical.
+    """
+    return to_jsonable_python(obj)
+
+
+class APIJSONResponse(JSONResponse):
+    """JSONResponse that serializes the payload in a single orjson pass."""
+
+    def render(self, content: Any) -> bytes:
+        # OPT_UTC_Z: Pydantic writes UTC datetimes as "...Z", not "+00:00".
+        return orjson.dumps(
+            content,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+
+
+def build_envelope(
+    success: bool,
+    message: str,
+    data: Any = None,
+    error: Optional[dict] = None,
+    login_info: Optional[dict] = None,
+) -> dict:
+    """
+    Build the APIResponse envelope as a plain dict.
+
+    Checks the same shape as ``APIResponse`` with isinstance checks instead
+    of a full Pydantic validation, leaving ``data`` untouched for the encoder.
+    """
+    if not isinstance(message, str):
+        raise TypeError(f"APIResponse.message must be str, got {type(message).__name__}")
+    if data is not None and not isinstance(data, _DATA_TYPES):
+        raise TypeError(f"APIResponse.data must be a list, dict or scalar, got {type(data).__name__}")
+    if error is not None and not isinstance(error, dict):
+        raise TypeError(f"APIResponse.error must be dict, got {type(error).__name__}")
+    if login_info is not None and not isinstance(login_info, dict):
+        raise TypeError(f"APIResponse.login_info must be dict, got {type(login_info).__name__}")
+    return {
+        "login_info": login_info,
+        "success": bool(success),
+        "message": message,
+        "data": list(data) if isinstance(data, tuple) else data,
+        "error": error,
+    }
+
+
 class ResponseHandler:
 
     @staticmethod
@@ -34,16 +91,14 @@ class ResponseHandler:
         """
         if data is None:
             data = []
-        response_data = APIResponse(
+        response_data = build_envelope(
             login_info=login_info,
             success=True,
             message=message,
             data=data,
             error={},
         )
-        return JSONResponse(
-            content=jsonable_encoder(response_data), status_code=status.HTTP_200_OK
-        )
+        return APIJSONResponse(content=response_data, status_code=status.HTTP_200_OK)
 
     @staticmethod
     def error(message: str, error_details: dict = None) -> JSONResponse:
@@ -59,15 +114,13 @@ class ResponseHandler:
         """
         if error_details is None:
             error_details = {}
-        response_data = APIResponse(
+        response_data = build_envelope(
             success=False,
             message=message,
             data=[],
             error=error_details,
         )
-        return JSONResponse(
-            content=jsonable_encoder(response_data), status_code=status.HTTP_400_BAD_REQUEST
-        )
+        return APIJSONResponse(content=response_data, status_code=status.HTTP_400_BAD_REQUEST)
 
     @staticmethod
     def raise_http_error(
@@ -109,15 +162,13 @@ class ResponseHandler:
         """
         if error_details is None:
             error_details = {}
-        response_data = APIResponse(
+        response_data = build_envelope(
             success=False,
             message=message,
             data=[],
             error=error_details,
         )
-        return JSONResponse(
-            content=jsonable_encoder(response_data), status_code=status.HTTP_404_NOT_FOUND
-        )
+        return APIJSONResponse(content=response_data, status_code=status.HTTP_404_NOT_FOUND)
 
     @staticmethod
     def forbidden(message: str, error_details: dict = None) -> JSONResponse:
@@ -133,15 +184,13 @@ class ResponseHandler:
         """
         if error_details is None:
             error_details = {}
-        response_data = APIResponse(
+        response_data = build_envelope(
             success=False,
             message=message,
             data=[],
             error=error_details,
         )
-        return JSONResponse(
-            content=jsonable_encoder(response_data), status_code=status.HTTP_403_FORBIDDEN
-        )
+        return APIJSONResponse(content=response_data, status_code=status.HTTP_403_FORBIDDEN)
 
     @staticmethod
     def handle_exception(request: Request, exc: Exception) -> JSONResponse:
@@ -188,21 +237,19 @@ class ResponseHandler:
             if not formatError:
                 formatError = {}
 
-            response_data = APIResponse(
+            response_data = build_envelope(
                 success=False,
                 message="Validation Errors",
                 #  data=None,
                 error=formatError,
             )
-            return JSONResponse(
-                content=jsonable_encoder(response_data), status_code=status.HTTP_400_BAD_REQUEST
-            )
+            return APIJSONResponse(content=response_data, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Handle other exceptions as a general internal server error
         else:
-            response_data = APIResponse(
+            response_data = build_envelope(
                 success=False,
                 message="Internal Server Error",
                 error={"detail": str(exc)},
             )
-            return JSONResponse(content=jsonable_encoder(response_data), status_code=500)
+            return APIJSONResponse(content=response_data, status_code=500)
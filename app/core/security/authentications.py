@@ -2,14 +2,16 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.security.oauth_token_service import validate_token
+from app.core.logger import create_logger
 
 # oauth2_scheme = OAuth2AuthorizationCodeBearer(tokenUrl="/auth/login")
 # Define OAuth2 Authorization Code Bearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+logger = create_logger("auth")
+
 
 async def getRequestIdentity(access_token: str = Depends(oauth2_scheme)):
-    print("====VALIDATE ACCESSTOKEN===")
     if access_token.startswith("Bearer "):
         access_token = access_token[len("Bearer ") :]
     if not access_token:
@@ -18,10 +20,9 @@ async def getRequestIdentity(access_token: str = Depends(oauth2_scheme)):
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    print("===AUTHORIZATION TOKEN===", access_token)
     
     indentity = await validate_token(TOKEN=access_token)
-    print("DecodeData", indentity)
+    logger.debug("Token identity: %s", indentity)
     if indentity is not None and indentity["token_type"] == "access_token":
 
         return indentity
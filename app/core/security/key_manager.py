@@ -7,12 +7,16 @@ import hashlib
 from datetime import datetime
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
+from app.core.logger import create_logger
 
 KEYS_DIR = "keys"  # Directory for storing private keys
 os.makedirs(KEYS_DIR, exist_ok=True)
 # Store keys persistently
 KEYS_FILE = os.path.join(KEYS_DIR, "keys.json") 
 
+logger = create_logger("auth")
+
+
 def generate_rsa_key():
     """Generate a new RSA key pair."""
     private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
@@ -41,7 +45,7 @@ def rotate_key():
     keys["active_kid"] = new_kid
     save_keys(keys)
 
-    print(f"🔄 New key rotated! Active `kid`: {new_kid}")
+    logger.info("Signing key rotated, active kid %s", new_kid)
 
 def save_keys(keys):
     """Save keys to a JSON file."""
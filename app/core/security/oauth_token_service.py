@@ -10,6 +10,7 @@ import base64
 
 
 from app.core.security.key_manager import get_active_private_key, get_jwks
+from app.core.logger import create_logger
 
 # Token Expiration Time
 # Token Expiration Times
@@ -22,6 +23,8 @@ from app.core.security.rsa_key_generator import load_rsa_keys
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+logger = create_logger("auth")
+
 
 def generate_auth_code(length=32, expires_in=300):
     """
@@ -60,9 +63,8 @@ def generate_oauth_tokens(
         tuple: A tuple containing the access token, refresh token, ID token, refresh token expiration, and ID token expiration.
     """
     private_key, kid = get_active_private_key()
-    print("====PAYLOAD===", payload)
+    logger.debug("Issuing tokens for %s", payload.get("sub"))
     # payload = convert_datetime_to_iso(payload)
-    print("====AFTER PAYLOAD===", payload)
 
     # print("===PRIVATE_KEY===", private_key)
     # print("===kid===", kid)
@@ -172,7 +174,7 @@ async def validate_token(TOKEN: str):
         # Decode JWT header to extract 'kid'
         decoded_header = jwt.get_unverified_header(TOKEN)
         kid = decoded_header.get("kid")
-        print("====kid====", decoded_header)
+        logger.debug("Token header: %s", decoded_header)
 
         if not kid:
             raise HTTPException(
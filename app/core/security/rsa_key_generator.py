@@ -9,6 +9,7 @@ import jwt
 from datetime import datetime, timedelta
 
 from app.core.security.key_manager import load_keys
+from app.core.logger import create_logger
 
 # Paths to store RSA keys and JWT token
 KEYS_DIR = "keys"  # Folder to store keys and token
@@ -17,6 +18,9 @@ KEYS_DIR = "keys"  # Folder to store keys and token
 PRIVATE_KEY_PATH = os.path.join(KEYS_DIR, "rsa_private_key.pem")
 PUBLIC_KEY_PATH = os.path.join(KEYS_DIR, "rsa_public_key.pem")
 
+logger = create_logger("auth")
+
+
 def generate_rsa_keys():
     """Generate RSA private and public keys."""
     private_key = rsa.generate_private_key(
@@ -44,7 +48,7 @@ def generate_rsa_keys():
     with open(PUBLIC_KEY_PATH, "wb") as f:
         f.write(public_pem)
 
-    print("RSA keys generated and saved.")
+    logger.info("RSA keys generated and saved")
 
 
 def load_rsa_keys():
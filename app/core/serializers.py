@@ -0,0 +1,179 @@
+"""
+Compiled per-model serializers.
+
+``get_serializer(Model, fields=..., exclude=...)`` generates one plain Python
+function per (model, field set) the first time it is asked for and caches it.
+The generated function reads the instance ``__dict__`` directly and converts
+UUID / Enum / Decimal / date / datetime columns inline, so the result is made
+of JSON-ready primitives and needs no ``jsonable_encoder`` pass afterwards.
+"""
+import datetime
+import decimal
+import enum
+import uuid
+from types import MethodType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import types as sa_types
+
+
+Serializer = Callable[[Any], Dict[str, Any]]
+
+_registry: Dict[tuple, Serializer] = {}
+
+
+def _decimal(value: decimal.Decimal):
+    """Same rule as ``fastapi.encoders.decimal_encoder``: int when integral, else float."""
+    if value.as_tuple().exponent >= 0:
+        return int(value)
+    return float(value)
+
+
+def _passthrough_value(value):
+    """Fallback for columns whose Python type is only known at runtime."""
+    if value is None or value.__class__ in (str, int, float, bool):
+        return value
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, decimal.Decimal):
+        return _decimal(value)
+    return value
+
+
+def _converter_for(column, namespace: dict, index: int) -> Optional[str]:
+    """
+    Return a format string producing the converted expression for ``{v}``,
+    or None when the raw value can be emitted as is.
+    """
+    col_type = column.type
+    if isinstance(col_type, sa_types.Enum) and col_type.enum_class is not None:
+        # Lookup table keyed by member; str-enums also resolve their raw string.
+        name = f"_enum{index}"
+        namespace[name] = {member: member.value for member in col_type.enum_class}
+        return name + ".get({v}, {v})"
+    if isinstance(col_type, sa_types.Uuid):
+        return "str({v})"
+    if isinstance(col_type, (sa_types.DateTime, sa_types.Date, sa_types.Time)):
+        return "{v}.isoformat()"
+    if isinstance(col_type, sa_types.Numeric) and not isinstance(col_type, sa_types.Float):
+        if col_type.asdecimal:
+            return "_decimal({v})"
+        return None
+    if isinstance(col_type, (sa_types.JSON, sa_types.ARRAY)):
+        return None
+    if isinstance(col_type, (sa_types.String, sa_types.Integer, sa_types.Boolean, sa_types.Float)):
+        return None
+    return "_passthrough_value({v})"
+
+
+def _compile(model, fields: Optional[Sequence[str]], exclude: frozenset) -> Serializer:
+    mapper = sa_inspect(model)
+    columns = {prop.key: prop.columns[0] for prop in mapper.column_attrs}
+
+    if fields is None:
+        keys = [key for key in columns if key not in exclude]
+    else:
+        unknown = [key for key in fields if key not in columns]
+        if unknown:
+            raise ValueError(f"{model.__name__} has no column attribute(s): {', '.join(unknown)}")
+        keys = [key for key in fields if key not in exclude]
+
+    namespace = {"_decimal": _decimal, "_passthrough_value": _passthrough_value}
+    fast_lines, slow_lines, items = [], [], []
+    for index, key in enumerate(keys):
+        var = f"v{index}"
+        fast_lines.append(f"    {var} = d[{key!r}]")
+        slow_lines.append(f"    {var} = obj.{key}")
+        converter = _converter_for(columns[key], namespace, index)
+        if converter is None:
+            items.append(f"{key!r}: {var}")
+        else:
+            expr = converter.format(v=var)
+            items.append(f"{key!r}: None if {var} is None else {expr}")
+
+    body = "{" + ", ".join(items) + "}"
+    source = "\n".join(
+        [
+            "def _slow(obj):",
+            *(slow_lines or ["    pass"]),
+            f"    return {body}",
+            "",
+            "def serialize(obj):",
+            "    d = obj.__dict__",
+            "    try:",
+            *(["    " + line for line in fast_lines] or ["        pass"]),
+            "    except KeyError:",
+            # Expired / deferred attributes are not in __dict__; go through the descriptors.
+            "        return _slow(obj)",
+            f"    return {body}",
+        ]
+    )
+    code = compile(source, f"<serializer {model.__name__}>", "exec")
+    exec(code, namespace)
+    serializer = namespace["serialize"]
+    serializer.__qualname__ = f"serialize_{model.__name__}"
+    serializer.fields = tuple(keys)
+    return serializer
+
+
+def get_serializer(
+    model, fields: Optional[Sequence[str]] = None, exclude: Iterable[str] = ()
+) -> Serializer:
+    """
+    Return the cached serializer for ``model`` restricted to ``fields`` (all
+    column attributes when omitted) minus ``exclude``.
+    """
+    field_key = tuple(fields) if fields is not None else None
+    exclude_key = frozenset(exclude or ())
+    key = (model, field_key, exclude_key)
+    serializer = _registry.get(key)
+    if serializer is None:
+        serializer = _registry.setdefault(key, _compile(model, field_key, exclude_key))
+    return serializer
+
+
+def serialize(instance, fields: Optional[Sequence[str]] = None, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Serialize a single ORM instance."""
+    return get_serializer(type(instance), fields, exclude)(instance)
+
+
+def serialize_many(
+    instances: Iterable[Any], fields: Optional[Sequence[str]] = None, exclude: Iterable[str] = ()
+) -> List[Dict[str, Any]]:
+    """Serialize a homogeneous list of ORM instances with a single compiled function."""
+    instances = instances if isinstance(instances, list) else list(instances)
+    if not instances:
+        return []
+    serializer = get_serializer(type(instances[0]), fields, exclude)
+    return [serializer(instance) for instance in instances]
+
+
+class compiled_serializer:
+    """
+    Class-level descriptor used by models' ``to_dict``::
+
+        _serialize = compiled_serializer(fields=("id", "name"))
+
+        def to_dict(self):
+            return self._serialize()
+
+    The function is compiled on first use, once mappers are configured.
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, exclude: Iterable[str] = ()):
+        self.fields = tuple(fields) if fields is not None else None
+        self.exclude = tuple(exclude)
+        self._compiled: Dict[type, Serializer] = {}
+
+    def __get__(self, instance, owner):
+        serializer = self._compiled.get(owner)
+        if serializer is None:
+            serializer = self._compiled.setdefault(owner, get_serializer(owner, self.fields, self.exclude))
+        if instance is None:
+            return serializer
+        return MethodType(serializer, instance)
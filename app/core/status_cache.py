@@ -0,0 +1,95 @@
+"""
+ETags for the onboarding status poll.
+
+The frontend polls ``/account/check-onboarding-status`` every few seconds
+after checkout. The status only changes when one of the tenant's
+transactions or subscriptions is written. This cache remembers the ETag
+last served for each ``(tenant_uuid, request_id)`` along with a per-tenant
+version. An ``If-None-Match`` that still matches is answered with 304 before
+any query runs.
+
+Versions are bumped from the ORM's commit hooks, so only writes made in this
+process are seen. Entries also expire after ``ttl`` seconds, which bounds how
+stale a worker can be about writes that landed on another worker (e.g. a
+Razorpay webhook).
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.response import _json_default
+
+_PENDING_KEY = "onboarding_status_tenants"
+
+
+def status_etag(payload) -> str:
+    body = orjson.dumps(payload, default=_json_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class StatusETagCache:
+    def __init__(self, ttl: float = 5.0, max_entries: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._versions: Dict[int, int] = {}
+        # key -> (etag, tenant_id, tenant version, expires at)
+        self._entries: "OrderedDict[Hashable, Tuple[str, int, int, float]]" = OrderedDict()
+
+    def current_etag(self, key: Hashable) -> Optional[str]:
+        """The ETag last served for ``key`` if nothing has changed since."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        etag, tenant_id, version, expires_at = entry
+        if expires_at <= self._clock() or self._versions.get(tenant_id, 0) != version:
+            self._entries.pop(key, None)
+            return None
+        return etag
+
+    def store(self, key: Hashable, tenant_id: int, etag: str):
+        self._entries[key] = (etag, tenant_id, self._versions.get(tenant_id, 0), self._clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def bump(self, tenant_id: int):
+        self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+
+
+onboarding_status_cache = StatusETagCache()
+
+
+def invalidate_on_commit(cache: StatusETagCache, *models):
+    """
+    Bump ``cache`` for every tenant whose ``models`` rows were flushed in a
+    session, once that session commits.
+    """
+
+    @event.listens_for(Session, "after_flush")
+    def _collect(session, flush_context):
+        tenants = session.info.setdefault(_PENDING_KEY, set())
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(instance, models) and getattr(instance, "tenant_id", None) is not None:
+                tenants.add(instance.tenant_id)
+
+    @event.listens_for(Session, "after_commit")
+    def _bump(session):
+        for tenant_id in session.info.pop(_PENDING_KEY, ()):
+            cache.bump(tenant_id)
+
+    @event.listens_for(Session, "after_soft_rollback")
+    def _discard(session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
@@ -1,6 +1,12 @@
+from functools import lru_cache
+
+MOBILE_KEYWORDS = ("Mobile", "Android", "iPhone", "iPad")
+
+
+# Few distinct user agents hit the API, and each one is classified on every request
+@lru_cache(maxsize=1024)
 def get_device_type(user_agent: str) -> str:
     """Determine if the request is from a mobile or desktop based on the User-Agent."""
-    mobile_keywords = ["Mobile", "Android", "iPhone", "iPad"]
-    if any(keyword in user_agent for keyword in mobile_keywords):
+    if any(keyword in user_agent for keyword in MOBILE_KEYWORDS):
         return "Mobile"
     return "Desktop"
@@ -0,0 +1,155 @@
+"""
+Apply Alembic migrations to every dedicated tenant database.
+
+Each tenant database is upgraded by its own ``alembic upgrade`` subprocess.
+Up to ``--concurrency`` run at once. The target URL is passed through
+ALEMBIC_DATABASE_URL (see alembic/env.py) so credentials never appear in the
+process list.
+
+Once upgraded, the tenant's ``tenants`` row and the roles and permissions it
+has in the shared database are copied into its database (rows already there
+are kept). Run this after creating a dedicated tenant or switching one to
+dedicated: its roles are read and written there from then on
+(app/db/tenancy.py).
+
+    python -m app.db.migrate_tenants [--revision head] [--concurrency 4]
+                                     [--tenant NAME ...] [--include-shared]
+
+Exits non-zero when any database failed to migrate.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import DATABASE_URL, TENANT_DATABASE_URL_TEMPLATE
+from app.core.logger import create_logger
+from app.db.database import AsyncSessionLocal
+from app.db.tenancy import TenantRoute
+from app.models.tenant import DeploymentEnum, Permission, Role, Tenant
+
+logger = create_logger("migrations")
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+async def dedicated_tenants(names: Optional[Sequence[str]] = None) -> List[TenantRoute]:
+    stmt = (
+        select(Tenant.id, Tenant.tenant_uuid, Tenant.tenant_name, Tenant.deployment_type)
+        .where(Tenant.deployment_type == DeploymentEnum.dedicated)
+        .order_by(Tenant.id)
+    )
+    if names:
+        stmt = stmt.where(Tenant.tenant_name.in_(list(names)))
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(stmt)).all()
+    return [TenantRoute(*row) for row in rows]
+
+
+async def upgrade_database(label: str, url: str, revision: str, semaphore: asyncio.Semaphore) -> Tuple[str, int, str]:
+    """Run ``alembic upgrade <revision>`` against ``url``; returns (label, returncode, output)."""
+    async with semaphore:
+        env = {**os.environ, "ALEMBIC_DATABASE_URL": url}
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "alembic", "upgrade", revision,
+            cwd=str(PROJECT_ROOT),
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        output, _ = await process.communicate()
+        return label, process.returncode, output.decode(errors="replace")
+
+
+async def copy_tenant_data(route: TenantRoute, url: str) -> int:
+    """
+    Copy the tenant's row, roles and permissions from the shared database
+    into its own; returns the number of rows read. Safe to rerun: existing
+    rows win, and id sequences are moved past the copied ids.
+    """
+    tenants, roles, permissions = Tenant.__table__, Role.__table__, Permission.__table__
+    async with AsyncSessionLocal() as session:
+        tenant_rows = (await session.execute(select(tenants).where(tenants.c.id == route.tenant_id))).mappings().all()
+        role_rows = (await session.execute(select(roles).where(roles.c.tenant_id == route.tenant_id))).mappings().all()
+        permission_rows = (await session.execute(
+            select(permissions).where(permissions.c.role_id.in_([row["id"] for row in role_rows]))
+        )).mappings().all() if role_rows else []
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            for table, rows in ((tenants, tenant_rows), (roles, role_rows), (permissions, permission_rows)):
+                if not rows:
+                    continue
+                await conn.execute(pg_insert(table).values([dict(row) for row in rows]).on_conflict_do_nothing())
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT max(id) FROM {table.name}))"
+                ))
+    finally:
+        await engine.dispose()
+    return len(tenant_rows) + len(role_rows) + len(permission_rows)
+
+
+async def migrate_all(revision: str = "head", concurrency: int = 4, names: Optional[Sequence[str]] = None, include_shared: bool = False) -> int:
+    targets: List[Tuple[str, str]] = []
+    if include_shared:
+        targets.append(("shared", DATABASE_URL))
+
+    tenants = await dedicated_tenants(names)
+    if tenants and not TENANT_DATABASE_URL_TEMPLATE:
+        logger.error("TENANT_DATABASE_URL_TEMPLATE is not set; cannot resolve dedicated tenant databases")
+        return 1
+    routes = {tenant.tenant_name: tenant for tenant in tenants}
+    targets.extend((tenant.tenant_name, tenant.database_url(TENANT_DATABASE_URL_TEMPLATE)) for tenant in tenants)
+
+    if not targets:
+        print("No databases to migrate")
+        return 0
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = await asyncio.gather(
+        *(upgrade_database(label, url, revision, semaphore) for label, url in targets)
+    )
+
+    failed = 0
+    for (label, returncode, output), (_, url) in zip(results, targets):
+        masked = make_url(url).render_as_string(hide_password=True)
+        if returncode == 0 and label in routes:
+            try:
+                copied = await copy_tenant_data(routes[label], url)
+                print(f"[ok]     {label} ({masked}), {copied} tenant row(s) copied or already present")
+            except Exception as e:
+                failed += 1
+                print(f"[failed] {label} ({masked}): copying tenant data: {e}")
+                logger.error(f"Copying tenant data failed for {label}: {e}")
+        elif returncode == 0:
+            print(f"[ok]     {label} ({masked})")
+        else:
+            failed += 1
+            print(f"[failed] {label} ({masked})\n{output}")
+            logger.error(f"Migration to {revision} failed for {label}: {output.strip()[-500:]}")
+
+    print(f"{len(targets) - failed}/{len(targets)} databases at {revision}")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply Alembic migrations to dedicated tenant databases.")
+    parser.add_argument("--revision", default="head")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tenant", action="append", dest="tenants", help="Only these tenant names (repeatable)")
+    parser.add_argument("--include-shared", action="store_true", help="Also upgrade the shared database")
+    args = parser.parse_args(argv)
+    return asyncio.run(migrate_all(args.revision, args.concurrency, args.tenants, args.include_shared))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
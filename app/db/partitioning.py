@@ -0,0 +1,313 @@
+"""
+Monthly range partitioning on ``created_at``.
+
+``transactions``, ``orders`` and ``saas_subscription_billings`` are
+partitioned by month. A child table is named ``<parent>_pYYYY_MM`` and
+covers ``[first of month, first of next month)``. A ``<parent>_default``
+partition catches anything outside the pre-created months.
+
+Maintenance (run from cron, or see ``python -m app.db.partitioning --help``):
+
+- pre-create partitions for the next ``PARTITION_MONTHS_AHEAD`` months. Rows
+  that already landed in the default partition for a month are moved into it.
+- detach partitions older than ``PARTITION_RETAIN_MONTHS``. Their rows are
+  copied into an ``lz4``-compressed table in the ``PARTITION_ARCHIVE_SCHEMA``
+  schema, then the detached partition is dropped.
+
+The finance rollups (app/services/rollups.py) read orders, billings and
+transactions from the live tables only. Their rows for archived months stay
+as they were computed: a rollup rebuild starts after the newest archived
+month (``archived_through``) instead of recomputing those days from
+partitions that are gone. Archive a month only once its rollups are
+complete; the refresh keeps them current, so within the default retention
+this holds unless the refresh stopped for the whole period.
+
+Queries against these tables should always carry a ``created_at`` bound so
+Postgres can prune partitions. ``created_between`` builds that predicate and
+``first_recent`` looks a row up in a recent window first, falling back to a
+full scan only when the row is older.
+"""
+import argparse
+import asyncio
+import re
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+from sqlalchemy import DDL, event, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import PARTITION_ARCHIVE_SCHEMA, PARTITION_MONTHS_AHEAD, PARTITION_RETAIN_MONTHS
+from app.core.logger import create_logger
+
+logger = create_logger("partitioning")
+
+PARTITIONED_TABLES = ("transactions", "orders", "saas_subscription_billings")
+PARTITION_KEY = "created_at"
+
+# Lookback used by ``first_recent`` before it falls back to every partition
+RECENT_WINDOW = timedelta(days=45)
+
+_PARTITION_NAME = re.compile(r"^(?P<parent>.+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ---------------------------------------------------------------------------
+# Month arithmetic + naming
+# ---------------------------------------------------------------------------
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(parent: str, month: date) -> str:
+    return f"{parent}_p{month.year:04d}_{month.month:02d}"
+
+
+def parse_partition_name(name: str) -> Optional[date]:
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match["year"]), int(match["month"]), 1)
+
+
+def default_partition_name(parent: str) -> str:
+    return f"{parent}_default"
+
+
+@dataclass(frozen=True)
+class MonthPartition:
+    parent: str
+    month: date
+
+    @property
+    def name(self) -> str:
+        return partition_name(self.parent, self.month)
+
+    @property
+    def lower(self) -> date:
+        return self.month
+
+    @property
+    def upper(self) -> date:
+        return add_months(self.month, 1)
+
+    def bounds_sql(self) -> str:
+        return f"FOR VALUES FROM ('{_utc_literal(self.lower)}') TO ('{_utc_literal(self.upper)}')"
+
+
+def _utc_literal(day: date) -> str:
+    # Explicit offset: bounds must not depend on the session's TimeZone
+    return f"{day.isoformat()} 00:00:00+00"
+
+
+def register_default_partition(table):
+    """
+    ``metadata.create_all`` only creates the partitioned parent. Attach a
+    default partition right after, so inserts work on a fresh database before
+    the maintenance job has created any monthly partitions.
+    """
+    event.listen(
+        table,
+        "after_create",
+        DDL("CREATE TABLE IF NOT EXISTS %(table)s_default PARTITION OF %(table)s DEFAULT").execute_if(dialect="postgresql"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Query helpers
+# ---------------------------------------------------------------------------
+
+def created_between(model, since=None, until=None):
+    """Partition-pruning predicate on ``model.created_at``."""
+    column = getattr(model, PARTITION_KEY)
+    if since is not None and until is not None:
+        return column.between(since, until)
+    if since is not None:
+        return column >= since
+    if until is not None:
+        return column <= until
+    raise ValueError("created_between needs at least one bound")
+
+
+async def first_recent(db, stmt, model, window: timedelta = RECENT_WINDOW, now: Optional[datetime] = None):
+    """
+    First ORM row of ``stmt``, looked up in the last ``window`` before falling
+    back to all partitions. Webhooks and activation lookups almost always
+    target rows created minutes ago, so the fallback is rare.
+    """
+    since = (now or utcnow()) - window
+    result = await db.execute(stmt.where(created_between(model, since=since)))
+    row = result.scalars().first()
+    if row is not None:
+        return row
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
+# ---------------------------------------------------------------------------
+# Maintenance
+# ---------------------------------------------------------------------------
+
+async def list_partitions(conn: AsyncConnection, parent: str) -> List[MonthPartition]:
+    rows = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_namespace ns ON ns.oid = parent.relnamespace "
+            "WHERE parent.relname = :parent AND ns.nspname = current_schema()"
+        ),
+        {"parent": parent},
+    )
+    partitions = []
+    for (name,) in rows:
+        month = parse_partition_name(name)
+        if month is not None and name == partition_name(parent, month):
+            partitions.append(MonthPartition(parent, month))
+    return sorted(partitions, key=lambda partition: partition.month)
+
+
+async def create_partition(conn: AsyncConnection, partition: MonthPartition):
+    """
+    Create one monthly partition inside the caller's transaction. Rows for
+    that month already sitting in the default partition are moved first;
+    otherwise attaching would fail the default partition's constraint check.
+    """
+    parent, child, default = partition.parent, partition.name, default_partition_name(partition.parent)
+    in_range = f"{PARTITION_KEY} >= '{_utc_literal(partition.lower)}' AND {PARTITION_KEY} < '{_utc_literal(partition.upper)}'"
+    await conn.execute(text(f"LOCK TABLE {parent} IN SHARE ROW EXCLUSIVE MODE"))
+    await conn.execute(text(f"CREATE TABLE {child} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await conn.execute(
+        text(f"WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) INSERT INTO {child} SELECT * FROM moved")
+    )
+    await conn.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {child} {partition.bounds_sql()}"))
+    if moved.rowcount:
+        logger.warning(f"Moved {moved.rowcount} rows from {default} into {child}")
+    logger.info(f"Created partition {child}")
+
+
+async def ensure_future_partitions(engine, parent: str, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None) -> List[str]:
+    async with engine.connect() as conn:
+        existing = {partition.month for partition in await list_partitions(conn, parent)}
+    current = month_start(today or utcnow())
+    created = []
+    for offset in range(months_ahead + 1):
+        partition = MonthPartition(parent, add_months(current, offset))
+        if partition.month not in existing:
+            async with engine.begin() as conn:
+                await create_partition(conn, partition)
+            created.append(partition.name)
+    return created
+
+
+async def _compressible_columns(conn: AsyncConnection, table: str, schema: str) -> List[str]:
+    rows = await conn.execute(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = :schema AND table_name = :table "
+            "AND data_type IN ('json', 'jsonb', 'text', 'character varying')"
+        ),
+        {"schema": schema, "table": table},
+    )
+    return [name for (name,) in rows]
+
+
+async def archive_partition(conn: AsyncConnection, partition: MonthPartition, schema: str = PARTITION_ARCHIVE_SCHEMA):
+    """
+    Detach ``partition`` and move its rows to ``<schema>.<partition name>``,
+    inside the caller's transaction. Wide columns are stored with lz4
+    compression and the table is packed at fillfactor 100, since archived
+    rows are never updated.
+    """
+    child = partition.name
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    await conn.execute(text(f"ALTER TABLE {partition.parent} DETACH PARTITION {child}"))
+    await conn.execute(text(f"CREATE TABLE {schema}.{child} (LIKE {child} INCLUDING DEFAULTS) WITH (fillfactor = 100)"))
+    if int(await conn.scalar(text("SHOW server_version_num"))) >= 140000:
+        for column in await _compressible_columns(conn, child, schema):
+            await conn.execute(text(f"ALTER TABLE {schema}.{child} ALTER COLUMN {column} SET COMPRESSION lz4"))
+    copied = await conn.execute(text(f"INSERT INTO {schema}.{child} SELECT * FROM {child}"))
+    await conn.execute(text(f"DROP TABLE {child}"))
+    logger.info(f"Archived {child} ({copied.rowcount} rows) to {schema}.{child}")
+
+
+async def archive_old_partitions(engine, parent: str, retain_months: int = PARTITION_RETAIN_MONTHS, today: Optional[date] = None) -> List[str]:
+    cutoff = add_months(month_start(today or utcnow()), -retain_months)
+    async with engine.connect() as conn:
+        partitions = await list_partitions(conn, parent)
+    archived = []
+    for partition in partitions:
+        if partition.upper <= cutoff:
+            async with engine.begin() as conn:
+                await archive_partition(conn, partition)
+            archived.append(partition.name)
+    return archived
+
+
+async def archived_through(conn, parent: str, schema: str = PARTITION_ARCHIVE_SCHEMA) -> Optional[date]:
+    """
+    The first day after the newest archived month of ``parent``, or None if
+    no month is archived. Earlier days are no longer in the live table.
+    """
+    rows = await conn.execute(
+        text(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = :schema AND table_name LIKE :pattern"
+        ),
+        {"schema": schema, "pattern": f"{parent}_p%"},
+    )
+    months = []
+    for (name,) in rows:
+        month = parse_partition_name(name)
+        if month is not None and name == partition_name(parent, month):
+            months.append(month)
+    return add_months(max(months), 1) if months else None
+
+
+async def run_maintenance(engine, tables: Sequence[str] = PARTITIONED_TABLES, months_ahead: int = PARTITION_MONTHS_AHEAD, retain_months: Optional[int] = PARTITION_RETAIN_MONTHS) -> dict:
+    """Pre-create upcoming partitions and archive expired ones for ``tables``."""
+    report = {}
+    for table in tables:
+        created = await ensure_future_partitions(engine, table, months_ahead)
+        archived = await archive_old_partitions(engine, table, retain_months) if retain_months else []
+        async with engine.connect() as conn:
+            default_rows = await conn.scalar(text(f"SELECT count(*) FROM {default_partition_name(table)}"))
+        if default_rows:
+            logger.warning(f"{default_partition_name(table)} holds {default_rows} rows outside the monthly partitions")
+        report[table] = {"created": created, "archived": archived, "default_rows": default_rows}
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Create upcoming monthly partitions and archive old ones.")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retain-months", type=int, default=PARTITION_RETAIN_MONTHS, help="0 disables archiving")
+    parser.add_argument("--table", action="append", dest="tables", choices=PARTITIONED_TABLES)
+    args = parser.parse_args(argv)
+
+    from app.db.database import engine
+
+    async def run():
+        try:
+            return await run_maintenance(engine, args.tables or PARTITIONED_TABLES, args.months_ahead, args.retain_months)
+        finally:
+            await engine.dispose()
+
+    report = asyncio.run(run())
+    for table, outcome in report.items():
+        print(f"{table}: created={outcome['created']} archived={outcome['archived']} default_rows={outcome['default_rows']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""
+Read models for list and lookup endpoints.
+
+These queries select only the columns an endpoint returns, using SQLAlchemy
+Core against the mapped tables. Rows are turned into small tuple-backed records
+and never pass through the ORM identity map or relationship loaders. Nested
+collections (tenant roles, app pricing / features) are built with Postgres
+``json_agg``, so each endpoint needs a single round trip.
+
+Every record's ``to_dict()`` produces the same shape the ORM path returned.
+"""
+import datetime
+import uuid
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import JSON, FromClause, Select, Text, case, func, literal, select, type_coerce
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.apps import App, AppPricing
+from app.models.auth import User
+from app.models.client import OAuthClient
+from app.models.features import Feature
+from app.models.plans import CountryEnum, CurrencyEnum
+from app.models.tenant import Role, Tenant
+
+
+# Fallback root price when an app has no active INR pricing row.
+DEFAULT_BASE_PRICE = 1000.00
+
+def _iso_utc(column):
+    """
+    Format a timestamptz inside a JSON aggregate the way Pydantic does for UTC
+    datetimes ("2026-01-02T03:04:05.123456Z", or "2026-01-02T03:04:05Z" on a
+    whole second) rather than Postgres' own "+00:00" form, so nested and
+    top-level timestamps look the same.
+    """
+    utc = func.timezone("UTC", column)
+    fraction = case((func.date_trunc("second", utc) == utc, literal("")), else_=func.to_char(utc, ".US"))
+    return func.to_char(utc, 'YYYY-MM-DD"T"HH24:MI:SS') + fraction + literal("Z")
+
+
+def json_array(subquery: Select):
+    """COALESCE a correlated json_agg subquery to [] and decode it as JSON."""
+    return type_coerce(func.coalesce(subquery.scalar_subquery(), func.json_build_array()), JSON)
+
+
+def _isoformat(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+# ---------------------------------------------------------------------------
+# Users
+# ---------------------------------------------------------------------------
+
+class UserRecord(NamedTuple):
+    id: int
+    first_name: str
+    last_name: str
+    username: str
+    email: str
+    phone_number: Optional[str]
+    tenant_id: int
+    is_active: Optional[bool]
+    is_root_user: Optional[bool]
+    is_superuser: Optional[bool]
+
+    def to_dict(self) -> dict:
+        """Same keys as ``User.to_dict()``."""
+        return self._asdict()
+
+
+_user_columns = [User.__table__.c[name] for name in UserRecord._fields]
+
+
+async def fetch_users(db: AsyncSession, *, offset: int = 0, limit: int = 10) -> List[UserRecord]:
+    """Page of auth users, without the password hash."""
+    stmt = select(*_user_columns).order_by(User.__table__.c.id).offset(offset).limit(limit)
+    result = await db.execute(stmt)
+    return [UserRecord._make(row) for row in result.all()]
+
+
+# ---------------------------------------------------------------------------
+# OAuth clients
+# ---------------------------------------------------------------------------
+
+class OAuthClientRecord(NamedTuple):
+    id: int
+    client_name: str
+    client_id: str
+    client_type: str
+    authorization_grant_types: list
+    redirect_urls: list
+    post_logout_redirect_urls: Optional[list]
+    skip_authorization: Optional[bool]
+    allowed_origins: Optional[list]
+    token_endpoint_auth_method: str
+    scope: list
+    response_types: list
+    grant_types: list
+    algorithm: str
+    created_at: datetime.datetime
+    updated_at: Optional[datetime.datetime]
+
+    def to_dict(self) -> dict:
+        """Same keys as ``OAuthClient.to_dict()``; secrets are never selected."""
+        data = self._asdict()
+        data["created_at"] = _isoformat(self.created_at)
+        data["updated_at"] = _isoformat(self.updated_at)
+        return data
+
+
+_client_columns = [OAuthClient.__table__.c[name] for name in OAuthClientRecord._fields]
+
+
+async def fetch_oauth_clients(db: AsyncSession, *, offset: int = 0, limit: int = 10) -> List[OAuthClientRecord]:
+    """Page of OAuth clients."""
+    stmt = select(*_client_columns).order_by(OAuthClient.__table__.c.id).offset(offset).limit(limit)
+    result = await db.execute(stmt)
+    return [OAuthClientRecord._make(row) for row in result.all()]
+
+
+# ---------------------------------------------------------------------------
+# Tenants with roles
+# ---------------------------------------------------------------------------
+
+class TenantRolesRecord(NamedTuple):
+    tenant_uuid: uuid.UUID
+    tenant_name: str
+    is_active: bool
+    created_at: Optional[datetime.datetime]
+    roles: list
+
+    def to_dict(self) -> dict:
+        return {
+            "tenant_id": str(self.tenant_uuid),
+            "name": self.tenant_name,
+            "roles": self.roles,
+            "isActive": self.is_active,
+            "created_at": self.created_at,
+        }
+
+
+def tenants_with_roles_query() -> Select:
+    tenants = Tenant.__table__
+    roles = Role.__table__
+    role_names = select(
+        func.json_agg(aggregate_order_by(roles.c.role_name, roles.c.id))
+    ).where(roles.c.tenant_id == tenants.c.id)
+    return select(
+        tenants.c.tenant_uuid,
+        tenants.c.tenant_name,
+        tenants.c.is_active,
+        tenants.c.created_at,
+        json_array(role_names).label("roles"),
+    ).order_by(tenants.c.id)
+
+
+async def fetch_tenants_with_roles(db: AsyncSession) -> List[TenantRolesRecord]:
+    """All tenants with their role names, in one query."""
+    result = await db.execute(tenants_with_roles_query())
+    return [TenantRolesRecord._make(row) for row in result.all()]
+
+
+# ---------------------------------------------------------------------------
+# SaaS apps with pricing and features
+# ---------------------------------------------------------------------------
+
+class AppRecord(NamedTuple):
+    id: uuid.UUID
+    code: str
+    name: str
+    description: Optional[str]
+    icon: Optional[str]
+    is_active: bool
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    pricing: list
+    features: list
+
+    def to_dict(self, currency: str = CurrencyEnum.INR.value, country: Optional[str] = None) -> dict:
+        """
+        Same shape as ``jsonable_encoder(AppOut)`` with the root price
+        resolved: the first active pricing row in ``currency`` (and
+        ``country`` when given; INR by default), else the default.
+        """
+        root_pricing = next(
+            (
+                p for p in self.pricing
+                if p["is_active"] and p["currency"] == currency and (country is None or p["country"] == country)
+            ),
+            None,
+        )
+        if root_pricing:
+            base_price = root_pricing["price"]
+            primary_currency = root_pricing["currency"]
+            primary_country = root_pricing["country"]
+        else:
+            base_price = DEFAULT_BASE_PRICE
+            primary_currency = CurrencyEnum.INR.value
+            primary_country = CountryEnum.IN.value
+
+        return {
+            "code": self.code,
+            "name": self.name,
+            "description": self.description,
+            "icon": self.icon,
+            "is_active": self.is_active,
+            "id": self.id,
+            "pricing": self.pricing,
+            "features": self.features,
+            "base_price": base_price,
+            "primary_currency": primary_currency,
+            "primary_country": primary_country,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+def pricing_rows(pricing: FromClause) -> Select:
+    """
+    ``json_agg`` of AppPricingOut-shaped objects over ``pricing`` (the table,
+    or a CTE returning its columns).
+
+    Numeric columns are cast to text so prices keep their scale ("3999.00"),
+    which is how Pydantic rendered the Decimal fields of AppOut.
+    """
+    return select(
+        func.json_agg(
+            aggregate_order_by(
+                func.json_build_object(
+                    "price", pricing.c.price.cast(Text),
+                    "currency", pricing.c.currency,
+                    "country", pricing.c.country,
+                    "is_active", pricing.c.is_active,
+                    "created_at", _iso_utc(pricing.c.created_at),
+                ),
+                pricing.c.id,
+            )
+        )
+    )
+
+
+def feature_rows(features: FromClause) -> Select:
+    """``json_agg`` of FeatureOut-shaped objects over ``features`` (table or CTE)."""
+    return select(
+        func.json_agg(
+            aggregate_order_by(
+                func.json_build_object(
+                    "code", features.c.code,
+                    "name", features.c.name,
+                    "description", features.c.description,
+                    "is_base_feature", features.c.is_base_feature,
+                    "addon_price", features.c.addon_price.cast(Text),
+                    "currency", features.c.currency,
+                    "status", features.c.status,
+                    "id", features.c.id,
+                    "created_at", _iso_utc(features.c.created_at),
+                    "updated_at", _iso_utc(features.c.updated_at),
+                ),
+                features.c.created_at,
+                features.c.id,
+            )
+        )
+    )
+
+
+def app_columns(apps: FromClause) -> list:
+    """The AppRecord columns of ``apps`` (table or CTE), in record order."""
+    return [apps.c[name] for name in AppRecord._fields if name not in ("pricing", "features")]
+
+
+def apps_query(active_only: bool = True) -> Select:
+    apps = App.__table__
+    pricing = AppPricing.__table__
+    features = Feature.__table__
+
+    stmt = select(
+        *app_columns(apps),
+        json_array(pricing_rows(pricing).where(pricing.c.app_id == apps.c.id)).label("pricing"),
+        json_array(feature_rows(features).where(features.c.app_id == apps.c.id)).label("features"),
+    )
+    if active_only:
+        stmt = stmt.where(apps.c.is_active.is_(True))
+    return stmt
+
+
+async def fetch_apps(db: AsyncSession, *, active_only: bool = True) -> List[AppRecord]:
+    """SaaS apps with their pricing rows and features, in one query."""
+    result = await db.execute(apps_query(active_only=active_only))
+    return [AppRecord._make(row) for row in result.all()]
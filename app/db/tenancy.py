@@ -0,0 +1,333 @@
+"""
+Tenant-aware database routing.
+
+Tenants with ``deployment_type == dedicated`` live in their own database,
+whose URL comes from ``TENANT_DATABASE_URL_TEMPLATE``. Shared tenants (and
+requests that carry no tenant at all) keep using the shared engine in
+``app.db.database``.
+
+- ``TenantDirectory`` looks a tenant up in the shared database by UUID or
+  name and caches the result for a short TTL.
+- ``TenantEngineRegistry`` keeps a bounded LRU of per-tenant async engines.
+  Each has a small pool, and engines idle for longer than the configured
+  window are disposed.
+- ``get_tenant_db`` is the FastAPI dependency. It takes the tenant from the
+  path (``tenant_uuid`` / ``tenant_id`` UUID params) or from the bearer
+  token, and yields a session bound to that tenant's engine.
+  ``tenant_session`` does the same for a tenant known only from a request
+  body or a loaded row.
+
+What lives in a dedicated database: the tenant's roles and permissions,
+read and written only through these sessions, plus a copy of its
+``tenants`` row for their foreign key. Tenants, users, subscriptions and
+billing stay in the shared database, because login, the tenant lookup
+above and billing look across tenants. ``python -m app.db.migrate_tenants``
+migrates each dedicated database and copies the tenant's row and any roles
+it had while shared into it.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import (
+    TENANT_DATABASE_URL_TEMPLATE,
+    TENANT_ENGINE_CACHE_SIZE,
+    TENANT_ENGINE_IDLE_SECONDS,
+    TENANT_POOL_MAX_OVERFLOW,
+    TENANT_POOL_SIZE,
+)
+from app.core.logger import create_logger
+from app.db.database import AsyncSessionLocal
+from app.models.tenant import DeploymentEnum, Tenant
+
+logger = create_logger("tenancy")
+
+
+@dataclass(frozen=True)
+class TenantRoute:
+    """The tenant fields needed to pick (and name) a database."""
+
+    tenant_id: int
+    tenant_uuid: uuid.UUID
+    tenant_name: str
+    deployment_type: DeploymentEnum
+
+    @property
+    def is_dedicated(self) -> bool:
+        return self.deployment_type == DeploymentEnum.dedicated
+
+    def database_url(self, template: str) -> str:
+        return template.format(
+            tenant_id=self.tenant_id,
+            tenant_uuid=self.tenant_uuid,
+            tenant_name=self.tenant_name,
+        )
+
+
+def _as_uuid(value) -> Optional[uuid.UUID]:
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Tenant lookups
+# ---------------------------------------------------------------------------
+
+class TenantDirectory:
+    """
+    Resolves a tenant UUID or name to a ``TenantRoute`` using the shared
+    database. Hits are cached for ``ttl`` seconds, with at most
+    ``max_entries`` cached.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1024, session_factory=AsyncSessionLocal, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._session_factory = session_factory
+        self._clock = clock
+        self._cache: Dict[str, Tuple[float, TenantRoute]] = {}
+
+    async def lookup(self, key: str) -> Optional[TenantRoute]:
+        key = str(key)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > self._clock():
+            return cached[1]
+
+        route = await self._fetch(key)
+        if route is not None:
+            if len(self._cache) >= self.max_entries:
+                # dicts keep insertion order: drop the oldest entry
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = (self._clock() + self.ttl, route)
+        return route
+
+    def invalidate(self, key: Optional[str] = None):
+        """Forget one tenant (e.g. after its deployment_type changed), or all."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(str(key), None)
+
+    async def _fetch(self, key: str) -> Optional[TenantRoute]:
+        tenant_uuid = _as_uuid(key)
+        condition = Tenant.tenant_uuid == tenant_uuid if tenant_uuid else Tenant.tenant_name == key
+        stmt = select(Tenant.id, Tenant.tenant_uuid, Tenant.tenant_name, Tenant.deployment_type).where(condition)
+        async with self._session_factory() as session:
+            row = (await session.execute(stmt)).first()
+        return TenantRoute(*row) if row else None
+
+
+# ---------------------------------------------------------------------------
+# Per-tenant engines
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _EngineEntry:
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker
+    last_used: float = field(default=0.0)
+
+
+class TenantEngineRegistry:
+    """
+    Bounded LRU of async engines for dedicated tenants.
+
+    Looking an engine up is synchronous (creating an engine does not
+    connect), so concurrent requests on the event loop cannot race to create
+    two engines for the same tenant. Evicted and idle engines are disposed
+    afterwards. Connections still checked out by in-flight requests are closed
+    when those requests return them.
+    """
+
+    def __init__(
+        self,
+        url_template: Optional[str] = TENANT_DATABASE_URL_TEMPLATE,
+        max_engines: int = TENANT_ENGINE_CACHE_SIZE,
+        idle_seconds: float = TENANT_ENGINE_IDLE_SECONDS,
+        pool_size: int = TENANT_POOL_SIZE,
+        max_overflow: int = TENANT_POOL_MAX_OVERFLOW,
+        engine_factory: Callable[..., AsyncEngine] = create_async_engine,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.url_template = url_template
+        self.max_engines = max_engines
+        self.idle_seconds = idle_seconds
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self._engine_factory = engine_factory
+        self._clock = clock
+        self._entries: "OrderedDict[uuid.UUID, _EngineEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, tenant_uuid) -> bool:
+        return tenant_uuid in self._entries
+
+    async def sessionmaker_for(self, route: TenantRoute) -> async_sessionmaker:
+        sessionmaker, stale = self._checkout(route)
+        await self._dispose(stale)
+        return sessionmaker
+
+    def _checkout(self, route: TenantRoute) -> Tuple[async_sessionmaker, List[AsyncEngine]]:
+        now = self._clock()
+        entry = self._entries.get(route.tenant_uuid)
+        if entry is None:
+            engine = self._engine_factory(
+                route.database_url(self.url_template),
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_pre_ping=True,
+                pool_recycle=1800,
+            )
+            entry = _EngineEntry(engine, async_sessionmaker(engine, expire_on_commit=False))
+            self._entries[route.tenant_uuid] = entry
+            logger.info(f"Created engine for dedicated tenant {route.tenant_name} ({len(self._entries)} cached)")
+        else:
+            self._entries.move_to_end(route.tenant_uuid)
+        entry.last_used = now
+
+        stale = self._pop_idle(now)
+        while len(self._entries) > self.max_engines:
+            _, evicted = self._entries.popitem(last=False)
+            stale.append(evicted.engine)
+        return entry.sessionmaker, stale
+
+    def _pop_idle(self, now: float) -> List[AsyncEngine]:
+        stale = []
+        # Least recently used first: stop at the first engine still in use
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self.idle_seconds:
+                break
+            del self._entries[key]
+            stale.append(entry.engine)
+        return stale
+
+    async def _dispose(self, engines: List[AsyncEngine]):
+        for engine in engines:
+            try:
+                await engine.dispose()
+            except Exception as e:
+                logger.error(f"Failed to dispose tenant engine {engine.url.render_as_string(hide_password=True)}: {e}")
+
+    async def dispose_idle(self):
+        await self._dispose(self._pop_idle(self._clock()))
+
+    async def dispose_all(self):
+        engines = [entry.engine for entry in self._entries.values()]
+        self._entries.clear()
+        await self._dispose(engines)
+
+    async def reap_forever(self, interval: float = 60.0):
+        """Background loop disposing idle engines even when no requests arrive."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.dispose_idle()
+
+
+# ---------------------------------------------------------------------------
+# Routing + FastAPI dependency
+# ---------------------------------------------------------------------------
+
+class TenantDatabaseRouter:
+    """Picks the session factory for a tenant key (UUID or name)."""
+
+    def __init__(self, registry: TenantEngineRegistry, directory: TenantDirectory, shared=AsyncSessionLocal):
+        self.registry = registry
+        self.directory = directory
+        self.shared = shared
+
+    async def sessionmaker_for(self, tenant_key: Optional[str]):
+        if not tenant_key:
+            return self.shared
+        route = await self.directory.lookup(tenant_key)
+        if route is None or not route.is_dedicated:
+            return self.shared
+        if not self.registry.url_template:
+            logger.warning(f"Tenant {route.tenant_name} is dedicated but TENANT_DATABASE_URL_TEMPLATE is not set; using the shared database")
+            return self.shared
+        return await self.registry.sessionmaker_for(route)
+
+
+tenant_engines = TenantEngineRegistry()
+tenant_directory = TenantDirectory()
+tenant_router = TenantDatabaseRouter(tenant_engines, tenant_directory)
+
+# Path parameters that identify a tenant by UUID
+TENANT_PATH_PARAMS = ("tenant_uuid", "tenant_id")
+
+
+def tenant_key_from_path(request: Request) -> Optional[str]:
+    for name in TENANT_PATH_PARAMS:
+        tenant_uuid = _as_uuid(request.path_params.get(name))
+        if tenant_uuid is not None:
+            return str(tenant_uuid)
+    return None
+
+
+async def token_claims(request: Request) -> Optional[dict]:
+    """
+    Claims of the request's bearer token, or None without a valid one. The
+    token is validated once per request and the claims kept on
+    ``request.state``, so tenant routing and ``get_current_user`` share them.
+    """
+    if hasattr(request.state, "token_claims"):
+        return request.state.token_claims
+    claims = None
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        # Imported lazily: the token service loads signing keys on import
+        from app.core.security.oauth_token_service import validate_token
+
+        try:
+            claims = await validate_token(TOKEN=token)
+        except Exception:
+            claims = None
+    request.state.token_claims = claims
+    return claims
+
+
+async def tenant_key_from_token(request: Request) -> Optional[str]:
+    """
+    Tenant claim of a valid bearer token, if any. An invalid token is ignored
+    here; routes that require authentication reject it themselves.
+    """
+    claims = await token_claims(request)
+    if not claims:
+        return None
+    return claims.get("tenant_uuid") or claims.get("tenant_name")
+
+
+@asynccontextmanager
+async def tenant_session(tenant_key: Optional[str], shared_session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    A session on the tenant's database. ``shared_session`` is used as is
+    when that is the shared database, instead of opening a second session.
+    """
+    session_factory = await tenant_router.sessionmaker_for(tenant_key)
+    if session_factory is tenant_router.shared and shared_session is not None:
+        yield shared_session
+        return
+    async with session_factory() as session:
+        yield session
+
+
+async def get_tenant_db(request: Request) -> AsyncIterator[AsyncSession]:
+    """Dependency: a session on the tenant's own database when it is dedicated."""
+    tenant_key = tenant_key_from_path(request) or await tenant_key_from_token(request)
+    async with tenant_session(tenant_key) as session:
+        yield session
@@ -0,0 +1,20 @@
+"""
+Durable, Postgres-backed job queue.
+
+Request handlers ``enqueue`` jobs in the same transaction as the write that
+needs them; ``python -m app.worker`` claims and runs them. Handlers are
+registered in ``app.jobs.handlers`` with ``@job_handler(kind)``. They must
+be idempotent, because a job can run again after a crash or a failed
+attempt.
+"""
+from app.jobs.queue import JobError, enqueue, enqueue_many
+from app.jobs.registry import job_handler
+
+# Job kinds
+SEND_TENANT_REGISTRATION_EMAIL = "email.tenant_registration"
+SEND_SUBSCRIPTION_CONFIRMATION = "email.subscription_confirmation"
+ACTIVATE_ORDER = "subscription.activate_order"
+PROCESS_WEBHOOK_EVENTS = "webhooks.process_order_events"
+REFRESH_ENTITLEMENTS = "subscriptions.refresh_entitlements"
+CHARGE_RENEWAL = "subscription.renewal_charge"
+SEND_LIFECYCLE_EMAIL = "email.subscription_lifecycle"
@@ -0,0 +1,208 @@
+"""
+Job handlers. Each one must tolerate running again for the same payload:
+a job is retried after any exception, and after a worker crash.
+"""
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import SUBSCRIPTION_GRACE_DAYS
+from app.controllers.account_controller import AccountController
+from app.controllers.subscription_controller import SubscriptionController
+from app.controllers.tenant_link_controller import activation_url, create_tenant_link
+from app.core.logger import create_logger
+from app.db.partitioning import first_recent
+from app.jobs import (
+    ACTIVATE_ORDER, CHARGE_RENEWAL, PROCESS_WEBHOOK_EVENTS, REFRESH_ENTITLEMENTS, SEND_LIFECYCLE_EMAIL,
+    SEND_SUBSCRIPTION_CONFIRMATION, SEND_TENANT_REGISTRATION_EMAIL, JobError, enqueue, job_handler,
+)
+from app.models.orders import Order
+from app.models.subscriptions import PaymentStatus, SubscriptionBilling
+from app.models.tenant import Tenant
+from app.models.transactions import Transaction, TransactionStatus
+from app.services.email_service import (
+    send_subscription_confirmation_email, send_subscription_lifecycle_email, send_tenant_registration_email,
+)
+from app.services.invoice_service import invoice_renderer, store_rendered_invoice
+from app.services.payment_gateway import GatewayError, payment_gateway
+from app.services.status_events import (
+    PAYMENT_FAILED, SUBSCRIPTION_ACTIVE, SUBSCRIPTION_PLAN_CHANGED, publish_status_event,
+)
+from app.services.subscription_lifecycle import renewal_payment_url
+from app.services.webhook_inbox import park_head_event, process_order_events
+
+logger = create_logger("jobs")
+
+
+def _raise_unless_sent(result: dict):
+    if not result or not result.get("success"):
+        raise JobError((result or {}).get("error") or "Email was not sent")
+
+
+@job_handler(SEND_TENANT_REGISTRATION_EMAIL)
+async def send_registration_email(db: AsyncSession, payload: dict):
+    """
+    The activation link is created as the email goes out, so its token is
+    only ever in the email. A retry sends a new link; earlier ones stay valid
+    until they expire, like resent links.
+    """
+    tenant = (await db.execute(select(Tenant).filter(Tenant.tenant_uuid == UUID(payload["tenant_uuid"])))).scalars().first()
+    if tenant is None:
+        raise JobError(f"Tenant {payload['tenant_uuid']} not found")
+    if tenant.is_active:
+        logger.info(f"Tenant {tenant.tenant_uuid} is already active, not sending an activation link")
+        return
+    _, raw_token = await create_tenant_link(db, str(tenant.tenant_uuid), hours_valid=24, extra_payload=tenant.to_dict())
+    result = await send_tenant_registration_email(tenant.tenant_email, tenant.tenant_name, activation_url(raw_token))
+    _raise_unless_sent(result)
+
+
+@job_handler(SEND_SUBSCRIPTION_CONFIRMATION)
+async def send_subscription_confirmation(db: AsyncSession, payload: dict):
+    """
+    A new root user's password is generated here and committed just before
+    the email is sent, so it is never stored in the job. A retry issues a
+    new one; only the last email's password works.
+    """
+    root_password = None
+    if payload.get("root_user_id"):
+        root_password = await AccountController(db).issue_password(payload["root_user_id"])
+    attachments = []
+    invoice = payload.get("invoice")
+    if invoice:
+        pdf_content = await invoice_renderer.render(invoice, payload["tenant_info"])
+        if invoice.get("billing_id"):
+            # Kept for GET /invoices/{billing_id}/pdf; the same bytes on a retry
+            await store_rendered_invoice(db, UUID(invoice["billing_id"]), pdf_content)
+        attachments.append({
+            "filename": f"Invoice_{invoice['invoice_number']}.pdf",
+            "content": pdf_content,
+            "content_type": "application/pdf"
+        })
+    result = await send_subscription_confirmation_email(
+        payload["tenant_email"],
+        payload["tenant_name"],
+        payload["plan_name"],
+        payload["start_date"],
+        payload["end_date"],
+        payload.get("root_username"),
+        root_password,
+        attachments,
+        payload.get("payment_info"),
+    )
+    _raise_unless_sent(result)
+
+
+async def _activation_dead(db: AsyncSession, payload: dict, error: str):
+    """A free activation that never succeeded is shown to the user as failed."""
+    if not payload.get("free"):
+        logger.error(f"Activation of paid order {payload['order_id']} is dead-lettered, needs manual replay: {error}")
+        return
+    transaction = await first_recent(db, select(Transaction).filter(Transaction.id == UUID(payload["transaction_id"])), Transaction)
+    if transaction and transaction.status == TransactionStatus.PENDING:
+        transaction.status = TransactionStatus.FAILED
+        await db.commit()
+        await publish_status_event(transaction.tenant_id, PAYMENT_FAILED, transaction_id=transaction.id, status="FAILED")
+
+
+@job_handler(ACTIVATE_ORDER, on_dead=_activation_dead)
+async def activate_order(db: AsyncSession, payload: dict):
+    """Create and activate the subscription an order paid for (free or via Razorpay)."""
+    transaction = await first_recent(db, select(Transaction).filter(Transaction.id == UUID(payload["transaction_id"])), Transaction)
+    order = await first_recent(db, select(Order).filter(Order.id == UUID(payload["order_id"])), Order)
+    if not transaction or not order:
+        raise JobError(f"Order {payload['order_id']} or Transaction {payload['transaction_id']} not found")
+
+    if transaction.status == TransactionStatus.SUCCESS:
+        logger.info(f"Order {order.id} already activated, skipping")
+        return
+
+    # Flushed and committed by activate_subscription together with the new
+    # subscription, so a retry after that commit sees SUCCESS and stops above
+    transaction.status = TransactionStatus.SUCCESS
+    sub_controller = SubscriptionController(db, tenant_id=transaction.tenant_id, plan_code=transaction.plan_code)
+    subscription = await sub_controller.create_subscription_from_order(order)
+
+    transaction.subscription_id = subscription.id
+    await db.commit()
+    logger.info(f"Activated subscription {subscription.id} for tenant {transaction.tenant_id}")
+    await publish_status_event(
+        transaction.tenant_id, SUBSCRIPTION_ACTIVE,
+        transaction_id=transaction.id, order_id=order.id, subscription_id=subscription.id, status="SUCCESS",
+    )
+
+
+async def _webhook_events_dead(db: AsyncSession, payload: dict, error: str):
+    """Park the event the order is stuck on, so its later events still run."""
+    await park_head_event(db, payload["order_key"], payload["provider"], error)
+
+
+@job_handler(PROCESS_WEBHOOK_EVENTS, on_dead=_webhook_events_dead)
+async def process_webhook_events(db: AsyncSession, payload: dict):
+    await process_order_events(db, payload["order_key"], payload["provider"])
+
+
+@job_handler(REFRESH_ENTITLEMENTS)
+async def refresh_entitlements(db: AsyncSession, payload: dict):
+    """Tell the tenants moved by a plan change to re-read their features."""
+    for tenant_id in payload["tenant_ids"]:
+        await publish_status_event(tenant_id, SUBSCRIPTION_PLAN_CHANGED, plan_version_id=payload["plan_version_id"])
+
+
+@job_handler(CHARGE_RENEWAL)
+async def charge_renewal(db: AsyncSession, payload: dict):
+    """
+    Open a gateway order for a renewal invoice and email the tenant a link to
+    pay it. The webhook for its capture settles the invoice.
+    """
+    stmt = select(SubscriptionBilling).filter(
+        SubscriptionBilling.id == UUID(payload["billing_id"]),
+        # Partition key: prunes the lookup to one month
+        SubscriptionBilling.created_at == datetime.fromisoformat(payload["billing_created_at"]),
+    )
+    billing = (await db.execute(stmt)).scalars().first()
+    if billing is None:
+        raise JobError(f"Renewal invoice {payload['billing_id']} not found")
+    if billing.payment_reference or billing.payment_status != PaymentStatus.pending:
+        logger.info(f"Renewal invoice {billing.id} already has a charge, skipping")
+        return
+
+    try:
+        order = await payment_gateway.create_order(
+            amount=int(billing.total_amount * 100),
+            currency=billing.currency.value,
+            receipt=f"renewal_{billing.id.hex[:12]}",
+            notes={"billing_id": str(billing.id), "subscription_id": str(billing.subscription_id)},
+        )
+    except GatewayError as e:
+        raise JobError(f"Renewal charge for invoice {billing.id} failed: {e}") from e
+    billing.payment_reference = order["id"]
+    if payload.get("email"):
+        await enqueue(
+            db, SEND_LIFECYCLE_EMAIL,
+            {
+                **payload["email"], "amount": billing.total_amount, "currency": billing.currency.value,
+                "order_id": order["id"], "payment_url": renewal_payment_url(order["id"]),
+            },
+            idempotency_key=f"lifecycle:renewed:{billing.id}",
+        )
+    await db.commit()
+
+
+@job_handler(SEND_LIFECYCLE_EMAIL)
+async def send_lifecycle_email(db: AsyncSession, payload: dict):
+    result = await send_subscription_lifecycle_email(
+        payload["tenant_email"],
+        payload["tenant_name"],
+        payload["event"],
+        payload["plan_name"],
+        payload["end_date"],
+        next_end_date=payload.get("next_end_date"),
+        amount=payload.get("amount"),
+        currency=payload.get("currency"),
+        payment_url=payload.get("payment_url"),
+        grace_days=SUBSCRIPTION_GRACE_DAYS,
+    )
+    _raise_unless_sent(result)
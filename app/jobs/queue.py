@@ -0,0 +1,188 @@
+import random
+from datetime import timedelta
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from pydantic_core import to_jsonable_python
+from sqlalchemy import case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    JOB_BACKOFF_BASE_SECONDS,
+    JOB_BACKOFF_MAX_SECONDS,
+    JOB_LOCK_TIMEOUT_SECONDS,
+    JOB_MAX_ATTEMPTS,
+)
+from app.models.jobs import Job, JobStatus
+
+
+class JobError(Exception):
+    """Raised by a handler to fail the current attempt; the job is retried."""
+
+
+class StaleJob(NamedTuple):
+    id: int
+    kind: str
+    payload: dict
+    status: JobStatus
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+    @property
+    def is_last_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Optional[dict] = None,
+    *,
+    idempotency_key: Optional[str] = None,
+    run_at=None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> Optional[int]:
+    """
+    Add a job in ``db``'s current transaction. Nothing is committed here: the
+    job becomes visible to workers when the caller's business write commits,
+    and disappears with it on rollback.
+
+    Returns the job id, or None when ``idempotency_key`` was already queued.
+    """
+    values = dict(
+        kind=kind,
+        payload=to_jsonable_python(payload or {}),
+        idempotency_key=idempotency_key,
+        max_attempts=max_attempts,
+    )
+    if run_at is not None:
+        values["run_at"] = run_at
+    stmt = (
+        pg_insert(Job)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[Job.idempotency_key])
+        .returning(Job.id)
+    )
+    return (await db.execute(stmt)).scalar()
+
+
+async def enqueue_many(
+    db: AsyncSession,
+    kind: str,
+    jobs: Iterable[Tuple[dict, Optional[str]]],
+    *,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> List[int]:
+    """
+    ``enqueue`` for many ``(payload, idempotency_key)`` pairs of one kind in
+    a single INSERT. Returns the ids of the jobs actually added.
+    """
+    rows = [
+        dict(kind=kind, payload=to_jsonable_python(payload or {}), idempotency_key=key, max_attempts=max_attempts)
+        for payload, key in jobs
+    ]
+    if not rows:
+        return []
+    stmt = (
+        pg_insert(Job)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[Job.idempotency_key])
+        .returning(Job.id)
+    )
+    return list((await db.execute(stmt)).scalars().all())
+
+
+def retry_delay(
+    attempts: int,
+    base: float = JOB_BACKOFF_BASE_SECONDS,
+    cap: float = JOB_BACKOFF_MAX_SECONDS,
+    rng: Callable[[], float] = random.random,
+) -> float:
+    """Exponential backoff (base, 2*base, 4*base ... up to cap) with +/-20% jitter."""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * (0.8 + 0.4 * rng())
+
+
+async def claim_jobs(db: AsyncSession, worker_id: str, limit: int = 1, kinds: Optional[Iterable[str]] = None) -> List[ClaimedJob]:
+    """
+    Atomically move up to ``limit`` runnable jobs to ``running`` and commit.
+    SKIP LOCKED lets concurrent consumers claim different rows without
+    waiting on each other.
+    """
+    runnable = (
+        select(Job.id)
+        .where(Job.status == JobStatus.queued, Job.run_at <= func.now())
+        .order_by(Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if kinds:
+        runnable = runnable.where(Job.kind.in_(list(kinds)))
+    stmt = (
+        update(Job)
+        .where(Job.id.in_(runnable.scalar_subquery()))
+        .values(status=JobStatus.running, attempts=Job.attempts + 1, locked_at=func.now(), locked_by=worker_id)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+    )
+    rows = (await db.execute(stmt)).all()
+    await db.commit()
+    return [ClaimedJob(*row) for row in rows]
+
+
+async def complete_job(db: AsyncSession, job: ClaimedJob):
+    values = dict(status=JobStatus.succeeded, finished_at=func.now(), locked_at=None, locked_by=None, last_error=None)
+    await db.execute(update(Job).where(Job.id == job.id, Job.status == JobStatus.running).values(**values))
+    await db.commit()
+
+
+async def fail_job(db: AsyncSession, job: ClaimedJob, error: str) -> JobStatus:
+    """Schedule a retry with backoff, or dead-letter the job after its last attempt."""
+    values = dict(locked_at=None, locked_by=None, last_error=error[-4000:])
+    if job.is_last_attempt:
+        values.update(status=JobStatus.dead, finished_at=func.now())
+    else:
+        values.update(status=JobStatus.queued, run_at=func.now() + timedelta(seconds=retry_delay(job.attempts)))
+    await db.execute(update(Job).where(Job.id == job.id, Job.status == JobStatus.running).values(**values))
+    await db.commit()
+    return values["status"]
+
+
+async def requeue_stale_jobs(db: AsyncSession, timeout_seconds: int = JOB_LOCK_TIMEOUT_SECONDS) -> List[StaleJob]:
+    """
+    Release jobs whose worker died mid-run. Their attempt still counts, so a
+    job that was on its last attempt is dead-lettered; the caller runs its
+    ``on_dead`` hook, as after any other last attempt.
+    """
+    last_attempt = Job.attempts >= Job.max_attempts
+    result = await db.execute(
+        update(Job)
+        .where(Job.status == JobStatus.running, Job.locked_at < func.now() - timedelta(seconds=timeout_seconds))
+        .values(
+            status=cast(case((last_attempt, JobStatus.dead), else_=JobStatus.queued), Job.status.type),
+            finished_at=case((last_attempt, func.now())),
+            locked_at=None,
+            locked_by=None,
+            last_error="Lock expired: worker stopped while running the job",
+        )
+        .returning(Job.id, Job.kind, Job.payload, Job.status)
+    )
+    rows = [StaleJob(*row) for row in result.all()]
+    await db.commit()
+    return rows
+
+
+async def retry_dead_job(db: AsyncSession, job_id: int) -> bool:
+    """Give a dead-lettered job a fresh set of attempts."""
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.dead)
+        .values(status=JobStatus.queued, attempts=0, run_at=func.now(), finished_at=None)
+    )
+    await db.commit()
+    return bool(result.rowcount)
@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+Handler = Callable[[AsyncSession, dict], Awaitable[Any]]
+DeadHandler = Callable[[AsyncSession, dict, str], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class JobHandler:
+    kind: str
+    func: Handler
+    # Called once when the job is moved to the dead-letter state
+    on_dead: Optional[DeadHandler] = None
+
+
+_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str, on_dead: Optional[DeadHandler] = None):
+    """Register ``func(db, payload)`` as the handler for jobs of ``kind``."""
+
+    def decorator(func: Handler) -> Handler:
+        if kind in _HANDLERS:
+            raise ValueError(f"Duplicate job handler for {kind!r}")
+        _HANDLERS[kind] = JobHandler(kind, func, on_dead)
+        return func
+
+    return decorator
+
+
+def get_handler(kind: str) -> Optional[JobHandler]:
+    return _HANDLERS.get(kind)
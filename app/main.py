@@ -1,5 +1,7 @@
 # from typing import Union
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -12,13 +14,51 @@ from app.routers.plans import router as Plans_router
 from app.routers.apps import router as Apps_router
 from app.routers.webhooks import router as Webhooks_router
 from app.routers.logs import router as Logs_router
+from app.routers.pricing import router as Pricing_router
+from app.routers.invoices import router as Invoices_router
+from app.routers.reports import router as Reports_router
 from app.core.response import ResponseHandler
 from app.middlewares.loggerMiddleware import LoggerMiddleware
 from typing import Union
 from fastapi.middleware.cors import CORSMiddleware
-from app.config import ENV
+from app.config import ENV, LOG_INDEX_INTERVAL_SECONDS
+from app.db.tenancy import tenant_engines
+from app.services.status_events import status_broker
+from app.services.payment_gateway import payment_gateway
+from app.services.catalog_cache import catalog_cache
+from app.services.email_templates import email_templates
+from app.services.invoice_service import invoice_renderer
+from app.services.mail_transport import mail_transport
+from app.services.log_index import log_indexer
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Dispose idle dedicated-tenant engines in the background
+    reaper = asyncio.create_task(tenant_engines.reap_forever())
+    # Index new log lines for /logs/search
+    indexer = asyncio.create_task(log_indexer.run_forever()) if LOG_INDEX_INTERVAL_SECONDS > 0 else None
+    # LISTEN for onboarding status events published by other workers
+    await status_broker.start()
+    # LISTEN for catalog version bumps (cached /saas/get_apps, /plans/available_plans)
+    await catalog_cache.start()
+    # Compile email templates now (and fill the bytecode cache), not on the first send
+    email_templates.precompile()
+    try:
+        yield
+    finally:
+        reaper.cancel()
+        if indexer is not None:
+            indexer.cancel()
+        await status_broker.stop()
+        await catalog_cache.stop()
+        await payment_gateway.aclose()
+        await mail_transport.aclose()
+        await invoice_renderer.aclose()
+        await tenant_engines.dispose_all()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # from dotenv import load_dotenv
 # import os
@@ -52,6 +92,18 @@ async def jwks():
     return get_jwks()
 
 
+@app.get("/metrics/payment-gateway")
+async def payment_gateway_metrics():
+    """Latency and error counts per payment gateway operation, plus breaker state."""
+    return {"breaker": payment_gateway.breaker.state, "operations": payment_gateway.metrics.snapshot()}
+
+
+@app.get("/metrics/email")
+async def email_metrics():
+    """SMTP pool throughput, failures and latency per step (connect, send)."""
+    return mail_transport.stats()
+
+
 @app.get("/.well-known/openid-configuration")
 async def openid_configuration():
     # DOMAIN = (
@@ -90,3 +142,6 @@ app.include_router(Plans_router)
 app.include_router(Apps_router)
 app.include_router(Webhooks_router)
 app.include_router(Logs_router)
+app.include_router(Pricing_router)
+app.include_router(Invoices_router)
+app.include_router(Reports_router)
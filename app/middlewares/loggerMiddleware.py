@@ -1,28 +1,111 @@
-# import logging
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
-import time
-from datetime import datetime
+"""
+Request logging and timing, as a plain ASGI middleware.
 
+Unlike a BaseHTTPMiddleware it adds no task or memory stream per request
+and passes streamed responses through as they are sent. It only wraps
+``send`` to time the response:
 
-from app.core.utils import get_device_type
-from app.core.logger import create_logger
+- ttfb: until the response headers go out, sent back as
+  ``Server-Timing: app;dur=<ms>``
+- total: until the last body chunk, so it leaves out background tasks that
+  run after the response. If the app sends no response, until it returns.
 
+Each request gets an id (the client's ``X-Request-ID`` if it sent a sane
+one), returned in ``X-Request-ID`` and attached to every log record made
+while handling it. One line per request goes to the ``system`` log for a
+LOG_REQUEST_SAMPLE_RATE share of requests; server errors and requests
+slower than LOG_SLOW_REQUEST_MS are always logged. An event stream lasts as
+long as its client stays connected, so it is only slow when its headers
+are.
+"""
+import random
+import re
+import time
+import uuid
 
+from app.config import LOG_REQUEST_SAMPLE_RATE, LOG_SLOW_REQUEST_MS
+from app.core.logger import create_logger, request_id_var
+from app.core.utils import get_device_type
 
 logger = create_logger('system')
 
+_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._-]{1,64}$")
+_EVENT_STREAM = b"text/event-stream"
+
+
+class LoggerMiddleware:
+    def __init__(self, app, sample_rate: float = LOG_REQUEST_SAMPLE_RATE, slow_ms: float = LOG_SLOW_REQUEST_MS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ns = int(slow_ms * 1_000_000)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        user_agent = b""
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"user-agent":
+                user_agent = value
+            elif name == b"x-request-id" and _REQUEST_ID.match(value):
+                request_id = value
+        request_id = request_id.decode() if request_id else uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status = 500
+        ttfb = total = None
+        streaming = False
+
+        async def send_timed(message):
+            nonlocal status, ttfb, total, streaming
+            if message["type"] == "http.response.start":
+                ttfb = time.perf_counter_ns() - start
+                status = message["status"]
+                streaming = any(
+                    name.lower() == b"content-type" and value.startswith(_EVENT_STREAM)
+                    for name, value in message.get("headers", ())
+                )
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"server-timing", f"app;dur={ttfb / 1_000_000:.1f}".encode()),
+                    (b"x-request-id", request_id.encode()),
+                ]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                total = time.perf_counter_ns() - start
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_timed)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if total is None:
+                total = time.perf_counter_ns() - start
+            slow = (ttfb if streaming and ttfb is not None else total) >= self.slow_ns
+            if error or status >= 500 or slow or random.random() < self.sample_rate:
+                self.log(scope, user_agent, status, ttfb, total, error, slow)
+            request_id_var.reset(token)
 
-class LoggerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        user_agent = request.headers.get("user-agent", "unknown")
-        client_ip = request.client.host if request.client else "unknown"
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        device_type = get_device_type(user_agent)
-        
-        logger.info(f"[{timestamp}] Incoming request: {request.method} {request.url} | IP: {client_ip} | User-Agent: {user_agent} |  Device: {device_type}")
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        logger.info(f"[{timestamp}] Completed response: {response.status_code} in {process_time:.2f} seconds")
-        return response
\ No newline at end of file
+    def log(self, scope, user_agent: bytes, status: int, ttfb, total: int, error=None, slow: bool = False):
+        client = scope.get("client")
+        user_agent = user_agent.decode("latin-1") or "unknown"
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope["query_string"].decode("latin-1"),
+            "status": status,
+            "ttfb_ms": round(ttfb / 1_000_000, 2) if ttfb is not None else None,
+            "total_ms": round(total / 1_000_000, 2),
+            "ip": client[0] if client else "unknown",
+            "user_agent": user_agent,
+            "device": get_device_type(user_agent),
+        }
+        level = logger.error if error or status >= 500 else logger.warning if slow else logger.info
+        level(
+            "%s %s %s in %.1fms", fields["method"], fields["path"], status, fields["total_ms"],
+            exc_info=error, extra={"fields": fields},
+        )
@@ -1,6 +1,7 @@
 from sqlalchemy import Column, ForeignKey, Integer, String, Text, Boolean
 from sqlalchemy.orm import relationship
 from app.db.database import Base
+from app.core.serializers import compiled_serializer
 
 
 class UserProfile(Base):
@@ -48,19 +49,11 @@ class User(Base):
     tenant = relationship("Tenant", backref="users")
     profile = relationship("UserProfile", uselist=False, back_populates="user")  # One-to-One Relationship
 
+    # hashed_password is never part of the serialized field set
+    _serialize = compiled_serializer(exclude=("hashed_password",))
+
     def to_dict(self, include_profile=False, include_tenant=False):
-        user_data = {
-            "id": self.id,
-            "first_name": self.first_name,
-            "last_name": self.last_name,
-            "username": self.username,
-            "email": self.email,
-            "phone_number": self.phone_number,
-            "tenant_id": self.tenant_id,
-            "is_active": self.is_active,
-            "is_root_user": self.is_root_user,
-            "is_superuser": self.is_superuser,
-        }
+        user_data = self._serialize()
         
         # Optionally include the profile if requested
         if include_profile and self.profile:
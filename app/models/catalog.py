@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, DateTime, SmallInteger, func
+from app.db.database import Base
+
+
+class CatalogVersion(Base):
+    """
+    Single-row counter bumped by every catalog write (apps, plans, pricing).
+    Cached catalog responses are keyed by it (app/services/catalog_cache.py).
+    """
+    __tablename__ = "saas_catalog_version"
+
+    id = Column(SmallInteger, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,42 @@
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Index, Integer, JSON, String, Text, func, text
+import enum
+from app.db.database import Base
+
+
+class JobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    dead = "dead"
+
+
+class Job(Base):
+    """
+    Durable background job (see app/jobs). Rows are enqueued inside the
+    business transaction that needs them (transactional outbox), and claimed
+    by `python -m app.worker` with SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim scan: only runnable rows, oldest first
+        Index("ix_jobs_runnable", "run_at", postgresql_where=text("status = 'queued'")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+
+    # Enqueueing the same key twice is a no-op (duplicate webhooks, retried requests)
+    idempotency_key = Column(String(200), nullable=True, unique=True)
+
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.queued, server_default=JobStatus.queued.value)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False, default=5, server_default="5")
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
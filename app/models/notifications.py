@@ -0,0 +1,48 @@
+import enum
+import uuid
+from sqlalchemy import Boolean, Column, DateTime, Enum, Integer, String, Text, UUID, func
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.database import Base
+
+
+class NotificationKind(str, enum.Enum):
+    plan_change = "plan_change"
+    renewal = "renewal"
+    maintenance = "maintenance"
+
+
+class NotificationCampaignStatus(str, enum.Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class NotificationCampaign(Base):
+    """
+    One notice sent to every tenant (app/services/notification_dispatch.py).
+    Each batch of recipients commits its counters together with the advanced
+    tenant cursor, so a crashed run resumes after the last finished batch.
+    """
+    __tablename__ = "saas_notification_campaigns"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(Enum(NotificationKind), nullable=False)
+    subject = Column(String(255), nullable=False)
+    # Shared template context: title, paragraphs, details, action_url, action_label
+    content = Column(JSONB, nullable=False, default=dict)
+    include_inactive = Column(Boolean, nullable=False, default=False, server_default="false")
+    batch_size = Column(Integer, nullable=False, default=500, server_default="500")
+
+    status = Column(Enum(NotificationCampaignStatus), nullable=False, default=NotificationCampaignStatus.running)
+    # Keyset cursor: every tenant up to and including this id has been sent to
+    last_tenant_id = Column(Integer, nullable=True)
+    sent = Column(Integer, nullable=False, default=0, server_default="0")
+    failed = Column(Integer, nullable=False, default=0, server_default="0")
+    # {reason: count} and {recipient domain: count} of failed deliveries
+    failure_reasons = Column(JSONB, nullable=False, default=dict, server_default="{}")
+    failure_domains = Column(JSONB, nullable=False, default=dict, server_default="{}")
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum, Numeric, func, JSON
+from sqlalchemy import BigInteger, Boolean, Column, String, Integer, ForeignKey, DateTime, Enum, Index, Numeric, func, text, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
 import enum
 from app.db.database import Base
+from app.db.partitioning import register_default_partition
 
 class OrderStatus(str, enum.Enum):
     PENDING = "pending"
@@ -11,11 +12,23 @@ class OrderStatus(str, enum.Enum):
     CANCELLED = "cancelled"
     FAILED = "failed"
 
+class LineItemKind(str, enum.Enum):
+    plan = "plan"
+    app = "app"
+    feature = "feature"
+    coupon = "coupon"
+
 class Order(Base):
     __tablename__ = "orders"
+    # Monthly range partitions on created_at (app/db/partitioning.py)
+    __table_args__ = (
+        # Rollup refresh: orders changed since the high-water mark
+        Index("ix_orders_updated_at", "updated_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
     
     # Order Details
     total_amount = Column(Numeric(10, 2), nullable=False)
@@ -27,13 +40,58 @@ class Order(Base):
     items = Column(JSON, nullable=True)
     
     # External Reference
-    provider_order_id = Column(String(100), nullable=True) # Razorpay Order ID
+    provider_order_id = Column(String(100), nullable=True, index=True) # Razorpay Order ID
     
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     tenant = relationship("Tenant", backref="orders")
-    transactions = relationship("Transaction", back_populates="order")
+    transactions = relationship("Transaction", back_populates="order", primaryjoin="Order.id == foreign(Transaction.order_id)")
+    line_items = relationship(
+        "OrderLineItem", primaryjoin="Order.id == foreign(OrderLineItem.order_id)",
+        order_by="OrderLineItem.position", viewonly=True,
+    )
+
+
+register_default_partition(Order.__table__)
+
+
+class OrderLineItem(Base):
+    """
+    One purchased item of an order: the plan, an app, an app feature or the
+    coupon discount. Written in the same transaction as the order
+    (app/services/order_line_items.py); ``Order.items`` stays as the raw
+    snapshot.
+    """
+    __tablename__ = "order_line_items"
+    __table_args__ = (
+        # Revenue by app / tenants with a feature add-on
+        Index("ix_order_line_items_app", "app_id", "kind"),
+        Index("ix_order_line_items_feature", "feature_id", postgresql_where=text("feature_id IS NOT NULL")),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # orders is partitioned on created_at; both halves of its key are kept
+    order_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    order_created_at = Column(DateTime(timezone=True), nullable=False)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+
+    kind = Column(Enum(LineItemKind), nullable=False)
+    plan_code = Column(String(100), nullable=True)
+    app_id = Column(UUID(as_uuid=True), nullable=True)
+    feature_id = Column(UUID(as_uuid=True), nullable=True)
+    code = Column(String(100), nullable=True)
+    name = Column(String(255), nullable=False)
+    is_base = Column(Boolean, nullable=False, default=False, server_default="false")
+
+    quantity = Column(Integer, nullable=False, default=1, server_default="1")
+    unit_price = Column(Numeric(10, 2), nullable=False, default=0)
+    # quantity * unit_price; negative for the coupon discount
+    amount = Column(Numeric(10, 2), nullable=False, default=0)
+    currency = Column(String(3), nullable=False, default="INR")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,38 @@
+import enum
+import uuid
+from sqlalchemy import Boolean, Column, Date, DateTime, Enum, ForeignKey, Integer, Numeric, Text, UUID, func
+from app.db.database import Base
+
+
+class PlanMigrationStatus(str, enum.Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class PlanMigration(Base):
+    """
+    Checkpoint of a bulk move of subscribers between plan versions
+    (app/services/plan_migration.py). Each chunk commits together with the
+    advanced cursor, so a failed or interrupted run resumes where it stopped.
+    """
+    __tablename__ = "saas_plan_migrations"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    from_version_id = Column(UUID(as_uuid=True), ForeignKey("saas_plan_versions.id"), nullable=False)
+    to_version_id = Column(UUID(as_uuid=True), ForeignKey("saas_plan_versions.id"), nullable=False)
+
+    effective_date = Column(Date, nullable=False)
+    prorate = Column(Boolean, nullable=False, default=True, server_default="true")
+    chunk_size = Column(Integer, nullable=False, default=500, server_default="500")
+
+    status = Column(Enum(PlanMigrationStatus), nullable=False, default=PlanMigrationStatus.running)
+    # Keyset cursor: every subscription up to and including this id is done
+    last_subscription_id = Column(UUID(as_uuid=True), nullable=True)
+    subscriptions_migrated = Column(Integer, nullable=False, default=0, server_default="0")
+    proration_total = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,66 @@
+from sqlalchemy import Column, Date, DateTime, Integer, Numeric, String, func
+from app.db.database import Base
+
+
+# Daily finance rollups (app/services/rollups.py). Each row is rebuilt whole
+# for its day by the refresh job; reports read only these tables.
+
+class RevenueDaily(Base):
+    """Recognised revenue per day, by plan, app or in total, per currency."""
+    __tablename__ = "rollup_revenue_daily"
+
+    day = Column(Date, primary_key=True)
+    # "plan" (paid billings by plan_code), "app" (completed orders by app
+    # and app feature line items) or "total" (paid billings, key "all")
+    dimension = Column(String(10), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class MrrDaily(Base):
+    """Subscriptions whose cycle covers the day, and their monthly-normalised price."""
+    __tablename__ = "rollup_mrr_daily"
+
+    day = Column(Date, primary_key=True)
+    plan_code = Column(String(100), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+
+    active_subscriptions = Column(Integer, nullable=False, default=0)
+    mrr = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class TenantsDaily(Base):
+    """Tenants whose first cycle started (new) or whose last cycle ended for good (churned)."""
+    __tablename__ = "rollup_tenants_daily"
+
+    day = Column(Date, primary_key=True)
+    plan_code = Column(String(100), primary_key=True)
+
+    new_tenants = Column(Integer, nullable=False, default=0)
+    churned_tenants = Column(Integer, nullable=False, default=0)
+
+
+class PaymentsDaily(Base):
+    """Payment attempts (transactions) per day, provider and currency."""
+    __tablename__ = "rollup_payments_daily"
+
+    day = Column(Date, primary_key=True)
+    provider = Column(String(50), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    amount_succeeded = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class RollupWatermark(Base):
+    """Source rows changed at or before ``high_water`` are already in the rollup."""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(50), primary_key=True)
+    high_water = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -13,10 +13,13 @@ from sqlalchemy import (
     DateTime,
     Enum,
     Numeric,
-    func
+    Index,
+    func,
+    text
 )
 from sqlalchemy.orm import relationship, backref
 from app.db.database import Base
+from app.db.partitioning import register_default_partition
 from app.models.plans import CurrencyEnum
 from app.models.apps import App
 from app.models.features import Feature
@@ -68,6 +71,14 @@ class SubscriptionFeature(Base):
 
 class SubscriptionCycle(Base):
     __tablename__ = "subscription_cycles"
+    __table_args__ = (
+        # Plan-version migrations walk one version's cycles by subscription id
+        Index("ix_subscription_cycles_version_subscription", "plan_version_id", "subscription_id"),
+        # Lifecycle scheduler scan: due cycles that are still running
+        Index("ix_subscription_cycles_due", "end_date", postgresql_where=text("status IN ('active', 'grace')")),
+        # Rollup refresh: cycles changed since the high-water mark
+        Index("ix_subscription_cycles_updated_at", "updated_at"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     subscription_id = Column(UUID(as_uuid=True), ForeignKey("subscriptions.id", ondelete="CASCADE"), nullable=False)
@@ -90,6 +101,10 @@ class SubscriptionCycle(Base):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # Rollup refresh: subscriptions changed since the high-water mark
+        Index("ix_subscriptions_updated_at", "updated_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -147,9 +162,17 @@ class Subscription(Base):
 
 class SubscriptionBilling(Base):
     __tablename__ = "saas_subscription_billings"
+    # Monthly range partitions on created_at (app/db/partitioning.py)
+    __table_args__ = (
+        # Rollup refresh: billings changed since the high-water mark
+        Index("ix_saas_subscription_billings_updated_at", "updated_at"),
+        # Renewal capture webhook: the invoice whose gateway order was paid
+        Index("ix_saas_subscription_billings_payment_reference", "payment_reference"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    subscription_id = Column(UUID(as_uuid=True), ForeignKey("subscriptions.id", ondelete="CASCADE"), nullable=False)
+    subscription_id = Column(UUID(as_uuid=True), ForeignKey("subscriptions.id", ondelete="CASCADE"), nullable=False, index=True)
 
     base_amount = Column(Numeric(10, 2), nullable=False, default=0.00)
     discount_amount = Column(Numeric(10, 2), default=0.00)
@@ -160,10 +183,15 @@ class SubscriptionBilling(Base):
     billing_date = Column(Date, nullable=False, default=date.today)
     payment_status = Column(Enum(PaymentStatus), default=PaymentStatus.pending, nullable=False)
     payment_reference = Column(String(255))  # Stripe / Razorpay ID
+    # Stored invoice PDF (app/services/invoice_service.py), content-addressed by sha256
+    invoice_sha256 = Column(String(64), nullable=True)
+    invoice_size = Column(Integer, nullable=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     subscription = relationship("Subscription", back_populates="billings")
 
+
+register_default_partition(SubscriptionBilling.__table__)
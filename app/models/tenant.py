@@ -17,6 +17,7 @@ from sqlalchemy import (
     UniqueConstraint
 )
 from app.db.database import Base
+from app.core.serializers import compiled_serializer
 import uuid
 from sqlalchemy.orm import relationship
 
@@ -91,25 +92,28 @@ class Tenant(Base):
         cascade="all, delete-orphan",
     )
 
+    _serialize = compiled_serializer(
+        fields=(
+            "id",
+            "tenant_uuid",
+            "tenant_name",
+            "tenant_email",
+            "is_active",
+            "status",
+            "deployment_type",
+            "created_at",
+        )
+    )
+
     def to_dict(self):
-        data = {
-            "id": self.id,
-            "tenant_uuid": str(self.tenant_uuid),
-            "tenant_name": self.tenant_name,
-            "tenant_email": self.tenant_email,
-            "is_active": self.is_active,
-            "status": self.status.value,
-            "deployment_type": self.deployment_type.value,
-            "created_at": self.created_at.isoformat() if self.created_at else None
-        }
-        
-        # Safe check for relationship to avoid greenlet_spawn error in async
-        from sqlalchemy import inspect
-        state = inspect(self)
-        if "profile" not in state.unloaded and "profile" not in state.expired:
-            if self.profile:
-                data["profile"] = self.profile.to_dict()
-                
+        data = self._serialize()
+
+        # Only include the profile when it is already loaded; touching an
+        # unloaded relationship would trigger a greenlet_spawn error in async.
+        profile = self.__dict__.get("profile")
+        if profile:
+            data["profile"] = profile.to_dict()
+
         return data
 
 
@@ -140,14 +144,12 @@ class Role(Base):
         lazy="selectin",
     )
 
+    _serialize = compiled_serializer(fields=("id", "role_name", "description", "is_active"))
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "role_name": self.role_name,
-            "description": self.description,
-            "is_active": self.is_active,
-            "permissions": [p.to_dict() for p in self.permissions],
-        }
+        data = self._serialize()
+        data["permissions"] = [p.to_dict() for p in self.permissions]
+        return data
 
 
 class Permission(Base):
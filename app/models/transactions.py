@@ -1,9 +1,10 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum, Numeric,JSON, func
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum, Index, Numeric,JSON, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 import enum
 from app.db.database import Base
+from app.db.partitioning import register_default_partition
 
 class TransactionStatus(str, enum.Enum):
     SUCCESS = "success"
@@ -13,18 +14,26 @@ class TransactionStatus(str, enum.Enum):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    # Monthly range partitions on created_at (app/db/partitioning.py); the
+    # primary key has to include the partition key.
+    __table_args__ = (
+        # Rollup refresh: transactions changed since the high-water mark
+        Index("ix_transactions_updated_at", "updated_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
     subscription_id = Column(UUID(as_uuid=True), ForeignKey("subscriptions.id"), nullable=True)
-    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id"), nullable=True)
+    # No FK: orders is partitioned too, so orders.id alone is not unique-constrained
+    order_id = Column(UUID(as_uuid=True), nullable=True, index=True)
     
     amount = Column(Numeric(10, 2), nullable=False)
     currency = Column(String(3), default="INR")
     
     provider = Column(String(50), default="razorpay")
     provider_payment_id = Column(String(100), nullable=True)
-    provider_order_id = Column(String(100), nullable=True)
+    provider_order_id = Column(String(100), nullable=True, index=True)
     provider_signature = Column(String(200), nullable=True)
     
     status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING)
@@ -34,7 +43,7 @@ class Transaction(Base):
     billing_cycle = Column(String(20), nullable=True)
     payment_details = Column(JSON, nullable=True)
     payment_method = Column(String(50), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Explicit link to the activation token used
@@ -43,6 +52,8 @@ class Transaction(Base):
     # Relationships
     tenant = relationship("Tenant", backref="transactions")
     subscription = relationship("Subscription", backref="transactions")
-    order = relationship("Order", back_populates="transactions")
+    order = relationship("Order", back_populates="transactions", primaryjoin="foreign(Transaction.order_id) == Order.id")
     tenant_link = relationship("TenantLink", backref="transactions")
 
+
+register_default_partition(Transaction.__table__)
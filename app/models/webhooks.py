@@ -0,0 +1,39 @@
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Index, Integer, JSON, String, Text, UniqueConstraint, func
+import enum
+from app.db.database import Base
+
+
+class WebhookEventStatus(str, enum.Enum):
+    received = "received"
+    processed = "processed"
+    failed = "failed"
+
+
+class WebhookEvent(Base):
+    """
+    Inbox of raw provider webhooks. The route stores the event and acks;
+    processing happens on the job worker (app/services/webhook_inbox.py).
+    """
+    __tablename__ = "webhook_events"
+    __table_args__ = (
+        # Redeliveries of the same event are dropped at insert time
+        UniqueConstraint("provider", "event_id", name="uq_webhook_events_provider_event"),
+        # Next unprocessed event of an order
+        Index("ix_webhook_events_order_queue", "provider", "order_key", "event_created_at", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    provider = Column(String(50), nullable=False, default="razorpay")
+    event_id = Column(String(200), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    # Events sharing an order_key are processed one at a time, oldest first
+    order_key = Column(String(200), nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(Enum(WebhookEventStatus), nullable=False, default=WebhookEventStatus.received, server_default=WebhookEventStatus.received.value)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(Text, nullable=True)
+
+    event_created_at = Column(DateTime(timezone=True), nullable=False)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
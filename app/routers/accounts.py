@@ -1,26 +1,28 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status,BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status,BackgroundTasks
+from fastapi.responses import StreamingResponse
 from uuid import UUID
 from sqlalchemy import func, desc, or_
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 from app.db.database import get_db, AsyncSessionLocal
 from app.models.auth import User
+from app.config import STATUS_STREAM_HEARTBEAT_SECONDS
 from app.schemas.tanent import TenantCreate
 
 # from app.crud.client import create_oauth_client
 from app.controllers.account_controller import AccountController
-from app.controllers.tenant_link_controller import create_tenant_link, get_tenant_link, mark_link_used
+from app.controllers.tenant_link_controller import get_tenant_link, mark_link_used
 from app.controllers.plan_controller import get_plan
 from app.controllers.subscription_controller import SubscriptionController
 from app.models.subscriptions import Subscription, SubscriptionStatus, SubscriptionBilling, PaymentStatus
 from datetime import datetime, timedelta, timezone
+import asyncio
 import uuid
 import os
 from dotenv import load_dotenv
 load_dotenv()
 from sqlalchemy.ext.asyncio import AsyncSession
-import razorpay
 import json
 
 from app.core.response import ResponseHandler, APIResponse
@@ -28,8 +30,19 @@ from app.models.tenant import Role, Tenant, TenantProfile
 from app.schemas.tanent import TenantCreate, TenantProfileCreate
 from app.schemas.auth_schemas import UserRegisterSchema
 from app.core.db_helpers import model_to_dict
+from app.core.status_cache import etag_matches, onboarding_status_cache, status_etag
+from app.services.status_events import (
+    ORDER_CREATED, SSE_HEARTBEAT, TERMINAL_EVENTS,
+    StreamLimitExceeded, format_sse, publish_status_event, snapshot_marker,
+    status_broker,
+)
+from app.db.partitioning import first_recent
+from app.services.payment_gateway import GatewayError, payment_gateway
+from app.services.pricing import QuoteError, pricing_catalog
+from app.services.order_line_items import write_line_items
+from app.db.read_models import fetch_users, fetch_tenants_with_roles
 from sqlalchemy.orm import selectinload
-from app.services.email_service import send_tenant_registration_email
+from app.jobs import ACTIVATE_ORDER, SEND_TENANT_REGISTRATION_EMAIL, enqueue
 from app.schemas.tenant_link import TenantLinkOut
 from app.schemas.tenant_link import ActivationComplete
 from app.models.subscriptions import Subscription
@@ -47,47 +60,6 @@ from app.core.logger import create_logger
 # tenant link helpers imported above
 logger = create_logger('accounts')
 
-async def process_free_activation_task(tenant_id: int, order_id: UUID, transaction_id: UUID, plan_code: str):
-    """
-    Background task to process subscription activation for free plans.
-    """
-    async with AsyncSessionLocal() as db:
-        try:
-            logger.info(f"[Background] Starting free activation for tenant {tenant_id}")
-            
-            # Fetch objects to ensure they exist and link properly in this session
-            order_res = await db.execute(select(Order).filter(Order.id == order_id))
-            order = order_res.scalars().first()
-            
-            txn_res = await db.execute(select(Transaction).filter(Transaction.id == transaction_id))
-            transaction = txn_res.scalars().first()
-            
-            if not order or not transaction:
-                logger.error(f"[Background] Activation failed: Order {order_id} or Transaction {transaction_id} not found")
-                return
-
-            sub_controller = SubscriptionController(db, tenant_id=tenant_id, plan_code=plan_code)
-            # This handles activation, root user, billing, and background emails
-            subscription = await sub_controller.create_subscription_from_order(order)
-            
-            transaction.subscription_id = subscription.id
-            transaction.status = TransactionStatus.SUCCESS # Mark as success AFTER activation
-            await db.commit()
-            logger.info(f"[Background] Free activation successful for tenant {tenant_id}. Subscription {subscription.id}")
-        except Exception as e:
-            logger.error(f"[Background] Error in free activation for tenant {tenant_id}: {str(e)}")
-            # For free plans, if background task fails, we might want to mark transaction as failed 
-            # so the user can see it in history/confirmation
-            try:
-                 txn_res = await db.execute(select(Transaction).filter(Transaction.id == transaction_id))
-                 txn = txn_res.scalars().first()
-                 if txn:
-                      txn.status = TransactionStatus.FAILED
-                      await db.commit()
-            except: pass
-            await db.rollback()
-
-
 router = APIRouter(
     prefix="/account",  # Optional: Define a prefix for all client routes
     tags=["account"],  # Optional: Add a tag for better documentation grouping
@@ -98,7 +70,6 @@ router = APIRouter(
 async def register_authuser(
     user: UserRegisterSchema, db: AsyncSession = Depends(get_db)
 ):
-    print("====CALLING REGISTER AUTH USER===")
     try:
         account_controller = AccountController(db=db)
         user_data = await account_controller.register_user(user)
@@ -131,11 +102,8 @@ async def get_oauth_users(
     # Fetch total records for pagination meta
     total = await db.scalar(select(func.count()).select_from(User))
 
-    # Fetch paginated results
-    result = await db.execute(
-        select(User).options(selectinload(User.tenant)).offset(offset).limit(limit)
-    )
-    users = result.scalars().all()
+    # Fetch paginated results (column-projected read model, no ORM instances)
+    users = await fetch_users(db, offset=offset, limit=limit)
 
     if not users:
         raise HTTPException(status_code=404, detail="No auth user found")
@@ -146,37 +114,25 @@ async def get_oauth_users(
         "page": page,
         "limit": limit,
         "pages": (total // limit) + (1 if total % limit != 0 else 0),  # Total pages
-        "data": [user.to_dict(include_tenant=False) for user in users],
+        "data": [user.to_dict() for user in users],
         "success": True,
     }
 
 
 @router.post("/register/tenant/", response_model=APIResponse)
-async def register_tanets(client: TenantCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
-    print(f"==CALLING register_tanets====")
-    print(f"Client", client)
+async def register_tanets(client: TenantCreate, db: AsyncSession = Depends(get_db)):
+    logger.debug("Registering tenant: %s", client)
     try:
         account_controller = AccountController(db=db)
         db_client = await account_controller.create_tenant(client)
-        # Create activation link valid for 24 hours (returns DB link and raw token)
-        link, raw_token = await create_tenant_link(
-            db=db, 
-            tenant_uuid=str(db_client.tenant_uuid), 
-            hours_valid=24,
-            extra_payload=db_client.to_dict()
-        )
-        print(f"Activation link created: {raw_token}")
-        # Build activation URL using DOMAIN_NAME env if available (send raw token)
-        DOMAIN = os.getenv("DOMAIN_NAME", "http://localhost:5173")
-        activation_url = f"{DOMAIN}/onboarding/{raw_token}"
-
-        # Send activation email in background (will await coroutine when run)
-        background_tasks.add_task(
-            send_tenant_registration_email,
-            db_client.tenant_email,
-            db_client.tenant_name,
-            activation_url,
+        # Queue the activation email; the worker creates the 24-hour
+        # activation link when it sends it, so the token is never queued
+        await enqueue(
+            db, SEND_TENANT_REGISTRATION_EMAIL,
+            {"tenant_uuid": str(db_client.tenant_uuid)},
+            idempotency_key=f"registration-email:{db_client.tenant_uuid}",
         )
+        await db.commit()
 
         return ResponseHandler.success(
             message="Tenant registered successfully", data=[db_client.to_dict()]
@@ -237,23 +193,9 @@ async def get_tenant(
 
 @router.get("/tenants-with-roles")
 async def get_tenants_with_roles(db: AsyncSession = Depends(get_db)):
-    # Fetch all tenants and their roles
-    result = await db.execute(select(Tenant).options(selectinload(Tenant.roles)))
-    tenants = result.scalars().all()
-
-    # Transform data to desired structure
-    tenants_with_roles = [
-        {
-            "tenant_id": str(tenant.tenant_uuid),
-            "name": tenant.tenant_name,
-            "roles": [role.role_name for role in tenant.roles],
-            "isActive": tenant.is_active,
-            "created_at": tenant.created_at
-        }
-        for tenant in tenants
-    ]
-
-    return tenants_with_roles
+    # Fetch all tenants with their role names aggregated in the same query
+    tenants = await fetch_tenants_with_roles(db)
+    return [tenant.to_dict() for tenant in tenants]
 
 
 @router.get("/validate/{token}", response_model=APIResponse)
@@ -294,7 +236,7 @@ async def validate_activation_link(token: str, db: AsyncSession = Depends(get_db
 
 
 @router.post("/resend-activation/{token}", response_model=APIResponse)
-async def resend_activation_link(token: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def resend_activation_link(token: str, db: AsyncSession = Depends(get_db)):
     """
     Resends the activation link for a tenant if the original link has expired or reached the user.
     Uses the old token to identify the tenant.
@@ -331,25 +273,10 @@ async def resend_activation_link(token: str, background_tasks: BackgroundTasks,
         if tenant.is_active:
              return ResponseHandler.error(message="Tenant is already active", error_details={"tenant_uuid": str(tenant.tenant_uuid)})
 
-        # 3. Create a new activation link (valid for 24 hours)
-        new_link, new_raw_token = await create_tenant_link(
-            db=db, 
-            tenant_uuid=str(tenant.tenant_uuid), 
-            hours_valid=24,
-            extra_payload=tenant.to_dict()
-        )
-
-        # 4. Build activation URL
-        DOMAIN = os.getenv("DOMAIN_NAME", "http://localhost:5173")
-        activation_url = f"{DOMAIN}/onboarding/{new_raw_token}"
-
-        # 5. Send activation email in background
-        background_tasks.add_task(
-            send_tenant_registration_email,
-            tenant.tenant_email,
-            tenant.tenant_name,
-            activation_url,
-        )
+        # 3. Queue the activation email; the worker creates the new
+        # 24-hour link when it sends it
+        await enqueue(db, SEND_TENANT_REGISTRATION_EMAIL, {"tenant_uuid": str(tenant.tenant_uuid)})
+        await db.commit()
 
         return ResponseHandler.success(
             message="New activation link sent successfully", 
@@ -371,44 +298,22 @@ async def upsert_tenant_profile(
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        # Check if tenant exists
-        result = await db.execute(select(Tenant).filter(Tenant.id == tenant_id))
-        tenant = result.scalars().first()
-        if not tenant:
-            return ResponseHandler.not_found(message="Tenant not found")
-
-        # Check if profile already exists
-        result = await db.execute(select(TenantProfile).filter(TenantProfile.tenant_id == tenant_id))
-        profile = result.scalars().first()
-
-        if profile:
-            # Update existing profile
-            has_changed = False
-            for key, value in profile_data.model_dump(exclude_unset=True).items():
-                if getattr(profile, key) != value:
-                    setattr(profile, key, value)
-                    has_changed = True
-            
-            if not has_changed:
-                return ResponseHandler.success(
-                    message="No data changed", 
-                    data=[profile.to_dict()]
-                )
-            
-            message = "Tenant profile updated successfully"
-        else:
-            # Create new profile
-            profile = TenantProfile(tenant_id=tenant_id, **profile_data.model_dump())
-            db.add(profile)
-            message = "Tenant profile created successfully"
-
-        await db.commit()
-        await db.refresh(profile)
+        # Single INSERT ... ON CONFLICT (tenant_id) DO UPDATE; unchanged rows
+        # are returned by the same statement without being rewritten.
+        account_controller = AccountController(db=db)
+        profile, outcome = await account_controller.upsert_tenant_profile(tenant_id, profile_data)
 
+        messages = {
+            "created": "Tenant profile created successfully",
+            "updated": "Tenant profile updated successfully",
+            "unchanged": "No data changed",
+        }
         return ResponseHandler.success(
-            message=message, 
+            message=messages[outcome], 
             data=[profile.to_dict()]
         )
+    except LookupError:
+        return ResponseHandler.not_found(message="Tenant not found")
     except Exception as e:
         await db.rollback()
         return ResponseHandler.error(message="Failed to update tenant profile", error_details={"detail": str(e)})
@@ -445,139 +350,46 @@ async def get_tenant_profile(tenant_id: int = Query(...), db: AsyncSession = Dep
 
 
 @router.post("/verify-payment", response_model=APIResponse)
-async def verify_payment(payload: PaymentVerificationRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def verify_payment(payload: PaymentVerificationRequest, db: AsyncSession = Depends(get_db)):
     """
     Step 1: Verify price server-side based on plan + apps + features + coupon.
     Step 2: Create Order in DB.
     Step 3: Create Razorpay Order (if amount > 0) or mock order.
     Step 4: Create Transaction (PENDING if paid, SUCCESS if free).
     """
-    print(f"========== STARTING PAYMENT VERIFICATION ==========")
-    print(f"Payload: {payload.dict()}")
+    logger.debug("Verifying payment: %s", payload)
     try:
         # 1. Fetch Tenant
-        print(f"Step 1: Fetching Tenant {payload.tenant_uuid}")
         stmt = select(Tenant).filter(Tenant.tenant_uuid == payload.tenant_uuid)
         result = await db.execute(stmt)
         tenant = result.scalars().first()
         if not tenant:
-            print(f"Error: Tenant not found")
+            logger.debug("Tenant not found: %s", payload.tenant_uuid)
             return ResponseHandler.not_found(message="Tenant not found")
 
-        # 2. Server-side Price Calculation
-        print(f"Step 2: Calculating Prices")
-        # Fetch Plan
-        plan_stmt = select(PlanVersion).join(Plan).filter(Plan.plan_code == payload.plan_code).order_by(desc(PlanVersion.created_at))
-        plan_result = await db.execute(plan_stmt)
-        plan_version = plan_result.scalars().first()
-        if not plan_version:
-             # Fallback if plan_code is FREE_TRIAL or check strict
-             if payload.plan_code == "FREE_TRIAL":
-                 plan_price = 0
-             else:
-                 print(f"Error: Plan not found {payload.plan_code}")
-                 return ResponseHandler.not_found(message=f"Plan not found: {payload.plan_code}")
-        else:
-             plan_price = float(plan_version.price)
-        print(f"Plan Price: {plan_price}")
-
-        # Fetch Apps
-        apps_price = 0
-        apps_details = []
-        if payload.apps:
-            # We need to join App with AppPricing to get the price
-            # Assuming CurrencyEnum.INR and CountryEnum.IN for now as defaults, or logic could be expanded to infer from tenant/request
-            target_currency = CurrencyEnum.INR
-            target_country = CountryEnum.IN
-
-            app_stmt = (
-                select(App, AppPricing)
-                .join(AppPricing, AppPricing.app_id == App.id)
-                .filter(
-                    App.id.in_(payload.apps),
-                    AppPricing.currency == target_currency,
-                    AppPricing.country == target_country
-                )
+        # 2. Server-side Price Calculation (in memory, from the pricing catalog)
+        catalog = await pricing_catalog.get(db)
+        try:
+            quote = catalog.quote(
+                payload.plan_code,
+                payload.apps,
+                payload.features,
+                payload.coupon.code if payload.coupon else None,
             )
-            app_result = await db.execute(app_stmt)
-            db_apps_with_pricing = app_result.all() # returns list of (App, AppPricing) tuples
-            # specific serialization for debugging
-            debug_apps = []
-            for app, pricing in db_apps_with_pricing:
-                debug_apps.append({
-                    "app_name": app.name,
-                    "app_id": str(app.id),
-                    "price": float(pricing.price),
-                    "currency": pricing.currency,
-                    "country": pricing.country
-                })
-            print(f"Apps with Pricing: {json.dumps(debug_apps, indent=4)}")
-            print(f"Apps found: {len(db_apps_with_pricing)}")
-
-            for app, pricing in db_apps_with_pricing:
-                base_price = float(pricing.price)
-                app_snapshot = {
-                    "app_id": str(app.id),
-                    "name": app.name,
-                    "base_price": base_price,
-                    "features": []
-                }
-                print(f"App: {app.name}, Base Price: {base_price} ,app_snapshot: {app_snapshot}")
-                # Addon Features
-                addon_price_sum = 0
-                if app.id in payload.features:
-                    selected_feature_codes = payload.features[app.id]
-                    # Fetch ALL selected features (including base ones)
-                    feat_stmt = select(Feature).filter(Feature.app_id == app.id, Feature.code.in_(selected_feature_codes))
-                    feat_result = await db.execute(feat_stmt)
-                    features = feat_result.scalars().all()
-                    for f in features:
-                        f_price = float(f.addon_price) if f.addon_price and not f.is_base_feature else 0.0
-                        addon_price_sum += f_price
-                        app_snapshot["features"].append({
-                            "feature_id": str(f.id),
-                            "code": f.code,
-                            "price": f_price,
-                            "is_base": f.is_base_feature
-                        })
-
-                app_total = base_price + addon_price_sum
-                apps_price += app_total
-                app_snapshot["total_price"] = app_total
-                apps_details.append(app_snapshot)
-        
-        print(f"Apps Price: {apps_price}")
-
-        subtotal = plan_price + apps_price
-        
-        # Apply Coupon
-        discount_amount = 0
-        if payload.coupon:
-            print(f"Applying Coupon: {payload.coupon.code}")
-            # Server-side validation of coupon could go here
-            code = payload.coupon.code.upper()
-            percentage = 0
-            if code == "WELCOME100": percentage = 1.0
-            elif code == "WELCOME10": percentage = 0.1
-            elif code == "SAAS20": percentage = 0.2
-            elif code == "LAUNCH50": percentage = 0.5
-            elif code == payload.coupon.code: percentage = payload.coupon.percentage # fallback
-            
-            discount_amount = subtotal * percentage
+        except QuoteError as quote_err:
+            return ResponseHandler.not_found(message=str(quote_err))
+
+        plan_price = quote.plan_price
+        apps_details = list(quote.apps)
+        discount_amount = quote.discount_amount
+        tax = quote.tax
+        grand_total = quote.grand_total
         
-        print(f"Discount: {discount_amount}")
-
-        taxable_amount = subtotal - discount_amount
-        tax_rate = 0.18
-        tax = taxable_amount * tax_rate
-        grand_total = taxable_amount + tax
-        
-        print(f"Calculated Grand Total: {grand_total}")
-        print(f"Payload Grand Total: {payload.grand_total}")
+        logger.debug("Grand total: calculated %s, client %s", grand_total, payload.grand_total)
 
         # Verify Grand Total (Tolerance of 1.0)
         if abs(grand_total - payload.grand_total) > 1.0:
-             print(f"ERROR: Price mismatch")
+             logger.debug("Price mismatch for tenant %s", payload.tenant_uuid)
              return ResponseHandler.error(
                  message="Price mismatch", 
                  error_details={
@@ -586,7 +398,6 @@ async def verify_payment(payload: PaymentVerificationRequest, background_tasks:
             )
 
         # 3. Create Order in DB
-        print(f"Step 3: Creating Order in DB")
         new_order = Order(
             tenant_id=tenant.id,
             total_amount=grand_total,
@@ -603,34 +414,35 @@ async def verify_payment(payload: PaymentVerificationRequest, background_tasks:
         )
         db.add(new_order)
         await db.flush() # Flush to get ID
-        print(f"Order Created with ID: {new_order.id}")
+        # Typed line items (plan, apps, features, coupon) commit with the order
+        await write_line_items(db, [new_order])
+        logger.debug("Order created: %s", new_order.id)
 
         # 4. Create Razorpay Order
-        print(f"Step 4: Creating Razorpay Order")
-        razorpay_key = os.getenv("RAZORPAY_KEY_ID")
-        razorpay_secret = os.getenv("RAZORPAY_KEY_SECRET")
+        razorpay_key = payment_gateway.key_id
         
-        if not razorpay_key or not razorpay_secret:
-             print("Error: Razorpay keys missing")
+        if not payment_gateway.configured:
+             logger.debug("Razorpay keys missing")
              return ResponseHandler.error(message="Payment gateway configuration missing",error_details={"detail": "Payment gateway configuration missing"})
 
-        client = razorpay.Client(auth=(razorpay_key, razorpay_secret))
-        
         amount_in_paise = int(grand_total * 100)
         order_id = None
         
         if amount_in_paise > 0:
-            order_data = {
-                "amount": amount_in_paise,
-                "currency": "INR",
-                "receipt": f"rcpt_{tenant.id}_{int(datetime.now().timestamp())}",
-                "notes": {
-                    "tenant_uuid": str(tenant.tenant_uuid),
-                    "plan_code": payload.plan_code,
-                    "db_order_id": str(new_order.id)
-                }
-            }
-            order = client.order.create(data=order_data)
+            try:
+                order = await payment_gateway.create_order(
+                    amount=amount_in_paise,
+                    currency="INR",
+                    receipt=f"rcpt_{tenant.id}_{int(datetime.now().timestamp())}",
+                    notes={
+                        "tenant_uuid": str(tenant.tenant_uuid),
+                        "plan_code": payload.plan_code,
+                        "db_order_id": str(new_order.id)
+                    },
+                )
+            except GatewayError as gateway_err:
+                await db.rollback()
+                return ResponseHandler.error(message="Payment gateway unavailable, please retry", error_details={"detail": str(gateway_err)})
             order_id = order['id']
             # Update order with provider id
             new_order.provider_order_id = order_id
@@ -639,10 +451,9 @@ async def verify_payment(payload: PaymentVerificationRequest, background_tasks:
             order_id = "order_free_" + uuid.uuid4().hex[:10]
             new_order.provider_order_id = order_id
         
-        print(f"Razorpay Order ID: {order_id}")
+        logger.debug("Razorpay order created: %s", order_id)
 
         # 5. Create Transaction
-        print(f"Step 5: Creating Transaction")
         is_free = (grand_total <= 0)
         
         transaction = Transaction(
@@ -652,7 +463,7 @@ async def verify_payment(payload: PaymentVerificationRequest, background_tasks:
             currency="INR",
             provider="razorpay",
             provider_order_id=order_id,
-            status=TransactionStatus.PENDING, # Always PENDING initially, background task will update it
+            status=TransactionStatus.PENDING, # Always PENDING initially, the activation job will update it
             plan_code=payload.plan_code,
             billing_cycle="monthly",
             payment_details={ # Store snapshot in transaction too
@@ -672,31 +483,32 @@ async def verify_payment(payload: PaymentVerificationRequest, background_tasks:
                 link = await get_tenant_link(db, payload.request_code)
                 if link:
                     transaction.tenant_link_id = link.id
-                    print(f"Linked Transaction {transaction.id} to TenantLink {link.id}")
+                    logger.debug("Linked transaction %s to tenant link %s", transaction.id, link.id)
             except Exception as link_err:
-                print(f"Failed to link transaction to token: {link_err}")
+                logger.debug("Failed to link transaction to token: %s", link_err)
 
         db.add(transaction)
         
         if is_free:
-            logger.info(f"Offloading free activation for tenant {tenant.id} to background")
+            logger.info(f"Queueing free activation for tenant {tenant.id}")
             new_order.status = OrderStatus.COMPLETED
-            await db.commit() # Save order and transaction first
-            
-            background_tasks.add_task(
-                process_free_activation_task,
-                tenant.id,
-                new_order.id,
-                transaction.id,
-                payload.plan_code
+            await db.flush()
+            # Committed with the order and transaction, so activation can't be lost
+            await enqueue(
+                db, ACTIVATE_ORDER,
+                {"order_id": new_order.id, "transaction_id": transaction.id, "free": True},
+                idempotency_key=f"activate-order:{new_order.id}",
             )
-        else:
-            await db.commit() # Commit for paid transactions (stays PENDING)
+        await db.commit() # Paid transactions stay PENDING until the webhook
         
         await db.refresh(transaction)
+        await publish_status_event(
+            tenant.id, ORDER_CREATED,
+            order_id=new_order.id, transaction_id=transaction.id, razorpay_order_id=order_id,
+            amount=grand_total, status="PENDING",
+        )
         
-        print(f"Transaction Created: {transaction.id}, Status: {transaction.status}")
-        print(f"========== VERIFICATION COMPLETE ==========")
+        logger.debug("Transaction created: %s, status %s", transaction.id, transaction.status)
 
         return ResponseHandler.success(
             message="Order created",
@@ -712,34 +524,46 @@ async def verify_payment(payload: PaymentVerificationRequest, background_tasks:
         )
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"EXCEPTION: {str(e)}")
+        logger.exception("Payment verification failed for tenant %s", payload.tenant_uuid)
         return ResponseHandler.error(message="Payment verification failed", error_details={"detail": str(e)})
 
 
 @router.post("/check-onboarding-status", response_model=APIResponse)
-async def check_onboarding_status(payload: PaymentStatusRequest, db: AsyncSession = Depends(get_db)):
+async def check_onboarding_status(payload: PaymentStatusRequest, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Check the status of a payment transaction and its associated subscription.
     This is used by the frontend to poll after a Razorpay checkout.
+
+    The response carries an ETag. Polls that send it back in If-None-Match
+    get 304 Not Modified, without a query while this worker knows nothing
+    changed.
     """
+    cache_key = (payload.tenant_uuid, payload.request_id)
+    if_none_match = request.headers.get("if-none-match")
+    cached_etag = onboarding_status_cache.current_etag(cache_key)
+    if cached_etag and etag_matches(if_none_match, cached_etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": cached_etag})
+
     try:
         # Logic delegate to controller
-        # Passing tenant_uuid=None explicitely to match signature requirements if any
         account_controller = AccountController(tenant_uuid=payload.tenant_uuid, db=db) 
-        
-        # Helper to extract request_id (TenantLink.id) from token if needed
-     
-        
+
         status_data = await account_controller.check_onboarding_status(
             request_id=payload.request_id
         )
 
-        return ResponseHandler.success(
+        etag = status_etag(status_data)
+        onboarding_status_cache.store(cache_key, account_controller.tenant_id, etag)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        response = ResponseHandler.success(
             message=status_data.get("message", "Payment status fetched"),
             data=[status_data]
         )
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
     except ValueError as ve:
         # Handle known errors from controller
@@ -755,4 +579,102 @@ async def check_onboarding_status(payload: PaymentStatusRequest, db: AsyncSessio
         return ResponseHandler.error(message="Failed to fetch payment status", error_details={"detail": str(e)})
 
 
+@router.get("/onboarding-status/history")
+async def get_onboarding_history(
+    tenant_uuid: str,
+    request_id: int,
+    db: AsyncSession = Depends(get_db),
+    page: int = Query(1, ge=1),  # Default page = 1 (>=1)
+    limit: int = Query(10, ge=1, le=100),  # Max limit = 100
+):
+    """Paginated payment attempts (newest first) behind /check-onboarding-status."""
+    offset = (page - 1) * limit
+    try:
+        account_controller = AccountController(tenant_uuid=tenant_uuid, db=db)
+        total, history = await account_controller.onboarding_history(request_id=request_id, offset=offset, limit=limit)
+    except ValueError as ve:
+        error_content = ve.args[0] if ve.args else "Unknown error"
+        if isinstance(error_content, dict):
+             return ResponseHandler.error(message="Payment history validation failed", error_details=error_content)
+        return ResponseHandler.error(message=str(error_content), error_details={"detail": str(error_content)})
+
+    return {
+        "message": "Payment history fetched successfully",
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "pages": (total // limit) + (1 if total % limit != 0 else 0),  # Total pages
+        "data": history,
+        "success": True,
+    }
+
+
+@router.get("/onboarding-status/stream")
+async def stream_onboarding_status(
+    request: Request,
+    tenant_uuid: str,
+    request_id: int,
+    last_event_id: Optional[int] = Query(None, alias="lastEventId"),
+):
+    """
+    Server-sent events replacing the /check-onboarding-status poll.
+
+    The stream opens with a ``status`` snapshot (the same payload as the
+    poll), then pushes order.created / payment.captured / payment.failed /
+    subscription.active as they are published, plus a heartbeat comment every
+    STATUS_STREAM_HEARTBEAT_SECONDS. A reconnecting EventSource resumes after
+    its Last-Event-ID; a new one gets the events published since just before
+    the snapshot was read, so none falls between the snapshot and the
+    subscription. The stream closes after subscription.active.
+
+    At most STATUS_STREAM_MAX_PER_TENANT streams per tenant on each worker.
+    """
+    header_id = request.headers.get("last-event-id", "")
+    resume_from = int(header_id) if header_id.isdigit() else last_event_id
+    if resume_from is None:
+        resume_from = snapshot_marker()
+
+    # Own session: it must be closed before the response starts streaming
+    async with AsyncSessionLocal() as db:
+        account_controller = AccountController(tenant_uuid=tenant_uuid, db=db)
+        try:
+            snapshot = await account_controller.check_onboarding_status(request_id=request_id)
+        except ValueError as ve:
+            error_content = ve.args[0] if ve.args else "Unknown error"
+            if isinstance(error_content, dict):
+                 return ResponseHandler.error(message="Payment status validation failed", error_details=error_content)
+            return ResponseHandler.error(message=str(error_content), error_details={"detail": str(error_content)})
+    tenant_id = account_controller.tenant_id
+
+    if status_broker.stream_count(tenant_id) >= status_broker.max_streams_per_tenant:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many open status streams for this tenant")
+
+    async def events():
+        try:
+            async with status_broker.subscribe(tenant_id, resume_from) as queue:
+                yield b"retry: 3000\n\n"
+                yield format_sse("status", snapshot)
+                if snapshot.get("subscription_status") == "active":
+                    return
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=STATUS_STREAM_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            return
+                        yield SSE_HEARTBEAT
+                        continue
+                    yield event.to_sse()
+                    if event.type in TERMINAL_EVENTS:
+                        return
+        except StreamLimitExceeded:
+            yield format_sse("error", {"detail": "Too many open status streams for this tenant"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 
@@ -1,89 +1,125 @@
-from fastapi import APIRouter, Depends, status
+import uuid
+from fastapi import APIRouter, Depends, Query, Request, status
 from fastapi.encoders import jsonable_encoder
+from sqlalchemy import column, func, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 from app.db.database import get_db
 from app.models.apps import App, AppPricing
 from app.models.features import Feature
 from app.models.plans import CountryEnum, CurrencyEnum
 from app.schemas.apps import AppCreate, AppOut
 from app.core.response import ResponseHandler, APIResponse
+from app.services.catalog_cache import bump_catalog_version, cached_catalog_response, catalog_cache
+from app.db.read_models import AppRecord, app_columns, feature_rows, fetch_apps, json_array, pricing_rows
 from sqlalchemy.orm import selectinload
 
 router = APIRouter(prefix="/saas", tags=["SAAS APPLICATIONS"])
 
-@router.post("/register", response_model=APIResponse)
-async def register_app(app_data: AppCreate, db: AsyncSession = Depends(get_db)):
-    try:
-        # Check if app code already exists
-        result = await db.execute(select(App).filter(App.code == app_data.code))
-        if result.scalars().first():
-            return ResponseHandler.error(message=f"App with code '{app_data.code}' already exists")
-
-        # Create App
-        new_app = App(
+def _register_app_statement(app_data: AppCreate):
+    """
+    One statement for the whole registration: the app insert (ON CONFLICT on
+    code DO NOTHING) and its pricing / feature inserts are data-modifying
+    CTEs, and the outer select returns the new app in AppOut shape straight
+    from their RETURNING rows.
+    """
+    apps = App.__table__
+    # Python-side column defaults cannot be prefetched inside insert CTEs, so
+    # ids are supplied explicitly and from_select skips the defaults.
+    new_app = (
+        pg_insert(App)
+        .values(
+            id=uuid.uuid4(),
             code=app_data.code,
             name=app_data.name,
             description=app_data.description,
             icon=app_data.icon,
-            is_active=app_data.is_active
+            is_active=app_data.is_active,
         )
-        db.add(new_app)
-        await db.flush()  # Get new_app.id
+        .on_conflict_do_nothing(index_elements=[apps.c.code])
+        .returning(*apps.c)
+        .cte("new_app")
+    )
 
-        # Add Pricing
-        for p in app_data.pricing:
-            new_pricing = AppPricing(
-                app_id=new_app.id,
-                price=p.price,
-                currency=p.currency,
-                country=p.country,
-                is_active=p.is_active
+    pricing_json = select(func.json_build_array())
+    if app_data.pricing:
+        pricing = AppPricing.__table__
+        rows = values(
+            column("price", pricing.c.price.type),
+            column("currency", pricing.c.currency.type),
+            column("country", pricing.c.country.type),
+            column("is_active", pricing.c.is_active.type),
+            name="pricing_input",
+        ).data([(p.price, p.currency, p.country, p.is_active) for p in app_data.pricing])
+        new_pricing = (
+            pg_insert(AppPricing)
+            .from_select(
+                ["app_id", "price", "currency", "country", "is_active"],
+                select(new_app.c.id, rows.c.price, rows.c.currency, rows.c.country, rows.c.is_active),
+                include_defaults=False,
             )
-            db.add(new_pricing)
-        
-        # Add Features
-        for f in app_data.features:
-            new_feature = Feature(
-                app_id=new_app.id,
-                code=f.code,
-                name=f.name,
-                description=f.description,
-                is_base_feature=f.is_base_feature,
-                addon_price=f.addon_price,
-                currency=f.currency,
-                status=f.status
+            .returning(*pricing.c)
+            .cte("new_pricing")
+        )
+        pricing_json = pricing_rows(new_pricing)
+
+    features_json = select(func.json_build_array())
+    if app_data.features:
+        features = Feature.__table__
+        rows = values(
+            column("code", features.c.code.type),
+            column("name", features.c.name.type),
+            column("description", features.c.description.type),
+            column("is_base_feature", features.c.is_base_feature.type),
+            column("addon_price", features.c.addon_price.type),
+            column("currency", features.c.currency.type),
+            column("status", features.c.status.type),
+            name="feature_input",
+        ).data([
+            (f.code, f.name, f.description, f.is_base_feature, f.addon_price, f.currency, f.status)
+            for f in app_data.features
+        ])
+        new_features = (
+            pg_insert(Feature)
+            .from_select(
+                ["id", "app_id", "code", "name", "description", "is_base_feature", "addon_price", "currency", "status"],
+                select(
+                    func.gen_random_uuid(), new_app.c.id, rows.c.code, rows.c.name, rows.c.description, rows.c.is_base_feature,
+                    rows.c.addon_price, rows.c.currency, rows.c.status,
+                ),
+                include_defaults=False,
             )
-            db.add(new_feature)
+            .returning(*features.c)
+            .cte("new_features")
+        )
+        features_json = feature_rows(new_features)
+
+    return select(
+        *app_columns(new_app),
+        json_array(pricing_json).label("pricing"),
+        json_array(features_json).label("features"),
+    )
+
+
+@router.post("/register", response_model=APIResponse)
+async def register_app(app_data: AppCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        result = await db.execute(_register_app_statement(app_data))
+        row = result.first()
+        if row is None:
+            # ON CONFLICT (code) DO NOTHING: nothing inserted
+            await db.rollback()
+            return ResponseHandler.error(message=f"App with code '{app_data.code}' already exists")
 
+        catalog_version = await bump_catalog_version(db)
         await db.commit()
-        await db.refresh(new_app)
-        
-        # Reload with relationships for the response
-        result = await db.execute(
-            select(App).options(
-                selectinload(App.pricing),
-                selectinload(App.features)
-            ).filter(App.id == new_app.id)
-        )
-        final_app = result.scalars().first()
-        
-        # Resolve root pricing for response (Mandatory INR)
-        app_out = AppOut.from_orm(final_app)
-        inr_pricing = next((p for p in final_app.pricing if p.is_active and p.currency == CurrencyEnum.INR), None)
-        
-        if inr_pricing:
-            app_out.base_price = inr_pricing.price
-            app_out.primary_currency = inr_pricing.currency
-            app_out.primary_country = inr_pricing.country
-        else:
-            app_out.base_price = 1000.00  # Fallback as requested
-            app_out.primary_currency = CurrencyEnum.INR
-            app_out.primary_country = CountryEnum.IN
-            
+        catalog_cache.observe(catalog_version)
+
+        # Root pricing (mandatory INR, else the default) is resolved by the record
         return ResponseHandler.success(
-            data=jsonable_encoder([app_out]), 
+            data=[AppRecord._make(row).to_dict()], 
             message="App registered successfully"
         )
     except Exception as e:
@@ -94,36 +130,27 @@ async def register_app(app_data: AppCreate, db: AsyncSession = Depends(get_db)):
         )
 
 @router.get("/get_apps", response_model=APIResponse)
-async def list_apps(db: AsyncSession = Depends(get_db)):
-    try:
-        result = await db.execute(
-            select(App).options(
-                selectinload(App.pricing),
-                selectinload(App.features)
-            ).filter(App.is_active == True)
-        )
-        apps = result.scalars().unique().all()
-        
-        data_out = []
-        for app in apps:
-            app_out = AppOut.from_orm(app)
-            # Find an active INR pricing record
-            inr_pricing = next((p for p in app.pricing if p.is_active and p.currency == CurrencyEnum.INR), None)
-            
-            if inr_pricing:
-                app_out.base_price = inr_pricing.price
-                app_out.primary_currency = inr_pricing.currency
-                app_out.primary_country = inr_pricing.country
-            else:
-                app_out.base_price = 1000.00  # Fallback as requested
-                app_out.primary_currency = CurrencyEnum.INR
-                app_out.primary_country = CountryEnum.IN
-            data_out.append(app_out)
-
+async def list_apps(
+    request: Request,
+    currency: CurrencyEnum = Query(CurrencyEnum.INR),
+    country: Optional[CountryEnum] = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Active apps with pricing and features. The serialized body is cached per
+    catalog version and carries a strong ETag.
+    """
+    async def build():
+        # Apps, pricing and features in one query; the root price for the
+        # requested currency/country is resolved by the read model.
+        apps = await fetch_apps(db, active_only=True)
         return ResponseHandler.success(
-            data=jsonable_encoder(data_out), 
+            data=[app.to_dict(currency.value, country.value if country else None) for app in apps],
             message="Apps retrieved successfully"
         )
+
+    try:
+        return await cached_catalog_response(db, request, ("apps", currency, country), build)
     except Exception as e:
         return ResponseHandler.error(
             message="Failed to retrieve apps", 
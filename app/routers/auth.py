@@ -1,7 +1,7 @@
 from datetime import timedelta
 import json
 from typing import Annotated
-from fastapi import APIRouter, Cookie, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,6 +9,7 @@ from app.core.response import APIResponse, ResponseHandler
 from app.core.security.authentications import getRequestIdentity
 from app.core.security.oauth_token_service import generate_oauth_tokens, validate_token
 from app.db.database import get_db
+from app.db.tenancy import get_tenant_db, tenant_directory, tenant_session, token_claims
 from app.models.auth import User
 from app.models.tenant import Permission, Role, ScopeEnum, Tenant
 from app.schemas.auth_schemas import (
@@ -22,6 +23,7 @@ from app.controllers.auth_controller import authenticateLoginUser
 from app.core.security.oauth_token_service import validate_token
 from sqlalchemy.orm import joinedload, selectinload
 from uuid import UUID
+from app.core.logger import create_logger
 
 # OAuth2 token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -32,9 +34,27 @@ router = APIRouter(
 )
 
 
-# Dependency to extract and verify the access token
-async def get_current_user(access_token: str = Depends(oauth2_scheme)):
-    return await validate_token(TOKEN=access_token)
+logger = create_logger("auth")
+
+
+# Dependency to extract and verify the access token. The claims are shared
+# with tenant routing (get_tenant_db), so the token is validated once.
+async def get_current_user(request: Request, access_token: str = Depends(oauth2_scheme)):
+    claims = await token_claims(request)
+    if claims is None:
+        # Raises the reason the token is not valid
+        return await validate_token(TOKEN=access_token)
+    return claims
+
+
+async def get_platform_admin(current_user: dict = Depends(get_current_user)):
+    """
+    The current user, if they are a platform superuser. Tenant roles and
+    permissions are set by each tenant's admins, so they do not count.
+    """
+    if current_user.get("is_superuser") is not True:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Platform admin access required")
+    return current_user
 
 
 # 🚀 Login User & Get Tokens
@@ -66,6 +86,7 @@ async def login(
             "userFullName": f"{user.first_name} {user.last_name}",
             "tenant_id": user.tenant_id,
             "tenant_name": user.tenant.tenant_name,
+            "is_superuser": bool(user.is_superuser),
             "subscription": auth_context.get("subscription"),
             "roles": auth_context.get("roles"),
             "permissions": auth_context.get("permissions"),
@@ -116,7 +137,6 @@ async def login(
 
 @router.get("/me")
 async def identity(refresh_token: Annotated[str | None, Cookie()] = None):
-    print(f"refresh_token", refresh_token)
     if not refresh_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="No refresh token found"
@@ -130,10 +150,9 @@ async def identity(refresh_token: Annotated[str | None, Cookie()] = None):
             detail="Invalid or expired refresh token",
         )
 
-    print("payload", payload)
+    logger.debug("Refreshing tokens for %s", payload.get("sub"))
     # access_token = create_jwt_token(payload, timedelta(minutes=7))
     access_token, *_ = generate_oauth_tokens(payload, False, False)
-    print("access_token", access_token)
     return {
         "access_token": access_token,
         "authProvider": "credentials",
@@ -160,7 +179,7 @@ async def userInfo(
     """
     Fetch user info based on the authenticated user's identity.
     """
-    print("Identity:", identity)
+    logger.debug("Identity: %s", identity)
 
     if not identity or "sub" not in identity:
         return {"error": "Invalid identity"}
@@ -197,45 +216,51 @@ async def userInfo(
 
 
 @router.post("/roles/")
-async def create_role(role_data: RoleCreate, db: AsyncSession = Depends(get_db)):
-    # Check if role already exists for this tenant
-    existing_role = await db.execute(
-        select(Role).filter(
-            Role.role_name == role_data.role_name, Role.tenant_id == role_data.tenant_id
-        )
-    )
-    if existing_role.scalars().first():
-        raise HTTPException(
-            status_code=400, detail="Role with this name already exists for the tenant."
+async def create_role(role_data: RoleCreate):
+    # Roles live in the tenant's own database when it is dedicated
+    route = await tenant_directory.lookup(str(role_data.tenant_id))
+    if route is None:
+        raise HTTPException(status_code=404, detail="Tenant not found.")
+
+    async with tenant_session(str(route.tenant_uuid)) as db:
+        # Check if role already exists for this tenant
+        existing_role = await db.execute(
+            select(Role).filter(
+                Role.role_name == role_data.role_name, Role.tenant_id == route.tenant_id
+            )
         )
+        if existing_role.scalars().first():
+            raise HTTPException(
+                status_code=400, detail="Role with this name already exists for the tenant."
+            )
 
-    # Create new Role
-    new_role = Role(
-        role_name=role_data.role_name,
-        is_active=role_data.is_active,
-        tenant_id=role_data.tenant_id,
-        description=role_data.description
-    )
-    db.add(new_role)
-    await db.commit()
-    await db.refresh(new_role)
-
-    # Add Permissions
-    for perm in role_data.permissions:
-        new_permission = Permission(
-            permission_name=perm.permission_name,
-            scopes=perm.scopes,
-            description=perm.description,
-            role_id=new_role.id,
+        # Create new Role
+        new_role = Role(
+            role_name=role_data.role_name,
+            is_active=role_data.is_active,
+            tenant_id=route.tenant_id,
+            description=role_data.description
         )
-        db.add(new_permission)
+        db.add(new_role)
+        await db.commit()
+        await db.refresh(new_role)
 
-    await db.commit()
-    return {"message": "Role created successfully", "role_id": new_role.id}
+        # Add Permissions
+        for perm in role_data.permissions:
+            new_permission = Permission(
+                permission_name=perm.permission_name,
+                scopes=perm.scopes,
+                description=perm.description,
+                role_id=new_role.id,
+            )
+            db.add(new_permission)
+
+        await db.commit()
+        return {"message": "Role created successfully", "role_id": new_role.id}
 
 
 @router.get("/roles/{tenant_id}", response_model=APIResponse)
-async def get_roles(tenant_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_roles(tenant_id: UUID, db: AsyncSession = Depends(get_tenant_db)):
     # Fetch roles for the tenant identified by tenant_uuid
     result = await db.execute(
         select(Role)
@@ -258,15 +283,15 @@ async def get_roles(tenant_id: UUID, db: AsyncSession = Depends(get_db)):
 
 @router.post("/permissions/")
 async def create_permissions(
-    permission_data: PermissionBulkCreate, db: AsyncSession = Depends(get_db)
+    permission_data: PermissionBulkCreate, db: AsyncSession = Depends(get_tenant_db)
 ):
     # Check if the role exists
     role = await db.execute(select(Role).filter(Role.id == permission_data.role_id))
     role = role.scalars().first()
     if not role:
         raise HTTPException(status_code=404, detail="Role not found.")
-    print("role", role)
-    print("permission_data", permission_data)
+    logger.debug("Role: %s", role)
+    logger.debug("Permission data: %s", permission_data)
     # Get existing permissions for this role
     existing_permissions = await db.execute(
         select(Permission).filter(Permission.role_id == permission_data.role_id)
@@ -275,7 +300,7 @@ async def create_permissions(
         permission.permission_name
         for permission in existing_permissions.scalars().all()
     }
-    print("existing_permission_names", existing_permission_names)
+    logger.debug("Existing permissions: %s", existing_permission_names)
     # Validate and create new permissions
     new_permissions = []
     for perm in permission_data.permissions:
@@ -298,7 +323,7 @@ async def create_permissions(
             )
         )
 
-    print("new_permissions", new_permissions)
+    logger.debug("New permissions: %s", new_permissions)
     # If no valid new permissions, return an error
     if not new_permissions:
         raise HTTPException(
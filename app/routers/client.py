@@ -6,9 +6,11 @@ from app.db.database import get_db
 from app.models.client import OAuthClient
 from app.schemas.client import OAuthClientCreate, OAuthClientUpdate
 from app.core.response import ResponseHandler, APIResponse
+from app.core.logger import create_logger
 
 # from app.con.client import create_oauth_client
 from app.controllers.application_controller import create_oauth_client
+from app.db.read_models import fetch_oauth_clients
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.response import ResponseHandler, APIResponse
@@ -18,16 +20,17 @@ router = APIRouter(
     tags=["applications"],  # Optional: Add a tag for better documentation grouping
 )
 
+logger = create_logger("oauth")
+
 
 @router.post("/register")
 async def register_oauth_client(
     inputData: OAuthClientCreate, db: AsyncSession = Depends(get_db)
 ):
-    print(f"==CALLING register_oauth_client====")
-    print(f"Client", inputData)
+    logger.debug("Registering OAuth client: %s", inputData)
     try:
         db_client = await create_oauth_client(db=db, client_data=inputData)
-        print("db_client", db_client)
+        logger.debug("OAuth client created: %s", db_client)
 
         return ResponseHandler.success(
             message="Client registered successfully",
@@ -56,9 +59,8 @@ async def get_oauth_clients(
     # Fetch total records for pagination meta
     total = await db.scalar(select(func.count()).select_from(OAuthClient))
 
-    # Fetch paginated results
-    result = await db.execute(select(OAuthClient).offset(offset).limit(limit))
-    clients = result.scalars().all()
+    # Fetch paginated results (column-projected read model, no ORM instances)
+    clients = await fetch_oauth_clients(db, offset=offset, limit=limit)
 
     if not clients:
         raise HTTPException(status_code=404, detail="No OAuth clients found")
@@ -0,0 +1,40 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.response import ResponseHandler
+from app.db.database import get_db
+from app.routers.auth import get_current_user
+from app.services.invoice_service import InvoiceError, invoice_for_download, invoice_renderer
+
+router = APIRouter(prefix="/invoices", tags=["invoices"])
+
+
+@router.get("/{billing_id}/pdf")
+async def download_invoice(
+    billing_id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Stream the invoice PDF of one of the caller's tenant's billings. The
+    PDF is rendered and stored on first request if the billing has none.
+    """
+    try:
+        digest, number = await invoice_for_download(db, billing_id, current_user.get("tenant_name"))
+    except InvoiceError as e:
+        return ResponseHandler.not_found(message=str(e))
+    except Exception as e:
+        return ResponseHandler.error(message="Failed to load invoice", error_details={"detail": str(e)})
+
+    # Content-addressed: the digest never changes for these bytes
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        invoice_renderer.store.path(digest), media_type="application/pdf",
+        filename=f"Invoice_{number}.pdf", headers=headers,
+    )
@@ -1,43 +1,152 @@
 import os
-from fastapi import APIRouter, HTTPException
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.config import LOG_FOLLOW_HEARTBEAT_SECONDS, LOG_SEARCH_MAX_LIMIT, LOG_TAIL_MAX_LINES
+from app.services import log_files, log_index
+from app.services.log_files import LogFileError
+from app.services.log_index import LogIndexError
+from app.services.status_events import SSE_HEARTBEAT, format_sse
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
-# Path to the logs directory (relative to the project root)
-logs_dir = os.path.join(os.path.dirname(__file__), "..", "..", "logs")
+TEXT = "text/plain; charset=utf-8"
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
 
 @router.get("/categories")
 def get_log_categories():
     """Get list of log categories (subfolders in logs directory)"""
     try:
-        if not os.path.exists(logs_dir):
-            raise HTTPException(status_code=404, detail="Logs directory not found")
-        categories = [d for d in os.listdir(logs_dir) if os.path.isdir(os.path.join(logs_dir, d))]
-        return {"categories": categories}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return {"categories": log_files.list_categories()}
+    except LogFileError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/search")
+async def search_logs(
+    q: List[str] = Query([], description="terms, all of which must match: ip:, tenant:, client:, status:, level:"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=LOG_SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
+    """
+    Log lines matching the terms within [since, until], newest first, read
+    through the log index (app/services/log_index.py) rather than by
+    scanning files. Files not indexed yet are listed under ``unindexed``.
+    """
+    try:
+        return await run_in_threadpool(log_index.log_indexer.search, q, since, until, category, limit, cursor)
+    except LogIndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LogFileError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 
 @router.get("/{category}")
 def get_logs_in_category(category: str):
     """Get list of log files in a specific category"""
-    category_path = os.path.join(logs_dir, category)
-    if not os.path.exists(category_path):
-        raise HTTPException(status_code=404, detail="Category not found")
     try:
-        files = [f for f in os.listdir(category_path) if os.path.isfile(os.path.join(category_path, f))]
-        return {"logs": files}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return {"logs": log_files.list_files(category)}
+    except LogFileError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 
 @router.get("/{category}/{filename}")
-def get_log_content(category: str, filename: str):
-    """Get the content of a specific log file"""
-    file_path = os.path.join(logs_dir, category, filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Log file not found")
+async def get_log_content(
+    category: str,
+    filename: str,
+    request: Request,
+    tail: Optional[int] = Query(None, ge=0, le=LOG_TAIL_MAX_LINES, description="only the last N lines"),
+    follow: bool = Query(False, description="server-sent events for lines as they are written"),
+):
+    """
+    Stream a log file as text.
+
+    - ``Range: bytes=...`` requests get 206 partial content.
+    - With ``Accept-Encoding: gzip`` the file is sent gzip-encoded; rotated
+      ``.gz`` files are sent as they are stored.
+    - ``?tail=N`` returns the last N lines, read backwards from the end.
+    - ``?follow=true`` opens a server-sent event stream: the ``tail`` lines,
+      then each new line as it is written (``line`` events, id = the byte
+      offset after the line, so a reconnect resumes via Last-Event-ID).
+    """
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        return {"content": content}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        path = log_files.log_path(category, filename)
+    except LogFileError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if (tail is not None or follow) and log_files.is_gzip(path):
+        raise HTTPException(status_code=400, detail="tail and follow are for uncompressed log files")
+
+    if follow:
+        return _follow(request, path, tail or 0)
+    if tail is not None:
+        lines, _ = await run_in_threadpool(log_files.tail, path, tail)
+        return Response(lines, media_type=TEXT)
+
+    gzip_ok = _accepts_gzip(request)
+    if log_files.is_gzip(path):
+        if gzip_ok:
+            return FileResponse(path, media_type=TEXT, headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+        return StreamingResponse(log_files.iter_gzip_decompressed(path), media_type=TEXT, headers={"Vary": "Accept-Encoding"})
+    if "range" in request.headers:
+        # Ranges are read to their exact length, so a growing file is fine
+        return FileResponse(path, media_type=TEXT)
+
+    # Only the bytes present now: the live file keeps growing while it is sent
+    size = os.stat(path).st_size
+    if gzip_ok:
+        return StreamingResponse(
+            log_files.iter_gzip_compressed(path, size), media_type=TEXT,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return StreamingResponse(
+        log_files.iter_file(path, size), media_type=TEXT,
+        headers={"Content-Length": str(size), "Accept-Ranges": "bytes", "Vary": "Accept-Encoding"},
+    )
+
+
+def _follow(request: Request, path: str, tail_lines: int) -> StreamingResponse:
+    header_id = request.headers.get("last-event-id", "")
+
+    async def events():
+        yield b"retry: 3000\n\n"
+        if header_id.isdigit():
+            offset = int(header_id)
+        else:
+            lines, offset = await run_in_threadpool(log_files.tail, path, tail_lines)
+            lines = lines.decode("utf-8", "replace").splitlines()
+            for i, line in enumerate(lines, 1):
+                yield format_sse("line", line, event_id=offset if i == len(lines) else None)
+        idle_since = time.monotonic()
+        async for entry in log_files.follow(path, offset):
+            if entry is not None:
+                end, line = entry
+                yield format_sse("line", line, event_id=end)
+                idle_since = time.monotonic()
+                continue
+            if await request.is_disconnected():
+                return
+            if time.monotonic() - idle_since >= LOG_FOLLOW_HEARTBEAT_SECONDS:
+                yield SSE_HEARTBEAT
+                idle_since = time.monotonic()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
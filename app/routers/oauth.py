@@ -30,6 +30,7 @@ from app.core.security.oauth_token_service import (
 from app.db.database import get_db
 from app.routers.auth import get_current_user
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.logger import create_logger
 
 from app.schemas.oauth_schemas import (
     OauthRequest,
@@ -50,19 +51,20 @@ router = APIRouter(
     tags=["Authorize"],
 )
 
+logger = create_logger("oauth")
+
 
 # -------------------------
 # Authorization Endpoint
 # -------------------------
 
-
 @router.get("/authorize", response_model=APIResponse)
 async def authorize(
     OauthRequest: OauthRequest = Depends(),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    print("===OauthRequest===", OauthRequest)
+    logger.debug("Authorization request: %s", OauthRequest)
     try:
 
         validateClient = await validateClientDetails(OauthRequest, current_user, db)
@@ -73,7 +75,6 @@ async def authorize(
             **{"expires_at": expires_at.isoformat()},
             **{"login_user": current_user},
         }
-        print("OAUTH_FLOW_USER_CONSENT_STORAGE", OAUTH_FLOW_USER_CONSENT_STORAGE)
 
         if validateClient.get("skip_authorization") is True:
 
@@ -120,7 +121,6 @@ async def grant_access(
     if response_type != "code":
         return RedirectResponse(f"{redirect_url}?error=invalid_response_type")
 
-    print(OAUTH_FLOW_USER_CONSENT_STORAGE)
 
     identity = (
         OAUTH_FLOW_USER_CONSENT_STORAGE[client_id]
@@ -132,7 +132,7 @@ async def grant_access(
         extra_params += f"&state={state}"
 
     if identity is not None:
-        print("====indentity found===", identity)
+        logger.debug("Identity found: %s", identity)
         if datetime.utcnow() < identity["expires_at"]:
             if action == "allow":
                 auth_code, expires_at = generate_auth_code()
@@ -226,7 +226,7 @@ async def token_endpoint(request: TokenRequest, db: AsyncSession = Depends(get_d
 
     # Retrieve user consent identity from storage
     identity = OAUTH_FLOW_USER_CONSENT_STORAGE.get(request.client_id)
-    print("===identity===", identity)
+    logger.debug("Identity: %s", identity)
 
     # Validate if identity exists
     if identity is None:
@@ -284,7 +284,7 @@ async def token_endpoint(request: TokenRequest, db: AsyncSession = Depends(get_d
         # expires_at = identity.get("auth_code", (None, None))
         # Validate authorization code and expiry
         if auth_code and expires_at is not None:
-            print("===expires_at", expires_at)
+            logger.debug("Authorization code expires at %s", expires_at)
             # if datetime.now() < expires_at:
 
             if request.code == auth_code and datetime.now() < datetime.fromisoformat(expires_at):
@@ -325,7 +325,7 @@ async def token_endpoint(request: TokenRequest, db: AsyncSession = Depends(get_d
     elif request.grant_type == "refresh_token":
         try:
             decodeData = await validate_token(TOKEN=request.refresh_token)
-            print("DecodeData", decodeData)
+            logger.debug("Token identity: %s", decodeData)
             if decodeData is not None and decodeData["token_type"] == "refresh_token":
 
                 access_token, refresh_token, id_token, refresh_exp, id_token_exp = (
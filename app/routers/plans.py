@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.schemas.plan import PlanCreate, PlanOut
 from app.controllers.plan_controller import create_plan, get_plan, list_plans, update_plan
 from app.core.response import ResponseHandler, APIResponse
+from app.services.catalog_cache import cached_catalog_response
 
 router = APIRouter(
     prefix="/plans",
@@ -26,14 +27,19 @@ async def create_plan_endpoint(inputData: PlanCreate, db: AsyncSession = Depends
 
 @router.get("/available_plans", response_model=APIResponse)
 async def list_plans_endpoint(
+    request: Request,
     db: AsyncSession = Depends(get_db),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
 ):
-    try:
+    """A page of plans with their versions, cached per catalog version with an ETag."""
+    async def build():
         result = await list_plans(db=db, page=page, limit=limit)
         plans_data = [PlanOut.from_orm(p).dict() for p in result["plans"]]
         return ResponseHandler.success(message="Plans fetched successfully", data=plans_data)
+
+    try:
+        return await cached_catalog_response(db, request, ("plans", page, limit), build)
     except Exception as e:
         return ResponseHandler.error(message="Failed to fetch plans", error_details={"detail": str(e)})
 
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_db
+from app.core.response import ResponseHandler, APIResponse
+from app.schemas.pricing import QuoteRequest
+from app.services.pricing import QuoteError, pricing_catalog
+
+router = APIRouter(prefix="/pricing", tags=["pricing"])
+
+
+@router.post("/quote", response_model=APIResponse)
+async def quote(payload: QuoteRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Price a cart (plan + apps + features + coupon) with the same breakdown
+    /account/verify-payment checks the client total against.
+    """
+    try:
+        catalog = await pricing_catalog.get(db)
+        result = catalog.quote(
+            payload.plan_code,
+            payload.apps,
+            payload.features,
+            payload.coupon_code,
+            currency=payload.currency.value,
+            country=payload.country.value,
+            billing_cycle=payload.billing_cycle.value,
+        )
+        return ResponseHandler.success(message="Quote calculated", data=result.to_dict())
+    except QuoteError as e:
+        return ResponseHandler.not_found(message=str(e))
+    except Exception as e:
+        return ResponseHandler.error(message="Failed to calculate quote", error_details={"detail": str(e)})
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.response import ResponseHandler
+from app.db.database import get_db
+from app.routers.auth import get_platform_admin
+from app.services import rollups
+from app.services.rollups import RollupError
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+DEFAULT_DAYS = 30
+
+Interval = Literal["day", "month"]
+
+
+def _range(start: Optional[date], end: Optional[date]):
+    end = end or date.today()
+    return start or end - timedelta(days=DEFAULT_DAYS - 1), end
+
+
+async def _report(message: str, load):
+    try:
+        return ResponseHandler.success(message=message, data=await load())
+    except RollupError as e:
+        return ResponseHandler.error(message=str(e))
+    except Exception as e:
+        return ResponseHandler.error(message="Failed to load report", error_details={"detail": str(e)})
+
+
+@router.get("/mrr")
+async def mrr(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: Interval = "day",
+    by_plan: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_platform_admin),
+):
+    """MRR and active subscriptions per currency, optionally split by plan."""
+    start, end = _range(start, end)
+    return await _report("MRR", lambda: rollups.mrr_report(db, start, end, interval, by_plan))
+
+
+@router.get("/revenue")
+async def revenue(
+    dimension: Literal["plan", "app", "total"] = "total",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: Interval = "day",
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_platform_admin),
+):
+    """Revenue per period by plan, app or in total, per currency."""
+    start, end = _range(start, end)
+    return await _report("Revenue", lambda: rollups.revenue_report(db, start, end, dimension, interval))
+
+
+@router.get("/tenants")
+async def tenants(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: Interval = "day",
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_platform_admin),
+):
+    """New and churned tenants per period."""
+    start, end = _range(start, end)
+    return await _report("Tenants", lambda: rollups.tenants_report(db, start, end, interval))
+
+
+@router.get("/payments")
+async def payments(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: Interval = "day",
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_platform_admin),
+):
+    """Payment attempts, successes, failures and failure rate per provider and currency."""
+    start, end = _range(start, end)
+    return await _report("Payments", lambda: rollups.payments_report(db, start, end, interval))
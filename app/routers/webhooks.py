@@ -1,13 +1,11 @@
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, Request, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.response import ResponseHandler, APIResponse
 from app.db.database import get_db
-import logging
+from app.config import RAZORPAY_WEBHOOK_SECRET
 import json
 
-
-
-from app.controllers.payment_webhook_controller import PaymentWebhookController
+from app.services.webhook_inbox import record_event, verify_signature
 
 from app.core.logger import create_logger
 
@@ -20,58 +18,33 @@ router = APIRouter(
 @router.post("/razorpay", response_model=APIResponse)
 async def razorpay_webhook(
     request: Request, 
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Webhook endpoint to handle payment events (e.g., from Stripe, Razorpay).
+    Razorpay webhook endpoint. Verifies the signature, stores the event in
+    the inbox and acks; the job worker processes it.
     """
+    # 1. Get Raw Body for Signature Verification
+    body_bytes = await request.body()
+    signature = request.headers.get("X-Razorpay-Signature")
+
+    # 2. Verify Signature (HMAC-SHA256, no network or client needed)
+    if RAZORPAY_WEBHOOK_SECRET:
+        if not verify_signature(body_bytes, signature, RAZORPAY_WEBHOOK_SECRET):
+            raise HTTPException(status_code=400, detail="Invalid signature")
+    else:
+        logger.warning("RAZORPAY_WEBHOOK_SECRET not set. Skipping signature verification.")
+
+    # 3. Store in the inbox (duplicates are dropped) and ack
     try:
-        logger.info("Razorpay webhook received")
-        
-        # 1. Get Raw Body for Signature Verification
-        body_bytes = await request.body()
-        signature = request.headers.get("X-Razorpay-Signature")
-        webhook_controller = PaymentWebhookController(db, background_tasks)
-        # 2. Verify Signature
-        if signature:
-             try:
-                 webhook_controller.verify_razorpay_signature(body_bytes, signature)
-             except ValueError:
-                 raise HTTPException(status_code=400, detail="Invalid signature")
-        else:
-             logger.warning("Missing X-Razorpay-Signature header. Skipping verification (dev mode?) or strictly failing.")
-             # Uncomment to enforce:
-             # raise HTTPException(status_code=400, detail="Missing signature")
-        
-        # 3. Parse Payload
-        payload = json.loads(body_bytes)
-        # logger.debug(f"Payload: {payload}")
-        print(payload)
-        event_type = payload.get("event")
-        data = payload.get("payload", {}).get("payment", {}).get("entity", {})
-        
-        # Also check for order entity if relevant
-        order_data = payload.get("payload", {}).get("order", {}).get("entity", {})
-
-        logger.info(f"Received webhook event: {event_type}")
-        print(order_data)
-        # 4. Handle specific events via Controller
-       
-        
-        if event_type == "payment.captured":
-            await webhook_controller.handle_payment_success(data, order_data)
-        elif event_type == "payment.failed":
-            await webhook_controller.handle_payment_failure(data)
-        elif event_type == "order.paid":
-             await webhook_controller.handle_order_paid(order_data)
-        
-        # Return success (200 OK) to acknowledge receipt
-        return ResponseHandler.success(message="Webhook received successfully")
-
+        inbox_id = await record_event(db, body_bytes, request.headers.get("X-Razorpay-Event-Id"))
     except json.JSONDecodeError:
         return ResponseHandler.error(message="Invalid JSON payload", error_details={"detail": "Could not parse request body"})
     except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
-        # Return 400 or 500 depending on the error, but usually webhooks check for 200
-        return ResponseHandler.error(message="Webhook processing failed", error_details={"detail": str(e)})
+        # Not acked: Razorpay redelivers, and the inbox drops the duplicate
+        logger.error(f"Error storing webhook: {str(e)}")
+        raise HTTPException(status_code=500, detail="Webhook could not be stored")
+
+    if inbox_id is None:
+        logger.info("Duplicate webhook delivery ignored")
+    return ResponseHandler.success(message="Webhook received successfully", data={"inbox_id": inbox_id})
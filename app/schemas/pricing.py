@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict
+from uuid import UUID
+
+from app.schemas.plan import BillingCycleEnum, CountryEnum, CurrencyEnum
+
+
+class QuoteRequest(BaseModel):
+    plan_code: str
+    apps: List[UUID] = Field(default_factory=list)
+    features: Dict[UUID, List[str]] = Field(default_factory=dict) # appId -> list of feature codes
+    coupon_code: Optional[str] = None
+    currency: CurrencyEnum = CurrencyEnum.INR
+    country: CountryEnum = CountryEnum.IN
+    billing_cycle: BillingCycleEnum = BillingCycleEnum.monthly
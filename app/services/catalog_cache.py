@@ -0,0 +1,194 @@
+"""
+Versioned cache of catalog responses (/saas/get_apps, /plans/available_plans).
+
+The catalog only changes when admins register apps or create/update plans.
+Those writes call ``bump_catalog_version`` inside their transaction. It
+increments the ``saas_catalog_version`` row and issues a ``NOTIFY``, which
+Postgres delivers only if the write commits. Every worker LISTENs. On a new
+version it drops its cached bodies and invalidates the pricing catalog.
+
+Responses are cached as serialized bytes per (endpoint, version, params),
+with a strong ETag over the body. A matching ``If-None-Match`` gets a 304.
+Without the listener (scripts, tests, a lost connection), the version is
+re-read from the database every CATALOG_VERSION_POLL_SECONDS.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, List, NamedTuple, Optional
+
+import asyncpg
+from fastapi import Request, Response, status
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    CATALOG_CACHE_MAX_ENTRIES,
+    CATALOG_EVENTS_CHANNEL,
+    CATALOG_VERSION_POLL_SECONDS,
+    DATABASE_URL,
+)
+from app.core.logger import create_logger
+from app.core.status_cache import etag_matches
+from app.models.catalog import CatalogVersion
+from app.services.pricing import pricing_catalog
+from app.services.status_events import _asyncpg_dsn
+
+logger = create_logger("catalog_cache")
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+async def bump_catalog_version(db: AsyncSession, channel: str = CATALOG_EVENTS_CHANNEL) -> int:
+    """Call inside a catalog write's transaction; takes effect on its commit."""
+    version = (await db.execute(
+        update(CatalogVersion).where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+        .returning(CatalogVersion.version)
+    )).scalar()
+    await db.execute(select(func.pg_notify(channel, str(version))))
+    return version
+
+
+class CatalogCache:
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        channel: str = CATALOG_EVENTS_CHANNEL,
+        max_entries: int = CATALOG_CACHE_MAX_ENTRIES,
+        poll_interval: float = CATALOG_VERSION_POLL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._on_change: List[Callable[[int], None]] = []
+        self._connection: Optional[asyncpg.Connection] = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+    # -- version ------------------------------------------------------------
+
+    def _listening(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    async def current_version(self, db: AsyncSession) -> int:
+        stale = self._clock() - self._checked_at >= self.poll_interval
+        if self._version is None or (stale and not self._listening()):
+            version = (await db.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1))).scalar() or 0
+            self.observe(version)
+        return self._version
+
+    def observe(self, version: int):
+        """Adopt ``version`` if it is newer than the one this worker knows."""
+        self._checked_at = self._clock()
+        if self._version is not None and version <= self._version:
+            return
+        self._version = version
+        self._entries.clear()
+        for callback in self._on_change:
+            callback(version)
+
+    def on_change(self, callback: Callable[[int], None]):
+        self._on_change.append(callback)
+
+    # -- bodies -------------------------------------------------------------
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: Hashable, body: bytes) -> CachedBody:
+        entry = CachedBody(body, body_etag(body))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    # -- LISTEN connection --------------------------------------------------
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            self.observe(int(payload))
+        except ValueError:
+            logger.error(f"Ignoring malformed catalog version {payload!r}")
+
+    async def start(self):
+        if self.dsn and self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _listen_forever(self, max_backoff: float = 30.0):
+        backoff = 1.0
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                await self._connection.add_listener(self.channel, self._on_notification)
+                # Catch up on bumps made while not listening
+                self.observe(await self._connection.fetchval("SELECT version FROM saas_catalog_version WHERE id = 1") or 0)
+                backoff = 1.0
+                while not self._connection.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog version listener failed, retrying in {backoff:.0f}s: {e}")
+            finally:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+
+catalog_cache = CatalogCache(dsn=_asyncpg_dsn(DATABASE_URL))
+# Quotes are priced from the same catalog
+catalog_cache.on_change(lambda version: pricing_catalog.invalidate())
+
+
+async def cached_catalog_response(
+    db: AsyncSession,
+    request: Request,
+    params: tuple,
+    build: Callable[[], Awaitable[Response]],
+    cache: Optional[CatalogCache] = None,
+) -> Response:
+    """
+    Serve ``build()``'s body from the cache for the current catalog version,
+    or 304 when the client's ETag still matches. Only 200s are cached.
+    """
+    cache = cache or catalog_cache
+    key = (await cache.current_version(db), *params)
+    entry = cache.get(key)
+    if entry is None:
+        response = await build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        entry = cache.store(key, response.body)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -1,46 +1,28 @@
-import os
-import logging
-import smtplib
-import ssl
-import asyncio
 from typing import Optional, List, Dict, Any
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from dotenv import load_dotenv
-from jinja2 import Environment, FileSystemLoader
-from datetime import datetime
 
 from app.core.logger import create_logger
+from app.services.email_templates import email_templates
+from app.services.mail_transport import mail_transport
 
 logger = create_logger('email')
-load_dotenv()
 
-# Setup Jinja2 environment
-template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "emails")
-jinja_env = Environment(loader=FileSystemLoader(template_dir))
 
 def render_template(template_name: str, **context) -> str:
-    """Helper to render a Jinja2 template."""
-    template = jinja_env.get_template(template_name)
-    # Add common context like current year
-    context.setdefault("year", datetime.now().year)
-    return template.render(**context)
-
-def _send_smtp_email(
-    smtp_server: str,
-    smtp_port: int,
-    username: str,
-    password: str,
-    use_tls: bool,
+    """Helper to render a Jinja2 template (year, locale and partials are added)."""
+    return email_templates.render(template_name, **context)
+
+def build_message(
     from_email: str,
     to_emails: List[str],
     subject: str,
     body: str,
     html_body: Optional[str] = None,
     attachments: Optional[List[Dict[str, Any]]] = None,
-) -> Dict[str, Any]:
+) -> MIMEMultipart:
     msg = MIMEMultipart("alternative") if not attachments else MIMEMultipart("mixed")
     
     # Create the alternative part for text/html
@@ -80,50 +62,24 @@ def _send_smtp_email(
                 )
                 msg.attach(part)
 
-    try:
-        if use_tls:
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls(context=ssl.create_default_context())
-        else:
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port, context=ssl.create_default_context())
+    return msg
 
-        server.login(username, password)
-        rejected = server.sendmail(from_email, to_emails, msg.as_string())
-        server.quit()
 
-        return {"success": True, "rejected": rejected}
-
-    except Exception as e:
-        logger.exception("Failed to send SMTP email")
-        return {"success": False, "error": str(e)}
+async def send_email(
+    to_emails: List[str],
+    subject: str,
+    body: str,
+    html_body: Optional[str] = None,
+    attachments: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Send one message from the configured sender over the pooled SMTP transport."""
+    message = build_message(mail_transport.settings.sender, to_emails, subject, body, html_body, attachments)
+    return await mail_transport.send(message)
 
 
 async def send_tenant_registration_email(tenant_email: str, tenant_name: str, link_url: str = None) -> Dict[str, Any]:
-    """Send a simple welcome email to a newly registered tenant.
-
-    Uses environment variables:
-      SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_USE_TLS, FROM_EMAIL, FROM_NAME
-    """
-    print("Sending tenant registration email to", tenant_email)
-    # Load configuration from env
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_username = os.getenv("SMTP_USERNAME", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
-    from_email = os.getenv("FROM_EMAIL", smtp_username)
-    from_name = os.getenv("FROM_NAME", "Support")
-    print("SMTP credentials:", smtp_username, smtp_password)
-    print("SMTP server:", smtp_server)
-    print("SMTP port:", smtp_port)
-    print("SMTP use TLS:", smtp_use_tls)
-    print("From email:", from_email)
-    print("From name:", from_name)
-    if not smtp_username or not smtp_password:
-        msg = "SMTP credentials are not configured"
-        logger.error(msg)
-        return {"success": False, "error": msg}
-
+    """Send a simple welcome email to a newly registered tenant."""
+    logger.info(f"Sending tenant registration email to {tenant_email}")
     subject = f"Welcome to the platform, {tenant_name}!"
     
     template_data = {
@@ -146,23 +102,11 @@ async def send_tenant_registration_email(tenant_email: str, tenant_name: str, li
         body = f"Hi {tenant_name}, please activate: {link_url}"
         html_body = body
 
-    # run blocking SMTP call in thread
-    result = await asyncio.to_thread(
-        _send_smtp_email,
-        smtp_server,
-        smtp_port,
-        smtp_username,
-        smtp_password,
-        smtp_use_tls,
-        f"{from_name} <{from_email}>",
-        [tenant_email],
-        subject,
-        body,
-        html_body,
-    )
-    print("Email send result:", result)
-
+    result = await send_email([tenant_email], subject, body, html_body)
+    logger.info(f"Registration email to {tenant_email}: {'sent' if result['success'] else result.get('error')}")
     return result
+
+
 async def send_subscription_confirmation_email(
     tenant_email: str, 
     tenant_name: str, 
@@ -175,26 +119,7 @@ async def send_subscription_confirmation_email(
     payment_info: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """Send a subscription confirmation email with plan details, credentials, and optional invoice."""
-    print("Sending subscription confirmation email to", tenant_email)
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_username = os.getenv("SMTP_USERNAME", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    smtp_use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
-    from_email = os.getenv("FROM_EMAIL", smtp_username)
-    from_name = os.getenv("FROM_NAME", "Support")
-    print("SMTP credentials:", smtp_username, smtp_password)
-    print("SMTP server:", smtp_server)
-    print("SMTP port:", smtp_port)
-    print("SMTP use TLS:", smtp_use_tls)
-    print("From email:", from_email)
-    print("From name:", from_name)
-   
-    if not smtp_username or not smtp_password:
-        msg = "SMTP credentials are not configured"
-        logger.error(msg)
-        return {"success": False, "error": msg}
-
+    logger.info(f"Sending subscription confirmation email to {tenant_email}")
     subject = f"Subscription Activated: {plan_name}"
     
     template_data = {
@@ -221,19 +146,52 @@ async def send_subscription_confirmation_email(
         body = f"Subscription {plan_name} activated for {tenant_name}."
         html_body = body
 
-    result = await asyncio.to_thread(
-        _send_smtp_email,
-        smtp_server,
-        smtp_port,
-        smtp_username,
-        smtp_password,
-        smtp_use_tls,
-        f"{from_name} <{from_email}>",
-        [tenant_email],
-        subject,
-        body,
-        html_body,
-        attachments,
-    )
+    return await send_email([tenant_email], subject, body, html_body, attachments)
 
-    return result
+
+LIFECYCLE_SUBJECTS = {
+    "renewed": "Subscription Renewed: {plan_name}",
+    "grace": "Action Needed: {plan_name} has ended",
+    "expired": "Subscription Expired: {plan_name}",
+}
+
+
+async def send_subscription_lifecycle_email(
+    tenant_email: str,
+    tenant_name: str,
+    event: str,
+    plan_name: str,
+    end_date: str,
+    next_end_date: Optional[str] = None,
+    amount: Optional[str] = None,
+    currency: Optional[str] = None,
+    payment_url: Optional[str] = None,
+    grace_days: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Tell a tenant their subscription renewed, entered its grace period or expired."""
+    subject = LIFECYCLE_SUBJECTS[event].format(plan_name=plan_name)
+    template_data = {
+        "title": subject,
+        "event": event,
+        "tenant_name": tenant_name,
+        "plan_name": plan_name,
+        "end_date": end_date,
+        "next_end_date": next_end_date,
+        "amount": amount,
+        "currency": currency,
+        "payment_url": payment_url,
+        "grace_days": grace_days,
+    }
+
+    try:
+        html_body = render_template("subscription_lifecycle.html", **template_data)
+        body = f"Hi {tenant_name},\n\n{subject}.\n\n"
+        if payment_url:
+            body += f"Amount due: {amount} {currency}. Pay here: {payment_url}\n\n"
+        body += "— The Team"
+    except Exception as e:
+        logger.error(f"Template rendering failed: {e}")
+        body = f"{subject}."
+        html_body = body
+
+    return await send_email([tenant_email], subject, body, html_body)
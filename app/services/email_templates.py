@@ -0,0 +1,94 @@
+"""
+Compiled email templates.
+
+Templates are compiled once, at startup (``precompile``), and the compiled
+code is kept in a filesystem bytecode cache, so a restart, a new worker
+process or the job worker loads bytecode instead of parsing the sources
+again. Outside production the environment checks the sources for changes
+on every lookup (auto reload); in production it never does.
+
+The stylesheet and footer under ``partials/`` do not depend on the
+recipient. They are rendered once per (locale, year) and handed to
+``base.html`` as markup.
+
+``render_many`` renders one template for many recipients. The template
+lookup and the shared context are set up once for the whole batch.
+"""
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
+
+from app.config import EMAIL_TEMPLATE_AUTO_RELOAD, EMAIL_TEMPLATE_CACHE_DIR, EMAIL_TEMPLATE_LOCALE
+from app.core.logger import create_logger
+
+logger = create_logger("email")
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "emails")
+# Rendered once per (locale, year), see ``EmailTemplates.partials``
+STATIC_PARTIALS = ("styles", "footer")
+
+
+class EmailTemplates:
+    def __init__(
+        self,
+        template_dir: str = TEMPLATE_DIR,
+        cache_dir: Optional[str] = EMAIL_TEMPLATE_CACHE_DIR,
+        auto_reload: bool = EMAIL_TEMPLATE_AUTO_RELOAD,
+        locale: str = EMAIL_TEMPLATE_LOCALE,
+    ):
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.locale = locale
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            # None falls back to a per-user directory under the system temp dir
+            bytecode_cache=FileSystemBytecodeCache(cache_dir or None),
+            auto_reload=auto_reload,
+        )
+        self.partials = lru_cache(maxsize=32)(self._render_partials)
+
+    def precompile(self) -> int:
+        """Load every template so later lookups hit the in-memory cache. Returns the count."""
+        names = self.env.list_templates(extensions=["html"])
+        for name in names:
+            self.env.get_template(name)
+        logger.info(f"Compiled {len(names)} email templates")
+        return len(names)
+
+    def _render_partials(self, locale: str, year: int) -> Dict[str, Markup]:
+        context = {"locale": locale, "year": year}
+        return {
+            name: Markup(self.env.get_template(f"partials/{name}.html").render(context))
+            for name in STATIC_PARTIALS
+        }
+
+    def base_context(self, locale: Optional[str] = None, **shared) -> Dict[str, Any]:
+        """Context every email gets: year, locale and the pre-rendered partials."""
+        locale = locale or self.locale
+        year = shared.pop("year", None) or datetime.now().year
+        return {"year": year, "locale": locale, "partials": self.partials(locale, year), **shared}
+
+    def render(self, template_name: str, locale: Optional[str] = None, **context) -> str:
+        return self.render_many(template_name, [{}], locale=locale, **context)[0]
+
+    def render_many(
+        self, template_name: str, recipients: Iterable[Dict[str, Any]], locale: Optional[str] = None, **shared,
+    ) -> List[str]:
+        """Render ``template_name`` once per recipient context, in order.
+
+        ``shared`` values go to every recipient; a recipient's own keys win.
+        """
+        template = self.env.get_template(template_name)
+        base = self.base_context(locale, **shared)
+        return [template.render({**base, **recipient}) for recipient in recipients]
+
+    def cache_info(self) -> dict:
+        info = self.partials.cache_info()
+        return {"templates": len(self.env.cache or ()), "partial_hits": info.hits, "partial_misses": info.misses}
+
+
+email_templates = EmailTemplates()
@@ -0,0 +1,84 @@
+"""
+Local stand-in for the Razorpay orders/payments API, for tests and load runs.
+
+    python -m app.services.fake_gateway --port 8900 --latency-ms 80 --error-rate 0.02
+    PAYMENT_GATEWAY_BASE_URL=http://127.0.0.1:8900/v1 uvicorn app.main:app
+
+Tests mount ``create_fake_gateway_app()`` directly with ``httpx.ASGITransport``.
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+
+def create_fake_gateway_app(latency_ms: float = 0.0, error_rate: float = 0.0, seed=None) -> FastAPI:
+    app = FastAPI(title="Fake payment gateway")
+    rng = random.Random(seed)
+    app.state.orders = {}
+    app.state.requests = 0
+
+    @app.middleware("http")
+    async def simulate_network(request: Request, call_next):
+        app.state.requests += 1
+        if latency_ms:
+            # Roughly log-normal, like real gateway latency: mostly fast, a long tail
+            await asyncio.sleep(rng.lognormvariate(0, 0.5) * latency_ms / 1000)
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse({"error": {"code": "SERVER_ERROR", "description": "Injected failure"}}, status_code=503)
+        return await call_next(request)
+
+    @app.post("/v1/orders")
+    async def create_order(request: Request):
+        body = await request.json()
+        if not isinstance(body.get("amount"), int) or body["amount"] < 100:
+            return JSONResponse(
+                {"error": {"code": "BAD_REQUEST_ERROR", "description": "The amount must be atleast INR 1.00"}},
+                status_code=400,
+            )
+        order = {
+            "id": "order_" + secrets.token_hex(7),
+            "entity": "order",
+            "amount": body["amount"],
+            "amount_paid": 0,
+            "amount_due": body["amount"],
+            "currency": body.get("currency", "INR"),
+            "receipt": body.get("receipt"),
+            "status": "created",
+            "notes": body.get("notes") or {},
+            "created_at": int(time.time()),
+        }
+        app.state.orders[order["id"]] = order
+        return order
+
+    @app.get("/v1/orders/{order_id}")
+    async def fetch_order(order_id: str):
+        if order_id not in app.state.orders:
+            raise HTTPException(status_code=404, detail="order not found")
+        return app.state.orders[order_id]
+
+    @app.get("/v1/payments/{payment_id}")
+    async def fetch_payment(payment_id: str):
+        return {"id": payment_id, "entity": "payment", "status": "captured", "created_at": int(time.time())}
+
+    return app
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake payment gateway.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_fake_gateway_app(args.latency_ms, args.error_rate), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
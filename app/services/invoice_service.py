@@ -1,10 +1,101 @@
+"""
+Invoice PDFs.
+
+Rendering is CPU-bound ReportLab work, so it runs on a process pool
+(``invoice_renderer``), never on the event loop. The paragraph styles are
+built once per process.
+
+Rendered PDFs are kept in a content-addressed store
+(``INVOICE_STORAGE_DIR/<sha256[:2]>/<sha256>.pdf``). The digest and size are
+recorded on the billing row (``invoice_sha256`` / ``invoice_size``), and
+``GET /invoices/{billing_id}/pdf`` streams the file. PDFs are rendered with
+ReportLab's invariant mode, so the same billing always gives the same
+bytes and a re-render is stored once.
+
+A billing run renders every billing without a stored PDF (optionally only
+those of one billing date) across all cores::
+
+    python -m app.services.invoice_service run [--billing-date YYYY-MM-DD] [--processes N]
+"""
+import argparse
+import asyncio
+import hashlib
 import io
-from datetime import datetime
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.units import inch
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    INVOICE_RENDER_CHUNK_SIZE,
+    INVOICE_RENDER_PROCESSES,
+    INVOICE_RUN_PAGE_SIZE,
+    INVOICE_STORAGE_DIR,
+)
+from app.core.logger import create_logger
+from app.models.orders import Order
+from app.models.subscriptions import Subscription, SubscriptionBilling, SubscriptionCycle
+from app.models.tenant import Tenant
+from app.services.order_line_items import invoice_lines, load_line_items
+
+logger = create_logger("invoices")
+
+DEFAULT_COMPANY = {
+    'name': 'Mindshift',
+    'address': '123 Tech Lane, Silicon Valley, CA 94025',
+    'email': 'billing@mindshift.ai',
+    'website': 'www.mindshift.ai'
+}
+
+
+class InvoiceError(ValueError):
+    """The invoice does not exist or is not visible to the caller."""
+
+
+@lru_cache(maxsize=1)
+def invoice_styles() -> dict:
+    """Sample stylesheet plus the invoice's own styles, built once per process."""
+    styles = getSampleStyleSheet()
+    return {
+        'normal': styles['Normal'],
+        'italic': styles['Italic'],
+        'title': ParagraphStyle(
+            'TitleStyle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor("#1e293b"),
+            spaceAfter=12
+        ),
+        'label': ParagraphStyle(
+            'LabelStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.grey,
+            spaceAfter=2
+        ),
+        'value': ParagraphStyle(
+            'ValueStyle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            spaceAfter=10
+        ),
+    }
+
 
 def generate_invoice_pdf(
     billing_data: dict,
@@ -13,7 +104,7 @@ def generate_invoice_pdf(
 ) -> bytes:
     """
     Generates a professional PDF invoice in memory.
-    
+
     billing_data: {
         'invoice_number': str,
         'date': str,
@@ -22,7 +113,8 @@ def generate_invoice_pdf(
         'discount': float,
         'total': float,
         'currency': str,
-        'plan_name': str
+        'plan_name': str,
+        'line_items': [{'name': str, 'price': float}] (optional)
     }
     tenant_data: {
         'name': str,
@@ -36,60 +128,30 @@ def generate_invoice_pdf(
         'website': str
     }
     """
-    if not company_details:
-        company_details = {
-            'name': 'Mindshift',
-            'address': '123 Tech Lane, Silicon Valley, CA 94025',
-            'email': 'billing@mindshift.ai',
-            'website': 'www.mindshift.ai'
-        }
+    company_details = company_details or DEFAULT_COMPANY
 
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'TitleStyle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor("#1e293b"),
-        spaceAfter=12
-    )
-    
-    label_style = ParagraphStyle(
-        'LabelStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.grey,
-        spaceAfter=2
-    )
-    
-    value_style = ParagraphStyle(
-        'ValueStyle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.black,
-        spaceAfter=10
-    )
+    # invariant: no timestamp or random document id, so equal input gives equal bytes
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18, invariant=True)
+    styles = invoice_styles()
 
     elements = []
 
     # Header: Title and Invoice Number
-    elements.append(Paragraph("INVOICE", title_style))
-    elements.append(Paragraph(f"Invoice #: {billing_data.get('invoice_number', 'N/A')}", styles['Normal']))
-    elements.append(Paragraph(f"Date: {billing_data.get('date', datetime.now().strftime('%Y-%m-%d'))}", styles['Normal']))
+    elements.append(Paragraph("INVOICE", styles['title']))
+    elements.append(Paragraph(f"Invoice #: {billing_data.get('invoice_number', 'N/A')}", styles['normal']))
+    elements.append(Paragraph(f"Date: {billing_data.get('date', datetime.now().strftime('%Y-%m-%d'))}", styles['normal']))
     elements.append(Spacer(1, 0.5 * inch))
 
     # Billing Info: Two columns (Sender and Receiver)
     data = [
-        [Paragraph("<b>FROM:</b>", label_style), Paragraph("<b>TO:</b>", label_style)],
+        [Paragraph("<b>FROM:</b>", styles['label']), Paragraph("<b>TO:</b>", styles['label'])],
         [
-            Paragraph(f"{company_details['name']}<br/>{company_details['address']}<br/>{company_details['email']}<br/>{company_details['website']}", styles['Normal']),
-            Paragraph(f"{tenant_data['name']}<br/>{tenant_data['email']}<br/>{tenant_data.get('address', '')}", styles['Normal'])
+            Paragraph(f"{company_details['name']}<br/>{company_details['address']}<br/>{company_details['email']}<br/>{company_details['website']}", styles['normal']),
+            Paragraph(f"{tenant_data['name']}<br/>{tenant_data['email']}<br/>{tenant_data.get('address', '')}", styles['normal'])
         ]
     ]
-    
+
     info_table = Table(data, colWidths=[3 * inch, 3 * inch])
     info_table.setStyle(TableStyle([
         ('VALIGN', (0,0), (-1,-1), 'TOP'),
@@ -101,9 +163,9 @@ def generate_invoice_pdf(
     # Items Table
     item_header = ["Description", "Quantity", "Rate", "Amount"]
     currency = billing_data.get('currency', 'INR')
-    
+
     items_data = [item_header]
-    
+
     # Add Itemized list
     line_items = billing_data.get('line_items', [])
     if line_items:
@@ -120,7 +182,7 @@ def generate_invoice_pdf(
         plan_name = billing_data.get('plan_name', 'SaaS Subscription')
         amount = billing_data.get('amount', 0.0)
         items_data.append([plan_name, "1", f"{currency} {amount:,.2f}", f"{currency} {amount:,.2f}"])
-    
+
     items_table = Table(items_data, colWidths=[3 * inch, 1 * inch, 1.2 * inch, 1.3 * inch])
     items_table.setStyle(TableStyle([
         ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#f1f5f9")),
@@ -146,9 +208,9 @@ def generate_invoice_pdf(
         ["Subtotal", f"{currency} {subtotal:,.2f}"],
         ["Tax", f"{currency} {tax:,.2f}"],
         ["Discount", f"-{currency} {discount:,.2f}"],
-        [Paragraph("<b>TOTAL</b>", styles['Normal']), Paragraph(f"<b>{currency} {total:,.2f}</b>", styles['Normal'])]
+        [Paragraph("<b>TOTAL</b>", styles['normal']), Paragraph(f"<b>{currency} {total:,.2f}</b>", styles['normal'])]
     ]
-    
+
     summary_table = Table(summary_data, colWidths=[4.7 * inch, 1.3 * inch])
     summary_table.setStyle(TableStyle([
         ('ALIGN', (0,0), (-1,-1), 'RIGHT'),
@@ -160,9 +222,257 @@ def generate_invoice_pdf(
 
     # Footer
     elements.append(Spacer(1, 1 * inch))
-    elements.append(Paragraph("Thank you for your business!", styles['Italic']))
-    elements.append(Paragraph("If you have any questions, please contact our support team.", styles['Normal']))
+    elements.append(Paragraph("Thank you for your business!", styles['italic']))
+    elements.append(Paragraph("If you have any questions, please contact our support team.", styles['normal']))
 
     doc.build(elements)
-    
+
     return buffer.getvalue()
+
+
+def invoice_number(billing_id) -> str:
+    return str(billing_id)[:8].upper()
+
+
+# -- storage -------------------------------------------------------------------
+
+class InvoiceStore:
+    """PDFs on disk, addressed by the sha256 of their content."""
+
+    def __init__(self, root: str = INVOICE_STORAGE_DIR):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.pdf")
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, content: bytes) -> Tuple[str, int]:
+        """Store ``content`` (once) and return its (sha256, size)."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write aside and rename, so a reader never sees a partial file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        return digest, len(content)
+
+
+invoice_store = InvoiceStore()
+
+
+def _render_and_store(root: str, documents: List[Tuple[dict, dict]]) -> List[Tuple[str, int]]:
+    """Render process: render and store a chunk, return only (sha256, size) per invoice."""
+    store = InvoiceStore(root)
+    return [store.put(generate_invoice_pdf(billing_data, tenant_data)) for billing_data, tenant_data in documents]
+
+
+class InvoiceRenderer:
+    def __init__(self, processes: int = INVOICE_RENDER_PROCESSES, store: InvoiceStore = invoice_store):
+        self.processes = processes
+        self.store = store
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"), initializer=invoice_styles,
+            )
+        return self._executor
+
+    async def render(self, billing_data: dict, tenant_data: dict) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, generate_invoice_pdf, billing_data, tenant_data)
+
+    async def render_and_store(
+        self, documents: List[Tuple[dict, dict]], chunk_size: int = INVOICE_RENDER_CHUNK_SIZE,
+    ) -> List[Tuple[str, int]]:
+        """Render and store many invoices across the pool. Results are in input order."""
+        loop = asyncio.get_running_loop()
+        chunks = [documents[start:start + chunk_size] for start in range(0, len(documents), chunk_size)]
+        stored = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _render_and_store, self.store.root, chunk) for chunk in chunks
+        ))
+        return [result for chunk in stored for result in chunk]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def aclose(self):
+        await asyncio.to_thread(self.close)
+
+
+invoice_renderer = InvoiceRenderer()
+
+
+# -- billing rows ----------------------------------------------------------------
+
+def invoice_inputs_query():
+    """Everything an invoice needs, one row per billing."""
+    plan_code = (
+        select(SubscriptionCycle.plan_code)
+        .where(
+            SubscriptionCycle.subscription_id == SubscriptionBilling.subscription_id,
+            SubscriptionCycle.start_date <= SubscriptionBilling.billing_date,
+        )
+        .order_by(SubscriptionCycle.start_date.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    order_id = (
+        select(Order.id).where(Order.provider_order_id == SubscriptionBilling.payment_reference).limit(1).scalar_subquery()
+    )
+    return (
+        select(
+            SubscriptionBilling.id, SubscriptionBilling.created_at, SubscriptionBilling.billing_date,
+            SubscriptionBilling.base_amount, SubscriptionBilling.tax_amount, SubscriptionBilling.discount_amount,
+            SubscriptionBilling.total_amount, SubscriptionBilling.currency, SubscriptionBilling.invoice_sha256,
+            Tenant.tenant_name, Tenant.tenant_email,
+            plan_code.label("plan_code"), order_id.label("order_id"),
+        )
+        .join(Subscription, Subscription.id == SubscriptionBilling.subscription_id)
+        .join(Tenant, Tenant.id == Subscription.tenant_id)
+    )
+
+
+async def load_invoice_documents(db: AsyncSession, rows: list) -> List[Tuple[dict, dict]]:
+    """Documents for ``invoice_inputs_query`` rows, with each order's line items read in one query."""
+    line_items = await load_line_items(db, {row.order_id for row in rows if row.order_id})
+    return [invoice_documents(row, line_items.get(row.order_id, [])) for row in rows]
+
+
+def invoice_documents(row, line_items: Iterable = ()) -> Tuple[dict, dict]:
+    """(billing_data, tenant_data) for ``generate_invoice_pdf`` from an ``invoice_inputs_query`` row."""
+    billing_data = {
+        'invoice_number': invoice_number(row.id),
+        'date': row.billing_date.strftime("%Y-%m-%d"),
+        'amount': float(row.base_amount),
+        'tax': float(row.tax_amount or 0),
+        'discount': float(row.discount_amount or 0),
+        'total': float(row.total_amount),
+        'currency': row.currency.value,
+        'plan_name': row.plan_code or "SaaS Subscription",
+        'line_items': invoice_lines(line_items),
+    }
+    tenant_data = {'name': row.tenant_name, 'email': row.tenant_email, 'address': ""}
+    return billing_data, tenant_data
+
+
+async def attach_invoice(db: AsyncSession, billing_id: UUID, digest: str, size: int):
+    await db.execute(
+        update(SubscriptionBilling)
+        .where(SubscriptionBilling.id == billing_id)
+        .values(invoice_sha256=digest, invoice_size=size)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def store_rendered_invoice(db: AsyncSession, billing_id: UUID, content: bytes, store: InvoiceStore = invoice_store) -> str:
+    """Keep an already rendered PDF (e.g. the one just emailed) and record it on the billing."""
+    digest, size = await asyncio.to_thread(store.put, content)
+    await attach_invoice(db, billing_id, digest, size)
+    await db.commit()
+    return digest
+
+
+async def invoice_for_download(
+    db: AsyncSession, billing_id: UUID, tenant_name: Optional[str], renderer: InvoiceRenderer = invoice_renderer,
+) -> Tuple[str, str]:
+    """(sha256, invoice number) of a tenant's invoice, rendering and storing it first if needed."""
+    row = (await db.execute(
+        invoice_inputs_query().where(SubscriptionBilling.id == billing_id, Tenant.tenant_name == tenant_name)
+    )).first()
+    if row is None:
+        raise InvoiceError(f"Invoice not found: {billing_id}")
+    if row.invoice_sha256 and renderer.store.exists(row.invoice_sha256):
+        return row.invoice_sha256, invoice_number(row.id)
+    [(digest, size)] = await renderer.render_and_store(await load_invoice_documents(db, [row]))
+    await attach_invoice(db, row.id, digest, size)
+    await db.commit()
+    return digest, invoice_number(row.id)
+
+
+# -- billing runs ----------------------------------------------------------------
+
+@dataclass
+class InvoiceRunReport:
+    invoices: int = 0
+    pages: int = 0
+    seconds: float = 0.0
+
+    @property
+    def invoices_per_second(self) -> float:
+        return self.invoices / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"{self.invoices} invoices in {self.pages} pages in {self.seconds:.2f}s, {self.invoices_per_second:.0f} invoices/s"
+
+
+async def render_billing_run(
+    session_factory,
+    billing_date: Optional[date] = None,
+    renderer: InvoiceRenderer = invoice_renderer,
+    page_size: int = INVOICE_RUN_PAGE_SIZE,
+) -> InvoiceRunReport:
+    """Render and store every billing (of ``billing_date``) that has no stored PDF yet."""
+    report = InvoiceRunReport()
+    started = time.perf_counter()
+    after = None
+    while True:
+        async with session_factory() as db:
+            query = invoice_inputs_query().where(SubscriptionBilling.invoice_sha256.is_(None))
+            if billing_date is not None:
+                query = query.where(SubscriptionBilling.billing_date == billing_date)
+            if after is not None:
+                query = query.where(SubscriptionBilling.id > after)
+            rows = (await db.execute(query.order_by(SubscriptionBilling.id).limit(page_size))).all()
+            if not rows:
+                break
+            stored = await renderer.render_and_store(await load_invoice_documents(db, rows))
+            # ORM bulk UPDATE by primary key (id, created_at): one executemany
+            await db.execute(update(SubscriptionBilling), [
+                {"id": row.id, "created_at": row.created_at, "invoice_sha256": digest, "invoice_size": size}
+                for row, (digest, size) in zip(rows, stored)
+            ])
+            await db.commit()
+        after = rows[-1].id
+        report.invoices += len(rows)
+        report.pages += 1
+        logger.info(f"Invoice run: {report.invoices} invoices stored so far")
+        if len(rows) < page_size:
+            break
+    report.seconds = time.perf_counter() - started
+    logger.info(f"Invoice run finished: {report}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render and store invoice PDFs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="render every billing without a stored PDF")
+    run_parser.add_argument("--billing-date", type=date.fromisoformat, default=None)
+    run_parser.add_argument("--processes", type=int, default=INVOICE_RENDER_PROCESSES)
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    async def run():
+        renderer = InvoiceRenderer(args.processes)
+        try:
+            return await render_billing_run(AsyncSessionLocal, args.billing_date, renderer)
+        finally:
+            await renderer.aclose()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
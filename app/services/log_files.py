@@ -0,0 +1,154 @@
+"""
+Reading log files for the logs router (app/routers/logs.py).
+
+Log files live under LOG_DIR/<category>/ (app/core/logger.py): the live
+``<category>.log`` and its rotated days, gzipped as
+``<category>.log.YYYY-MM-DD.gz``. Nothing here reads a whole file into
+memory: downloads are streamed in LOG_STREAM_CHUNK_BYTES chunks, a tail
+seeks back from the end, and a follow keeps its file open and reads only
+what was appended.
+"""
+import asyncio
+import gzip
+import os
+import zlib
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from app.config import LOG_DIR, LOG_FOLLOW_POLL_SECONDS, LOG_STREAM_CHUNK_BYTES
+
+
+class LogFileError(ValueError):
+    pass
+
+
+def _safe_name(name: str) -> bool:
+    return bool(name) and name == os.path.basename(name) and not name.startswith(".")
+
+
+def list_categories(log_dir: Optional[str] = None) -> List[str]:
+    log_dir = log_dir or LOG_DIR
+    if not os.path.isdir(log_dir):
+        raise LogFileError("Logs directory not found")
+    with os.scandir(log_dir) as entries:
+        return sorted(entry.name for entry in entries if entry.is_dir() and _safe_name(entry.name))
+
+
+def list_files(category: str, log_dir: Optional[str] = None) -> List[str]:
+    directory = os.path.join(log_dir or LOG_DIR, category)
+    if not _safe_name(category) or not os.path.isdir(directory):
+        raise LogFileError("Category not found")
+    with os.scandir(directory) as entries:
+        return sorted(entry.name for entry in entries if entry.is_file() and _safe_name(entry.name))
+
+
+def log_path(category: str, filename: str, log_dir: Optional[str] = None) -> str:
+    """The file's path; names that are not plain file names in a category are not found."""
+    path = os.path.join(log_dir or LOG_DIR, category, filename)
+    if not (_safe_name(category) and _safe_name(filename)) or not os.path.isfile(path):
+        raise LogFileError("Log file not found")
+    return path
+
+
+def is_gzip(path: str) -> bool:
+    return path.endswith(".gz")
+
+
+def iter_file(path: str, size: int, chunk_size: int = LOG_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """The first ``size`` bytes; a live file may grow while it is read, the response may not."""
+    with open(path, "rb") as f:
+        while size > 0:
+            chunk = f.read(min(chunk_size, size))
+            if not chunk:
+                return
+            size -= len(chunk)
+            yield chunk
+
+
+def iter_gzip_compressed(path: str, size: int, chunk_size: int = LOG_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """The first ``size`` bytes, gzip-compressed as they are read."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in iter_file(path, size, chunk_size):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_gzip_decompressed(path: str, chunk_size: int = LOG_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def tail(path: str, lines: int, block_size: int = LOG_STREAM_CHUNK_BYTES) -> Tuple[bytes, int]:
+    """
+    The last ``lines`` complete lines and the offset they end at, reading
+    blocks backwards from the end. A trailing partial line (still being
+    written) is left for a follow to pick up.
+    """
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        position, data = end, b""
+        # Skip back to the end of the last complete line
+        while position > 0 and not data.count(b"\n"):
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+        end -= len(data) - (data.rfind(b"\n") + 1)
+        data = data[:data.rfind(b"\n") + 1]
+        while position > 0 and data.count(b"\n") <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    if lines <= 0:
+        return b"", end
+    kept = data.split(b"\n")[:-1][-lines:]
+    return b"".join(line + b"\n" for line in kept), end
+
+
+def _rotated(path: str, f) -> bool:
+    """The live file was rotated away (a new inode at its path) or truncated below our position."""
+    opened = os.fstat(f.fileno())
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return current.st_ino != opened.st_ino or opened.st_size < f.tell()
+
+
+async def follow(
+    path: str, offset: int, poll_seconds: float = LOG_FOLLOW_POLL_SECONDS, chunk_size: int = LOG_STREAM_CHUNK_BYTES,
+) -> AsyncIterator[Optional[Tuple[int, str]]]:
+    """
+    Yield ``(end_offset, line)`` for each complete line written after
+    ``offset``, and ``None`` on each idle poll. Only appended bytes are
+    read; after a rotation the new file is followed from its start.
+    """
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        size = os.fstat(f.fileno()).st_size
+        offset = offset if offset <= size else 0
+        f.seek(offset)
+        pending = b""
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if chunk:
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    offset += len(line) + 1
+                    yield offset, line.decode("utf-8", "replace")
+                continue
+            if await asyncio.to_thread(_rotated, path, f):
+                f.close()
+                f = await asyncio.to_thread(open, path, "rb")
+                offset, pending = 0, b""
+                continue
+            yield None
+            await asyncio.sleep(poll_seconds)
+    finally:
+        f.close()
@@ -0,0 +1,508 @@
+"""
+Indexed search across log files (``GET /logs/search``).
+
+A background pass (``LogIndexer.run_forever``, started with the API, or
+``python -m app.services.log_index [--watch]``) keeps one index per log
+file under LOG_INDEX_DIR/<category>/<filename>.idx:
+
+- the start offset and time of every line; times are clamped to be
+  non-decreasing within a file, so a time range is two binary searches
+- a sorted posting list of line numbers for each term: ``ip:<addr>``,
+  ``tenant:<id>``, ``client:<client_id>``, ``status:<code>`` and
+  ``level:<LEVEL>``, taken from the JSON record and its ``fields``
+  (including ``tenant_id``/``client_id`` query parameters of requests)
+- for gzipped days, where each gzip member starts; the logger writes
+  rotated days as members of about LOG_GZIP_MEMBER_BYTES
+  (app/core/logger.py), so reading a matching line decompresses one member
+
+Index files are a JSON header followed by raw arrays and are memory-mapped
+for a search, so a query touches the postings it intersects and the lines
+it returns, not the log files. Rotated files are indexed once; the live
+file is indexed incrementally from where the last pass stopped, and a
+search scans whatever was appended since.
+"""
+import argparse
+import asyncio
+import base64
+import heapq
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs
+
+from app.config import LOG_DIR, LOG_INDEX_DIR, LOG_INDEX_INTERVAL_SECONDS, LOG_STREAM_CHUNK_BYTES
+from app.core.logger import create_logger
+from app.services.log_files import LogFileError, is_gzip, list_categories, list_files, log_path
+
+logger = create_logger("system")
+
+MAGIC = b"LOGIDX1\n"
+TERM_KEYS = ("ip", "tenant", "client", "status", "level")
+MAX_TERM_LENGTH = 200
+
+# Record fields (under "fields") and request query parameters that become terms
+_FIELD_TERMS = {"ip": "ip", "status": "status", "tenant": "tenant", "tenant_id": "tenant",
+                "tenant_uuid": "tenant", "client_id": "client"}
+_QUERY_TERMS = {"tenant": "tenant", "tenant_id": "tenant", "client_id": "client"}
+
+
+class LogIndexError(ValueError):
+    pass
+
+
+def line_terms(entry: dict) -> Set[str]:
+    terms = set()
+    if entry.get("level"):
+        terms.add(f"level:{entry['level']}")
+    fields = entry.get("fields")
+    if isinstance(fields, dict):
+        for name, key in _FIELD_TERMS.items():
+            value = fields.get(name)
+            if value is not None and value != "":
+                terms.add(f"{key}:{value}")
+        query = fields.get("query")
+        if isinstance(query, str) and query:
+            for name, values in parse_qs(query).items():
+                key = _QUERY_TERMS.get(name)
+                if key:
+                    terms.update(f"{key}:{value}" for value in values if value)
+    return {term for term in terms if len(term) <= MAX_TERM_LENGTH}
+
+
+def parse_term(term: str) -> str:
+    key, sep, value = term.partition(":")
+    if not sep or not value or key not in TERM_KEYS:
+        raise LogIndexError(f"Search terms look like key:value with key one of {', '.join(TERM_KEYS)}")
+    return f"{key}:{value.upper() if key == 'level' else value}"
+
+
+def _line_ms(entry: dict) -> Optional[int]:
+    try:
+        return int(datetime.fromisoformat(entry["ts"]).timestamp() * 1000)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _to_ms(moment: Optional[datetime]) -> Optional[int]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+# ---------------------------------------------------------------------------
+# Reading log files
+# ---------------------------------------------------------------------------
+
+def _gzip_members(f, position: int = 0, chunk_size: int = LOG_STREAM_CHUNK_BYTES) -> Iterator[Tuple[int, bytes]]:
+    """Decompressed data from ``position`` on, with the compressed offset of the member it came from."""
+    f.seek(position)
+    member = position
+    decompressor = zlib.decompressobj(31)
+    while True:
+        raw = f.read(chunk_size)
+        if not raw:
+            return
+        while raw:
+            data = decompressor.decompress(raw)
+            if data:
+                yield member, data
+            if not decompressor.eof:
+                position += len(raw)
+                break
+            position += len(raw) - len(decompressor.unused_data)
+            raw = decompressor.unused_data
+            member = position
+            decompressor = zlib.decompressobj(31)
+
+
+def _read_lines(
+    path: str, start: int, members: Optional[List[Tuple[int, int]]] = None, chunk_size: int = LOG_STREAM_CHUNK_BYTES,
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    ``(offset, line)`` for each complete line from ``start``. For a gzipped
+    file, ``members`` collects the decompressed and compressed offset at
+    which each gzip member starts.
+    """
+    with open(path, "rb") as f:
+        if is_gzip(path):
+            chunks = _gzip_members(f, 0, chunk_size)
+        else:
+            # Only what is there now; the live file keeps growing
+            size = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            chunks = ((-1, chunk) for chunk in iter(lambda: f.read(min(chunk_size, size - f.tell())), b""))
+        offset, pending, member = start, b"", -1
+        for chunk_member, chunk in chunks:
+            if chunk_member != member:
+                member = chunk_member
+                members.append((offset + len(pending), member))
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                yield offset, line
+                offset += len(line) + 1
+
+
+class _LineReader:
+    """Reads lines at given offsets, keeping the last decompressed gzip member."""
+
+    def __init__(self, path: str, index: "FileIndex"):
+        self.index = index
+        self.f = open(path, "rb")
+        self.member: Optional[Tuple[int, bytes]] = None
+
+    def read(self, offset: int) -> str:
+        if not self.index.gzip:
+            self.f.seek(offset)
+            line = self.f.readline()
+        else:
+            block = max(bisect_right(self.index.block_raw, offset) - 1, 0)
+            start = self.index.block_raw[block]
+            if self.member is None or self.member[0] != start:
+                data = b""
+                for member, chunk in _gzip_members(self.f, self.index.block_gz[block]):
+                    # Members the logger writes end at a line end; others may split a line
+                    if member != self.index.block_gz[block] and data.endswith(b"\n"):
+                        break
+                    data += chunk
+                self.member = (start, data)
+            data = self.member[1]
+            line = data[offset - start:data.find(b"\n", offset - start) + 1 or len(data)]
+        return line.rstrip(b"\n").decode("utf-8", "replace")
+
+    def close(self):
+        self.f.close()
+
+
+# ---------------------------------------------------------------------------
+# The index of one file
+# ---------------------------------------------------------------------------
+
+class FileIndex:
+    """
+    Lines, times, postings and gzip members of one log file, either built
+    in memory or memory-mapped from its index file.
+    """
+
+    def __init__(self, meta: dict, offsets: Sequence[int], times: Sequence[int],
+                 block_raw: Sequence[int], block_gz: Sequence[int], terms: Dict[str, Sequence[int]] = None, view=None):
+        self.meta = meta
+        self.offsets = offsets
+        self.times = times
+        self.block_raw = block_raw
+        self.block_gz = block_gz
+        self.terms = terms or {}
+        self._view = view
+
+    @property
+    def gzip(self) -> bool:
+        return self.meta["gzip"]
+
+    @property
+    def end(self) -> int:
+        """Offset after the last indexed line (in decompressed bytes for a gzipped file)."""
+        return self.meta["end"]
+
+    def postings(self, term: str) -> Sequence[int]:
+        if self._view is None:
+            return self.terms.get(term, ())
+        entry = self.meta["terms"].get(term)
+        return self._section(*entry, "I") if entry else ()
+
+    def _section(self, position: int, count: int, typecode: str):
+        base = self.meta["base"] + position
+        return self._view[base:base + count * array(typecode).itemsize].cast(typecode)
+
+    def current_for(self, stat: os.stat_result) -> bool:
+        """Still describes the file: gzipped days never change, the live file only grows."""
+        if self.meta["inode"] != stat.st_ino:
+            return False
+        return self.meta["size"] == stat.st_size if self.gzip else self.end <= stat.st_size
+
+    def matches(self, terms: List[str], since: Optional[int], until: Optional[int]) -> Iterator[Tuple[int, int]]:
+        """``(time, line number)`` of each matching line, newest first."""
+        lo = bisect_left(self.times, since) if since is not None else 0
+        hi = bisect_right(self.times, until) if until is not None else len(self.times)
+        if not terms:
+            for number in range(hi - 1, lo - 1, -1):
+                yield self.times[number], number
+            return
+        lists = sorted((self.postings(term) for term in terms), key=len)
+        if not lists[0]:
+            return
+        first, others = lists[0], lists[1:]
+        for position in range(bisect_left(first, hi) - 1, bisect_left(first, lo) - 1, -1):
+            number = first[position]
+            if all(_contains(other, number) for other in others):
+                yield self.times[number], number
+
+    def save(self, path: str):
+        sections, body, position = {}, [], 0
+
+        def add(values: Sequence[int], typecode: str) -> List[int]:
+            nonlocal position
+            data = array(typecode, values).tobytes()
+            data += b"\0" * (-len(data) % 8)
+            body.append(data)
+            entry = [position, len(values)]
+            position += len(data)
+            return entry
+
+        for name, values, typecode in (("offsets", self.offsets, "Q"), ("times", self.times, "q"),
+                                       ("block_raw", self.block_raw, "Q"), ("block_gz", self.block_gz, "Q")):
+            sections[name] = add(values, typecode)
+        terms = {term: add(self.postings(term), "I") for term in sorted(self.terms)}
+        header = json.dumps({**self.meta, "sections": sections, "terms": terms}).encode()
+        header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            f.writelines(body)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FileIndex":
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise LogIndexError(f"Not a log index: {path}")
+            (length,) = struct.unpack("<Q", f.read(8))
+            meta = json.loads(f.read(length))
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        meta["base"] = len(MAGIC) + 8 + length
+        index = cls(meta, (), (), (), (), view=view)
+        sections = meta.pop("sections")
+        index.offsets = index._section(*sections["offsets"], "Q")
+        index.times = index._section(*sections["times"], "q")
+        index.block_raw = index._section(*sections["block_raw"], "Q")
+        index.block_gz = index._section(*sections["block_gz"], "Q")
+        return index
+
+
+def _contains(postings: Sequence[int], number: int) -> bool:
+    position = bisect_left(postings, number)
+    return position < len(postings) and postings[position] == number
+
+
+def build_index(path: str, base: Optional[FileIndex] = None) -> FileIndex:
+    """
+    Index ``path``, or only the lines after ``base`` (the live file's
+    previous index). Lines without a parseable time take the previous one.
+    """
+    stat = os.stat(path)
+    gzip = is_gzip(path)
+    offsets, times = array("Q"), array("q")
+    block_raw, block_gz = array("Q"), array("Q")
+    terms: Dict[str, array] = {}
+    start, last_ms = 0, 0
+    if base is not None and not gzip:
+        offsets.extend(base.offsets)
+        times.extend(base.times)
+        for term in base.meta["terms"] if base._view is not None else base.terms:
+            terms[term] = array("I", base.postings(term))
+        start, last_ms = base.end, base.meta["max_ts"] or 0
+
+    end, members = start, []
+    for offset, line in _read_lines(path, start, members):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        if not isinstance(entry, dict):
+            entry = {}
+        ms = _line_ms(entry)
+        last_ms = max(last_ms, ms) if ms is not None else last_ms
+        number = len(offsets)
+        offsets.append(offset)
+        times.append(last_ms)
+        for term in line_terms(entry):
+            terms.setdefault(term, array("I")).append(number)
+        end = offset + len(line) + 1
+    for raw, member in members:
+        block_raw.append(raw)
+        block_gz.append(member)
+
+    meta = {
+        "source": os.path.basename(path), "gzip": gzip, "inode": stat.st_ino, "size": stat.st_size,
+        "end": end, "lines": len(offsets),
+        "min_ts": times[0] if times else None, "max_ts": times[-1] if times else None,
+    }
+    return FileIndex(meta, offsets, times, block_raw, block_gz, terms)
+
+
+# ---------------------------------------------------------------------------
+# Indexer and search
+# ---------------------------------------------------------------------------
+
+def _hits(index: FileIndex, file_key: str, terms: List[str], since: Optional[int], until: Optional[int]):
+    for ts, number in index.matches(terms, since, until):
+        yield ts, file_key, index.offsets[number]
+
+
+def _encode_cursor(key: Tuple[int, str, int]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, str, int]:
+    try:
+        ts, file_key, offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(ts), str(file_key), int(offset)
+    except (ValueError, TypeError):
+        raise LogIndexError("Invalid cursor")
+
+
+class LogIndexer:
+    def __init__(self, log_dir: str = LOG_DIR, index_dir: str = LOG_INDEX_DIR):
+        self.log_dir = log_dir
+        self.index_dir = index_dir
+
+    def index_path(self, category: str, filename: str) -> str:
+        return os.path.join(self.index_dir, category, f"{filename}.idx")
+
+    def load(self, category: str, filename: str) -> Optional[FileIndex]:
+        try:
+            return FileIndex.load(self.index_path(category, filename))
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def index_file(self, category: str, filename: str) -> bool:
+        """Bring one file's index up to date; False if it already was."""
+        path = log_path(category, filename, self.log_dir)
+        stat = os.stat(path)
+        existing = self.load(category, filename)
+        base = None
+        if existing is not None and existing.current_for(stat):
+            if existing.gzip or existing.end == stat.st_size:
+                return False
+            base = existing
+        index = build_index(path, base)
+        if base is not None and index.meta["lines"] == base.meta["lines"]:
+            return False
+        index.save(self.index_path(category, filename))
+        return True
+
+    def index_all(self) -> int:
+        """One pass over every category; drops the indexes of files that were removed."""
+        indexed = 0
+        try:
+            categories = list_categories(self.log_dir)
+        except LogFileError:
+            return 0
+        for category in categories:
+            filenames = list_files(category, self.log_dir)
+            for filename in filenames:
+                try:
+                    indexed += self.index_file(category, filename)
+                except (OSError, LogFileError):
+                    # Rotated or removed while we looked; the next pass sees the new name
+                    continue
+            directory = os.path.join(self.index_dir, category)
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    if name.endswith(".idx") and name[:-4] not in filenames:
+                        os.remove(os.path.join(directory, name))
+        return indexed
+
+    async def run_forever(self, interval: float = LOG_INDEX_INTERVAL_SECONDS):
+        while True:
+            started = time.monotonic()
+            try:
+                indexed = await asyncio.to_thread(self.index_all)
+                if indexed:
+                    logger.debug("Indexed %s log file(s) in %.1fs", indexed, time.monotonic() - started)
+            except Exception:
+                logger.exception("Log indexing pass failed")
+            await asyncio.sleep(interval)
+
+    def search(
+        self,
+        terms: List[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        category: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        """
+        Lines matching every term within [since, until], newest first.
+        ``next_cursor`` continues after the last result. Files without a
+        current index (not yet indexed, or replaced since) are listed
+        under ``unindexed`` rather than scanned.
+        """
+        terms = [parse_term(term) for term in terms]
+        since_ms, until_ms = _to_ms(since), _to_ms(until)
+        after = _decode_cursor(cursor) if cursor else None
+        if after is not None:
+            until_ms = after[0] if until_ms is None else min(until_ms, after[0])
+        categories = [category] if category else list_categories(self.log_dir)
+
+        streams, sources, unindexed = [], {}, []
+        for name in categories:
+            for filename in list_files(name, self.log_dir):
+                path = log_path(name, filename, self.log_dir)
+                stat = os.stat(path)
+                index = self.load(name, filename)
+                if index is None or not index.current_for(stat):
+                    unindexed.append(f"{name}/{filename}")
+                    continue
+                file_key = f"{name}/{filename}"
+                parts = [index]
+                if not index.gzip and index.end < stat.st_size:
+                    # Appended since the last pass
+                    parts.append(build_index(path, FileIndex(index.meta, (), (), (), ())))
+                for part in parts:
+                    if part.meta["lines"] and not (
+                        (since_ms is not None and part.meta["max_ts"] < since_ms)
+                        or (until_ms is not None and part.meta["min_ts"] > until_ms)
+                    ):
+                        sources[file_key] = (path, index)
+                        streams.append(_hits(part, file_key, terms, since_ms, until_ms))
+
+        results, readers, last = [], {}, None
+        try:
+            for ts, file_key, offset in heapq.merge(*streams, reverse=True):
+                if after is not None and (ts, file_key, offset) >= after:
+                    continue
+                if len(results) == limit:
+                    break
+                last = (ts, file_key, offset)
+                if file_key not in readers:
+                    readers[file_key] = _LineReader(*sources[file_key])
+                results.append({
+                    "ts": datetime.fromtimestamp(ts / 1000, timezone.utc).isoformat(timespec="milliseconds"),
+                    "file": file_key,
+                    "offset": offset,
+                    "line": readers[file_key].read(offset),
+                })
+            else:
+                return {"results": results, "next_cursor": None, "unindexed": unindexed}
+        finally:
+            for reader in readers.values():
+                reader.close()
+        return {"results": results, "next_cursor": _encode_cursor(last), "unindexed": unindexed}
+
+
+log_indexer = LogIndexer()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index log files for /logs/search.")
+    parser.add_argument("--watch", action="store_true", help="keep indexing every LOG_INDEX_INTERVAL_SECONDS")
+    args = parser.parse_args(argv)
+    if args.watch:
+        asyncio.run(log_indexer.run_forever(LOG_INDEX_INTERVAL_SECONDS or 60))
+    else:
+        print(f"Indexed {log_indexer.index_all()} log file(s)")
+
+
+if __name__ == "__main__":
+    main()
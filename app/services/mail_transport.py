@@ -0,0 +1,274 @@
+"""
+Pooled SMTP delivery.
+
+Sending used to open a connection, negotiate TLS and log in for every
+message. ``SMTPTransport`` keeps up to ``pool_size`` authenticated sessions
+open and reuses them. smtplib is blocking, so sessions are only used from
+the transport's own thread pool, never on the event loop.
+
+- ``send`` delivers one message. ``send_many`` splits a batch across the
+  pool and sends each share back to back over one session.
+- A session the server dropped (idle timeout, restart) is replaced, and the
+  message is retried once on the new one. A session idle for longer than
+  ``idle_check_seconds`` is checked with NOOP before reuse.
+- A refused sender or recipient fails only that message. The session is
+  RSET and carries on. Failed results carry a coarse ``reason``
+  (recipient_refused, deferred, connection, ...).
+
+Settings are read once, at import. Latencies per SMTP step are in
+``mail_transport.metrics``, totals and throughput in ``stats()``
+(``/metrics/email``).
+"""
+import asyncio
+import os
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from app.core.logger import create_logger
+from app.core.metrics import LatencyMetrics
+
+logger = create_logger("email")
+load_dotenv()
+
+# The session is unusable; reconnect and retry the message
+_DROPPED = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+@dataclass(frozen=True)
+class SMTPSettings:
+    server: str = "smtp.gmail.com"
+    port: int = 587
+    username: str = ""
+    password: str = field(default="", repr=False)
+    # "starttls", "ssl" or "none" (local sinks)
+    security: str = "starttls"
+    from_email: str = ""
+    from_name: str = "Support"
+    timeout: float = 30.0
+    pool_size: int = 4
+    idle_check_seconds: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SMTPSettings":
+        username = os.getenv("SMTP_USERNAME", "")
+        # SMTP_USE_TLS=false has always meant implicit SSL (port 465)
+        use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+        return cls(
+            server=os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=username,
+            password=os.getenv("SMTP_PASSWORD", ""),
+            security=os.getenv("SMTP_SECURITY") or ("starttls" if use_tls else "ssl"),
+            from_email=os.getenv("FROM_EMAIL", username),
+            from_name=os.getenv("FROM_NAME", "Support"),
+            timeout=float(os.getenv("SMTP_TIMEOUT_SECONDS", "30")),
+            pool_size=int(os.getenv("SMTP_POOL_SIZE", "4")),
+            idle_check_seconds=float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30")),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.server) and (self.security == "none" or bool(self.username and self.password))
+
+    @property
+    def sender(self) -> str:
+        return f"{self.from_name} <{self.from_email}>"
+
+
+class _Session:
+    __slots__ = ("smtp", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+
+def failure_reason(error: Exception) -> str:
+    """Coarse class of a failed delivery, for failure breakdowns."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return "recipient_refused"
+    if isinstance(error, smtplib.SMTPSenderRefused):
+        return "sender_refused"
+    if isinstance(error, smtplib.SMTPResponseException):
+        return "deferred" if 400 <= error.smtp_code < 500 else "rejected"
+    if isinstance(error, (smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError)):
+        return "rejected"
+    return "connection"
+
+
+def _close(session: _Session):
+    try:
+        session.smtp.quit()
+    except Exception:
+        session.smtp.close()
+
+
+class SMTPTransport:
+    def __init__(self, settings: SMTPSettings, metrics: Optional[LatencyMetrics] = None):
+        self.settings = settings
+        self.metrics = metrics or LatencyMetrics()
+        self._idle: List[_Session] = []
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.sent = 0
+        self.failed = 0
+        self._sending_seconds = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.settings.pool_size, thread_name_prefix="smtp")
+        return self._executor
+
+    # -- sessions (pool threads only) ------------------------------------------
+
+    def _connect(self) -> _Session:
+        settings = self.settings
+        started = time.perf_counter()
+        try:
+            if settings.security == "ssl":
+                smtp = smtplib.SMTP_SSL(settings.server, settings.port, timeout=settings.timeout, context=ssl.create_default_context())
+            else:
+                smtp = smtplib.SMTP(settings.server, settings.port, timeout=settings.timeout)
+                if settings.security == "starttls":
+                    smtp.starttls(context=ssl.create_default_context())
+            if settings.username:
+                smtp.login(settings.username, settings.password)
+        except Exception:
+            self.metrics.observe("connect", time.perf_counter() - started, ok=False)
+            raise
+        self.metrics.observe("connect", time.perf_counter() - started, ok=True)
+        return _Session(smtp)
+
+    def _checkout(self) -> _Session:
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is not None and time.monotonic() - session.last_used > self.settings.idle_check_seconds:
+            try:
+                alive = session.smtp.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                alive = False
+            if not alive:
+                _close(session)
+                session = None
+        return session or self._connect()
+
+    def _checkin(self, session: _Session):
+        session.last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle) < self.settings.pool_size:
+                self._idle.append(session)
+                return
+        _close(session)
+
+    def _deliver(self, messages: List[Message]) -> List[dict]:
+        """Pool thread: send ``messages`` one after another over one session."""
+        results = []
+        session = None
+        try:
+            for index, message in enumerate(messages):
+                for attempt in (1, 2):
+                    if session is None:
+                        try:
+                            session = self._checkout()
+                        except Exception as e:
+                            # Server unreachable: the rest of this share would fail the same way
+                            logger.error(f"SMTP connect to {self.settings.server}:{self.settings.port} failed: {e}")
+                            failure = {"success": False, "error": str(e), "reason": failure_reason(e)}
+                            results.extend(dict(failure) for _ in messages[index:])
+                            return results
+                    started = time.perf_counter()
+                    try:
+                        rejected = session.smtp.send_message(message)
+                    except _DROPPED as e:
+                        self.metrics.observe("send", time.perf_counter() - started, ok=False)
+                        session.smtp.close()
+                        session = None
+                        if attempt == 2:
+                            results.append({"success": False, "error": str(e), "reason": "connection"})
+                        continue
+                    except smtplib.SMTPException as e:
+                        self.metrics.observe("send", time.perf_counter() - started, ok=False)
+                        logger.error(f"SMTP refused message to {message['To']}: {e}")
+                        results.append({"success": False, "error": str(e), "reason": failure_reason(e)})
+                        try:
+                            session.smtp.rset()
+                        except Exception:
+                            session.smtp.close()
+                            session = None
+                        break
+                    self.metrics.observe("send", time.perf_counter() - started, ok=True)
+                    results.append({"success": True, "rejected": rejected})
+                    break
+            return results
+        finally:
+            if session is not None:
+                self._checkin(session)
+
+    # -- public API -------------------------------------------------------------
+
+    async def send(self, message: Message) -> dict:
+        return (await self.send_many([message]))[0]
+
+    async def send_many(self, messages: Iterable[Message]) -> List[dict]:
+        """Send a batch over up to ``pool_size`` sessions. Results are in input order."""
+        messages = list(messages)
+        if not messages:
+            return []
+        if not self.settings.configured:
+            logger.error("SMTP credentials are not configured")
+            return [
+                {"success": False, "error": "SMTP credentials are not configured", "reason": "not_configured"}
+                for _ in messages
+            ]
+
+        loop = asyncio.get_running_loop()
+        size = -(-len(messages) // min(self.settings.pool_size, len(messages)))
+        shares = [messages[start:start + size] for start in range(0, len(messages), size)]
+        started = time.perf_counter()
+        delivered = await asyncio.gather(*(loop.run_in_executor(self.executor, self._deliver, share) for share in shares))
+        elapsed = time.perf_counter() - started
+
+        results = [result for share in delivered for result in share]
+        sent = sum(1 for result in results if result["success"])
+        self.sent += sent
+        self.failed += len(results) - sent
+        self._sending_seconds += elapsed
+        if len(messages) > 1:
+            logger.info(f"Sent {sent}/{len(messages)} emails in {elapsed:.2f}s ({len(messages) / max(elapsed, 1e-9):.0f}/s)")
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+        total = self.sent + self.failed
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "messages_per_second": round(total / self._sending_seconds, 2) if self._sending_seconds else 0.0,
+            "idle_sessions": idle,
+            "operations": self.metrics.snapshot(),
+        }
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            _close(session)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def aclose(self):
+        await asyncio.to_thread(self.close)
+
+
+mail_transport = SMTPTransport(SMTPSettings.from_env())
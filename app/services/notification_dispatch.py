@@ -0,0 +1,354 @@
+"""
+Bulk tenant notices (plan changes, renewals, maintenance).
+
+A campaign sends one notice to every active tenant (or every tenant, with
+``--include-inactive``):
+
+- recipients are streamed from ``tenants`` in id order through a
+  server-side cursor, ``batch_size`` rows at a time;
+- each batch is rendered with one ``render_many`` call and sent with
+  ``mail_transport.send_many``, at most ``NOTIFY_CONCURRENCY`` sends at once;
+- a token bucket per recipient domain keeps each mail provider under
+  ``NOTIFY_DOMAIN_RATE_PER_SECOND`` (overrides in ``NOTIFY_DOMAIN_RATE_LIMITS``);
+- after each batch the counters and the tenant cursor are committed on
+  ``saas_notification_campaigns``.
+
+A crashed or failed run resumes after the last committed batch. Tenants of
+the batch that was in flight may get the notice twice; every other tenant
+gets it once. The report gives messages/sec and failures by reason and by
+recipient domain::
+
+    python -m app.services.notification_dispatch start KIND --subject TEXT --paragraph TEXT [--paragraph ...] [--detail TEXT ...] [--action-url URL] [--include-inactive]
+    python -m app.services.notification_dispatch resume CAMPAIGN_ID
+    python -m app.services.notification_dispatch status CAMPAIGN_ID
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    NOTIFY_BATCH_SIZE,
+    NOTIFY_CONCURRENCY,
+    NOTIFY_DOMAIN_RATE_LIMITS,
+    NOTIFY_DOMAIN_RATE_PER_SECOND,
+)
+from app.core.logger import create_logger
+from app.core.response import _json_default
+from app.models.notifications import NotificationCampaign, NotificationCampaignStatus, NotificationKind
+from app.models.tenant import Tenant
+from app.services.email_service import build_message
+from app.services.email_templates import email_templates
+from app.services.mail_transport import mail_transport
+
+logger = create_logger("notification_dispatch")
+
+TEMPLATE = "notice.html"
+
+
+class NotificationDispatchError(ValueError):
+    """The campaign cannot run as asked (unknown campaign, empty notice)."""
+
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    """``"gmail.com=50,outlook.com=30"`` -> ``{"gmail.com": 50.0, "outlook.com": 30.0}``."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        domain, _, rate = item.partition("=")
+        limits[domain.strip().lower()] = float(rate)
+    return limits
+
+
+class DomainRateLimiter:
+    """
+    Token bucket per recipient domain. A bucket holds one second of sends,
+    so a domain gets at most ``rate`` messages in any second.
+    """
+
+    def __init__(
+        self,
+        rate: float = NOTIFY_DOMAIN_RATE_PER_SECOND,
+        overrides: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self.rate = rate
+        self.overrides = overrides if overrides is not None else parse_rate_limits(NOTIFY_DOMAIN_RATE_LIMITS)
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def rate_for(self, domain: str) -> float:
+        return self.overrides.get(domain, self.rate)
+
+    def burst(self, domain: str) -> int:
+        """Largest count one ``acquire`` may ask for."""
+        return max(1, int(self.rate_for(domain)))
+
+    async def acquire(self, domain: str, count: int = 1):
+        rate, capacity = self.rate_for(domain), self.burst(domain)
+        count = min(count, capacity)
+        while True:
+            now = self.clock()
+            tokens, updated = self._buckets.get(domain, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= count:
+                self._buckets[domain] = (tokens - count, now)
+                return
+            self._buckets[domain] = (tokens, now)
+            await self.sleep((count - tokens) / rate)
+
+
+@dataclass
+class DispatchReport:
+    sent: int = 0
+    failed: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    reasons: Counter = field(default_factory=Counter)
+    domains: Counter = field(default_factory=Counter)
+
+    @property
+    def messages_per_second(self) -> float:
+        return (self.sent + self.failed) / self.seconds if self.seconds else 0.0
+
+    def add(self, results: List[dict], recipients: List[str]):
+        self.batches += 1
+        for result, email in zip(results, recipients):
+            if result["success"]:
+                self.sent += 1
+                continue
+            self.failed += 1
+            self.reasons[result.get("reason", "unknown")] += 1
+            self.domains[recipient_domain(email)] += 1
+
+    def __str__(self):
+        text = (
+            f"{self.sent} sent, {self.failed} failed in {self.batches} batches "
+            f"in {self.seconds:.2f}s, {self.messages_per_second:.0f} msgs/s"
+        )
+        if self.failed:
+            reasons = ", ".join(f"{reason}={count}" for reason, count in self.reasons.most_common())
+            domains = ", ".join(f"{domain}={count}" for domain, count in self.domains.most_common(5))
+            text += f"; failures by reason: {reasons}; top domains: {domains}"
+        return text
+
+
+def recipient_domain(email: str) -> str:
+    return email.rpartition("@")[2].lower()
+
+
+def recipients_query(campaign: NotificationCampaign):
+    query = select(Tenant.id, Tenant.tenant_email, Tenant.tenant_name).order_by(Tenant.id)
+    if campaign.last_tenant_id is not None:
+        query = query.where(Tenant.id > campaign.last_tenant_id)
+    if not campaign.include_inactive:
+        query = query.where(Tenant.is_active.is_(True))
+    return query
+
+
+async def stream_recipients(db: AsyncSession, campaign: NotificationCampaign) -> AsyncIterator[list]:
+    """Batches of (id, tenant_email, tenant_name) after the campaign's cursor, from a server-side cursor."""
+    result = await db.stream(recipients_query(campaign).execution_options(yield_per=campaign.batch_size))
+    async for rows in result.partitions():
+        yield rows
+
+
+def plain_text(tenant_name: str, content: dict) -> str:
+    lines = [f"Hi {tenant_name},", *content.get("paragraphs", [])]
+    lines += [f"- {item}" for item in content.get("details", [])]
+    if content.get("action_url"):
+        lines.append(f"{content.get('action_label') or 'Learn more'}: {content['action_url']}")
+    return "\n\n".join(lines) + "\n\n— The Team"
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        transport=mail_transport,
+        templates=email_templates,
+        limiter: Optional[DomainRateLimiter] = None,
+        concurrency: int = NOTIFY_CONCURRENCY,
+    ):
+        self.transport = transport
+        self.templates = templates
+        self.limiter = limiter or DomainRateLimiter()
+        self.concurrency = concurrency
+
+    def build_messages(self, campaign: NotificationCampaign, rows: list) -> list:
+        content = {"title": campaign.subject, **campaign.content}
+        html = self.templates.render_many(TEMPLATE, [{"tenant_name": row.tenant_name} for row in rows], **content)
+        sender = self.transport.settings.sender
+        return [
+            build_message(sender, [row.tenant_email], campaign.subject, plain_text(row.tenant_name, content), body)
+            for row, body in zip(rows, html)
+        ]
+
+    async def send_batch(self, emails: List[str], messages: list) -> List[dict]:
+        """Send one batch within the domain rate limits. Results are in input order."""
+        results: List[Optional[dict]] = [None] * len(messages)
+        by_domain: Dict[str, List[int]] = {}
+        for index, email in enumerate(emails):
+            by_domain.setdefault(recipient_domain(email), []).append(index)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_domain(domain: str, indexes: List[int]):
+            step = self.limiter.burst(domain)
+            for start in range(0, len(indexes), step):
+                share = indexes[start:start + step]
+                await self.limiter.acquire(domain, len(share))
+                async with semaphore:
+                    sent = await self.transport.send_many([messages[index] for index in share])
+                for index, result in zip(share, sent):
+                    results[index] = result
+
+        await asyncio.gather(*(send_domain(domain, indexes) for domain, indexes in by_domain.items()))
+        return results
+
+    async def run(self, session_factory, campaign_id: UUID) -> DispatchReport:
+        """Send (or resume) a campaign until every recipient after its cursor has been tried."""
+        async with session_factory() as db:
+            campaign = await db.get(NotificationCampaign, campaign_id)
+            if campaign is None:
+                raise NotificationDispatchError(f"Notification campaign not found: {campaign_id}")
+        report = DispatchReport()
+        if campaign.status == NotificationCampaignStatus.completed:
+            return report
+
+        started = time.perf_counter()
+        try:
+            async with session_factory() as reader:
+                async for rows in stream_recipients(reader, campaign):
+                    emails = [row.tenant_email for row in rows]
+                    results = await self.send_batch(emails, self.build_messages(campaign, rows))
+                    batch = DispatchReport()
+                    batch.add(results, emails)
+                    report.add(results, emails)
+                    async with session_factory() as db:
+                        await _checkpoint(db, campaign_id, rows[-1].id, batch)
+                    logger.info(
+                        f"Campaign {campaign_id}: batch up to tenant {rows[-1].id}, "
+                        f"{report.sent} sent, {report.failed} failed so far"
+                    )
+            async with session_factory() as db:
+                await _finish(db, campaign_id, NotificationCampaignStatus.completed)
+        except Exception as e:
+            logger.exception(f"Campaign {campaign_id} failed")
+            async with session_factory() as db:
+                await _finish(db, campaign_id, NotificationCampaignStatus.failed, f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            report.seconds = time.perf_counter() - started
+        logger.info(f"Campaign {campaign_id} finished: {report}")
+        return report
+
+
+async def _checkpoint(db: AsyncSession, campaign_id: UUID, last_tenant_id: int, batch: DispatchReport):
+    campaign = (await db.execute(
+        select(NotificationCampaign).where(NotificationCampaign.id == campaign_id).with_for_update()
+    )).scalars().one()
+    campaign.last_tenant_id = last_tenant_id
+    campaign.sent += batch.sent
+    campaign.failed += batch.failed
+    campaign.failure_reasons = dict(Counter(campaign.failure_reasons or {}) + batch.reasons)
+    campaign.failure_domains = dict(Counter(campaign.failure_domains or {}) + batch.domains)
+    campaign.status = NotificationCampaignStatus.running
+    campaign.last_error = None
+    await db.commit()
+
+
+async def _finish(db: AsyncSession, campaign_id: UUID, status: NotificationCampaignStatus, error: Optional[str] = None):
+    values = {"status": status, "last_error": error[-4000:] if error else None}
+    if status == NotificationCampaignStatus.completed:
+        values["finished_at"] = datetime.now(timezone.utc)
+    await db.execute(update(NotificationCampaign).where(NotificationCampaign.id == campaign_id).values(**values))
+    await db.commit()
+
+
+async def start_campaign(
+    db: AsyncSession,
+    kind: NotificationKind,
+    subject: str,
+    content: dict,
+    include_inactive: bool = False,
+    batch_size: int = NOTIFY_BATCH_SIZE,
+) -> NotificationCampaign:
+    if not subject or not content.get("paragraphs"):
+        raise NotificationDispatchError("A notice needs a subject and at least one paragraph")
+    campaign = NotificationCampaign(
+        kind=kind, subject=subject, content=content, include_inactive=include_inactive,
+        batch_size=batch_size, status=NotificationCampaignStatus.running,
+    )
+    db.add(campaign)
+    await db.commit()
+    return campaign
+
+
+def campaign_summary(campaign: NotificationCampaign) -> dict:
+    return {
+        "id": campaign.id,
+        "kind": campaign.kind.value,
+        "subject": campaign.subject,
+        "status": campaign.status.value,
+        "sent": campaign.sent,
+        "failed": campaign.failed,
+        "failure_reasons": campaign.failure_reasons,
+        "failure_domains": campaign.failure_domains,
+        "last_tenant_id": campaign.last_tenant_id,
+        "last_error": campaign.last_error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a notice to every tenant.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    start = commands.add_parser("start", help="create a campaign and send it")
+    start.add_argument("kind", choices=[kind.value for kind in NotificationKind])
+    start.add_argument("--subject", required=True)
+    start.add_argument("--paragraph", dest="paragraphs", action="append", required=True)
+    start.add_argument("--detail", dest="details", action="append", default=[])
+    start.add_argument("--action-url")
+    start.add_argument("--action-label")
+    start.add_argument("--include-inactive", action="store_true")
+    start.add_argument("--batch-size", type=int, default=NOTIFY_BATCH_SIZE)
+    for name, help_text in (("resume", "continue a failed or interrupted campaign"), ("status", "show progress")):
+        commands.add_parser(name, help=help_text).add_argument("campaign_id", type=UUID)
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    async def run():
+        try:
+            campaign_id = getattr(args, "campaign_id", None)
+            if args.command == "start":
+                content = {"paragraphs": args.paragraphs, "details": args.details}
+                if args.action_url:
+                    content.update(action_url=args.action_url, action_label=args.action_label)
+                async with AsyncSessionLocal() as db:
+                    campaign = await start_campaign(
+                        db, NotificationKind(args.kind), args.subject, content, args.include_inactive, args.batch_size,
+                    )
+                    campaign_id = campaign.id
+            if args.command != "status":
+                print(await NotificationDispatcher().run(AsyncSessionLocal, campaign_id))
+            async with AsyncSessionLocal() as db:
+                campaign = await db.get(NotificationCampaign, campaign_id)
+            if campaign is None:
+                raise NotificationDispatchError(f"Notification campaign not found: {campaign_id}")
+            return campaign_summary(campaign)
+        finally:
+            await mail_transport.aclose()
+
+    print(json.dumps(asyncio.run(run()), default=_json_default, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Order line items.
+
+``Order.items`` is the JSON snapshot of a cart (plan, apps, app features,
+coupon). ``order_line_items`` holds the same purchase as one typed row per
+item, written in the order's own transaction, so revenue by app or
+"tenants with feature X as an add-on" are plain indexed queries, and the
+invoice and confirmation email read their lines from it.
+
+Orders placed before the table existed are converted by the backfill, in
+batches of orders that have no line items yet::
+
+    python -m app.services.order_line_items backfill [--batch-size N]
+"""
+import argparse
+import asyncio
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logger import create_logger
+from app.models.orders import LineItemKind, Order, OrderLineItem
+
+logger = create_logger("order_line_items")
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _money(value) -> Decimal:
+    try:
+        return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return Decimal("0.00")
+
+
+def _uuid(value) -> Optional[UUID]:
+    try:
+        return UUID(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def line_items_from_snapshot(order: Order) -> List[dict]:
+    """
+    Line item rows (column dicts) for an order's ``items`` snapshot. Older
+    snapshots missing ids or prices still convert; the gaps stay NULL / 0.
+    """
+    items = order.items or {}
+    currency = order.currency or "INR"
+    rows = []
+
+    def add(kind: LineItemKind, name: str, price, **columns):
+        unit_price = _money(price)
+        rows.append({
+            "order_id": order.id, "order_created_at": order.created_at, "tenant_id": order.tenant_id,
+            "position": len(rows), "kind": kind, "name": name[:255], "quantity": 1,
+            "unit_price": unit_price, "amount": unit_price, "currency": currency, **columns,
+        })
+
+    plan_code = items.get("plan_code")
+    if plan_code:
+        add(LineItemKind.plan, f"Plan: {plan_code}", items.get("plan_price"), plan_code=plan_code)
+    for app in items.get("apps") or []:
+        app_id = _uuid(app.get("app_id"))
+        add(LineItemKind.app, app.get("name") or "Unknown App", app.get("base_price"), app_id=app_id)
+        for feature in app.get("features") or []:
+            add(
+                LineItemKind.feature, feature.get("code") or "Feature", feature.get("price"),
+                app_id=app_id, feature_id=_uuid(feature.get("feature_id")), code=feature.get("code"),
+                is_base=bool(feature.get("is_base")),
+            )
+    coupon = items.get("coupon") or {}
+    discount = _money(order.discount_amount)
+    if coupon.get("code") and discount > 0:
+        add(LineItemKind.coupon, f"Coupon: {coupon['code']}", -discount, code=coupon["code"])
+    return rows
+
+
+async def write_line_items(db: AsyncSession, orders: Iterable[Order]) -> int:
+    """Insert the line items of flushed orders in the caller's transaction."""
+    rows = [row for order in orders for row in line_items_from_snapshot(order)]
+    if rows:
+        await db.execute(insert(OrderLineItem), rows)
+    return len(rows)
+
+
+async def load_line_items(db: AsyncSession, order_ids: Iterable[UUID]) -> Dict[UUID, List[OrderLineItem]]:
+    """Line items per order, in cart order."""
+    order_ids = list(order_ids)
+    grouped: Dict[UUID, List[OrderLineItem]] = {order_id: [] for order_id in order_ids}
+    if not order_ids:
+        return grouped
+    result = await db.execute(
+        select(OrderLineItem)
+        .where(OrderLineItem.order_id.in_(order_ids))
+        .order_by(OrderLineItem.order_id, OrderLineItem.position)
+    )
+    for item in result.scalars():
+        grouped[item.order_id].append(item)
+    return grouped
+
+
+async def order_line_items(db: AsyncSession, order: Order) -> List[OrderLineItem]:
+    """An order's line items, writing them first for an order placed before the table existed."""
+    items = (await load_line_items(db, [order.id]))[order.id]
+    if not items and order.items:
+        await write_line_items(db, [order])
+        items = (await load_line_items(db, [order.id]))[order.id]
+    return items
+
+
+def invoice_lines(items: Iterable[OrderLineItem]) -> List[dict]:
+    """Invoice / email lines ``{"name", "price"}``. The coupon is shown as the discount total instead."""
+    lines = []
+    for item in items:
+        if item.kind == LineItemKind.coupon:
+            continue
+        if item.kind == LineItemKind.app:
+            name = f"App: {item.name}"
+        elif item.kind == LineItemKind.feature:
+            name = f"  - {'Addon' if item.unit_price > 0 else 'Included'}: {item.code or item.name}"
+        else:
+            name = item.name
+        lines.append({"name": name, "price": float(item.amount)})
+    return lines
+
+
+async def backfill_line_items(session_factory, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Convert every order with a snapshot but no line items, ``batch_size`` orders per transaction."""
+    converted = 0
+    started = time.perf_counter()
+    after = None
+    while True:
+        async with session_factory() as db:
+            query = (
+                select(Order)
+                .where(Order.items.is_not(None), ~exists().where(OrderLineItem.order_id == Order.id))
+                .order_by(Order.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                query = query.where(Order.id > after)
+            orders = (await db.execute(query)).scalars().all()
+            if not orders:
+                break
+            rows = await write_line_items(db, orders)
+            await db.commit()
+        after = orders[-1].id
+        converted += len(orders)
+        logger.info(
+            f"Line item backfill: {converted} orders converted ({rows} rows in this batch, "
+            f"{converted / max(time.perf_counter() - started, 1e-9):.0f} orders/s)"
+        )
+        if len(orders) < batch_size:
+            break
+    return converted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize Order.items into order_line_items.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="convert historical orders")
+    backfill.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    converted = asyncio.run(backfill_line_items(AsyncSessionLocal, args.batch_size))
+    print(f"{converted} orders converted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Payment gateway client.
+
+``PaymentGateway`` is the interface the routes use; ``RazorpayGateway``
+implements it on one shared ``httpx.AsyncClient``, so requests reuse
+keep-alive connections instead of opening a session per call. Every call has
+timeouts and passes through a circuit breaker. After
+PAYMENT_GATEWAY_BREAKER_THRESHOLD consecutive failures, calls fail fast for
+PAYMENT_GATEWAY_BREAKER_RESET_SECONDS, then one trial call is let through.
+
+Retries use exponential backoff with full jitter. Reads are retried on
+timeouts, connection errors, 429 and 5xx. Writes (order creation) are only
+retried when the request never reached Razorpay (connect errors), so a
+retry cannot create a second order.
+
+Latency is recorded per operation in ``payment_gateway.metrics``. For tests
+and load runs, point PAYMENT_GATEWAY_BASE_URL at ``app.services.fake_gateway``.
+"""
+import asyncio
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import httpx
+
+from app.config import (
+    PAYMENT_GATEWAY_BASE_URL,
+    PAYMENT_GATEWAY_BREAKER_RESET_SECONDS,
+    PAYMENT_GATEWAY_BREAKER_THRESHOLD,
+    PAYMENT_GATEWAY_CONNECT_TIMEOUT_SECONDS,
+    PAYMENT_GATEWAY_MAX_CONNECTIONS,
+    PAYMENT_GATEWAY_MAX_RETRIES,
+    PAYMENT_GATEWAY_TIMEOUT_SECONDS,
+)
+from app.core.logger import create_logger
+from app.core.metrics import LatencyMetrics
+
+logger = create_logger("payment_gateway")
+
+
+class GatewayError(Exception):
+    """The gateway call failed."""
+
+
+class GatewayUnavailable(GatewayError):
+    """Circuit open, or the gateway kept failing after retries."""
+
+
+class GatewayRejected(GatewayError):
+    """The gateway answered with a 4xx; retrying will not help."""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(f"Gateway rejected the request ({status_code}): {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = PAYMENT_GATEWAY_BREAKER_THRESHOLD,
+        reset_timeout: float = PAYMENT_GATEWAY_BREAKER_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+        self._trial_in_flight = False
+
+    def release(self):
+        """The call ended without a verdict (cancelled): let the next call be the trial."""
+        self._trial_in_flight = False
+
+
+class PaymentGateway(ABC):
+    @abstractmethod
+    async def create_order(self, amount: int, currency: str, receipt: str, notes: Optional[dict] = None) -> dict:
+        """Create a gateway order for ``amount`` in the smallest currency unit."""
+
+    @abstractmethod
+    async def fetch_order(self, order_id: str) -> dict:
+        ...
+
+    @abstractmethod
+    async def fetch_payment(self, payment_id: str) -> dict:
+        ...
+
+    async def aclose(self):
+        pass
+
+
+# Errors where the request provably never reached the gateway
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RazorpayGateway(PaymentGateway):
+    def __init__(
+        self,
+        key_id: Optional[str],
+        key_secret: Optional[str],
+        base_url: str = PAYMENT_GATEWAY_BASE_URL,
+        max_retries: int = PAYMENT_GATEWAY_MAX_RETRIES,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        metrics: Optional[LatencyMetrics] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or LatencyMetrics()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.key_id and self.key_secret)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(self.key_id or "", self.key_secret or ""),
+                timeout=httpx.Timeout(PAYMENT_GATEWAY_TIMEOUT_SECONDS, connect=PAYMENT_GATEWAY_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=PAYMENT_GATEWAY_MAX_CONNECTIONS,
+                    max_keepalive_connections=PAYMENT_GATEWAY_MAX_CONNECTIONS,
+                    keepalive_expiry=30,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def create_order(self, amount: int, currency: str, receipt: str, notes: Optional[dict] = None) -> dict:
+        body = {"amount": amount, "currency": currency, "receipt": receipt, "notes": notes or {}}
+        return await self._request("orders.create", "POST", "/orders", json=body, idempotent=False)
+
+    async def fetch_order(self, order_id: str) -> dict:
+        return await self._request("orders.fetch", "GET", f"/orders/{order_id}")
+
+    async def fetch_payment(self, payment_id: str) -> dict:
+        return await self._request("payments.fetch", "GET", f"/payments/{payment_id}")
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _request(self, operation: str, method: str, path: str, json: Optional[dict] = None, idempotent: bool = True) -> dict:
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise GatewayUnavailable(f"Payment gateway circuit is open ({operation})")
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, json=json)
+            except httpx.HTTPError as e:
+                self.metrics.observe(operation, time.perf_counter() - started, ok=False)
+                self.breaker.record_failure()
+                last_error = e
+                retryable = isinstance(e, _NOT_SENT) or (idempotent and isinstance(e, httpx.TransportError))
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled (e.g. the client disconnected): no verdict on the
+                # gateway, but a half-open trial must not stay taken
+                self.breaker.release()
+                raise
+            else:
+                ok = response.status_code < 400
+                self.metrics.observe(operation, time.perf_counter() - started, ok=ok)
+                if ok:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        self.breaker.record_failure()
+                        raise GatewayError(f"{operation} returned a body that is not JSON") from e
+                    self.breaker.record_success()
+                    return data
+                if response.status_code not in _RETRY_STATUS:
+                    # The gateway is healthy, the request is not
+                    self.breaker.record_success()
+                    raise GatewayRejected(response.status_code, _error_detail(response))
+                self.breaker.record_failure()
+                last_error = GatewayError(f"{operation} returned {response.status_code}")
+                retryable = idempotent
+            if not retryable or attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt)
+            logger.warning(f"{operation} failed ({last_error}), retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        raise GatewayUnavailable(f"{operation} failed: {last_error}") from last_error
+
+
+def _error_detail(response: httpx.Response):
+    try:
+        return response.json().get("error", {}).get("description") or response.text
+    except ValueError:
+        return response.text
+
+
+payment_gateway = RazorpayGateway(os.getenv("RAZORPAY_KEY_ID"), os.getenv("RAZORPAY_KEY_SECRET"))
@@ -0,0 +1,404 @@
+"""
+Bulk plan-version migrations.
+
+``update_plan`` publishes a new PlanVersion, but subscribers stay on the
+version they bought. A migration moves every live subscription on one
+version to another, a chunk of subscriptions per transaction:
+
+- cycles that started before the effective date end on it, and a new cycle
+  on the target version covers the rest of the term;
+- cycles starting on or after it are re-pointed in place;
+- with proration, the price difference for the remaining days is billed as
+  one pending billing row per cycle (negative for a downgrade: a credit);
+- a job refreshes the entitlements of the chunk's tenants.
+
+Each chunk is a handful of set-based statements, committed together with
+the checkpoint cursor on ``saas_plan_migrations``. An interrupted or failed
+run resumes after the last committed chunk. ``plan`` prints the diff and
+the proration totals without writing anything::
+
+    python -m app.services.plan_migration plan FROM_VERSION TO_VERSION [--effective-date YYYY-MM-DD]
+    python -m app.services.plan_migration start FROM_VERSION TO_VERSION [--effective-date ...] [--no-prorate] [--chunk-size N] [--throttle SECONDS]
+    python -m app.services.plan_migration resume MIGRATION_ID [--throttle SECONDS]
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import Date, Numeric, and_, distinct, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import PLAN_MIGRATION_CHUNK_SIZE, PLAN_MIGRATION_THROTTLE_SECONDS
+from app.core.logger import create_logger
+from app.core.response import _json_default
+from app.jobs import REFRESH_ENTITLEMENTS, enqueue
+from app.models.plan_migrations import PlanMigration, PlanMigrationStatus
+from app.models.plans import PlanVersion
+from app.models.subscriptions import PaymentStatus, Subscription, SubscriptionBilling, SubscriptionCycle, SubscriptionStatus
+from app.services.pricing import TAX_RATE
+
+logger = create_logger("plan_migration")
+
+LIVE_STATUSES = (SubscriptionStatus.active, SubscriptionStatus.grace)
+LIMITS = ("max_users", "max_branches", "storage_limit_gb")
+ZERO = Decimal("0.00")
+
+
+class PlanMigrationError(ValueError):
+    """The migration cannot run as asked (unknown or incompatible versions)."""
+
+
+@dataclass
+class ChunkResult:
+    subscription_ids: List[UUID] = field(default_factory=list)
+    tenant_ids: Set[int] = field(default_factory=set)
+    cycles: int = 0
+    proration_total: Decimal = ZERO
+
+
+async def load_versions(db: AsyncSession, from_version_id: UUID, to_version_id: UUID) -> Tuple[PlanVersion, PlanVersion]:
+    result = await db.execute(
+        select(PlanVersion)
+        .options(selectinload(PlanVersion.plan), selectinload(PlanVersion.features))
+        .where(PlanVersion.id.in_([from_version_id, to_version_id]))
+    )
+    versions = {version.id: version for version in result.scalars().all()}
+    for version_id in (from_version_id, to_version_id):
+        if version_id not in versions:
+            raise PlanMigrationError(f"Plan version not found: {version_id}")
+    return versions[from_version_id], versions[to_version_id]
+
+
+def check_compatible(source: PlanVersion, target: PlanVersion, prorate: bool = True):
+    if source.id == target.id:
+        raise PlanMigrationError("Source and target plan versions are the same")
+    # Cycles keep their end date, so the term length must not change
+    if source.billing_cycle != target.billing_cycle:
+        raise PlanMigrationError(f"Cannot move {source.billing_cycle.value} cycles to a {target.billing_cycle.value} plan")
+    if prorate and source.currency != target.currency:
+        raise PlanMigrationError(f"Cannot prorate {source.currency.value} cycles into {target.currency.value}")
+
+
+def version_diff(source: PlanVersion, target: PlanVersion) -> dict:
+    """What changes for a subscriber moved from ``source`` to ``target``."""
+    source_features = {feature.code for feature in source.features}
+    target_features = {feature.code for feature in target.features}
+
+    def describe(version):
+        return {
+            "version_id": version.id, "plan_code": version.plan.plan_code, "version": version.version,
+            "price": version.price, "currency": version.currency.value,
+        }
+
+    return {
+        "from": describe(source),
+        "to": describe(target),
+        "price_delta": target.price - source.price,
+        "features_added": sorted(target_features - source_features),
+        "features_removed": sorted(source_features - target_features),
+        "limits": {
+            name: {"from": getattr(source, name), "to": getattr(target, name)}
+            for name in LIMITS
+            if getattr(source, name) != getattr(target, name)
+        },
+    }
+
+
+def proration_amount(source: PlanVersion, target: PlanVersion, effective_date: date):
+    """SQL: the price difference for the part of each cycle left after ``effective_date``."""
+    term = func.greatest(SubscriptionCycle.end_date - SubscriptionCycle.start_date, 1)
+    remaining = func.least(func.greatest(SubscriptionCycle.end_date - literal(effective_date, Date), 0), term)
+    delta = literal(target.price - source.price, Numeric(10, 2))
+    return func.round(delta * remaining / term, 2)
+
+
+def _live_cycles(source: PlanVersion, effective_date: date):
+    return and_(
+        SubscriptionCycle.plan_version_id == source.id,
+        SubscriptionCycle.status.in_(LIVE_STATUSES),
+        SubscriptionCycle.end_date > effective_date,
+        Subscription.status.in_(LIVE_STATUSES),
+    )
+
+
+async def plan_migration_diff(
+    db: AsyncSession, source: PlanVersion, target: PlanVersion, effective_date: date, sample_size: int = 10,
+) -> dict:
+    """Dry run: the version diff plus who would move and what they would be billed."""
+    amount = proration_amount(source, target, effective_date)
+    live = _live_cycles(source, effective_date)
+    totals = (await db.execute(
+        select(
+            func.count(distinct(SubscriptionCycle.subscription_id)).label("subscriptions"),
+            func.count().label("cycles"),
+            func.count(distinct(Subscription.tenant_id)).label("tenants"),
+            func.coalesce(func.sum(amount).filter(amount > 0), 0).label("charges"),
+            func.coalesce(func.sum(amount).filter(amount < 0), 0).label("credits"),
+        )
+        .select_from(SubscriptionCycle)
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .where(live)
+    )).one()
+    sample = (await db.execute(
+        select(
+            Subscription.tenant_id, SubscriptionCycle.subscription_id, SubscriptionCycle.start_date,
+            SubscriptionCycle.end_date, amount.label("proration"),
+        )
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .where(live)
+        .order_by(SubscriptionCycle.subscription_id)
+        .limit(sample_size)
+    )).all()
+    return {
+        **version_diff(source, target),
+        "effective_date": effective_date,
+        **totals._asdict(),
+        "sample": [row._asdict() for row in sample],
+    }
+
+
+async def migrate_chunk(
+    db: AsyncSession,
+    source: PlanVersion,
+    target: PlanVersion,
+    effective_date: date,
+    reference: str,
+    after: Optional[UUID] = None,
+    limit: int = PLAN_MIGRATION_CHUNK_SIZE,
+    prorate: bool = True,
+    subscription_id: Optional[UUID] = None,
+) -> ChunkResult:
+    """
+    Move the next ``limit`` subscriptions (by id, after ``after``) from
+    ``source`` to ``target``. Does not commit: the caller commits the chunk
+    together with its checkpoint. ``reference`` tags the billing rows.
+    """
+    live = _live_cycles(source, effective_date)
+    chunk = (
+        select(SubscriptionCycle.subscription_id)
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .where(live)
+        .group_by(SubscriptionCycle.subscription_id)
+        .order_by(SubscriptionCycle.subscription_id)
+        .limit(limit)
+    )
+    if after is not None:
+        chunk = chunk.where(SubscriptionCycle.subscription_id > after)
+    if subscription_id is not None:
+        chunk = chunk.where(SubscriptionCycle.subscription_id == subscription_id)
+
+    amount = proration_amount(source, target, effective_date)
+    # Locks the cycles; one changed meanwhile is re-checked against ``live``
+    rows = (await db.execute(
+        select(SubscriptionCycle.id, SubscriptionCycle.subscription_id, Subscription.tenant_id, amount.label("proration"))
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .where(live, SubscriptionCycle.subscription_id.in_(chunk.scalar_subquery()))
+        .order_by(SubscriptionCycle.subscription_id)
+        .with_for_update(of=SubscriptionCycle)
+    )).all()
+    if not rows:
+        return ChunkResult()
+
+    result = ChunkResult(
+        subscription_ids=list(dict.fromkeys(row.subscription_id for row in rows)),
+        tenant_ids={row.tenant_id for row in rows},
+        cycles=len(rows),
+    )
+    in_chunk = SubscriptionCycle.id.in_([row.id for row in rows])
+    started = SubscriptionCycle.start_date < effective_date
+    plan_code = target.plan.plan_code
+
+    if prorate:
+        result.proration_total = sum((row.proration for row in rows), ZERO)
+        charges = select(SubscriptionCycle.subscription_id, amount.label("amount")).where(in_chunk).subquery("charges")
+        tax = func.round(charges.c.amount * literal(Decimal(str(TAX_RATE)), Numeric(4, 2)), 2)
+        await db.execute(
+            insert(SubscriptionBilling).from_select(
+                ["id", "subscription_id", "base_amount", "discount_amount", "tax_amount", "total_amount",
+                 "currency", "billing_date", "payment_status", "payment_reference"],
+                select(
+                    func.gen_random_uuid(), charges.c.subscription_id, charges.c.amount, literal(ZERO), tax,
+                    charges.c.amount + tax,
+                    literal(target.currency, SubscriptionBilling.currency.type), literal(effective_date, Date),
+                    literal(PaymentStatus.pending, SubscriptionBilling.payment_status.type), literal(reference),
+                ).where(charges.c.amount != 0),
+            )
+        )
+
+    # The rest of a running term goes on the target version; reads end_date before it is cut below
+    await db.execute(
+        insert(SubscriptionCycle).from_select(
+            ["id", "subscription_id", "plan_version_id", "plan_code", "start_date", "end_date", "status"],
+            select(
+                func.gen_random_uuid(), SubscriptionCycle.subscription_id, literal(target.id, SubscriptionCycle.plan_version_id.type),
+                literal(plan_code), literal(effective_date, Date), SubscriptionCycle.end_date, SubscriptionCycle.status,
+            ).where(in_chunk, started),
+        )
+    )
+    await db.execute(
+        update(SubscriptionCycle)
+        .where(in_chunk, started)
+        .values(end_date=effective_date, status=SubscriptionStatus.cancelled)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(SubscriptionCycle)
+        .where(in_chunk, ~started)
+        .values(plan_version_id=target.id, plan_code=plan_code)
+        .execution_options(synchronize_session=False)
+    )
+
+    await enqueue(
+        db, REFRESH_ENTITLEMENTS,
+        {"tenant_ids": sorted(result.tenant_ids), "plan_version_id": str(target.id)},
+        idempotency_key=f"{reference}:entitlements:{result.subscription_ids[-1]}",
+    )
+    return result
+
+
+async def start_migration(
+    db: AsyncSession,
+    from_version_id: UUID,
+    to_version_id: UUID,
+    effective_date: Optional[date] = None,
+    prorate: bool = True,
+    chunk_size: int = PLAN_MIGRATION_CHUNK_SIZE,
+) -> PlanMigration:
+    source, target = await load_versions(db, from_version_id, to_version_id)
+    check_compatible(source, target, prorate)
+    migration = PlanMigration(
+        from_version_id=source.id, to_version_id=target.id, effective_date=effective_date or date.today(),
+        prorate=prorate, chunk_size=chunk_size, status=PlanMigrationStatus.running,
+    )
+    db.add(migration)
+    await db.commit()
+    return migration
+
+
+async def run_migration(
+    session_factory,
+    migration_id: UUID,
+    throttle_seconds: float = PLAN_MIGRATION_THROTTLE_SECONDS,
+    sleep: Callable[[float], Awaitable] = asyncio.sleep,
+) -> PlanMigration:
+    """
+    Run (or resume) a migration chunk by chunk until no live cycle is left
+    on the source version, sleeping ``throttle_seconds`` between chunks.
+    """
+    async with session_factory() as db:
+        migration = await db.get(PlanMigration, migration_id)
+        if migration is None:
+            raise PlanMigrationError(f"Plan migration not found: {migration_id}")
+        source, target = await load_versions(db, migration.from_version_id, migration.to_version_id)
+
+    reference = f"plan-migration:{migration_id}"
+    started_at = time.monotonic()
+    while True:
+        async with session_factory() as db:
+            # Row lock: a second runner of the same migration waits, then sees the new cursor
+            migration = (await db.execute(
+                select(PlanMigration).where(PlanMigration.id == migration_id).with_for_update()
+            )).scalars().one()
+            if migration.status == PlanMigrationStatus.completed:
+                await db.commit()
+                return migration
+            try:
+                chunk = await migrate_chunk(
+                    db, source, target, migration.effective_date, reference,
+                    after=migration.last_subscription_id, limit=migration.chunk_size, prorate=migration.prorate,
+                )
+            except Exception as e:
+                await db.rollback()
+                await _mark_failed(db, migration_id, f"{type(e).__name__}: {e}")
+                logger.exception(f"Plan migration {migration_id} failed after {migration.last_subscription_id}")
+                raise
+
+            migration.status = PlanMigrationStatus.running
+            migration.last_error = None
+            if chunk.subscription_ids:
+                migration.last_subscription_id = chunk.subscription_ids[-1]
+                migration.subscriptions_migrated += len(chunk.subscription_ids)
+                migration.proration_total += chunk.proration_total
+            else:
+                migration.status = PlanMigrationStatus.completed
+                migration.finished_at = datetime.now(timezone.utc)
+            await db.commit()
+
+        elapsed = time.monotonic() - started_at
+        logger.info(
+            f"Plan migration {migration_id}: {migration.subscriptions_migrated} subscriptions moved "
+            f"({len(chunk.subscription_ids)} in this chunk, {migration.subscriptions_migrated / max(elapsed, 1e-9):.0f}/s)"
+        )
+        if not chunk.subscription_ids:
+            return migration
+        await sleep(throttle_seconds)
+
+
+async def _mark_failed(db: AsyncSession, migration_id: UUID, error: str):
+    await db.execute(
+        update(PlanMigration)
+        .where(PlanMigration.id == migration_id)
+        .values(status=PlanMigrationStatus.failed, last_error=error[-4000:])
+    )
+    await db.commit()
+
+
+def migration_summary(migration: PlanMigration) -> dict:
+    return {
+        "id": migration.id,
+        "status": migration.status.value,
+        "from_version_id": migration.from_version_id,
+        "to_version_id": migration.to_version_id,
+        "effective_date": migration.effective_date,
+        "subscriptions_migrated": migration.subscriptions_migrated,
+        "proration_total": migration.proration_total,
+        "last_subscription_id": migration.last_subscription_id,
+        "last_error": migration.last_error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move subscribers between plan versions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("plan", "show the diff without writing"), ("start", "start a migration")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("from_version", type=UUID)
+        command.add_argument("to_version", type=UUID)
+        command.add_argument("--effective-date", type=date.fromisoformat, default=None)
+    commands.choices["start"].add_argument("--no-prorate", dest="prorate", action="store_false")
+    commands.choices["start"].add_argument("--chunk-size", type=int, default=PLAN_MIGRATION_CHUNK_SIZE)
+    resume = commands.add_parser("resume", help="continue a failed or interrupted migration")
+    resume.add_argument("migration_id", type=UUID)
+    for name in ("start", "resume"):
+        commands.choices[name].add_argument("--throttle", type=float, default=PLAN_MIGRATION_THROTTLE_SECONDS)
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    async def run():
+        if args.command == "plan":
+            async with AsyncSessionLocal() as db:
+                source, target = await load_versions(db, args.from_version, args.to_version)
+                check_compatible(source, target)
+                return await plan_migration_diff(db, source, target, args.effective_date or date.today())
+        migration_id = args.migration_id if args.command == "resume" else None
+        if migration_id is None:
+            async with AsyncSessionLocal() as db:
+                migration = await start_migration(
+                    db, args.from_version, args.to_version, args.effective_date, args.prorate, args.chunk_size,
+                )
+                migration_id = migration.id
+        return migration_summary(await run_migration(AsyncSessionLocal, migration_id, args.throttle))
+
+    print(json.dumps(asyncio.run(run()), default=_json_default, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Pricing catalog and quote engine.
+
+``load_catalog`` reads plans, app pricing, features and coupon rules in four
+flat queries. It freezes them into read-only indexes: (plan_code, currency,
+country, billing cycle) -> current version, app id -> prices per (currency,
+country), and (app id, feature code) -> features. ``CatalogSnapshot.quote``
+then prices a cart in memory with no queries, with the plan and app prices
+of the same region.
+
+``pricing_catalog`` holds the current snapshot for this process. Catalog
+writes bump the catalog version (app/services/catalog_cache.py). That
+invalidates the snapshot on every worker, and the next request reloads.
+Snapshots also expire after PRICING_CATALOG_TTL_SECONDS, as a backstop.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import PRICING_CATALOG_TTL_SECONDS
+from app.models.apps import App, AppPricing
+from app.models.features import Feature
+from app.models.plans import BillingCycleEnum, CountryEnum, CurrencyEnum, Plan, PlanVersion
+
+TAX_RATE = 0.18
+
+# Coupon code -> discount rate on the subtotal
+COUPON_RULES = MappingProxyType({
+    "WELCOME100": 1.0,
+    "WELCOME10": 0.1,
+    "SAAS20": 0.2,
+    "LAUNCH50": 0.5,
+})
+
+# Plans that may be sold without a configured version
+FREE_PLAN_CODES = frozenset({"FREE_TRIAL"})
+
+
+class QuoteError(ValueError):
+    """The cart refers to something the catalog does not sell."""
+
+
+@dataclass(frozen=True)
+class PlanPrice:
+    plan_code: str
+    version_id: UUID
+    price: float
+    currency: str = CurrencyEnum.INR.value
+    country: str = CountryEnum.IN.value
+    billing_cycle: str = BillingCycleEnum.monthly.value
+
+    @property
+    def key(self) -> Tuple[str, str, str, str]:
+        return (self.plan_code, self.currency, self.country, self.billing_cycle)
+
+
+@dataclass(frozen=True)
+class FeaturePrice:
+    id: UUID
+    code: str
+    is_base: bool
+    addon_price: float
+
+    @property
+    def price(self) -> float:
+        return 0.0 if self.is_base else self.addon_price
+
+
+@dataclass(frozen=True)
+class AppPrice:
+    id: UUID
+    name: str
+    # (currency, country) -> base price
+    prices: Mapping[Tuple[str, str], float]
+    # feature code -> features (codes are not unique-constrained per app)
+    features: Mapping[str, Tuple[FeaturePrice, ...]]
+
+
+@dataclass(frozen=True)
+class Quote:
+    plan_code: str
+    plan_price: float
+    apps: Tuple[dict, ...]
+    apps_price: float
+    subtotal: float
+    coupon_code: Optional[str]
+    discount_rate: float
+    discount_amount: float
+    taxable_amount: float
+    tax_rate: float
+    tax: float
+    grand_total: float
+    currency: str
+
+    def to_dict(self) -> dict:
+        coupon = None
+        if self.coupon_code:
+            coupon = {"code": self.coupon_code, "percentage": self.discount_rate, "valid": self.discount_rate > 0}
+        return {
+            "plan_code": self.plan_code,
+            "plan_price": self.plan_price,
+            "apps": list(self.apps),
+            "apps_price": self.apps_price,
+            "subtotal": self.subtotal,
+            "coupon": coupon,
+            "discount_amount": self.discount_amount,
+            "taxable_amount": self.taxable_amount,
+            "tax_rate": self.tax_rate,
+            "tax": self.tax,
+            "grand_total": self.grand_total,
+            "currency": self.currency,
+        }
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    # (plan_code, currency, country, billing cycle) -> price
+    plans: Mapping[Tuple[str, str, str, str], PlanPrice]
+    apps: Mapping[UUID, AppPrice]
+    coupons: Mapping[str, float] = field(default_factory=lambda: COUPON_RULES)
+    tax_rate: float = TAX_RATE
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def quote(
+        self,
+        plan_code: str,
+        app_ids: Iterable[UUID] = (),
+        features: Optional[Mapping[UUID, List[str]]] = None,
+        coupon_code: Optional[str] = None,
+        currency: str = CurrencyEnum.INR.value,
+        country: str = CountryEnum.IN.value,
+        billing_cycle: str = BillingCycleEnum.monthly.value,
+    ) -> Quote:
+        plan = self.plans.get((plan_code, currency, country, billing_cycle))
+        if plan is not None:
+            plan_price = plan.price
+        elif plan_code in FREE_PLAN_CODES:
+            plan_price = 0.0
+        else:
+            raise QuoteError(f"Plan not found: {plan_code} ({currency}, {country}, {billing_cycle})")
+
+        features = features or {}
+        apps_price = 0.0
+        apps_details = []
+        for app_id in dict.fromkeys(app_ids):
+            app = self.apps.get(app_id)
+            base_price = app.prices.get((currency, country)) if app else None
+            if base_price is None:
+                # Not sold in this region: left out of the cart, as before
+                continue
+            app_snapshot = {"app_id": str(app.id), "name": app.name, "base_price": base_price, "features": []}
+            addon_price_sum = 0.0
+            for code in dict.fromkeys(features.get(app_id, ())):
+                for feature in app.features.get(code, ()):
+                    addon_price_sum += feature.price
+                    app_snapshot["features"].append({
+                        "feature_id": str(feature.id),
+                        "code": feature.code,
+                        "price": feature.price,
+                        "is_base": feature.is_base,
+                    })
+            app_snapshot["total_price"] = base_price + addon_price_sum
+            apps_price += app_snapshot["total_price"]
+            apps_details.append(app_snapshot)
+
+        subtotal = plan_price + apps_price
+        discount_rate = self.coupons.get(coupon_code.upper(), 0.0) if coupon_code else 0.0
+        discount_amount = subtotal * discount_rate
+        taxable_amount = subtotal - discount_amount
+        tax = taxable_amount * self.tax_rate
+        return Quote(
+            plan_code=plan_code,
+            plan_price=plan_price,
+            apps=tuple(apps_details),
+            apps_price=apps_price,
+            subtotal=subtotal,
+            coupon_code=coupon_code,
+            discount_rate=discount_rate,
+            discount_amount=discount_amount,
+            taxable_amount=taxable_amount,
+            tax_rate=self.tax_rate,
+            tax=tax,
+            grand_total=taxable_amount + tax,
+            currency=currency,
+        )
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+async def load_catalog(db: AsyncSession) -> CatalogSnapshot:
+    plans: Dict[Tuple[str, str, str, str], PlanPrice] = {}
+    versions = await db.execute(
+        select(
+            Plan.plan_code, PlanVersion.id, PlanVersion.price,
+            PlanVersion.currency, PlanVersion.country, PlanVersion.billing_cycle,
+        )
+        .join(Plan, Plan.id == PlanVersion.plan_id)
+        .order_by(PlanVersion.is_current.asc().nulls_first(), PlanVersion.created_at.asc().nulls_first())
+    )
+    for plan_code, version_id, price, currency, country, billing_cycle in versions:
+        # Ascending order: per region and cycle, the newest current version is written last
+        plan = PlanPrice(
+            plan_code, version_id, float(price),
+            _enum_value(currency), _enum_value(country), _enum_value(billing_cycle),
+        )
+        plans[plan.key] = plan
+
+    prices: Dict[UUID, Dict[Tuple[str, str], float]] = {}
+    for app_id, currency, country, price in await db.execute(
+        select(AppPricing.app_id, AppPricing.currency, AppPricing.country, AppPricing.price)
+    ):
+        prices.setdefault(app_id, {})[(_enum_value(currency), _enum_value(country))] = float(price)
+
+    app_features: Dict[UUID, Dict[str, Tuple[FeaturePrice, ...]]] = {}
+    for feature_id, app_id, code, is_base, addon_price in await db.execute(
+        select(Feature.id, Feature.app_id, Feature.code, Feature.is_base_feature, Feature.addon_price)
+    ):
+        by_code = app_features.setdefault(app_id, {})
+        by_code[code] = by_code.get(code, ()) + (FeaturePrice(feature_id, code, bool(is_base), float(addon_price or 0)),)
+
+    apps = {
+        app_id: AppPrice(
+            app_id,
+            name,
+            MappingProxyType(prices.get(app_id, {})),
+            MappingProxyType(app_features.get(app_id, {})),
+        )
+        for app_id, name in await db.execute(select(App.id, App.name))
+    }
+    return CatalogSnapshot(plans=MappingProxyType(plans), apps=MappingProxyType(apps))
+
+
+class PricingCatalog:
+    def __init__(
+        self,
+        ttl: float = PRICING_CATALOG_TTL_SECONDS,
+        loader: Callable[[AsyncSession], "asyncio.Future"] = load_catalog,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self._loader = loader
+        self._clock = clock
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and self._clock() - self._loaded_at < self.ttl
+
+    async def get(self, db: AsyncSession) -> CatalogSnapshot:
+        if self._fresh():
+            return self._snapshot
+        async with self._lock:
+            # Another request may have reloaded while we waited
+            if not self._fresh():
+                generation = self._generation
+                snapshot = await self._loader(db)
+                # An invalidation during the load means the snapshot may be old already
+                if generation == self._generation:
+                    self._snapshot, self._loaded_at = snapshot, self._clock()
+                else:
+                    return snapshot
+        return self._snapshot
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+
+
+pricing_catalog = PricingCatalog()
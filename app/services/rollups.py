@@ -0,0 +1,582 @@
+"""
+Revenue and subscription rollups.
+
+Finance reports (app/routers/reports.py) read only the daily rollup tables
+in app/models/rollups.py, never the transactional ones:
+
+- revenue: paid billings by plan and in total, completed orders by app
+- mrr: subscriptions whose cycle covers the day, monthly-normalised price
+- tenants: new (first cycle starts) and churned (last cycle of an expired
+  or cancelled subscription ends) tenants per plan
+- payments: transaction attempts, successes and failures per provider
+
+A rollup row is always recomputed whole for its day (DELETE + INSERT ...
+SELECT over a day range), so refreshing a day twice is harmless. The
+incremental refresh keeps a high-water mark per rollup: it finds the day
+range touched by source rows changed since the mark (minus
+ROLLUP_WATERMARK_LAG_SECONDS, for transactions still in flight when the
+mark was taken), recomputes those days and moves the mark to the database
+clock. Changes older than ROLLUP_MAX_LOOKBACK_DAYS are left to a rebuild.
+
+Revenue and payments read orders, billings and transactions, whose old
+monthly partitions are archived (app/db/partitioning.py). A rebuild keeps
+their rows for archived months and starts after the newest one::
+
+    python -m app.services.rollups refresh [--once] [--interval SECONDS]
+    python -m app.services.rollups rebuild [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--only NAME]
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Date, String, and_, case, cast, delete, distinct, func, insert, literal, literal_column, or_, select, union_all, update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import (
+    ROLLUP_INTERVAL_SECONDS, ROLLUP_MAX_LOOKBACK_DAYS, ROLLUP_REBUILD_CHUNK_DAYS, ROLLUP_WATERMARK_LAG_SECONDS,
+)
+from app.core.logger import create_logger
+from app.db.partitioning import archived_through
+from app.models.orders import LineItemKind, Order, OrderLineItem, OrderStatus
+from app.models.plans import BillingCycleEnum, PlanVersion
+from app.models.rollups import MrrDaily, PaymentsDaily, RevenueDaily, RollupWatermark, TenantsDaily
+from app.models.subscriptions import PaymentStatus, Subscription, SubscriptionBilling, SubscriptionCycle, SubscriptionStatus
+from app.models.transactions import Transaction, TransactionStatus
+
+logger = create_logger("rollups")
+
+REVENUE_DIMENSIONS = ("plan", "app", "total")
+UNKNOWN = "unknown"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+CHURNED_STATUSES = (SubscriptionStatus.expired, SubscriptionStatus.cancelled)
+
+
+class RollupError(ValueError):
+    pass
+
+
+def _utc_day(column):
+    """The UTC calendar day of a timestamptz column."""
+    return cast(func.timezone("UTC", column), Date)
+
+
+def _utc_bounds(lo: date, hi: date) -> Tuple[datetime, datetime]:
+    """Half-open timestamptz range covering the days ``lo``..``hi``; lets Postgres prune partitions."""
+    return (
+        datetime.combine(lo, dt_time.min, tzinfo=timezone.utc),
+        datetime.combine(hi + timedelta(days=1), dt_time.min, tzinfo=timezone.utc),
+    )
+
+
+def _changed(model, since: datetime):
+    """Rows inserted or updated since ``since`` (updated_at is NULL until the first update)."""
+    return or_(model.updated_at >= since, model.created_at >= since)
+
+
+# -- Rollup rows for a day range ----------------------------------------------
+
+def _billing_plan_code():
+    """The plan of the cycle a billing falls in."""
+    return (
+        select(SubscriptionCycle.plan_code)
+        .where(
+            SubscriptionCycle.subscription_id == SubscriptionBilling.subscription_id,
+            SubscriptionCycle.start_date <= SubscriptionBilling.billing_date,
+        )
+        .order_by(SubscriptionCycle.start_date.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def revenue_rows(lo: date, hi: date):
+    """
+    Revenue for days ``lo``..``hi``: paid billings net of discount, before
+    tax, by plan and in total; completed orders' app and app-feature line
+    items (list price, before the order's coupon) by app.
+    """
+    billings = (
+        select(
+            SubscriptionBilling.billing_date.label("day"),
+            func.coalesce(_billing_plan_code(), UNKNOWN).label("plan_code"),
+            cast(SubscriptionBilling.currency, String(3)).label("currency"),
+            (SubscriptionBilling.base_amount - func.coalesce(SubscriptionBilling.discount_amount, 0)).label("amount"),
+        )
+        .where(SubscriptionBilling.payment_status == PaymentStatus.paid, SubscriptionBilling.billing_date.between(lo, hi))
+        .cte("billings")
+    )
+    start, end = _utc_bounds(lo, hi)
+    apps = (
+        select(
+            _utc_day(OrderLineItem.order_created_at).label("day"),
+            func.coalesce(cast(OrderLineItem.app_id, String), UNKNOWN).label("app_id"),
+            OrderLineItem.currency,
+            OrderLineItem.order_id,
+            OrderLineItem.amount,
+        )
+        .join(Order, and_(Order.id == OrderLineItem.order_id, Order.created_at == OrderLineItem.order_created_at))
+        .where(
+            Order.status == OrderStatus.COMPLETED,
+            OrderLineItem.kind.in_((LineItemKind.app, LineItemKind.feature)),
+            OrderLineItem.order_created_at >= start,
+            OrderLineItem.order_created_at < end,
+        )
+        .subquery("apps")
+    )
+    by_plan = select(
+        billings.c.day, literal("plan").label("dimension"), billings.c.plan_code.label("key"), billings.c.currency,
+        func.count().label("count"), func.sum(billings.c.amount).label("amount"),
+    ).group_by(billings.c.day, billings.c.plan_code, billings.c.currency)
+    total = select(
+        billings.c.day, literal("total").label("dimension"), literal("all").label("key"), billings.c.currency,
+        func.count().label("count"), func.sum(billings.c.amount).label("amount"),
+    ).group_by(billings.c.day, billings.c.currency)
+    by_app = select(
+        apps.c.day, literal("app").label("dimension"), apps.c.app_id.label("key"), apps.c.currency,
+        func.count(distinct(apps.c.order_id)).label("count"), func.sum(apps.c.amount).label("amount"),
+    ).group_by(apps.c.day, apps.c.app_id, apps.c.currency)
+    return union_all(by_plan, total, by_app)
+
+
+def _days(lo: date, hi: date):
+    series = func.generate_series(lo, hi, literal_column("interval '1 day'")).table_valued("value").render_derived("days")
+    return series, cast(series.c.value, Date)
+
+
+def mrr_rows(lo: date, hi: date):
+    """Per day ``lo``..``hi``: subscriptions with a cycle covering the day, and their monthly price."""
+    days, day = _days(lo, hi)
+    monthly = case(
+        (PlanVersion.billing_cycle == BillingCycleEnum.yearly, PlanVersion.price / 12),
+        else_=PlanVersion.price,
+    )
+    plan_code = func.coalesce(SubscriptionCycle.plan_code, UNKNOWN)
+    currency = cast(PlanVersion.currency, String(3))
+    return (
+        select(
+            day.label("day"), plan_code.label("plan_code"), currency.label("currency"),
+            func.count(distinct(SubscriptionCycle.subscription_id)).label("active_subscriptions"),
+            func.round(func.sum(monthly), 2).label("mrr"),
+        )
+        .select_from(days)
+        .join(SubscriptionCycle, and_(SubscriptionCycle.start_date <= day, SubscriptionCycle.end_date > day))
+        .join(PlanVersion, PlanVersion.id == SubscriptionCycle.plan_version_id)
+        .group_by(day, plan_code, currency)
+    )
+
+
+def tenants_rows(lo: date, hi: date):
+    """
+    Per day ``lo``..``hi`` and plan: tenants whose subscription's first
+    cycle started, and tenants whose expired or cancelled subscription's
+    last cycle ended.
+    """
+    touching = aliased(SubscriptionCycle)
+    in_range = select(touching.subscription_id).where(
+        or_(touching.start_date.between(lo, hi), touching.end_date.between(lo, hi))
+    )
+    ranked = (
+        select(
+            Subscription.tenant_id,
+            Subscription.status,
+            SubscriptionCycle.start_date,
+            SubscriptionCycle.end_date,
+            func.coalesce(SubscriptionCycle.plan_code, UNKNOWN).label("plan_code"),
+            func.row_number().over(
+                partition_by=SubscriptionCycle.subscription_id, order_by=SubscriptionCycle.start_date.asc()
+            ).label("first"),
+            func.row_number().over(
+                partition_by=SubscriptionCycle.subscription_id, order_by=SubscriptionCycle.start_date.desc()
+            ).label("last"),
+        )
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .where(SubscriptionCycle.subscription_id.in_(in_range))
+        .cte("ranked")
+    )
+    new = select(
+        ranked.c.start_date.label("day"), ranked.c.plan_code,
+        func.count(distinct(ranked.c.tenant_id)).label("new_tenants"), literal(0).label("churned_tenants"),
+    ).where(ranked.c.first == 1, ranked.c.start_date.between(lo, hi)).group_by(ranked.c.start_date, ranked.c.plan_code)
+    churned = select(
+        ranked.c.end_date.label("day"), ranked.c.plan_code,
+        literal(0).label("new_tenants"), func.count(distinct(ranked.c.tenant_id)).label("churned_tenants"),
+    ).where(
+        ranked.c.last == 1, ranked.c.status.in_(CHURNED_STATUSES), ranked.c.end_date.between(lo, hi),
+    ).group_by(ranked.c.end_date, ranked.c.plan_code)
+    events = union_all(new, churned).subquery("events")
+    return select(
+        events.c.day, events.c.plan_code,
+        func.sum(events.c.new_tenants).label("new_tenants"), func.sum(events.c.churned_tenants).label("churned_tenants"),
+    ).group_by(events.c.day, events.c.plan_code)
+
+
+def payments_rows(lo: date, hi: date):
+    """Transactions per day ``lo``..``hi``, provider and currency. Refunded payments count as succeeded attempts."""
+    start, end = _utc_bounds(lo, hi)
+    day = _utc_day(Transaction.created_at)
+    provider = func.coalesce(Transaction.provider, UNKNOWN)
+    currency = func.coalesce(Transaction.currency, "INR")
+    succeeded = Transaction.status.in_((TransactionStatus.SUCCESS, TransactionStatus.REFUNDED))
+    return (
+        select(
+            day.label("day"), provider.label("provider"), currency.label("currency"),
+            func.count().label("attempts"),
+            func.count().filter(succeeded).label("succeeded"),
+            func.count().filter(Transaction.status == TransactionStatus.FAILED).label("failed"),
+            func.coalesce(func.sum(Transaction.amount).filter(Transaction.status == TransactionStatus.SUCCESS), 0)
+            .label("amount_succeeded"),
+        )
+        .where(Transaction.created_at >= start, Transaction.created_at < end)
+        .group_by(day, provider, currency)
+    )
+
+
+# -- Day ranges touched by changed source rows --------------------------------
+
+def revenue_changes(since: datetime):
+    billings = select(SubscriptionBilling.billing_date.label("day")).where(_changed(SubscriptionBilling, since))
+    orders = select(_utc_day(Order.created_at).label("day")).where(_changed(Order, since))
+    days = union_all(billings, orders).subquery("changed")
+    return select(func.min(days.c.day), func.max(days.c.day))
+
+
+def mrr_changes(since: datetime):
+    return select(func.min(SubscriptionCycle.start_date), func.max(SubscriptionCycle.end_date)).where(
+        _changed(SubscriptionCycle, since)
+    )
+
+
+def tenants_changes(since: datetime):
+    starts = select(SubscriptionCycle.start_date.label("day")).where(_changed(SubscriptionCycle, since))
+    ends = select(SubscriptionCycle.end_date.label("day")).where(_changed(SubscriptionCycle, since))
+    # A subscription expiring or being cancelled churns it on its last cycle's end
+    churns = (
+        select(func.max(SubscriptionCycle.end_date).label("day"))
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .where(_changed(Subscription, since))
+        .group_by(SubscriptionCycle.subscription_id)
+    )
+    days = union_all(starts, ends, churns).subquery("changed")
+    return select(func.min(days.c.day), func.max(days.c.day))
+
+
+def payments_changes(since: datetime):
+    day = _utc_day(Transaction.created_at)
+    return select(func.min(day), func.max(day)).where(_changed(Transaction, since))
+
+
+@dataclass(frozen=True)
+class Rollup:
+    name: str
+    model: type
+    rows: Callable[[date, date], object]
+    changes: Callable[[datetime], object]
+    # The earliest day with source data, for a full rebuild
+    first_day: object
+    # Recompute up to today on every refresh, even with no changes (a day's
+    # MRR exists before anything happens on it)
+    through_today: bool = False
+    # Partitioned source tables, whose old months get archived
+    partitioned_sources: Tuple[str, ...] = ()
+
+    @property
+    def columns(self) -> List[str]:
+        return [column.name for column in self.model.__table__.columns]
+
+
+ROLLUPS: Dict[str, Rollup] = {
+    rollup.name: rollup for rollup in (
+        Rollup(
+            "revenue", RevenueDaily, revenue_rows, revenue_changes,
+            select(func.least(
+                select(func.min(SubscriptionBilling.billing_date)).scalar_subquery(),
+                select(func.min(_utc_day(Order.created_at))).scalar_subquery(),
+            )),
+            partitioned_sources=(SubscriptionBilling.__tablename__, Order.__tablename__),
+        ),
+        Rollup(
+            "mrr", MrrDaily, mrr_rows, mrr_changes,
+            select(func.min(SubscriptionCycle.start_date)), through_today=True,
+        ),
+        Rollup("tenants", TenantsDaily, tenants_rows, tenants_changes, select(func.min(SubscriptionCycle.start_date))),
+        Rollup(
+            "payments", PaymentsDaily, payments_rows, payments_changes, select(func.min(_utc_day(Transaction.created_at))),
+            partitioned_sources=(Transaction.__tablename__,),
+        ),
+    )
+}
+
+
+async def recompute(db: AsyncSession, rollup: Rollup, lo: date, hi: date) -> int:
+    """Replace the rollup's rows for days ``lo``..``hi``; returns the rows written."""
+    table = rollup.model.__table__
+    await db.execute(delete(table).where(table.c.day.between(lo, hi)))
+    result = await db.execute(insert(table).from_select(rollup.columns, rollup.rows(lo, hi)))
+    return result.rowcount or 0
+
+
+async def archived_floor(db: AsyncSession, rollup: Rollup) -> Optional[date]:
+    """The first day whose source rows are all still live, if any source month is archived."""
+    days = [day for day in [await archived_through(db, table) for table in rollup.partitioned_sources] if day]
+    return max(days) if days else None
+
+
+async def lock_watermark(db: AsyncSession, name: str) -> datetime:
+    """The rollup's high-water mark, row-locked so concurrent refreshers take turns."""
+    await db.execute(
+        pg_insert(RollupWatermark).values(name=name, high_water=EPOCH).on_conflict_do_nothing(index_elements=["name"])
+    )
+    return (
+        await db.execute(select(RollupWatermark.high_water).where(RollupWatermark.name == name).with_for_update())
+    ).scalar_one()
+
+
+async def _set_watermark(db: AsyncSession, name: str, high_water: datetime):
+    await db.execute(update(RollupWatermark).where(RollupWatermark.name == name).values(high_water=high_water))
+
+
+@dataclass
+class RollupReport:
+    days: Dict[str, int] = field(default_factory=dict)
+    rows: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def add(self, name: str, days: int, rows: int):
+        self.days[name] = self.days.get(name, 0) + days
+        self.rows[name] = self.rows.get(name, 0) + rows
+
+    @property
+    def rows_per_second(self) -> float:
+        return sum(self.rows.values()) / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        parts = ", ".join(f"{name} {self.days[name]} days/{self.rows[name]} rows" for name in self.days) or "nothing"
+        return f"Rollups: {parts} in {self.seconds:.2f}s, {self.rows_per_second:.0f} rows/s"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def refresh_rollup(
+    db: AsyncSession,
+    rollup: Rollup,
+    today: date,
+    lag_seconds: float = ROLLUP_WATERMARK_LAG_SECONDS,
+    max_lookback_days: int = ROLLUP_MAX_LOOKBACK_DAYS,
+) -> Tuple[int, int]:
+    """
+    Recompute the days touched since the rollup's high-water mark, in the
+    caller's transaction. Returns (days, rows).
+    """
+    started = (await db.execute(select(func.now()))).scalar_one()
+    high_water = await lock_watermark(db, rollup.name)
+    lo, hi = (await db.execute(rollup.changes(high_water - timedelta(seconds=lag_seconds)))).one()
+    if rollup.through_today:
+        lo, hi = min(lo or today, today), today
+    days = rows = 0
+    if lo is not None:
+        floor = today - timedelta(days=max_lookback_days)
+        if lo < floor:
+            logger.warning(f"Rollup {rollup.name}: changes back to {lo} are older than the lookback, run a rebuild")
+            lo = floor
+        hi = min(hi, today)
+        if lo <= hi:
+            rows = await recompute(db, rollup, lo, hi)
+            days = (hi - lo).days + 1
+    await _set_watermark(db, rollup.name, started)
+    return days, rows
+
+
+async def refresh_rollups(session_factory, names: Optional[List[str]] = None, today: Optional[date] = None) -> RollupReport:
+    """Incrementally refresh each rollup, one transaction per rollup."""
+    report = RollupReport()
+    started = time.perf_counter()
+    today = today or _today()
+    for name in names or ROLLUPS:
+        async with session_factory() as db:
+            days, rows = await refresh_rollup(db, ROLLUPS[name], today)
+            await db.commit()
+        report.add(name, days, rows)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+async def rebuild_rollups(
+    session_factory,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    names: Optional[List[str]] = None,
+    chunk_days: int = ROLLUP_REBUILD_CHUNK_DAYS,
+) -> RollupReport:
+    """
+    Recompute every day from ``start`` (default: the first day with data)
+    to ``end`` (default: today), ``chunk_days`` per transaction. A rebuild
+    up to today also moves the high-water mark to when it started.
+
+    Days before ``archived_floor`` are skipped, even when ``start`` asks for
+    them: their source partitions are archived, so recomputing would
+    replace their rows with nothing.
+    """
+    report = RollupReport()
+    started = time.perf_counter()
+    today = _today()
+    end = end or today
+    if start and start > end:
+        raise RollupError(f"Rebuild start {start} is after its end {end}")
+    for name in names or ROLLUPS:
+        rollup = ROLLUPS[name]
+        async with session_factory() as db:
+            began = (await db.execute(select(func.now()))).scalar_one()
+            lo = start or (await db.execute(rollup.first_day)).scalar()
+            floor = await archived_floor(db, rollup)
+        if lo is None:
+            continue
+        if floor and lo < floor:
+            logger.warning(f"Rollup {name}: keeping the rows before {floor}, their source partitions are archived")
+            lo = floor
+        while lo <= end:
+            hi = min(lo + timedelta(days=chunk_days - 1), end)
+            async with session_factory() as db:
+                rows = await recompute(db, rollup, lo, hi)
+                await db.commit()
+            report.add(name, (hi - lo).days + 1, rows)
+            logger.info(f"Rollup {name} rebuilt {lo}..{hi} ({rows} rows)")
+            lo = hi + timedelta(days=1)
+        if end >= today:
+            async with session_factory() as db:
+                await lock_watermark(db, name)
+                await _set_watermark(db, name, began)
+                await db.commit()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+# -- Report queries (rollup tables only) --------------------------------------
+
+def _period(day, interval: str):
+    return day if interval == "day" else cast(func.date_trunc("month", day), Date)
+
+
+def _check_range(start: date, end: date):
+    if start > end:
+        raise RollupError(f"Report start {start} is after its end {end}")
+
+
+async def mrr_report(db: AsyncSession, start: date, end: date, interval: str = "day", by_plan: bool = False) -> List[dict]:
+    """MRR and active subscriptions per currency (and plan). Monthly periods report their last day."""
+    _check_range(start, end)
+    period = _period(MrrDaily.day, interval)
+    keys = [MrrDaily.day, MrrDaily.currency] + ([MrrDaily.plan_code] if by_plan else [])
+    query = (
+        select(
+            period.label("period"), *keys[1:],
+            func.sum(MrrDaily.active_subscriptions).label("active_subscriptions"), func.sum(MrrDaily.mrr).label("mrr"),
+        )
+        .where(MrrDaily.day.between(start, end))
+        .group_by(*keys)
+        .order_by(MrrDaily.day, *keys[1:])
+    )
+    if interval == "month":
+        month_end = cast(func.date_trunc("month", MrrDaily.day) + literal_column("interval '1 month - 1 day'"), Date)
+        query = query.where(or_(MrrDaily.day == month_end, MrrDaily.day == end))
+    return [dict(row._mapping) for row in await db.execute(query)]
+
+
+async def revenue_report(db: AsyncSession, start: date, end: date, dimension: str = "total", interval: str = "day") -> List[dict]:
+    _check_range(start, end)
+    if dimension not in REVENUE_DIMENSIONS:
+        raise RollupError(f"Unknown revenue dimension: {dimension}")
+    period = _period(RevenueDaily.day, interval)
+    query = (
+        select(
+            period.label("period"), RevenueDaily.key, RevenueDaily.currency,
+            func.sum(RevenueDaily.count).label("count"), func.sum(RevenueDaily.amount).label("amount"),
+        )
+        .where(RevenueDaily.dimension == dimension, RevenueDaily.day.between(start, end))
+        .group_by(period, RevenueDaily.key, RevenueDaily.currency)
+        .order_by(period, RevenueDaily.key, RevenueDaily.currency)
+    )
+    return [dict(row._mapping) for row in await db.execute(query)]
+
+
+async def tenants_report(db: AsyncSession, start: date, end: date, interval: str = "day") -> List[dict]:
+    _check_range(start, end)
+    period = _period(TenantsDaily.day, interval)
+    query = (
+        select(
+            period.label("period"),
+            func.sum(TenantsDaily.new_tenants).label("new_tenants"),
+            func.sum(TenantsDaily.churned_tenants).label("churned_tenants"),
+        )
+        .where(TenantsDaily.day.between(start, end))
+        .group_by(period)
+        .order_by(period)
+    )
+    return [
+        {**row._mapping, "net": row.new_tenants - row.churned_tenants}
+        for row in await db.execute(query)
+    ]
+
+
+async def payments_report(db: AsyncSession, start: date, end: date, interval: str = "day") -> List[dict]:
+    """Attempts and outcomes per provider and currency; failure_rate is failed / (succeeded + failed)."""
+    _check_range(start, end)
+    period = _period(PaymentsDaily.day, interval)
+    query = (
+        select(
+            period.label("period"), PaymentsDaily.provider, PaymentsDaily.currency,
+            func.sum(PaymentsDaily.attempts).label("attempts"),
+            func.sum(PaymentsDaily.succeeded).label("succeeded"),
+            func.sum(PaymentsDaily.failed).label("failed"),
+            func.sum(PaymentsDaily.amount_succeeded).label("amount_succeeded"),
+        )
+        .where(PaymentsDaily.day.between(start, end))
+        .group_by(period, PaymentsDaily.provider, PaymentsDaily.currency)
+        .order_by(period, PaymentsDaily.provider, PaymentsDaily.currency)
+    )
+    rows = []
+    for row in await db.execute(query):
+        settled = row.succeeded + row.failed
+        rows.append({**row._mapping, "failure_rate": round(row.failed / settled, 4) if settled else 0.0})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh or rebuild the finance rollup tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh = commands.add_parser("refresh", help="recompute days changed since the high-water marks")
+    refresh.add_argument("--once", action="store_true", help="refresh once and exit")
+    refresh.add_argument("--interval", type=float, default=ROLLUP_INTERVAL_SECONDS)
+    rebuild = commands.add_parser("rebuild", help="recompute a day range (default: all history)")
+    rebuild.add_argument("--from", dest="start", type=date.fromisoformat)
+    rebuild.add_argument("--to", dest="end", type=date.fromisoformat)
+    rebuild.add_argument("--chunk-days", type=int, default=ROLLUP_REBUILD_CHUNK_DAYS)
+    for command in (refresh, rebuild):
+        command.add_argument("--only", action="append", choices=sorted(ROLLUPS), help="limit to this rollup (repeatable)")
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    async def run():
+        if args.command == "rebuild":
+            print(await rebuild_rollups(AsyncSessionLocal, args.start, args.end, args.only, args.chunk_days))
+            return
+        while True:
+            print(await refresh_rollups(AsyncSessionLocal, args.only))
+            if args.once:
+                return
+            await asyncio.sleep(args.interval)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Onboarding / payment status events, pushed to the frontend over SSE.
+
+Publishers (order creation, Razorpay webhooks, free-plan activation) call
+``publish_status_event`` after their commit. The event goes out on a Postgres
+``NOTIFY``, and every worker (the publisher included) hands it to the SSE
+streams of that tenant it holds through ``LISTEN``. A webhook received by
+one worker therefore reaches a browser connected to another. When the
+listener is not running (tests, scripts), events are dispatched in-process
+only.
+
+Every worker keeps the last few events per tenant, so a reconnecting
+``EventSource`` resumes from its ``Last-Event-ID``. Event ids are
+microsecond timestamps taken by the publisher, which keeps them comparable
+across workers. A new stream resumes from ``snapshot_marker()``, taken
+before its status snapshot, so an event published while the snapshot was
+being read is replayed rather than lost.
+
+The per-tenant stream cap is enforced by each worker on its own streams.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Set
+
+import asyncpg
+import orjson
+from sqlalchemy.engine import make_url
+
+from app.config import (
+    DATABASE_URL,
+    STATUS_EVENT_HISTORY,
+    STATUS_EVENTS_CHANNEL,
+    STATUS_STREAM_MAX_PER_TENANT,
+)
+from app.core.logger import create_logger
+from app.core.response import _json_default
+from app.core.status_cache import onboarding_status_cache
+
+logger = create_logger("status_events")
+
+ORDER_CREATED = "order.created"
+PAYMENT_CAPTURED = "payment.captured"
+PAYMENT_FAILED = "payment.failed"
+SUBSCRIPTION_ACTIVE = "subscription.active"
+# The plan behind the tenant's features changed; clients re-read their entitlements
+SUBSCRIPTION_PLAN_CHANGED = "subscription.plan_changed"
+
+# Streams close after sending one of these: nothing further will happen
+TERMINAL_EVENTS = frozenset({SUBSCRIPTION_ACTIVE})
+
+
+class StreamLimitExceeded(Exception):
+    """The tenant already has the maximum number of open status streams."""
+
+
+@dataclass(frozen=True)
+class StatusEvent:
+    id: int
+    tenant_id: int
+    type: str
+    data: dict = field(default_factory=dict)
+
+    def to_json(self) -> bytes:
+        return orjson.dumps(
+            {"id": self.id, "tenant_id": self.tenant_id, "type": self.type, "data": self.data},
+            default=_json_default,
+        )
+
+    @classmethod
+    def from_json(cls, raw) -> "StatusEvent":
+        payload = orjson.loads(raw)
+        return cls(payload["id"], payload["tenant_id"], payload["type"], payload.get("data") or {})
+
+    def to_sse(self) -> bytes:
+        return format_sse(self.type, self.data, event_id=self.id)
+
+
+def format_sse(event_type: str, data, event_id: Optional[int] = None) -> bytes:
+    """One ``text/event-stream`` message; JSON data is always a single line."""
+    message = b"event: %s\ndata: %s\n\n" % (event_type.encode(), orjson.dumps(data, default=_json_default))
+    return b"id: %d\n" % event_id + message if event_id is not None else message
+
+
+SSE_HEARTBEAT = b": heartbeat\n\n"
+
+# Publishers on other workers stamp events with their own clocks
+SNAPSHOT_REPLAY_MARGIN_MICROS = 2_000_000
+
+
+def snapshot_marker() -> int:
+    """
+    The event id to subscribe from when a status snapshot is about to be
+    read: events at or after it may be missing from the snapshot. Events
+    the snapshot already reflects may be replayed too; they only repeat it.
+    """
+    return time.time_ns() // 1000 - SNAPSHOT_REPLAY_MARGIN_MICROS
+
+
+class StatusBroker:
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        channel: str = STATUS_EVENTS_CHANNEL,
+        history: int = STATUS_EVENT_HISTORY,
+        max_streams_per_tenant: int = STATUS_STREAM_MAX_PER_TENANT,
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.history = history
+        self.max_streams_per_tenant = max_streams_per_tenant
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._recent: Dict[int, Deque[StatusEvent]] = {}
+        self._connection: Optional[asyncpg.Connection] = None
+        self._notify_lock = asyncio.Lock()
+        self._listener_task: Optional[asyncio.Task] = None
+
+    # -- fan-out ------------------------------------------------------------
+
+    async def publish(self, tenant_id: int, event_type: str, data: Optional[dict] = None) -> StatusEvent:
+        """Publish an event to every worker. Never raises: status events are best effort."""
+        event = StatusEvent(time.time_ns() // 1000, tenant_id, event_type, data or {})
+        connection = self._connection
+        if connection is not None and not connection.is_closed():
+            try:
+                async with self._notify_lock:
+                    await connection.execute("SELECT pg_notify($1, $2)", self.channel, event.to_json().decode())
+                return event
+            except Exception as e:
+                logger.error(f"NOTIFY failed, dispatching {event_type} locally only: {e}")
+        self.dispatch(event)
+        return event
+
+    def dispatch(self, event: StatusEvent):
+        recent = self._recent.setdefault(event.tenant_id, deque(maxlen=self.history))
+        recent.append(event)
+        # The status behind any cached ETag for this tenant just changed
+        onboarding_status_cache.bump(event.tenant_id)
+        for queue in self._subscribers.get(event.tenant_id, ()):
+            queue.put_nowait(event)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            self.dispatch(StatusEvent.from_json(payload))
+        except Exception as e:
+            logger.error(f"Dropping malformed status event: {e}")
+
+    # -- subscriptions ------------------------------------------------------
+
+    def stream_count(self, tenant_id: int) -> int:
+        """Streams of the tenant open on this worker."""
+        return len(self._subscribers.get(tenant_id, ()))
+
+    @asynccontextmanager
+    async def subscribe(self, tenant_id: int, last_event_id: Optional[int] = None):
+        """
+        Yields a queue of the tenant's events. With ``last_event_id``, events
+        newer than it that this worker still remembers are queued first.
+        """
+        subscribers = self._subscribers.setdefault(tenant_id, set())
+        if len(subscribers) >= self.max_streams_per_tenant:
+            raise StreamLimitExceeded(tenant_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        if last_event_id is not None:
+            for event in self._recent.get(tenant_id, ()):
+                if event.id > last_event_id:
+                    queue.put_nowait(event)
+        subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(tenant_id, None)
+
+    # -- LISTEN connection --------------------------------------------------
+
+    async def start(self):
+        if self.dsn and self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _listen_forever(self, max_backoff: float = 30.0):
+        backoff = 1.0
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                await self._connection.add_listener(self.channel, self._on_notification)
+                logger.info(f"Listening for status events on '{self.channel}'")
+                backoff = 1.0
+                while not self._connection.is_closed():
+                    await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Status event listener failed, retrying in {backoff:.0f}s: {e}")
+            finally:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+
+def _asyncpg_dsn(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+status_broker = StatusBroker(dsn=_asyncpg_dsn(DATABASE_URL))
+
+
+async def publish_status_event(tenant_id: int, event_type: str, **data) -> StatusEvent:
+    return await status_broker.publish(tenant_id, event_type, data)
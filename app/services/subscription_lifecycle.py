@@ -0,0 +1,326 @@
+"""
+Subscription lifecycle: renewals, grace and expiry.
+
+A cycle is due once its end_date has passed. Each run claims due cycles in
+batches, walking the partial ``ix_subscription_cycles_due`` index on
+end_date, and moves each one on:
+
+- renew: the subscription is active with auto_renew and the invoice of the
+  ending cycle, if any, is paid. A cycle on the same plan version starts
+  where the old one ended. Paid plans also get a pending billing row and a
+  renewal charge job, which opens a gateway order and emails the tenant a
+  link to pay it.
+- grace: any other active cycle, including an auto-renewed one whose invoice
+  is still unpaid. The cycle and its subscription stay usable in ``grace``
+  for SUBSCRIPTION_GRACE_DAYS.
+- expire: the grace period is over, or the subscription was cancelled.
+
+``settle_renewal`` marks a renewal invoice paid when the gateway captures
+its order (app/controllers/payment_webhook_controller.py). A subscription
+in grace waiting for that payment becomes active again and renews on the
+next run.
+
+Each transition is one set-based statement per batch. The charge and email
+jobs for a batch go in with one INSERT per kind, in the batch's own
+transaction. Batches are claimed with FOR UPDATE SKIP LOCKED, so any number
+of nodes can run the scheduler at once::
+
+    python -m app.services.subscription_lifecycle [--once] [--batch-size N] [--interval SECONDS]
+"""
+import argparse
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import Date, Numeric, case, cast, func, insert, literal, literal_column, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import LIFECYCLE_BATCH_SIZE, LIFECYCLE_INTERVAL_SECONDS, SUBSCRIPTION_GRACE_DAYS
+from app.core.logger import create_logger
+from app.jobs import CHARGE_RENEWAL, SEND_LIFECYCLE_EMAIL, enqueue_many
+from app.models.plans import BillingCycleEnum, PlanVersion
+from app.models.subscriptions import PaymentStatus, Subscription, SubscriptionBilling, SubscriptionCycle, SubscriptionStatus
+from app.models.tenant import Tenant
+from app.services.pricing import TAX_RATE
+
+logger = create_logger("subscription_lifecycle")
+
+RENEW = "renew"
+GRACE = "grace"
+EXPIRE = "expire"
+
+LIVE_STATUSES = (SubscriptionStatus.active, SubscriptionStatus.grace)
+UNPAID_STATUSES = (PaymentStatus.pending, PaymentStatus.failed)
+
+
+@dataclass
+class LifecycleReport:
+    renewed: int = 0
+    graced: int = 0
+    expired: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def cycles(self) -> int:
+        return self.renewed + self.graced + self.expired
+
+    @property
+    def cycles_per_second(self) -> float:
+        return self.cycles / self.seconds if self.seconds else 0.0
+
+    def add(self, counts: Dict[str, int]):
+        self.renewed += counts.get(RENEW, 0)
+        self.graced += counts.get(GRACE, 0)
+        self.expired += counts.get(EXPIRE, 0)
+        self.batches += 1
+
+    def __str__(self):
+        return (
+            f"{self.cycles} cycles in {self.batches} batches ({self.renewed} renewed, {self.graced} in grace, "
+            f"{self.expired} expired) in {self.seconds:.2f}s, {self.cycles_per_second:.0f} cycles/s"
+        )
+
+
+def next_action(row, today: date, grace_days: int = SUBSCRIPTION_GRACE_DAYS) -> str:
+    """What happens to a due cycle (a row of ``due_cycles_query``)."""
+    if row.subscription_status not in LIVE_STATUSES or row.cycle_status == SubscriptionStatus.grace:
+        return EXPIRE
+    if row.auto_renew and row.subscription_status == SubscriptionStatus.active and not row.unpaid:
+        return RENEW
+    if row.end_date + timedelta(days=grace_days) <= today:
+        return EXPIRE
+    return GRACE
+
+
+def _unpaid_invoice():
+    """The cycle's renewal invoice (billed on one of its days) is not paid."""
+    return (
+        select(SubscriptionBilling.id)
+        .where(
+            SubscriptionBilling.subscription_id == SubscriptionCycle.subscription_id,
+            SubscriptionBilling.billing_date >= SubscriptionCycle.start_date,
+            SubscriptionBilling.billing_date < SubscriptionCycle.end_date,
+            SubscriptionBilling.payment_status.in_(UNPAID_STATUSES),
+        )
+        .exists()
+    )
+
+
+def due_cycles_query(today: date, grace_days: int = SUBSCRIPTION_GRACE_DAYS, limit: int = LIFECYCLE_BATCH_SIZE):
+    """Claim up to ``limit`` due cycles, oldest first, skipping those another node holds."""
+    grace_over = today - timedelta(days=grace_days)
+    return (
+        select(
+            SubscriptionCycle.id,
+            SubscriptionCycle.subscription_id,
+            SubscriptionCycle.status.label("cycle_status"),
+            SubscriptionCycle.end_date,
+            SubscriptionCycle.plan_code,
+            Subscription.tenant_id,
+            Subscription.status.label("subscription_status"),
+            Subscription.auto_renew,
+            _unpaid_invoice().label("unpaid"),
+            Tenant.tenant_email,
+            Tenant.tenant_name,
+        )
+        .join(Subscription, Subscription.id == SubscriptionCycle.subscription_id)
+        .join(Tenant, Tenant.id == Subscription.tenant_id)
+        .where(
+            # Matches the partial index predicate, so the scan is ordered by end_date
+            SubscriptionCycle.status.in_(LIVE_STATUSES),
+            SubscriptionCycle.end_date <= today,
+            # Cycles in grace only come back once the grace period is over
+            or_(SubscriptionCycle.status == SubscriptionStatus.active, SubscriptionCycle.end_date <= grace_over),
+        )
+        .order_by(SubscriptionCycle.end_date)
+        .limit(limit)
+        .with_for_update(of=SubscriptionCycle, skip_locked=True)
+    )
+
+
+def renewal_payment_url(order_id: str) -> str:
+    """The page a tenant pays a renewal's gateway order on (DOMAIN_NAME env, the frontend)."""
+    domain = os.getenv("DOMAIN_NAME", "http://localhost:5173")
+    return f"{domain}/billing/pay/{order_id}"
+
+
+def _email(row, event: str, **extra) -> tuple:
+    payload = {
+        "event": event, "tenant_email": row.tenant_email, "tenant_name": row.tenant_name,
+        "plan_name": row.plan_code, "end_date": row.end_date, **extra,
+    }
+    return payload, f"lifecycle:{event}:{row.id}"
+
+
+async def _renew(db: AsyncSession, rows: list):
+    cycle_ids = [row.id for row in rows]
+    term = case(
+        (PlanVersion.billing_cycle == BillingCycleEnum.yearly, literal_column("interval '1 year'")),
+        else_=literal_column("interval '1 month'"),
+    )
+    renewed = (await db.execute(
+        insert(SubscriptionCycle).from_select(
+            ["id", "subscription_id", "plan_version_id", "plan_code", "start_date", "end_date", "status"],
+            select(
+                func.gen_random_uuid(), SubscriptionCycle.subscription_id, SubscriptionCycle.plan_version_id,
+                SubscriptionCycle.plan_code, SubscriptionCycle.end_date, cast(SubscriptionCycle.end_date + term, Date),
+                literal(SubscriptionStatus.active, SubscriptionCycle.status.type),
+            )
+            .join(PlanVersion, PlanVersion.id == SubscriptionCycle.plan_version_id)
+            .where(SubscriptionCycle.id.in_(cycle_ids)),
+        ).returning(SubscriptionCycle.id, SubscriptionCycle.subscription_id, SubscriptionCycle.end_date)
+    )).all()
+
+    # One pending invoice per renewed paid cycle, at the version's contracted price
+    tax = func.round(PlanVersion.price * literal(Decimal(str(TAX_RATE)), Numeric(4, 2)), 2)
+    invoices = (await db.execute(
+        insert(SubscriptionBilling).from_select(
+            ["id", "subscription_id", "base_amount", "discount_amount", "tax_amount", "total_amount",
+             "currency", "billing_date", "payment_status"],
+            select(
+                func.gen_random_uuid(), SubscriptionCycle.subscription_id, PlanVersion.price, literal(Decimal("0.00")),
+                tax, PlanVersion.price + tax, PlanVersion.currency, SubscriptionCycle.start_date,
+                literal(PaymentStatus.pending, SubscriptionBilling.payment_status.type),
+            )
+            .join(PlanVersion, PlanVersion.id == SubscriptionCycle.plan_version_id)
+            .where(SubscriptionCycle.id.in_([cycle.id for cycle in renewed]), PlanVersion.price > 0),
+        ).returning(
+            SubscriptionBilling.id, SubscriptionBilling.subscription_id, SubscriptionBilling.created_at,
+            SubscriptionBilling.total_amount, SubscriptionBilling.currency,
+        )
+    )).all()
+
+    await db.execute(
+        update(SubscriptionCycle)
+        .where(SubscriptionCycle.id.in_(cycle_ids))
+        .values(status=SubscriptionStatus.expired)
+        .execution_options(synchronize_session=False)
+    )
+
+    new_end = {cycle.subscription_id: cycle.end_date for cycle in renewed}
+    emails = {
+        row.subscription_id: _email(row, "renewed", next_end_date=new_end.get(row.subscription_id))
+        for row in rows if row.tenant_email
+    }
+    charges = []
+    for invoice in invoices:
+        # Paid renewals are emailed by the charge job, once there is an order to pay
+        email, _ = emails.pop(invoice.subscription_id, (None, None))
+        charges.append((
+            {"billing_id": invoice.id, "billing_created_at": invoice.created_at,
+             "subscription_id": invoice.subscription_id, "email": email},
+            f"renewal-charge:{invoice.id}",
+        ))
+    await enqueue_many(db, CHARGE_RENEWAL, charges)
+    await enqueue_many(db, SEND_LIFECYCLE_EMAIL, list(emails.values()))
+
+
+async def settle_renewal(db: AsyncSession, billing: SubscriptionBilling):
+    """
+    Mark a renewal invoice paid, in the caller's transaction. If its
+    subscription went into grace waiting for it, the subscription and its
+    grace cycle are active again, and the next run renews them.
+    """
+    billing.payment_status = PaymentStatus.paid
+    await db.execute(
+        update(SubscriptionCycle)
+        .where(SubscriptionCycle.subscription_id == billing.subscription_id, SubscriptionCycle.status == SubscriptionStatus.grace)
+        .values(status=SubscriptionStatus.active)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.id == billing.subscription_id, Subscription.status == SubscriptionStatus.grace)
+        .values(status=SubscriptionStatus.active)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _move_to(db: AsyncSession, rows: list, status: SubscriptionStatus, event: str):
+    await db.execute(
+        update(SubscriptionCycle)
+        .where(SubscriptionCycle.id.in_([row.id for row in rows]))
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    # A cancelled subscription keeps its status; only its last cycle ends
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_({row.subscription_id for row in rows}), Subscription.status.in_(LIVE_STATUSES))
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    await enqueue_many(db, SEND_LIFECYCLE_EMAIL, [_email(row, event) for row in rows if row.tenant_email])
+
+
+async def process_batch(
+    db: AsyncSession, today: date, grace_days: int = SUBSCRIPTION_GRACE_DAYS, batch_size: int = LIFECYCLE_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Claim one batch of due cycles, advance them and commit. Returns counts per action."""
+    rows = (await db.execute(due_cycles_query(today, grace_days, batch_size))).all()
+    groups: Dict[str, List] = {RENEW: [], GRACE: [], EXPIRE: []}
+    for row in rows:
+        groups[next_action(row, today, grace_days)].append(row)
+
+    if groups[RENEW]:
+        await _renew(db, groups[RENEW])
+    if groups[GRACE]:
+        await _move_to(db, groups[GRACE], SubscriptionStatus.grace, "grace")
+    if groups[EXPIRE]:
+        await _move_to(db, groups[EXPIRE], SubscriptionStatus.expired, "expired")
+    await db.commit()
+    return {action: len(group) for action, group in groups.items()}
+
+
+async def run_lifecycle(
+    session_factory,
+    today: Optional[date] = None,
+    batch_size: int = LIFECYCLE_BATCH_SIZE,
+    grace_days: int = SUBSCRIPTION_GRACE_DAYS,
+) -> LifecycleReport:
+    """Process batches until no due cycle is left that this node can claim."""
+    today = today or date.today()
+    report = LifecycleReport()
+    started = time.perf_counter()
+    while True:
+        async with session_factory() as db:
+            counts = await process_batch(db, today, grace_days, batch_size)
+        claimed = sum(counts.values())
+        if claimed:
+            report.add(counts)
+        # A short batch means the rest is done or held by other nodes
+        if claimed < batch_size:
+            break
+    report.seconds = time.perf_counter() - started
+    if report.cycles:
+        logger.info(f"Subscription lifecycle: {report}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Renew, grace and expire due subscription cycles.")
+    parser.add_argument("--once", action="store_true", help="process what is due now and exit")
+    parser.add_argument("--batch-size", type=int, default=LIFECYCLE_BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=LIFECYCLE_INTERVAL_SECONDS)
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    async def run():
+        while True:
+            report = await run_lifecycle(AsyncSessionLocal, batch_size=args.batch_size)
+            print(report)
+            if args.once:
+                return
+            await asyncio.sleep(args.interval)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
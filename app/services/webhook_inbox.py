@@ -0,0 +1,239 @@
+"""
+Razorpay webhook inbox.
+
+``/webhooks/razorpay`` verifies the HMAC, stores the raw event in
+``webhook_events`` and acks. Redeliveries hit the (provider, event_id)
+unique key and are dropped. Each stored event queues a job that drains the
+pending events of its order, oldest first. A transaction-scoped advisory
+lock on the order key keeps two workers from interleaving one order's
+events.
+
+An event that keeps failing is parked as ``failed`` after
+WEBHOOK_MAX_ATTEMPTS, and the rest of its order proceeds. If the order's
+job dies first (a worker stopped while running it), ``park_head_event``
+parks the event it was stuck on. Replay parked events with::
+
+    python -m app.services.webhook_inbox replay [EVENT_ID ...] [--all-failed]
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import RAZORPAY_WEBHOOK_SECRET, WEBHOOK_MAX_ATTEMPTS
+from app.core.logger import create_logger
+from app.jobs import PROCESS_WEBHOOK_EVENTS, JobError, enqueue
+from app.models.webhooks import WebhookEvent, WebhookEventStatus
+
+logger = create_logger("webhooks")
+
+PROVIDER = "razorpay"
+
+
+def verify_signature(body: bytes, signature: Optional[str], secret: Optional[str] = RAZORPAY_WEBHOOK_SECRET) -> bool:
+    """Razorpay signs the raw body with HMAC-SHA256 of the webhook secret."""
+    if not signature or not secret:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def inbox_fields(payload: dict, event_id: Optional[str] = None) -> dict:
+    """Dedup key, ordering key and timestamp for a Razorpay event body."""
+    event_type = payload.get("event") or "unknown"
+    entities = payload.get("payload") or {}
+    payment = (entities.get("payment") or {}).get("entity") or {}
+    order = (entities.get("order") or {}).get("entity") or {}
+
+    # X-Razorpay-Event-Id when sent; otherwise the entity id per event type
+    entity_id = payment.get("id") or order.get("id")
+    event_id = event_id or f"{event_type}:{entity_id}"
+    created = payload.get("created_at")
+    return {
+        "event_id": event_id,
+        "event_type": event_type,
+        "order_key": payment.get("order_id") or order.get("id") or event_id,
+        "event_created_at": datetime.fromtimestamp(created, timezone.utc) if created else datetime.now(timezone.utc),
+    }
+
+
+async def record_event(db: AsyncSession, body: bytes, event_id: Optional[str] = None) -> Optional[int]:
+    """
+    Store a webhook and queue its processing in one commit. Returns the
+    inbox id, or None for a duplicate delivery.
+    """
+    payload = json.loads(body)
+    fields = inbox_fields(payload, event_id)
+    stmt = (
+        pg_insert(WebhookEvent)
+        .values(provider=PROVIDER, payload=payload, **fields)
+        .on_conflict_do_nothing(index_elements=[WebhookEvent.provider, WebhookEvent.event_id])
+        .returning(WebhookEvent.id)
+    )
+    inbox_id = (await db.execute(stmt)).scalar()
+    if inbox_id is not None:
+        await _enqueue_order(db, fields["order_key"], f"webhook-inbox:{inbox_id}")
+    await db.commit()
+    return inbox_id
+
+
+async def _enqueue_order(db: AsyncSession, order_key: str, idempotency_key: str):
+    # One more job attempt than event attempts, so the last failure parks the event
+    await enqueue(
+        db, PROCESS_WEBHOOK_EVENTS, {"provider": PROVIDER, "order_key": order_key},
+        idempotency_key=idempotency_key, max_attempts=WEBHOOK_MAX_ATTEMPTS + 1,
+    )
+
+
+async def dispatch_event(controller, event_type: str, payload: dict):
+    entities = payload.get("payload", {})
+    data = entities.get("payment", {}).get("entity", {})
+    order_data = entities.get("order", {}).get("entity", {})
+    if event_type == "payment.captured":
+        await controller.handle_payment_success(data, order_data)
+    elif event_type == "payment.failed":
+        await controller.handle_payment_failure(data)
+    elif event_type == "order.paid":
+        await controller.handle_order_paid(order_data)
+    else:
+        logger.info(f"Ignoring webhook event {event_type}")
+
+
+async def _record_failure(db: AsyncSession, inbox_id: int, error: str) -> WebhookEventStatus:
+    attempts = WebhookEvent.attempts + 1
+    result = await db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == inbox_id)
+        .values(
+            attempts=attempts,
+            last_error=error[-4000:],
+            status=cast(
+                case((attempts >= WEBHOOK_MAX_ATTEMPTS, WebhookEventStatus.failed), else_=WebhookEventStatus.received),
+                WebhookEvent.status.type,
+            ),
+        )
+        .returning(WebhookEvent.status)
+    )
+    status = result.scalar()
+    await db.commit()
+    return status
+
+
+async def process_order_events(db: AsyncSession, order_key: str, provider: str = PROVIDER) -> int:
+    """Process the order's pending events oldest first. Returns how many succeeded."""
+    from app.controllers.payment_webhook_controller import PaymentWebhookController
+
+    controller = PaymentWebhookController(db)
+    processed = 0
+    while True:
+        # Held until the event's commit; the next loop takes it again
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"webhook:{provider}:{order_key}"))))
+        event = (await db.execute(
+            select(WebhookEvent)
+            .where(
+                WebhookEvent.provider == provider,
+                WebhookEvent.order_key == order_key,
+                WebhookEvent.status == WebhookEventStatus.received,
+            )
+            .order_by(WebhookEvent.event_created_at, WebhookEvent.id)
+            .limit(1)
+        )).scalars().first()
+        if event is None:
+            await db.commit()
+            return processed
+
+        inbox_id, event_type, payload = event.id, event.event_type, event.payload
+        # Flushed with the handler's own commit, so the result is recorded atomically
+        event.status = WebhookEventStatus.processed
+        event.attempts = WebhookEvent.attempts + 1
+        event.processed_at = func.now()
+        try:
+            await dispatch_event(controller, event_type, payload)
+            await db.commit()
+            processed += 1
+        except Exception as e:
+            await db.rollback()
+            status = await _record_failure(db, inbox_id, f"{type(e).__name__}: {e}")
+            if status == WebhookEventStatus.failed:
+                logger.error(f"Webhook event {inbox_id} ({event_type}) parked after {WEBHOOK_MAX_ATTEMPTS} attempts: {e}")
+                continue
+            # Later events of this order wait behind this one; retried with backoff
+            raise JobError(f"Webhook event {inbox_id} ({event_type}) failed: {e}") from e
+
+
+async def park_head_event(db: AsyncSession, order_key: str, provider: str = PROVIDER, error: str = "") -> Optional[int]:
+    """
+    Park the order's oldest pending event once its job is dead-lettered, and
+    queue the rest of the order. Returns the parked event's id, if any.
+    """
+    head = (
+        select(WebhookEvent.id)
+        .where(
+            WebhookEvent.provider == provider,
+            WebhookEvent.order_key == order_key,
+            WebhookEvent.status == WebhookEventStatus.received,
+        )
+        .order_by(WebhookEvent.event_created_at, WebhookEvent.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    inbox_id = (await db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == head)
+        .values(status=WebhookEventStatus.failed, last_error=error[-4000:])
+        .returning(WebhookEvent.id)
+    )).scalar()
+    if inbox_id is not None:
+        logger.error(f"Webhook event {inbox_id} parked, its job is dead: {error}")
+        await _enqueue_order(db, order_key, f"webhook-parked:{inbox_id}")
+    await db.commit()
+    return inbox_id
+
+
+async def replay_events(db: AsyncSession, event_ids: Iterable[int] = (), all_failed: bool = False) -> int:
+    """Move parked events back to ``received`` and queue their orders again."""
+    stmt = (
+        update(WebhookEvent)
+        .where(WebhookEvent.status == WebhookEventStatus.failed)
+        .values(status=WebhookEventStatus.received, attempts=0, last_error=None)
+        .returning(WebhookEvent.id, WebhookEvent.order_key)
+    )
+    event_ids = list(event_ids)
+    if event_ids:
+        stmt = stmt.where(WebhookEvent.id.in_(event_ids))
+    elif not all_failed:
+        return 0
+    rows = (await db.execute(stmt)).all()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+    for inbox_id, order_key in rows:
+        await _enqueue_order(db, order_key, f"webhook-replay:{inbox_id}:{stamp}")
+    await db.commit()
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Razorpay webhook inbox maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay", help="requeue failed webhook events")
+    replay.add_argument("event_ids", nargs="*", type=int)
+    replay.add_argument("--all-failed", action="store_true")
+    args = parser.parse_args(argv)
+
+    from app.db.database import AsyncSessionLocal
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await replay_events(db, args.event_ids, args.all_failed)
+
+    print(f"Requeued {asyncio.run(run())} webhook event(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Job worker: ``python -m app.worker [--concurrency N]``.
+
+Runs N consumers that claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so
+any number of worker processes can share the queue. SIGTERM/SIGINT stop new
+claims and let running jobs finish.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import traceback
+
+from app.config import JOB_LOCK_TIMEOUT_SECONDS, JOB_POLL_INTERVAL_SECONDS, JOB_WORKER_CONCURRENCY
+from app.core.logger import create_logger
+from app.db.database import AsyncSessionLocal
+from app.jobs import handlers  # noqa: F401  (registers the handlers)
+from app.jobs.queue import ClaimedJob, claim_jobs, complete_job, fail_job, requeue_stale_jobs, retry_dead_job
+from app.jobs.registry import get_handler
+from app.models.jobs import JobStatus
+from app.services.email_templates import email_templates
+from app.services.invoice_service import invoice_renderer
+from app.services.mail_transport import mail_transport
+from app.services.payment_gateway import payment_gateway
+from app.services.status_events import status_broker
+
+logger = create_logger("worker")
+
+
+async def run_job(job: ClaimedJob, session_factory=AsyncSessionLocal) -> JobStatus:
+    handler = get_handler(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {job.kind!r}")
+        async with session_factory() as db:
+            await handler.func(db, job.payload)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        async with session_factory() as db:
+            status = await fail_job(db, job, error)
+        if status == JobStatus.dead:
+            logger.error(f"Job {job.id} ({job.kind}) is dead after {job.attempts} attempts: {e}")
+            await run_on_dead(job.id, job.kind, job.payload, str(e), session_factory)
+        else:
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, will retry: {e}")
+        return status
+
+    async with session_factory() as db:
+        await complete_job(db, job)
+    logger.info(f"Job {job.id} ({job.kind}) succeeded")
+    return JobStatus.succeeded
+
+
+async def run_on_dead(job_id: int, kind: str, payload: dict, error: str, session_factory=AsyncSessionLocal):
+    """Run the dead-letter hook of a job's handler, if it has one."""
+    handler = get_handler(kind)
+    if handler is None or handler.on_dead is None:
+        return
+    try:
+        async with session_factory() as db:
+            await handler.on_dead(db, payload, error)
+    except Exception as dead_err:
+        logger.error(f"on_dead hook for job {job_id} failed: {dead_err}")
+
+
+async def consume(worker_id: str, stopping: asyncio.Event, poll_interval: float = JOB_POLL_INTERVAL_SECONDS):
+    while not stopping.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                jobs = await claim_jobs(db, worker_id)
+        except Exception as e:
+            logger.error(f"{worker_id}: claiming failed: {e}")
+            jobs = []
+        for job in jobs:
+            await run_job(job)
+        if not jobs:
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def release_stale_jobs(session_factory=AsyncSessionLocal) -> int:
+    """Requeue jobs left running by a stopped worker; dead-letter those on their last attempt."""
+    async with session_factory() as db:
+        released = await requeue_stale_jobs(db, JOB_LOCK_TIMEOUT_SECONDS)
+    if released:
+        logger.warning(f"Released {len(released)} job(s) left running by a stopped worker")
+    for job in released:
+        if job.status == JobStatus.dead:
+            error = "Lock expired on the last attempt: worker stopped while running the job"
+            logger.error(f"Job {job.id} ({job.kind}) is dead: {error}")
+            await run_on_dead(job.id, job.kind, job.payload, error, session_factory)
+    return len(released)
+
+
+async def reap_stale_locks(stopping: asyncio.Event, interval: float = 60.0):
+    while not stopping.is_set():
+        try:
+            await release_stale_jobs()
+        except Exception as e:
+            logger.error(f"Stale lock sweep failed: {e}")
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(concurrency: int = JOB_WORKER_CONCURRENCY):
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    # Lets handlers' status events reach SSE streams served by the API workers
+    await status_broker.start()
+    email_templates.precompile()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Job worker {prefix} starting {concurrency} consumer(s)")
+    try:
+        await asyncio.gather(
+            reap_stale_locks(stopping),
+            *(consume(f"{prefix}:{index}", stopping) for index in range(concurrency)),
+        )
+    finally:
+        await status_broker.stop()
+        await payment_gateway.aclose()
+        await mail_transport.aclose()
+        await invoice_renderer.aclose()
+    logger.info(f"Job worker {prefix} stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job consumers.")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--retry-dead", type=int, metavar="JOB_ID", help="requeue a dead-lettered job and exit")
+    args = parser.parse_args(argv)
+    if args.retry_dead is not None:
+        asyncio.run(_retry_dead(args.retry_dead))
+    else:
+        asyncio.run(run_worker(args.concurrency))
+
+
+async def _retry_dead(job_id: int):
+    async with AsyncSessionLocal() as db:
+        requeued = await retry_dead_job(db, job_id)
+    print(f"Job {job_id} requeued" if requeued else f"Job {job_id} is not dead-lettered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.core.response import ResponseHandler
+from app.db.database import get_db
+from app.routers import apps as apps_router
+from app.services import catalog_cache as catalog_cache_module
+from app.services.catalog_cache import CatalogCache, bump_catalog_version
+
+
+def _db(version):
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar=MagicMock(return_value=version)))
+    return db
+
+
+@pytest.mark.asyncio
+async def test_bump_increments_and_notifies_in_the_write_transaction():
+    db = _db(8)
+    assert await bump_catalog_version(db) == 8
+    update_sql, notify_sql = (str(call.args[0].compile(dialect=postgresql.asyncpg.dialect())) for call in db.execute.await_args_list)
+    assert "UPDATE saas_catalog_version SET version=(saas_catalog_version.version +" in update_sql
+    assert "RETURNING saas_catalog_version.version" in update_sql
+    assert "pg_notify" in notify_sql
+
+
+@pytest.mark.asyncio
+async def test_new_version_clears_bodies_and_notifies_listeners():
+    clock = [0.0]
+    cache = CatalogCache(poll_interval=5, clock=lambda: clock[0])
+    changes = []
+    cache.on_change(changes.append)
+
+    assert await cache.current_version(_db(3)) == 3
+    cache.store((3, "apps"), b"[]")
+    # Not listening: the version is only re-read after the poll interval
+    assert await cache.current_version(_db(4)) == 3
+    clock[0] = 6
+    assert await cache.current_version(_db(4)) == 4
+    assert cache.get((3, "apps")) is None
+    cache.observe(2)  # late, out-of-order notification
+    assert changes == [3, 4]
+
+
+def test_get_apps_is_built_once_per_version_and_revalidates(monkeypatch):
+    cache = CatalogCache(poll_interval=3600)
+    monkeypatch.setattr(catalog_cache_module, "catalog_cache", cache)
+    fetch_apps = AsyncMock(return_value=[])
+    monkeypatch.setattr(apps_router, "fetch_apps", fetch_apps)
+    app = FastAPI()
+    app.include_router(apps_router.router)
+    app.dependency_overrides[get_db] = lambda: _db(1)
+    client = TestClient(app)
+
+    first = client.get("/saas/get_apps")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.json()["data"] == []
+    assert client.get("/saas/get_apps", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/saas/get_apps").content == first.content
+    assert fetch_apps.await_count == 1
+
+    client.get("/saas/get_apps", params={"currency": "USD"})
+    assert fetch_apps.await_count == 2
+
+    cache.observe(2)
+    assert client.get("/saas/get_apps", headers={"If-None-Match": etag}).status_code == 304
+    assert fetch_apps.await_count == 3  # rebuilt; identical body keeps the same ETag
@@ -0,0 +1,42 @@
+import os
+from unittest.mock import MagicMock
+
+from app.services import email_service
+from app.services.email_templates import EmailTemplates
+
+CONTEXT = {
+    "title": "Subscription Expired: pro", "event": "expired", "tenant_name": "Acme",
+    "plan_name": "pro", "end_date": "2026-10-18",
+}
+
+
+def test_precompile_fills_the_bytecode_cache(tmp_path):
+    count = EmailTemplates(cache_dir=str(tmp_path), auto_reload=False).precompile()
+    assert count >= 6 and len(os.listdir(tmp_path)) == count
+
+    # A fresh environment (restart, another worker) loads bytecode instead of compiling
+    restarted = EmailTemplates(cache_dir=str(tmp_path), auto_reload=False)
+    restarted.env.compile = MagicMock(side_effect=AssertionError("compiled from source"))
+    assert restarted.precompile() == count
+    assert not restarted.env.auto_reload
+
+
+def test_render_many_shares_context_and_partials(tmp_path):
+    templates = EmailTemplates(cache_dir=str(tmp_path), auto_reload=False)
+    names = ["Acme", "Globex", "Initech"]
+    html = templates.render_many("subscription_lifecycle.html", [{"tenant_name": name} for name in names],
+                                 year=2031, **{k: v for k, v in CONTEXT.items() if k != "tenant_name"})
+
+    assert [f"Hi {name}," in body for body, name in zip(html, names)] == [True, True, True]
+    assert all("&copy; 2031 Antigravity Platform" in body and "<style>" in body for body in html)
+    assert html[0] == templates.render("subscription_lifecycle.html", year=2031, **CONTEXT)
+
+    # Partials rendered once for (locale, year), then reused
+    templates.render_many("registration.html", [{"tenant_name": "Acme"}], year=2031)
+    info = templates.cache_info()
+    assert info["partial_misses"] == 1 and info["partial_hits"] == 2
+
+
+def test_render_template_keeps_the_current_year():
+    body = email_service.render_template("subscription_lifecycle.html", **CONTEXT)
+    assert "Hi Acme," in body and "Antigravity Platform. All rights reserved." in body
@@ -0,0 +1,133 @@
+import os
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.db.database import get_db
+from app.models.orders import Order, OrderLineItem
+from app.models.plans import CurrencyEnum
+from app.routers import invoices as invoices_router
+from app.routers.auth import get_current_user
+from app.services import invoice_service
+from app.services.invoice_service import InvoiceError, InvoiceRenderer, InvoiceStore, generate_invoice_pdf
+from app.services.order_line_items import line_items_from_snapshot
+
+BILLING = {
+    "invoice_number": "AB12CD34", "date": "2026-10-19", "amount": 999.0, "tax": 179.82, "discount": 0.0,
+    "total": 1178.82, "currency": "INR", "plan_name": "pro",
+}
+TENANT = {"name": "Acme", "email": "owner@acme.io", "address": ""}
+
+
+def _row(**overrides):
+    values = dict(
+        id=uuid.uuid4(), created_at=datetime(2026, 10, 19, tzinfo=timezone.utc), billing_date=date(2026, 10, 19),
+        base_amount=Decimal("999.00"), tax_amount=Decimal("179.82"), discount_amount=Decimal("0.00"),
+        total_amount=Decimal("1178.82"), currency=CurrencyEnum.INR, invoice_sha256=None,
+        tenant_name="Acme", tenant_email="owner@acme.io", plan_code="pro", order_id=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.asyncio
+async def test_pdfs_are_deterministic_and_stored_by_content(tmp_path):
+    first = generate_invoice_pdf(BILLING, TENANT)
+    assert first.startswith(b"%PDF") and generate_invoice_pdf(BILLING, TENANT) == first
+    assert invoice_service.invoice_styles.cache_info().misses == 1
+
+    store = InvoiceStore(str(tmp_path))
+    digest, size = store.put(first)
+    assert store.put(first) == (digest, size) and size == len(first)
+    assert store.path(digest) == os.path.join(str(tmp_path), digest[:2], f"{digest}.pdf")
+    with open(store.path(digest), "rb") as f:
+        assert f.read() == first
+
+    order = Order(
+        id=uuid.uuid4(), tenant_id=7, currency="INR", discount_amount=Decimal("0.00"),
+        items={"plan_code": "pro", "plan_price": 999, "apps": [{"name": "CRM", "base_price": 0, "features": [{"code": "crm:sms", "price": 0}]}]},
+    )
+    lines = [OrderLineItem(**row) for row in line_items_from_snapshot(order)]
+    billing_data, tenant_data = invoice_service.invoice_documents(_row(order_id=order.id), lines)
+    assert billing_data["total"] == 1178.82 and billing_data["currency"] == "INR"
+    assert [line["name"] for line in billing_data["line_items"]] == ["Plan: pro", "App: CRM", "  - Included: crm:sms"]
+
+    # Across a real process pool, in input order, only digests come back
+    renderer = InvoiceRenderer(processes=2, store=store)
+    try:
+        documents = [({**BILLING, "invoice_number": f"N{i}"}, TENANT) for i in range(5)]
+        stored = await renderer.render_and_store(documents, chunk_size=2)
+    finally:
+        renderer.close()
+    assert stored[0] != stored[1]
+    assert stored[3][0] == store.put(generate_invoice_pdf(*documents[3]))[0]
+    assert all(store.exists(digest) for digest, _ in stored)
+
+
+@pytest.mark.asyncio
+async def test_billing_run_pages_and_bulk_updates():
+    pages = [[_row(), _row()], [_row()]]
+    statements = []
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt, params=None):
+            statements.append((stmt, params))
+            return MagicMock(all=MagicMock(return_value=pages.pop(0) if params is None else []))
+
+        async def commit(self):
+            pass
+
+    renderer = MagicMock(render_and_store=AsyncMock(side_effect=lambda docs: [(f"sha{i}", 100) for i in range(len(docs))]))
+    report = await invoice_service.render_billing_run(Session, date(2026, 10, 19), renderer, page_size=2)
+    assert (report.invoices, report.pages) == (3, 2)
+
+    first_select = str(statements[0][0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert "saas_subscription_billings.invoice_sha256 IS NULL" in first_select
+    assert "saas_subscription_billings.billing_date = " in first_select
+    next_select = str(statements[2][0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert "saas_subscription_billings.id > " in next_select
+    updates = statements[1][1]
+    assert [params["invoice_sha256"] for params in updates] == ["sha0", "sha1"]
+    assert set(updates[0]) == {"id", "created_at", "invoice_sha256", "invoice_size"}
+
+
+def test_download_streams_the_stored_pdf(tmp_path, monkeypatch):
+    store = InvoiceStore(str(tmp_path))
+    content = generate_invoice_pdf(BILLING, TENANT)
+    digest, _ = store.put(content)
+    monkeypatch.setattr(invoices_router, "invoice_renderer", SimpleNamespace(store=store))
+    known = uuid.uuid4()
+
+    async def invoice_for_download(db, billing_id, tenant_name):
+        if billing_id != known or tenant_name != "Acme":
+            raise InvoiceError(f"Invoice not found: {billing_id}")
+        return digest, "AB12CD34"
+
+    monkeypatch.setattr(invoices_router, "invoice_for_download", invoice_for_download)
+    app = FastAPI()
+    app.include_router(invoices_router.router)
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_current_user] = lambda: {"tenant_name": "Acme"}
+    client = TestClient(app)
+
+    response = client.get(f"/invoices/{known}/pdf")
+    assert response.status_code == 200 and response.content == content
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["etag"] == f'"{digest}"'
+    assert 'filename="Invoice_AB12CD34.pdf"' in response.headers["content-disposition"]
+
+    assert client.get(f"/invoices/{known}/pdf", headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+    assert client.get(f"/invoices/{uuid.uuid4()}/pdf").status_code == 404
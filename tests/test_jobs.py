@@ -0,0 +1,157 @@
+from dataclasses import replace
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.jobs import ACTIVATE_ORDER, enqueue
+from app.jobs.queue import (
+    ClaimedJob, StaleJob, claim_jobs, complete_job, fail_job, requeue_stale_jobs, retry_delay,
+)
+from app.jobs import handlers, registry
+from app.jobs.registry import get_handler
+from app.models.jobs import JobStatus
+from app import worker
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+def _db(rows=()):
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=list(rows)), scalar=MagicMock(return_value=1)))
+    db.commit = AsyncMock()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent_and_does_not_commit():
+    db = _db()
+    await enqueue(db, ACTIVATE_ORDER, {"order_id": 1}, idempotency_key="activate-order:1")
+    sql = _sql(db.execute.await_args.args[0])
+    assert "INSERT INTO jobs" in sql
+    assert "ON CONFLICT (idempotency_key) DO NOTHING RETURNING jobs.id" in sql
+    db.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_rows_locked_by_other_consumers():
+    db = _db([(3, ACTIVATE_ORDER, {}, 1, 5)])
+    jobs = await claim_jobs(db, "host:1:0", limit=2)
+    sql = _sql(db.execute.await_args.args[0])
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "attempts=(jobs.attempts + $" in sql and "RETURNING" in sql
+    assert jobs == [ClaimedJob(3, ACTIVATE_ORDER, {}, 1, 5)]
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failures_back_off_then_dead_letter():
+    assert retry_delay(1, base=10, cap=3600, rng=lambda: 0.5) == 10
+    assert retry_delay(4, base=10, cap=3600, rng=lambda: 0.5) == 80
+    assert retry_delay(20, base=10, cap=3600, rng=lambda: 0.5) == 3600
+
+    assert await fail_job(_db(), ClaimedJob(1, "x", {}, 2, 5), "boom") == JobStatus.queued
+    assert await fail_job(_db(), ClaimedJob(1, "x", {}, 5, 5), "boom") == JobStatus.dead
+
+
+@pytest.mark.asyncio
+async def test_stale_jobs_are_requeued_or_dead_lettered():
+    db = _db()
+    await requeue_stale_jobs(db, timeout_seconds=60)
+    sql = _sql(db.execute.await_args.args[0])
+    # Typed as the enum, or Postgres types the CASE as text and rejects the update
+    assert "CAST(CASE WHEN (jobs.attempts >= jobs.max_attempts)" in sql and "AS jobstatus)" in sql
+    assert "finished_at=CASE WHEN (jobs.attempts >= jobs.max_attempts) THEN now() END" in sql
+    assert sql.endswith("RETURNING jobs.id, jobs.kind, jobs.payload, jobs.status")
+
+
+@pytest.mark.asyncio
+async def test_stale_sweep_runs_on_dead_for_jobs_on_their_last_attempt(monkeypatch):
+    webhook = get_handler(handlers.PROCESS_WEBHOOK_EVENTS)
+    assert webhook.on_dead is handlers._webhook_events_dead
+    db = _db([
+        StaleJob(1, ACTIVATE_ORDER, {"free": True, "order_id": "o1", "transaction_id": "t1"}, JobStatus.dead),
+        StaleJob(2, ACTIVATE_ORDER, {"free": True, "order_id": "o2", "transaction_id": "t2"}, JobStatus.queued),
+        StaleJob(3, webhook.kind, {"provider": "razorpay", "order_key": "order_1"}, JobStatus.dead),
+    ])
+
+    class Session:
+        async def __aenter__(self):
+            return db
+
+        async def __aexit__(self, *exc):
+            return False
+
+    activation_dead, webhook_dead = AsyncMock(), AsyncMock()
+    monkeypatch.setitem(registry._HANDLERS, ACTIVATE_ORDER, replace(get_handler(ACTIVATE_ORDER), on_dead=activation_dead))
+    monkeypatch.setitem(registry._HANDLERS, webhook.kind, replace(webhook, on_dead=webhook_dead))
+
+    assert await worker.release_stale_jobs(session_factory=Session) == 3
+    activation_dead.assert_awaited_once()
+    assert activation_dead.await_args.args[1]["order_id"] == "o1"
+    webhook_dead.assert_awaited_once()
+    assert webhook_dead.await_args.args[1]["order_key"] == "order_1"
+
+
+@pytest.mark.asyncio
+async def test_dead_webhook_job_parks_its_stuck_event(monkeypatch):
+    db = _db()
+    enqueue_order = AsyncMock()
+    monkeypatch.setattr("app.services.webhook_inbox._enqueue_order", enqueue_order)
+    await handlers._webhook_events_dead(db, {"provider": "razorpay", "order_key": "order_1"}, "Lock expired")
+    sql = _sql(db.execute.await_args.args[0])
+    assert sql.startswith("UPDATE webhook_events SET status=") and "ORDER BY webhook_events.event_created_at" in sql
+    enqueue_order.assert_awaited_once_with(db, "order_1", "webhook-parked:1")
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_run_job_completes_and_calls_on_dead(monkeypatch):
+    db = _db()
+
+    class Session:
+        async def __aenter__(self):
+            return db
+
+        async def __aexit__(self, *exc):
+            return False
+
+    handler = get_handler("email.subscription_confirmation")
+    monkeypatch.setitem(registry._HANDLERS, handler.kind, replace(handler, func=AsyncMock()))
+    job = ClaimedJob(1, handler.kind, {"root_user_id": 7, "tenant_email": "a@b.c"}, 1, 5)
+    assert await worker.run_job(job, session_factory=Session) == JobStatus.succeeded
+    assert db.execute.await_args.args[0].compile().params["status"] == JobStatus.succeeded
+
+    on_dead = AsyncMock()
+    failing = replace(get_handler(ACTIVATE_ORDER), func=AsyncMock(side_effect=RuntimeError("gateway down")), on_dead=on_dead)
+    monkeypatch.setitem(registry._HANDLERS, ACTIVATE_ORDER, failing)
+    assert await worker.run_job(ClaimedJob(2, ACTIVATE_ORDER, {"free": True}, 5, 5), session_factory=Session) == JobStatus.dead
+    on_dead.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_email_secrets_are_made_when_sent_not_queued(monkeypatch):
+    # The confirmation payload names the root user; its password is set at send time
+    issue_password = AsyncMock(return_value="fresh-password")
+    send = AsyncMock(return_value={"success": True})
+    monkeypatch.setattr(handlers.AccountController, "issue_password", issue_password)
+    monkeypatch.setattr(handlers, "send_subscription_confirmation_email", send)
+    payload = {"tenant_email": "a@b.c", "tenant_name": "Acme", "plan_name": "pro", "start_date": "N/A",
+               "end_date": "N/A", "root_username": "a@b.c", "root_user_id": 7}
+    await handlers.send_subscription_confirmation(_db(), payload)
+    issue_password.assert_awaited_once_with(7)
+    assert send.await_args.args[6] == "fresh-password"
+
+    # The activation link is created when the registration email goes out
+    tenant = MagicMock(tenant_uuid=uuid4(), tenant_email="a@b.c", tenant_name="Acme", is_active=False)
+    db = _db()
+    db.execute.return_value.scalars.return_value.first.return_value = tenant
+    create_link = AsyncMock(return_value=(MagicMock(), "raw-token"))
+    send = AsyncMock(return_value={"success": True})
+    monkeypatch.setattr(handlers, "create_tenant_link", create_link)
+    monkeypatch.setattr(handlers, "send_tenant_registration_email", send)
+    await handlers.send_registration_email(db, {"tenant_uuid": str(tenant.tenant_uuid)})
+    assert send.await_args.args[2].endswith("/onboarding/raw-token")
@@ -0,0 +1,117 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import logger as app_logger
+from app.routers import logs as logs_router
+from app.services import log_files, log_index
+from app.services.log_index import FileIndex, LogIndexer
+
+START = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+
+def _line(i: int, day: int = 0) -> bytes:
+    entry = {
+        "ts": (START + timedelta(days=day, minutes=i)).isoformat(timespec="milliseconds"),
+        "level": "ERROR" if i % 10 == 0 else "INFO",
+        "category": "system",
+        "message": f"request {i}",
+        "fields": {
+            "ip": f"10.0.0.{i % 4}",
+            "status": 500 if i % 10 == 0 else 200,
+            "query": f"client_id=client-{i % 3}",
+        },
+    }
+    return json.dumps(entry).encode() + b"\n"
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    (tmp_path / "system").mkdir()
+    rotated = tmp_path / "system" / "system.log.2026-10-18"
+    rotated.write_bytes(b"".join(_line(i) for i in range(100)))
+    # Small members, so a lookup decompresses one of several
+    monkeypatch.setattr(app_logger, "LOG_GZIP_MEMBER_BYTES", 1024)
+    app_logger._gzip_rotator(str(rotated), str(rotated) + ".gz")
+    (tmp_path / "system" / "system.log").write_bytes(b"".join(_line(i, day=1) for i in range(50)) + b'{"ts"')
+
+    indexer = LogIndexer(log_dir=str(tmp_path), index_dir=str(tmp_path / ".index"))
+    monkeypatch.setattr(log_files, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(log_index, "log_indexer", indexer)
+    return indexer
+
+
+def test_indexes_and_searches_by_term_and_time(indexer, tmp_path):
+    assert indexer.index_all() == 2
+    assert indexer.index_all() == 0
+    gz = indexer.load("system", "system.log.2026-10-18.gz")
+    assert gz.meta["lines"] == 100 and len(gz.block_gz) > 1
+
+    page = indexer.search(["client:client-1", "status:500"])
+    lines = [json.loads(hit["line"])["message"] for hit in page["results"]]
+    # Newest first: the live file, then the rotated day
+    assert lines == ["request 40", "request 10", "request 70", "request 40", "request 10"]
+    assert page["results"][0]["file"] == "system/system.log" and page["next_cursor"] is None
+
+    since = START + timedelta(minutes=20)
+    page = indexer.search(["ip:10.0.0.1"], since=since, until=since + timedelta(minutes=10))
+    assert [json.loads(hit["line"])["message"] for hit in page["results"]] == ["request 29", "request 25", "request 21"]
+
+    # Pages cover every match exactly once
+    seen, cursor = [], None
+    while True:
+        page = indexer.search(["level:error"], limit=4, cursor=cursor)
+        seen += [(hit["file"], hit["offset"]) for hit in page["results"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 15
+
+    with pytest.raises(log_index.LogIndexError):
+        indexer.search(["path:/"])
+
+
+def test_live_file_is_indexed_incrementally(indexer, tmp_path):
+    indexer.index_all()
+    path = tmp_path / "system" / "system.log"
+    with open(path, "ab") as f:
+        # Completes the partial line, then one more
+        f.write(b': "bad"}\n' + _line(50, day=1))
+
+    # Appended lines are found before the next pass indexes them
+    assert indexer.search(["status:500"], limit=1)["results"][0]["line"] == _line(50, day=1).decode().strip()
+    assert indexer.index_file("system", "system.log")
+    index = indexer.load("system", "system.log")
+    assert index.meta["lines"] == 52 and index.end == os.path.getsize(path)
+    assert list(index.postings("status:500"))[-1] == 51
+
+    # Replaced files are reported, not scanned, until they are indexed again
+    path.write_bytes(_line(0))
+    assert indexer.search(["status:500"])["unindexed"] == ["system/system.log"]
+    indexer.index_all()
+    assert isinstance(indexer.load("system", "system.log"), FileIndex)
+
+    os.remove(str(tmp_path / "system" / "system.log.2026-10-18.gz"))
+    indexer.index_all()
+    assert os.listdir(tmp_path / ".index" / "system") == ["system.log.idx"]
+
+
+def test_search_route(indexer):
+    indexer.index_all()
+    app = FastAPI()
+    app.include_router(logs_router.router)
+    client = TestClient(app)
+
+    response = client.get("/logs/search", params={"q": ["status:500", "ip:10.0.0.2"], "limit": 2})
+    body = response.json()
+    assert response.status_code == 200 and len(body["results"]) == 2 and body["next_cursor"]
+    response = client.get("/logs/search", params={"q": "status:500", "cursor": body["next_cursor"]})
+    assert response.status_code == 200
+    assert client.get("/logs/search", params={"q": "nope"}).status_code == 400
+    assert client.get("/logs/search", params={"category": "nope"}).status_code == 404
+    # .index is not a category
+    assert client.get("/logs/categories").json() == {"categories": ["system"]}
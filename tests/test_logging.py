@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+
+from app.core.logger import LoggingPipeline, request_id_var
+
+
+class Rendered:
+    """Records the thread its message is formatted on."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread().name)
+        return "order-42"
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_one_handler_per_category_and_json_records(tmp_path):
+    pipeline = LoggingPipeline(log_dir=str(tmp_path), level="INFO")
+    logger = pipeline.get("billing")
+    assert pipeline.get("billing") is logger and len(logger.handlers) == 1
+    other = pipeline.get("webhooks")
+    assert other.handlers[0] is logger.handlers[0] and not logger.propagate
+
+    rendered, skipped = Rendered(), Rendered()
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("paid %s", rendered, extra={"fields": {"tenant_id": 7}})
+        logger.debug("never formatted %s", skipped)
+    finally:
+        request_id_var.reset(token)
+    other.error("failed")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        other.exception("crashed")
+    pipeline.stop()
+
+    [record] = _lines(os.path.join(tmp_path, "billing", "billing.log"))
+    assert record["message"] == "paid order-42" and record["level"] == "INFO" and record["category"] == "billing"
+    assert record["request_id"] == "req-1" and record["fields"] == {"tenant_id": 7}
+    # Formatting happens on the listener thread, and never below the level
+    assert rendered.threads and threading.main_thread().name not in rendered.threads
+    assert skipped.threads == []
+
+    failed, crashed = _lines(os.path.join(tmp_path, "webhooks", "webhooks.log"))
+    assert "request_id" not in failed and failed["message"] == "failed"
+    assert "ValueError: boom" in crashed["exc"]
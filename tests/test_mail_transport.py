@@ -0,0 +1,145 @@
+import socketserver
+import threading
+
+import pytest
+
+from app.services.email_service import build_message
+from app.services.mail_transport import SMTPSettings, SMTPTransport
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server: records messages, refuses *bounce* recipients."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None):
+        super().__init__(("127.0.0.1", 0), SinkHandler)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server
+        with sink.lock:
+            sink.connections += 1
+        delivered = 0
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 sink")
+            elif command.startswith("MAIL FROM"):
+                if sink.drop_after is not None and delivered >= sink.drop_after:
+                    return  # server-side idle timeout / restart
+                self.reply("250 OK")
+            elif command.startswith("RCPT TO"):
+                self.reply("550 no such user" if "BOUNCE" in command else "250 OK")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                data = b"".join(iter(lambda: self.rfile.readline(), b".\r\n"))
+                with sink.lock:
+                    sink.messages.append(data)
+                delivered += 1
+                self.reply("250 queued")
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+@pytest.fixture
+def sink_factory():
+    sinks = []
+
+    def start(**kwargs):
+        sink = SMTPSink(**kwargs)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        sinks.append(sink)
+        return sink
+
+    yield start
+    for sink in sinks:
+        sink.shutdown()
+        sink.server_close()
+
+
+def _transport(sink, pool_size=2):
+    settings = SMTPSettings(server="127.0.0.1", port=sink.port, security="none", from_email="noreply@example.com",
+                            pool_size=pool_size, timeout=5)
+    return SMTPTransport(settings)
+
+
+def _message(to, subject="Hello"):
+    return build_message("Support <noreply@example.com>", [to], subject, "body", "<p>body</p>")
+
+
+@pytest.mark.asyncio
+async def test_send_many_reuses_pooled_sessions(sink_factory):
+    sink = sink_factory()
+    transport = _transport(sink, pool_size=2)
+    try:
+        results = await transport.send_many([_message(f"user{i}@example.com", f"Notice {i}") for i in range(20)])
+        assert all(result["success"] for result in results)
+        assert len(sink.messages) == 20 and sink.connections == 2
+
+        # Later sends reuse the idle sessions instead of reconnecting
+        assert (await transport.send(_message("late@example.com")))["success"]
+        assert sink.connections == 2
+
+        stats = transport.stats()
+        assert stats["sent"] == 21 and stats["failed"] == 0 and stats["messages_per_second"] > 0
+        assert stats["operations"]["connect"]["calls"] == 2 and stats["operations"]["send"]["calls"] == 21
+    finally:
+        transport.close()
+
+
+@pytest.mark.asyncio
+async def test_dropped_session_reconnects_and_refusals_fail_one_message(sink_factory):
+    sink = sink_factory(drop_after=2)
+    transport = _transport(sink, pool_size=1)
+    try:
+        messages = [_message(f"user{i}@example.com") for i in range(7)]
+        messages[1] = _message("bounce@example.com")
+        results = await transport.send_many(messages)
+
+        assert [result["success"] for result in results] == [True, False, True, True, True, True, True]
+        assert "no such user" in results[1]["error"]
+        assert results[1]["reason"] == "recipient_refused"
+        # The server hangs up after 2 deliveries per session; the next message is retried on a new one
+        assert len(sink.messages) == 6 and sink.connections == 3
+    finally:
+        transport.close()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_server_fails_the_batch_without_raising(sink_factory):
+    sink = sink_factory()
+    port = sink.port
+    sink.shutdown()
+    sink.server_close()
+    transport = SMTPTransport(SMTPSettings(server="127.0.0.1", port=port, security="none", pool_size=2, timeout=1))
+    try:
+        results = await transport.send_many([_message("a@example.com"), _message("b@example.com"), _message("c@example.com")])
+        assert [result["success"] for result in results] == [False, False, False]
+        assert {result["reason"] for result in results} == {"connection"}
+        assert transport.stats()["failed"] == 3
+        assert not (await SMTPTransport(SMTPSettings(server="smtp.example.com")).send(_message("a@example.com")))["success"]
+    finally:
+        transport.close()
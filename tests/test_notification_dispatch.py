@@ -0,0 +1,149 @@
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.notifications import NotificationCampaign, NotificationCampaignStatus, NotificationKind
+from app.services import notification_dispatch
+from app.services.notification_dispatch import DomainRateLimiter, NotificationDispatcher, parse_rate_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+class FakeTransport:
+    settings = SimpleNamespace(sender="Support <noreply@example.com>")
+
+    def __init__(self, crash_on=None):
+        self.calls = []
+        self.crash_on = crash_on
+
+    async def send_many(self, messages):
+        to = [message["To"] for message in messages]
+        if self.crash_on in to:
+            raise ConnectionResetError("smtp pool lost")
+        self.calls.append(to)
+        return [
+            {"success": False, "error": "550", "reason": "recipient_refused"} if "bounce" in address
+            else {"success": True, "rejected": {}}
+            for address in to
+        ]
+
+
+def _tenant(id, email):
+    return SimpleNamespace(id=id, tenant_email=email, tenant_name=f"Tenant {id}")
+
+
+def _campaign(**kwargs):
+    return NotificationCampaign(
+        id=uuid.uuid4(), kind=NotificationKind.maintenance, subject="Scheduled maintenance",
+        content={"paragraphs": ["We will be down for 30 minutes."], "details": ["Sunday 02:00 UTC"]},
+        include_inactive=False, batch_size=3, status=NotificationCampaignStatus.running,
+        sent=0, failed=0, failure_reasons={}, failure_domains={}, **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_domain_rate_limiter():
+    clock = FakeClock()
+    limiter = DomainRateLimiter(rate=2, overrides=parse_rate_limits(" Gmail.com=4 ,"), clock=clock, sleep=clock.sleep)
+    assert limiter.overrides == {"gmail.com": 4.0} and limiter.burst("gmail.com") == 4
+
+    await limiter.acquire("example.com", 2)
+    await limiter.acquire("gmail.com", 4)
+    assert clock.sleeps == []
+    await limiter.acquire("example.com", 2)
+    await limiter.acquire("example.com", 1)
+    # example.com refills at 2/s: 1s for two more tokens, then 0.5s for one
+    assert clock.sleeps == [1.0, 0.5]
+
+
+@pytest.mark.asyncio
+async def test_batch_groups_by_domain_and_reports_failures():
+    clock = FakeClock()
+    transport = FakeTransport()
+    dispatcher = NotificationDispatcher(
+        transport=transport, limiter=DomainRateLimiter(rate=2, overrides={}, clock=clock, sleep=clock.sleep),
+    )
+    rows = [_tenant(1, "a@x.com"), _tenant(2, "bounce@y.com"), _tenant(3, "b@x.com"), _tenant(4, "c@x.com")]
+    messages = dispatcher.build_messages(_campaign(), rows)
+    html = messages[0].get_payload()[1].get_payload(decode=True).decode()
+    assert "Hi Tenant 1," in html and "Sunday 02:00 UTC" in html and "Scheduled maintenance" in html
+
+    emails = [row.tenant_email for row in rows]
+    results = await dispatcher.send_batch(emails, messages)
+    assert [result["success"] for result in results] == [True, False, True, True]
+    # x.com is sent two at a time, the third waits for the bucket to refill
+    assert sorted(transport.calls) == [["a@x.com", "b@x.com"], ["bounce@y.com"], ["c@x.com"]]
+    assert clock.sleeps == [0.5]
+
+    report = notification_dispatch.DispatchReport(seconds=2.0)
+    report.add(results, emails)
+    assert report.messages_per_second == 2.0
+    assert report.reasons == {"recipient_refused": 1} and report.domains == {"y.com": 1}
+    assert "recipient_refused=1" in str(report) and "y.com=1" in str(report)
+
+
+class FakeSession:
+    def __init__(self, campaign):
+        self.campaign = campaign
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, key):
+        return self.campaign
+
+    async def execute(self, stmt):
+        if stmt.is_update:
+            self.campaign.status = stmt.compile().params["status"]
+        return MagicMock(scalars=MagicMock(return_value=MagicMock(one=MagicMock(return_value=self.campaign))))
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_crashed_run_resumes_after_the_last_batch(monkeypatch):
+    tenants = [_tenant(i, f"user{i}@example.com") for i in range(1, 8)]
+    campaign = _campaign()
+    cursors = []
+
+    async def stream_recipients(db, campaign):
+        cursors.append(campaign.last_tenant_id)
+        pending = [t for t in tenants if campaign.last_tenant_id is None or t.id > campaign.last_tenant_id]
+        for start in range(0, len(pending), campaign.batch_size):
+            yield pending[start:start + campaign.batch_size]
+
+    monkeypatch.setattr(notification_dispatch, "stream_recipients", stream_recipients)
+    session = FakeSession(campaign)
+    limiter = DomainRateLimiter(rate=100, overrides={})
+
+    with pytest.raises(ConnectionResetError):
+        await NotificationDispatcher(FakeTransport(crash_on="user5@example.com"), limiter=limiter).run(lambda: session, campaign.id)
+    assert campaign.status == NotificationCampaignStatus.failed and campaign.last_tenant_id == 3 and campaign.sent == 3
+
+    transport = FakeTransport()
+    report = await NotificationDispatcher(transport, limiter=limiter).run(lambda: session, campaign.id)
+    assert cursors == [None, 3]
+    assert [address for call in transport.calls for address in call] == [f"user{i}@example.com" for i in range(4, 8)]
+    assert report.sent == 4 and report.batches == 2
+    assert campaign.status == NotificationCampaignStatus.completed and campaign.sent == 7 and campaign.last_tenant_id == 7
+
+    sql = str(notification_dispatch.recipients_query(campaign).compile(dialect=postgresql.asyncpg.dialect()))
+    assert "tenants.id > " in sql and "tenants.is_active IS true" in sql and sql.endswith("ORDER BY tenants.id")
@@ -0,0 +1,105 @@
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.controllers.account_controller import AccountController
+from app.core.status_cache import StatusETagCache, etag_matches, onboarding_status_cache, status_etag
+from app.db.database import get_db
+from app.models.subscriptions import SubscriptionStatus
+from app.models.transactions import TransactionStatus
+from app.routers import accounts
+
+TENANT_UUID = uuid.uuid4()
+
+
+def _row(**overrides):
+    values = dict(
+        link_tenant_uuid=TENANT_UUID, tenant_id=7, subscription_status=SubscriptionStatus.active,
+        transaction_id=uuid.uuid4(), amount=Decimal("3999.00"), currency="INR",
+        status=TransactionStatus.SUCCESS, provider_order_id="order_1", transaction_count=3, success_count=2,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _db(row):
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(first=MagicMock(return_value=row)))
+    return db
+
+
+def test_status_query_aggregates_in_sql():
+    stmt = AccountController(db=None, tenant_uuid=TENANT_UUID)._onboarding_status_query(5)
+    sql = str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+    assert "count(*) OVER () AS transaction_count" in sql
+    assert "count(*) FILTER (WHERE transactions.status = " in sql
+    assert "LEFT OUTER JOIN LATERAL" in sql and "LIMIT" in sql
+
+
+@pytest.mark.asyncio
+async def test_check_onboarding_status_is_one_query():
+    db = _db(_row())
+    controller = AccountController(db=db, tenant_uuid=TENANT_UUID)
+    status = await controller.check_onboarding_status(request_id=5)
+
+    db.execute.assert_awaited_once()
+    assert controller.tenant_id == 7
+    assert status["status"] == "SUCCESS" and status["subscription_status"] == "active"
+    assert status["transaction_count"] == 3 and status["refund_eligible"] is True
+    assert "history" not in status
+
+    with pytest.raises(ValueError, match="does not belong"):
+        await AccountController(db=_db(_row(link_tenant_uuid=uuid.uuid4())), tenant_uuid=TENANT_UUID).check_onboarding_status(5)
+    with pytest.raises(ValueError, match="Invalid request ID"):
+        await AccountController(db=_db(None), tenant_uuid=TENANT_UUID).check_onboarding_status(5)
+
+
+def test_etag_cache_invalidates_on_bump_and_ttl():
+    clock = SimpleNamespace(now=0.0)
+    cache = StatusETagCache(ttl=5, clock=lambda: clock.now)
+    etag = status_etag({"status": "PENDING", "amount": Decimal("10.00")})
+    cache.store(("t", 1), 7, etag)
+    assert cache.current_etag(("t", 1)) == etag
+    assert etag_matches(f'W/{etag}, "other"', etag)
+
+    cache.bump(7)
+    assert cache.current_etag(("t", 1)) is None
+
+    cache.store(("t", 1), 7, etag)
+    clock.now = 6
+    assert cache.current_etag(("t", 1)) is None
+
+
+def test_unchanged_poll_returns_304_without_querying(monkeypatch):
+    calls = []
+
+    async def check_onboarding_status(self, request_id):
+        calls.append(request_id)
+        self.tenant_id = 7
+        return {"valid": True, "status": "PENDING", "message": "Transaction is current PENDING"}
+
+    monkeypatch.setattr(AccountController, "check_onboarding_status", check_onboarding_status)
+    monkeypatch.setattr(onboarding_status_cache, "_entries", type(onboarding_status_cache._entries)())
+    app = FastAPI()
+    app.include_router(accounts.router)
+    app.dependency_overrides[get_db] = lambda: None
+    client = TestClient(app)
+    body = {"tenant_uuid": str(TENANT_UUID), "request_id": 5}
+
+    first = client.post("/account/check-onboarding-status", json=body)
+    assert first.status_code == 200 and first.headers["etag"]
+
+    second = client.post("/account/check-onboarding-status", json=body, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert calls == [5]
+
+    onboarding_status_cache.bump(7)
+    third = client.post("/account/check-onboarding-status", json=body, headers={"If-None-Match": first.headers["etag"]})
+    assert third.status_code == 304
+    assert calls == [5, 5]
@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.orders import LineItemKind, Order, OrderLineItem
+from app.services import order_line_items
+from app.services.order_line_items import invoice_lines, line_items_from_snapshot
+
+APP_ID, FEATURE_ID = uuid.uuid4(), uuid.uuid4()
+
+
+def _order(items, discount="0.00"):
+    return Order(
+        id=uuid.uuid4(), created_at=datetime(2026, 10, 19, tzinfo=timezone.utc), tenant_id=7,
+        currency="INR", discount_amount=Decimal(discount), items=items,
+    )
+
+
+def test_snapshot_converts_to_typed_rows():
+    order = _order({
+        "plan_code": "pro", "plan_price": 999.0,
+        "apps": [{
+            "app_id": str(APP_ID), "name": "CRM", "base_price": 499.0,
+            "features": [
+                {"feature_id": str(FEATURE_ID), "code": "crm:sms", "price": 99.0, "is_base": False},
+                {"code": "crm:core", "price": 0},  # older snapshots have no feature_id
+            ],
+        }],
+        "coupon": {"code": "WELCOME10", "percentage": 0.1},
+    }, discount="159.70")
+    rows = line_items_from_snapshot(order)
+
+    assert [row["kind"] for row in rows] == [
+        LineItemKind.plan, LineItemKind.app, LineItemKind.feature, LineItemKind.feature, LineItemKind.coupon,
+    ]
+    assert [row["position"] for row in rows] == [0, 1, 2, 3, 4]
+    assert rows[0]["plan_code"] == "pro" and rows[0]["amount"] == Decimal("999.00")
+    assert rows[2]["app_id"] == APP_ID and rows[2]["feature_id"] == FEATURE_ID and rows[2]["unit_price"] == Decimal("99.00")
+    assert rows[3]["feature_id"] is None and rows[3]["code"] == "crm:core"
+    assert rows[4]["amount"] == Decimal("-159.70")
+    assert all(row["order_id"] == order.id and row["tenant_id"] == 7 for row in rows)
+
+    lines = invoice_lines(OrderLineItem(**row) for row in rows)
+    assert lines == [
+        {"name": "Plan: pro", "price": 999.0},
+        {"name": "App: CRM", "price": 499.0},
+        {"name": "  - Addon: crm:sms", "price": 99.0},
+        {"name": "  - Included: crm:core", "price": 0.0},
+    ]
+    assert line_items_from_snapshot(_order(None)) == []
+
+
+class FakeSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.executed = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        self.executed.append((stmt, params))
+        orders = self.pages.pop(0) if params is None else []
+        return MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=orders))))
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.mark.asyncio
+async def test_backfill_converts_in_batches():
+    snapshot = {"plan_code": "basic", "plan_price": 0, "apps": [{"app_id": str(APP_ID), "name": "CRM", "base_price": 10}]}
+    session = FakeSession([[_order(snapshot), _order(snapshot)], [_order(snapshot)]])
+    converted = await order_line_items.backfill_line_items(lambda: session, batch_size=2)
+
+    assert converted == 3 and session.commits == 2
+    select_sql = str(session.executed[0][0].compile(dialect=postgresql.asyncpg.dialect()))
+    assert "NOT (EXISTS (SELECT" in select_sql and "orders.items IS NOT NULL" in select_sql
+    insert_stmt, rows = session.executed[1]
+    assert str(insert_stmt).startswith("INSERT INTO order_line_items") and len(rows) == 4
+    assert "orders.id > " in str(session.executed[2][0].compile(dialect=postgresql.asyncpg.dialect()))
@@ -0,0 +1,120 @@
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.db.partitioning import (
+    MonthPartition,
+    add_months,
+    archive_old_partitions,
+    create_partition,
+    created_between,
+    first_recent,
+    parse_partition_name,
+    partition_name,
+)
+from app.models.transactions import Transaction
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+class RecordingConnection:
+    """AsyncConnection stand-in that records SQL text and answers catalog reads."""
+
+    def __init__(self, partitions=()):
+        self.statements = []
+        self.partitions = list(partitions)
+
+    async def execute(self, clause, params=None):
+        sql = str(clause)
+        self.statements.append(sql)
+        result = MagicMock(rowcount=0)
+        if "pg_inherits" in sql:
+            result.__iter__.return_value = iter([(name,) for name in self.partitions])
+        elif "information_schema.columns" in sql:
+            result.__iter__.return_value = iter([("payment_details",)])
+        return result
+
+    async def scalar(self, clause, params=None):
+        return "160002"
+
+
+class FakeEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return self._context()
+
+    begin = connect
+
+    def _context(self):
+        conn = self.conn
+
+        class Context:
+            async def __aenter__(self):
+                return conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Context()
+
+
+def test_month_arithmetic_and_names_round_trip():
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    name = partition_name("saas_subscription_billings", date(2026, 3, 1))
+    assert name == "saas_subscription_billings_p2026_03"
+    assert parse_partition_name(name) == date(2026, 3, 1)
+    assert parse_partition_name("transactions_default") is None
+    assert MonthPartition("orders", date(2026, 12, 1)).bounds_sql() == (
+        "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')"
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_partition_moves_default_rows_before_attaching():
+    conn = RecordingConnection()
+    await create_partition(conn, MonthPartition("transactions", date(2026, 10, 1)))
+    lock, create, move, attach = conn.statements
+    assert lock.startswith("LOCK TABLE transactions")
+    assert "CREATE TABLE transactions_p2026_10 (LIKE transactions" in create
+    assert "DELETE FROM transactions_default WHERE created_at >= '2026-10-01 00:00:00+00'" in move
+    assert attach.startswith("ALTER TABLE transactions ATTACH PARTITION transactions_p2026_10")
+
+
+@pytest.mark.asyncio
+async def test_archive_only_touches_partitions_past_retention():
+    conn = RecordingConnection(["orders_p2024_01", "orders_p2024_02", "orders_p2026_10", "orders_default"])
+    archived = await archive_old_partitions(FakeEngine(conn), "orders", retain_months=32, today=date(2026, 10, 19))
+    assert archived == ["orders_p2024_01"]
+    sql = "\n".join(conn.statements)
+    assert "DETACH PARTITION orders_p2024_01" in sql
+    assert "ALTER TABLE archive.orders_p2024_01 ALTER COLUMN payment_details SET COMPRESSION lz4" in sql
+    assert "orders_p2024_02" not in sql
+
+
+@pytest.mark.asyncio
+async def test_first_recent_prunes_then_falls_back():
+    found = object()
+    statements = []
+
+    async def execute(stmt):
+        statements.append(stmt)
+        result = MagicMock()
+        result.scalars.return_value.first.return_value = None if len(statements) == 1 else found
+        return result
+
+    db = MagicMock(execute=execute)
+    stmt = select(Transaction).where(Transaction.provider_order_id == "order_123")
+    now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+    assert await first_recent(db, stmt, Transaction, now=now) is found
+
+    assert "transactions.created_at >= $2" in _sql(statements[0])
+    assert "created_at" not in _sql(statements[1]).split("WHERE", 1)[1]
+    assert "transactions.created_at BETWEEN" in _sql(select(Transaction.id).where(created_between(Transaction, now, now)))
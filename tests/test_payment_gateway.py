@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.fake_gateway import create_fake_gateway_app
+from app.services.payment_gateway import (
+    CircuitBreaker,
+    GatewayError,
+    GatewayRejected,
+    GatewayUnavailable,
+    RazorpayGateway,
+)
+
+
+def _gateway(app, **kwargs):
+    kwargs.setdefault("backoff_base", 0)
+    return RazorpayGateway("key", "secret", base_url="http://fake/v1", transport=httpx.ASGITransport(app=app), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_orders_round_trip_through_fake_gateway():
+    gateway = _gateway(create_fake_gateway_app())
+    order = await gateway.create_order(49900, "INR", "rcpt_1", {"plan_code": "PRO"})
+    assert (await gateway.fetch_order(order["id"]))["notes"] == {"plan_code": "PRO"}
+
+    with pytest.raises(GatewayRejected) as rejected:
+        await gateway.create_order(10, "INR", "rcpt_2")
+    assert rejected.value.status_code == 400
+    assert gateway.breaker.state == "closed"
+    assert gateway.metrics.snapshot()["orders.create"]["calls"] == 2
+    await gateway.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reads_are_retried_but_order_creation_is_not():
+    app = create_fake_gateway_app(error_rate=1.0)
+    gateway = _gateway(app, max_retries=2, breaker=CircuitBreaker(failure_threshold=100))
+
+    with pytest.raises(GatewayUnavailable):
+        await gateway.fetch_payment("pay_1")
+    assert app.state.requests == 3
+
+    with pytest.raises(GatewayUnavailable):
+        await gateway.create_order(49900, "INR", "rcpt_1")
+    assert app.state.requests == 4
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_then_half_opens():
+    clock = [0.0]
+    app = create_fake_gateway_app(error_rate=1.0)
+    gateway = _gateway(app, max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: clock[0]))
+
+    for _ in range(2):
+        with pytest.raises(GatewayUnavailable):
+            await gateway.fetch_order("order_1")
+    assert gateway.breaker.state == "open"
+    with pytest.raises(GatewayUnavailable, match="circuit is open"):
+        await gateway.fetch_order("order_1")
+    assert app.state.requests == 2
+
+    clock[0] = 31
+    assert gateway.breaker.state == "half_open"
+    # The gateway recovers: one trial call goes through (a 404 here) and closes the circuit
+    gateway._client, gateway._transport = None, httpx.ASGITransport(app=create_fake_gateway_app())
+    with pytest.raises(GatewayRejected):
+        await gateway.fetch_order("order_1")
+    assert gateway.breaker.state == "closed"
+
+
+class _Transport(httpx.AsyncBaseTransport):
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def handle_async_request(self, request):
+        return await self.handler(request)
+
+
+@pytest.mark.asyncio
+async def test_half_open_trial_is_released_when_cancelled_or_broken():
+    clock = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 31
+
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    gateway = RazorpayGateway("key", "secret", base_url="http://fake/v1", breaker=breaker, max_retries=0, transport=_Transport(hang))
+    trial = asyncio.create_task(gateway.fetch_order("order_1"))
+    await asyncio.sleep(0.01)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    # Still half-open, and the next call may be the trial
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.release()
+
+    async def not_json(request):
+        return httpx.Response(200, content=b"<html>")
+
+    gateway._client, gateway._transport = None, _Transport(not_json)
+    with pytest.raises(GatewayError, match="not JSON"):
+        await gateway.fetch_order("order_1")
+    assert breaker.state == "open"
+    clock[0] = 62
+    assert breaker.allow()
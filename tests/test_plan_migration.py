@@ -0,0 +1,141 @@
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.plan_migrations import PlanMigration, PlanMigrationStatus
+from app.models.plans import BillingCycleEnum, CurrencyEnum
+from app.services import plan_migration
+from app.services.plan_migration import ChunkResult, PlanMigrationError
+
+EFFECTIVE = date(2026, 10, 19)
+
+
+def _version(price, features=(), currency=CurrencyEnum.INR, max_users=5, code="pro"):
+    return SimpleNamespace(
+        id=uuid.uuid4(), price=Decimal(price), currency=currency, billing_cycle=BillingCycleEnum.monthly,
+        version=1, plan=SimpleNamespace(plan_code=code), features=[SimpleNamespace(code=c) for c in features],
+        max_users=max_users, max_branches=1, storage_limit_gb=10,
+    )
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+def test_diff_and_compatibility():
+    source = _version("999.00", ["crm:core", "crm:sms"])
+    target = _version("1499.00", ["crm:core", "crm:reports"], max_users=20, code="business")
+    diff = plan_migration.version_diff(source, target)
+    assert diff["price_delta"] == Decimal("500.00")
+    assert diff["features_added"] == ["crm:reports"] and diff["features_removed"] == ["crm:sms"]
+    assert diff["limits"] == {"max_users": {"from": 5, "to": 20}}
+
+    with pytest.raises(PlanMigrationError, match="same"):
+        plan_migration.check_compatible(source, source)
+    with pytest.raises(PlanMigrationError, match="prorate"):
+        plan_migration.check_compatible(source, _version("10.00", currency=CurrencyEnum.USD))
+    plan_migration.check_compatible(source, _version("10.00", currency=CurrencyEnum.USD), prorate=False)
+
+
+@pytest.mark.asyncio
+async def test_chunk_is_set_based(monkeypatch):
+    source, target = _version("1000.00"), _version("1300.00", code="business")
+    sub_a, sub_b = sorted([uuid.uuid4(), uuid.uuid4()])
+    rows = [
+        SimpleNamespace(id=uuid.uuid4(), subscription_id=sub_a, tenant_id=7, proration=Decimal("150.00")),
+        SimpleNamespace(id=uuid.uuid4(), subscription_id=sub_b, tenant_id=8, proration=Decimal("300.00")),
+    ]
+    statements = []
+
+    async def execute(stmt):
+        statements.append(stmt)
+        return MagicMock(all=MagicMock(return_value=rows if len(statements) == 1 else []))
+
+    enqueue = AsyncMock()
+    monkeypatch.setattr(plan_migration, "enqueue", enqueue)
+    db = MagicMock(execute=execute)
+    result = await plan_migration.migrate_chunk(db, source, target, EFFECTIVE, "plan-migration:m1", after=uuid.uuid4(), limit=2)
+
+    assert result.subscription_ids == [sub_a, sub_b] and result.tenant_ids == {7, 8}
+    assert result.proration_total == Decimal("450.00")
+    lock, billing, new_cycles, close, repoint = [_sql(stmt) for stmt in statements]
+    assert "FOR UPDATE OF subscription_cycles" in lock and "GROUP BY subscription_cycles.subscription_id" in lock
+    assert "subscription_cycles.subscription_id > " in lock and "LIMIT" in lock
+    assert billing.startswith("INSERT INTO saas_subscription_billings") and "round(" in billing
+    assert new_cycles.startswith("INSERT INTO subscription_cycles") and "gen_random_uuid()" in new_cycles
+    assert close.startswith("UPDATE subscription_cycles SET end_date=") and "start_date < " in close
+    assert repoint.startswith("UPDATE subscription_cycles SET plan_version_id=") and "start_date >= " in repoint
+    payload = enqueue.await_args.args[2]
+    assert payload == {"tenant_ids": [7, 8], "plan_version_id": str(target.id)}
+    assert enqueue.await_args.kwargs["idempotency_key"] == f"plan-migration:m1:entitlements:{sub_b}"
+
+
+class FakeSession:
+    def __init__(self, migration):
+        self.migration = migration
+        self.commits = 0
+        self.executed = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, key):
+        return self.migration
+
+    async def execute(self, stmt):
+        self.executed.append(stmt)
+        if stmt.is_update:
+            self.migration.status = PlanMigrationStatus.failed
+        return MagicMock(scalars=MagicMock(return_value=MagicMock(one=MagicMock(return_value=self.migration))))
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_run_checkpoints_throttles_and_resumes(monkeypatch):
+    migration = PlanMigration(
+        id=uuid.uuid4(), from_version_id=uuid.uuid4(), to_version_id=uuid.uuid4(), effective_date=EFFECTIVE,
+        prorate=True, chunk_size=2, status=PlanMigrationStatus.running, subscriptions_migrated=0,
+        proration_total=Decimal("0.00"),
+    )
+    session = FakeSession(migration)
+    monkeypatch.setattr(plan_migration, "load_versions", AsyncMock(return_value=(_version("1.00"), _version("2.00"))))
+    first, second = uuid.uuid4(), uuid.uuid4()
+    chunks = [
+        ChunkResult([uuid.uuid4(), first], {1}, 2, Decimal("10.00")),
+        RuntimeError("connection reset"),
+        ChunkResult([second], {2}, 1, Decimal("5.00")),
+        ChunkResult(),
+    ]
+    cursors = []
+
+    async def migrate_chunk(db, source, target, effective_date, reference, after=None, limit=None, prorate=True):
+        cursors.append(after)
+        chunk = chunks.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
+
+    monkeypatch.setattr(plan_migration, "migrate_chunk", migrate_chunk)
+    sleep = AsyncMock()
+    with pytest.raises(RuntimeError):
+        await plan_migration.run_migration(lambda: session, migration.id, throttle_seconds=0.5, sleep=sleep)
+    assert migration.status == PlanMigrationStatus.failed and migration.last_subscription_id == first
+
+    done = await plan_migration.run_migration(lambda: session, migration.id, throttle_seconds=0.5, sleep=sleep)
+    assert cursors == [None, first, first, second]
+    assert done.status == PlanMigrationStatus.completed and done.last_error is None
+    assert done.subscriptions_migrated == 3 and done.proration_total == Decimal("15.00")
+    assert [call.args for call in sleep.await_args_list] == [(0.5,), (0.5,)]
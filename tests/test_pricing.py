@@ -0,0 +1,117 @@
+import uuid
+from types import MappingProxyType
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.database import get_db
+from app.routers import pricing as pricing_router
+from app.services.pricing import (
+    AppPrice,
+    CatalogSnapshot,
+    FeaturePrice,
+    PlanPrice,
+    PricingCatalog,
+    QuoteError,
+    load_catalog,
+)
+
+CRM = uuid.uuid4()
+SMS = FeaturePrice(uuid.uuid4(), "crm:sms", False, 200.0)
+LEADS = FeaturePrice(uuid.uuid4(), "crm:leads", True, 999.0)
+
+
+def _catalog():
+    crm = AppPrice(
+        CRM, "CRM",
+        MappingProxyType({("INR", "IN"): 500.0, ("USD", "US"): 9.0}),
+        MappingProxyType({"crm:sms": (SMS,), "crm:leads": (LEADS,)}),
+    )
+    return CatalogSnapshot(
+        plans=MappingProxyType({
+            plan.key: plan
+            for plan in (PlanPrice("PRO", uuid.uuid4(), 1000.0), PlanPrice("PRO", uuid.uuid4(), 19.0, "USD", "US"))
+        }),
+        apps=MappingProxyType({CRM: crm}),
+    )
+
+
+def test_quote_matches_verify_payment_arithmetic():
+    quote = _catalog().quote("PRO", [CRM, uuid.uuid4()], {CRM: ["crm:sms", "crm:leads", "crm:nope"]}, "saas20")
+    assert quote.apps_price == 700.0 and quote.subtotal == 1700.0
+    assert [f["code"] for f in quote.apps[0]["features"]] == ["crm:sms", "crm:leads"]
+    assert quote.apps[0]["features"][1]["price"] == 0.0  # base features are free
+    assert quote.discount_amount == pytest.approx(340.0)
+    assert quote.tax == pytest.approx(1360.0 * 0.18)
+    assert quote.grand_total == pytest.approx(1360.0 * 1.18)
+
+    # Unknown coupons no longer take the client's percentage
+    assert _catalog().quote("PRO", coupon_code="FREEBIE").to_dict()["coupon"] == {"code": "FREEBIE", "percentage": 0.0, "valid": False}
+    assert _catalog().quote("FREE_TRIAL").grand_total == 0.0
+    with pytest.raises(QuoteError, match="Plan not found"):
+        _catalog().quote("GOLD")
+
+    # Plan and app prices come from the same region and cycle
+    usd = _catalog().quote("PRO", [CRM], currency="USD", country="US")
+    assert usd.plan_price == 19.0 and usd.subtotal == 28.0
+    with pytest.raises(QuoteError, match="Plan not found"):
+        _catalog().quote("PRO", currency="USD", country="IN")
+    with pytest.raises(QuoteError, match="Plan not found"):
+        _catalog().quote("PRO", billing_cycle="yearly")
+
+
+@pytest.mark.asyncio
+async def test_load_catalog_keeps_current_plan_version_per_region_in_four_queries():
+    old, new, usd, yearly = uuid.uuid4(), uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    results = iter([
+        [
+            ("PRO", old, 900, "INR", "IN", "monthly"),
+            ("PRO", usd, 19, "USD", "US", "monthly"),
+            ("PRO", yearly, 9000, "INR", "IN", "yearly"),
+            ("PRO", new, 1000, "INR", "IN", "monthly"),
+        ],
+        [(CRM, "INR", "IN", 500)],
+        [(SMS.id, CRM, "crm:sms", False, 200)],
+        [(CRM, "CRM")],
+    ])
+    db = MagicMock(execute=AsyncMock(side_effect=lambda stmt: next(results)))
+    catalog = await load_catalog(db)
+    assert db.execute.await_count == 4
+    assert catalog.plans[("PRO", "INR", "IN", "monthly")].version_id == new
+    assert catalog.plans[("PRO", "USD", "US", "monthly")].price == 19.0
+    assert catalog.plans[("PRO", "INR", "IN", "yearly")].version_id == yearly
+    order_by = db.execute.await_args_list[0].args[0]._order_by_clauses
+    assert "is_current" in str(order_by[0])
+    assert catalog.apps[CRM].prices[("INR", "IN")] == 500.0
+    assert catalog.apps[CRM].features["crm:sms"] == (SMS,)
+
+
+@pytest.mark.asyncio
+async def test_catalog_reloads_after_invalidate_and_ttl():
+    clock = [0.0]
+    loader = AsyncMock(side_effect=lambda db: _catalog())
+    catalog = PricingCatalog(ttl=60, loader=loader, clock=lambda: clock[0])
+    first = await catalog.get(None)
+    assert await catalog.get(None) is first and loader.await_count == 1
+
+    catalog.invalidate()
+    assert await catalog.get(None) is not first and loader.await_count == 2
+    clock[0] = 61
+    await catalog.get(None)
+    assert loader.await_count == 3
+
+
+def test_quote_endpoint(monkeypatch):
+    monkeypatch.setattr(pricing_router.pricing_catalog, "get", AsyncMock(return_value=_catalog()))
+    app = FastAPI()
+    app.include_router(pricing_router.router)
+    app.dependency_overrides[get_db] = lambda: None
+    client = TestClient(app)
+
+    body = client.post("/pricing/quote", json={"plan_code": "PRO", "apps": [str(CRM)], "currency": "USD", "country": "US"}).json()
+    assert body["data"]["apps_price"] == 9.0 and body["data"]["plan_price"] == 19.0
+    assert body["data"]["currency"] == "USD"
+    assert client.post("/pricing/quote", json={"plan_code": "PRO", "currency": "USD"}).status_code == 404
+    assert client.post("/pricing/quote", json={"plan_code": "GOLD"}).status_code == 404
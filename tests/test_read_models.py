@@ -0,0 +1,146 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.dialects import postgresql
+
+from app.core.response import ResponseHandler
+from app.db.read_models import (
+    AppRecord,
+    OAuthClientRecord,
+    TenantRolesRecord,
+    UserRecord,
+    _iso_utc,
+    apps_query,
+    tenants_with_roles_query,
+)
+from app.models.apps import App, AppPricing
+from app.models.auth import User
+from app.models.features import Feature
+from app.models.plans import CountryEnum, CurrencyEnum
+from app.schemas.apps import AppOut
+
+
+NOW = datetime(2026, 3, 4, 5, 6, 7, 123456, tzinfo=timezone.utc)
+NOW_Z = "2026-03-04T05:06:07.123456Z"
+
+
+def _compile(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+def _orm_app():
+    app_id = uuid.UUID("a0a0a0a0-0000-4000-8000-000000000001")
+    feature_id = uuid.UUID("f0f0f0f0-0000-4000-8000-000000000001")
+    return App(
+        id=app_id,
+        code="CRM",
+        name="CRM Suite",
+        description=None,
+        icon=None,
+        is_active=True,
+        created_at=NOW,
+        updated_at=NOW,
+        pricing=[
+            AppPricing(price=Decimal("10.00"), currency=CurrencyEnum.USD, country=CountryEnum.US, is_active=True, created_at=NOW),
+            AppPricing(price=Decimal("3999.00"), currency=CurrencyEnum.INR, country=CountryEnum.IN, is_active=True, created_at=NOW),
+        ],
+        features=[
+            Feature(
+                id=feature_id, code="crm:leads", name="Leads", description=None, is_base_feature=True,
+                addon_price=Decimal("0.00"), currency=CurrencyEnum.INR, status="active",
+                created_at=NOW, updated_at=NOW,
+            )
+        ],
+    )
+
+
+def _app_record(app):
+    # Mirrors the row apps_query() returns: nested rows come back as JSON.
+    return AppRecord(
+        id=app.id, code=app.code, name=app.name, description=app.description, icon=app.icon,
+        is_active=app.is_active, created_at=app.created_at, updated_at=app.updated_at,
+        pricing=[
+            {"price": str(p.price), "currency": p.currency.value, "country": p.country.value,
+             "is_active": p.is_active, "created_at": NOW_Z}
+            for p in app.pricing
+        ],
+        features=[
+            {"code": f.code, "name": f.name, "description": f.description, "is_base_feature": f.is_base_feature,
+             "addon_price": str(f.addon_price), "currency": f.currency.value, "status": f.status,
+             "id": str(f.id), "created_at": NOW_Z, "updated_at": NOW_Z}
+            for f in app.features
+        ],
+    )
+
+
+def test_app_record_matches_appout_response():
+    app = _orm_app()
+    app_out = AppOut.from_orm(app)
+    app_out.base_price = app.pricing[1].price
+    app_out.primary_currency = app.pricing[1].currency
+    app_out.primary_country = app.pricing[1].country
+    legacy = json.loads(ResponseHandler.success(message="ok", data=jsonable_encoder([app_out])).body)
+
+    current = json.loads(ResponseHandler.success(message="ok", data=[_app_record(app).to_dict()]).body)
+    assert current == legacy
+    assert list(current["data"][0]) == list(legacy["data"][0])
+
+
+def test_app_record_falls_back_to_default_price():
+    app = _orm_app()
+    app.pricing[1].is_active = False
+    data = _app_record(app).to_dict()
+    assert (data["base_price"], data["primary_currency"], data["primary_country"]) == (1000.0, "INR", "IN")
+
+
+def test_user_and_client_records_match_orm_to_dict():
+    user = User(
+        id=7, first_name="A", last_name="B", username="ab", email="ab@x.io", phone_number=None,
+        hashed_password="hash", tenant_id=3, is_active=True, is_root_user=False, is_superuser=False,
+    )
+    record = UserRecord(**{name: getattr(user, name) for name in UserRecord._fields})
+    assert record.to_dict() == user.to_dict()
+    assert list(record.to_dict()) == list(user.to_dict())
+
+    client = OAuthClientRecord(
+        1, "app", "cid", "confidential", ["authorization_code"], ["https://x/cb"], None, False, None,
+        "client_secret_post", ["openid"], ["code"], ["authorization_code"], "RS256", datetime(2026, 1, 1), None,
+    )
+    assert client.to_dict()["created_at"] == "2026-01-01T00:00:00"
+    assert "client_secret" not in client.to_dict()
+
+
+def test_tenant_roles_record_shape():
+    tenant_uuid = uuid.uuid4()
+    record = TenantRolesRecord(tenant_uuid, "acme", True, NOW, ["admin", "viewer"])
+    assert record.to_dict() == {
+        "tenant_id": str(tenant_uuid), "name": "acme", "roles": ["admin", "viewer"],
+        "isActive": True, "created_at": NOW,
+    }
+
+
+def test_queries_aggregate_nested_rows_in_one_statement():
+    sql = _compile(tenants_with_roles_query())
+    assert "json_agg(auth_roles.role_name ORDER BY auth_roles.id)" in sql
+    assert "JOIN" not in sql
+
+    sql = _compile(apps_query())
+    assert sql.count("json_agg(") == 2
+    assert "saas_apps.is_active IS true" in sql
+
+
+def test_nested_timestamps_drop_a_zero_fraction_like_pydantic():
+    whole = NOW.replace(microsecond=0)
+    assert TypeAdapter(datetime).dump_python(NOW, mode="json") == NOW_Z
+    assert TypeAdapter(datetime).dump_python(whole, mode="json") == "2026-03-04T05:06:07Z"
+
+    sql = str(_iso_utc(Feature.created_at).compile(
+        dialect=postgresql.asyncpg.dialect(), compile_kwargs={"literal_binds": True},
+    ))
+    assert sql.startswith("""to_char(timezone('UTC', saas_features.created_at), 'YYYY-MM-DD"T"HH24:MI:SS') || CASE""")
+    assert "WHEN (date_trunc('second', timezone('UTC', saas_features.created_at)) = " in sql
+    assert "THEN '' ELSE to_char(timezone('UTC', saas_features.created_at), '.US') END || 'Z'" in sql
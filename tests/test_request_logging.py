@@ -0,0 +1,96 @@
+import time
+from unittest.mock import MagicMock
+
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.logger import request_id_var
+from app.core.utils import get_device_type
+from app.middlewares import loggerMiddleware
+from app.middlewares.loggerMiddleware import LoggerMiddleware
+
+
+def _app(**options):
+    app = FastAPI()
+    app.add_middleware(LoggerMiddleware, **options)
+    seen = []
+
+    @app.get("/ok")
+    async def ok():
+        seen.append(request_id_var.get())
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]), media_type="text/plain")
+
+    @app.get("/later")
+    async def later(background_tasks: BackgroundTasks):
+        background_tasks.add_task(time.sleep, 0.3)
+        return {"ok": True}
+
+    @app.get("/events")
+    async def events():
+        def lines():
+            yield b"data: 1\n\n"
+            time.sleep(0.3)
+            yield b"data: 2\n\n"
+        return StreamingResponse(lines(), media_type="text/event-stream")
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app, seen
+
+
+def test_timing_headers_request_id_and_sampling(monkeypatch):
+    logger = MagicMock()
+    monkeypatch.setattr(loggerMiddleware, "logger", logger)
+    app, seen = _app(sample_rate=0.0, slow_ms=60_000)
+    client = TestClient(app, raise_server_exceptions=False)
+
+    response = client.get("/ok", headers={"X-Request-ID": "abc-123", "User-Agent": "Mozilla/5.0 (iPhone)"})
+    assert response.status_code == 200 and response.headers["x-request-id"] == "abc-123"
+    assert response.headers["server-timing"].startswith("app;dur=")
+    assert seen == ["abc-123"] and request_id_var.get() is None
+    # Sampled out: nothing logged for a fast 200
+    assert not logger.info.called
+
+    assert client.get("/stream").text == "abc"
+    generated = client.get("/ok", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"]
+    assert generated != "bad id\n" and len(generated) == 32
+
+    # Errors are always logged, with the exception
+    assert client.get("/boom").status_code == 500
+    args, kwargs = logger.error.call_args
+    assert args[1:4] == ("GET", "/boom", 500) and isinstance(kwargs["exc_info"], RuntimeError)
+
+    # So are slow requests
+    logger.reset_mock()
+    app, _ = _app(sample_rate=0.0, slow_ms=0)
+    TestClient(app).get("/ok?page=2", headers={"User-Agent": "Mozilla/5.0 (iPhone)"})
+    fields = logger.warning.call_args.kwargs["extra"]["fields"]
+    assert fields["query"] == "page=2" and fields["status"] == 200 and fields["device"] == "Mobile"
+    assert fields["total_ms"] >= fields["ttfb_ms"] >= 0
+
+    # Classified once per user agent
+    assert get_device_type("Mozilla/5.0 (iPhone)") == "Mobile" and get_device_type.cache_info().hits >= 1
+
+
+def test_total_ends_with_the_last_body_chunk(monkeypatch):
+    logger = MagicMock()
+    monkeypatch.setattr(loggerMiddleware, "logger", logger)
+    app, _ = _app(sample_rate=1.0, slow_ms=200)
+    client = TestClient(app)
+
+    # Background tasks run after the response and are not timed
+    client.get("/later")
+    assert logger.info.call_args.kwargs["extra"]["fields"]["total_ms"] < 200 and not logger.warning.called
+
+    # An event stream's length is the client's; its headers were fast
+    logger.reset_mock()
+    assert client.get("/events").text == "data: 1\n\ndata: 2\n\n"
+    fields = logger.info.call_args.kwargs["extra"]["fields"]
+    assert fields["total_ms"] >= 300 and fields["ttfb_ms"] < 200 and not logger.warning.called
@@ -0,0 +1,63 @@
+import enum
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.core.response import APIResponse, ResponseHandler, build_envelope
+
+
+class Colour(str, enum.Enum):
+    red = "red"
+
+
+class Item(BaseModel):
+    name: str
+    price: Decimal
+
+
+def _body(response):
+    return json.loads(response.body)
+
+
+def test_success_matches_pydantic_envelope():
+    data = [{
+        "id": uuid.UUID("0f3c7e9a-7d4e-4b8e-9a4e-0a0b0c0d0e0f"),
+        "at": datetime(2026, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "day": date(2026, 5, 1),
+        "price": Decimal("10.50"),
+        "qty": Decimal("3"),
+        "colour": Colour.red,
+    }]
+    response = ResponseHandler.success(message="ok", data=data)
+    legacy = jsonable_encoder(APIResponse(success=True, message="ok", data=data, error={}))
+
+    assert response.status_code == 200
+    assert _body(response) == legacy
+    assert list(_body(response)) == ["login_info", "success", "message", "data", "error"]
+
+
+def test_pydantic_models_inside_data_are_encoded_like_before():
+    data = [Item(name="crm", price=Decimal("1.5")), {"tags": {"a"}}]
+    response = ResponseHandler.success(message="ok", data=data)
+    legacy = jsonable_encoder(APIResponse(success=True, message="ok", data=data, error={}))
+    assert _body(response) == legacy
+
+
+def test_error_and_not_found_status_codes():
+    assert ResponseHandler.error(message="bad").status_code == 400
+    assert ResponseHandler.not_found(message="missing").status_code == 404
+    assert _body(ResponseHandler.forbidden(message="no"))["error"] == {}
+
+
+def test_envelope_rejects_invalid_shapes():
+    with pytest.raises(TypeError):
+        build_envelope(success=True, message=1)
+    with pytest.raises(TypeError):
+        build_envelope(success=False, message="x", error="not-a-dict")
+    with pytest.raises(TypeError):
+        build_envelope(success=True, message="x", data=object())
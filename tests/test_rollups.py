@@ -0,0 +1,158 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.db.database import get_db
+from app.routers import reports as reports_router
+from app.routers.auth import get_current_user
+from app.services import rollups
+from app.services.rollups import ROLLUPS, refresh_rollup
+
+TODAY = date(2026, 10, 19)
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+def test_rollup_queries():
+    revenue = _sql(rollups.revenue_rows(date(2026, 10, 1), TODAY))
+    assert "WITH billings AS" in revenue and revenue.count("UNION ALL") == 2
+    assert "saas_subscription_billings.payment_status = " in revenue
+    assert "orders.created_at = order_line_items.order_created_at" in revenue
+
+    mrr = _sql(rollups.mrr_rows(date(2026, 10, 1), TODAY))
+    assert "FROM generate_series(" in mrr and "saas_plan_versions.price / CAST(" in mrr
+    assert "subscription_cycles.end_date > CAST(days.value AS DATE)" in mrr
+
+    payments = _sql(rollups.payments_rows(TODAY, TODAY))
+    assert "count(*) FILTER (WHERE transactions.status = " in payments
+    # Bounded on the partition key, so only the month's partition is read
+    assert "transactions.created_at >= " in payments and "transactions.created_at < " in payments
+
+
+class FakeSession:
+    def __init__(self, changed, high_water=NOW - timedelta(hours=1)):
+        self.changed = changed
+        self.high_water = high_water
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        sql = _sql(stmt)
+        if sql.startswith("SELECT now()"):
+            return MagicMock(scalar_one=MagicMock(return_value=NOW))
+        if "FROM rollup_watermarks" in sql:
+            return MagicMock(scalar_one=MagicMock(return_value=self.high_water))
+        if sql.startswith("SELECT min("):
+            self.since = stmt.compile().params["updated_at_1"]
+            return MagicMock(one=MagicMock(return_value=self.changed))
+        if sql.startswith("UPDATE rollup_watermarks"):
+            self.high_water = stmt.compile().params["high_water"]
+        return MagicMock(rowcount=4)
+
+
+@pytest.mark.asyncio
+async def test_refresh_recomputes_changed_days_and_moves_the_watermark():
+    db = FakeSession((date(2026, 10, 17), date(2026, 10, 18)))
+    assert await refresh_rollup(db, ROLLUPS["payments"], TODAY, lag_seconds=300) == (2, 4)
+    assert db.since == NOW - timedelta(hours=1, minutes=5)
+    assert db.high_water == NOW
+
+    delete, insert = [s for s in db.statements if s.is_delete or s.is_insert][1:]
+    assert _sql(delete).startswith("DELETE FROM rollup_payments_daily WHERE rollup_payments_daily.day BETWEEN")
+    assert delete.compile().params == {"day_1": date(2026, 10, 17), "day_2": date(2026, 10, 18)}
+    assert _sql(insert).startswith("INSERT INTO rollup_payments_daily (day, provider, currency, attempts")
+
+    # Nothing changed: only the watermark moves, except for MRR which always covers today
+    db = FakeSession((None, None))
+    assert await refresh_rollup(db, ROLLUPS["payments"], TODAY) == (0, 0)
+    assert not any(s.is_delete for s in db.statements) and db.high_water == NOW
+    assert await refresh_rollup(FakeSession((None, None)), ROLLUPS["mrr"], TODAY) == (1, 4)
+
+    # Changes beyond the lookback are clipped (those days need a rebuild)
+    db = FakeSession((date(2020, 1, 1), date(2030, 1, 1)))
+    assert await refresh_rollup(db, ROLLUPS["revenue"], TODAY, max_lookback_days=10) == (11, 4)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_rollups_of_archived_months(monkeypatch):
+    monkeypatch.setattr(rollups, "_today", lambda: TODAY)
+    recomputed = []
+
+    class Session(FakeSession):
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def commit(self):
+            pass
+
+        async def execute(self, stmt, params=None):
+            sql = str(stmt)
+            if "information_schema.tables" in sql:
+                names = {"transactions": ["transactions_p2024_09", "transactions_p2024_10", "transactions_default"]}
+                return [(name,) for name in names.get(params["pattern"][:-3], [])]
+            if sql.startswith("DELETE FROM"):
+                recomputed.append(stmt.compile().params)
+            if "min(" in sql and "now()" not in sql:
+                return MagicMock(scalar=MagicMock(return_value=date(2024, 1, 1)))
+            return await super().execute(stmt, params)
+
+    report = await rollups.rebuild_rollups(lambda: Session((None, None)), names=["payments"], chunk_days=400)
+    # Transactions before November 2024 are archived: those days keep their rows
+    assert recomputed[0] == {"day_1": date(2024, 11, 1), "day_2": date(2025, 12, 5)}
+    assert report.days["payments"] == (TODAY - date(2024, 11, 1)).days + 1
+
+    recomputed.clear()
+    await rollups.rebuild_rollups(lambda: Session((None, None)), start=date(2024, 1, 1), names=["revenue"], chunk_days=2000)
+    assert recomputed == [{"day_1": date(2024, 1, 1), "day_2": TODAY}]
+
+
+def _row(**values):
+    return SimpleNamespace(_mapping=values, **values)
+
+
+def test_reports_read_the_rollups():
+    executed = []
+
+    class Session:
+        async def execute(self, stmt):
+            executed.append(_sql(stmt))
+            return [
+                _row(period=TODAY, provider="razorpay", currency="INR", attempts=10, succeeded=6, failed=2,
+                     amount_succeeded=Decimal("5994.00")),
+                _row(period=TODAY, provider="stripe", currency="USD", attempts=1, succeeded=0, failed=0,
+                     amount_succeeded=Decimal("0")),
+            ]
+
+    app = FastAPI()
+    app.include_router(reports_router.router)
+    app.dependency_overrides[get_db] = lambda: Session()
+    user = {"tenant_name": "Acme", "roles": ["platform_admin"], "permissions": ["reports:read"]}
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    # Platform-wide figures: a tenant's own roles and permissions do not grant them
+    assert client.get("/reports/mrr").status_code == 403
+    user["is_superuser"] = True
+
+    response = client.get("/reports/payments", params={"start": "2026-10-01", "end": "2026-10-19", "interval": "month"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [row["failure_rate"] for row in data] == [0.25, 0.0]
+    assert "FROM rollup_payments_daily" in executed[0] and "date_trunc(" in executed[0]
+    assert "transactions" not in executed[0].replace("rollup_payments_daily", "")
+
+    assert client.get("/reports/revenue", params={"dimension": "coupon"}).status_code == 422
+    response = client.get("/reports/tenants", params={"start": "2026-10-19", "end": "2026-10-01"})
+    assert response.status_code == 400 and "after its end" in response.json()["message"]
@@ -0,0 +1,77 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from app.core.db_helpers import model_to_dict
+from app.core.serializers import get_serializer, serialize_many
+from app.models.apps import AppPricing
+from app.models.auth import User
+from app.models.client import OAuthClient
+from app.models.plans import CountryEnum, CurrencyEnum
+from app.models.tenant import DeploymentEnum, Tenant, TenantProfile, TenantStatusEnum
+
+
+def _tenant(**overrides):
+    values = dict(
+        id=1,
+        tenant_uuid=uuid.UUID("8d7f4a52-1c2b-4c57-9a53-3f1f0d7d1e11"),
+        tenant_name="acme",
+        tenant_email="ops@acme.io",
+        is_active=True,
+        status=TenantStatusEnum.active,
+        deployment_type=DeploymentEnum.shared,
+        created_at=datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    )
+    values.update(overrides)
+    return Tenant(**values)
+
+
+def test_tenant_to_dict_is_json_ready():
+    data = _tenant().to_dict()
+    assert data == {
+        "id": 1,
+        "tenant_uuid": "8d7f4a52-1c2b-4c57-9a53-3f1f0d7d1e11",
+        "tenant_name": "acme",
+        "tenant_email": "ops@acme.io",
+        "is_active": True,
+        "status": "active",
+        "deployment_type": "shared",
+        "created_at": "2026-01-02T03:04:05+00:00",
+    }
+
+
+def test_tenant_to_dict_includes_loaded_profile_only():
+    tenant = _tenant()
+    assert "profile" not in tenant.to_dict()
+
+    tenant.profile = TenantProfile(legal_name="Acme Pvt Ltd")
+    assert tenant.to_dict()["profile"]["legal_name"] == "Acme Pvt Ltd"
+
+
+def test_user_serializer_excludes_hashed_password():
+    user = User(id=7, first_name="A", last_name="B", username="ab", email="ab@acme.io",
+                hashed_password="secret", tenant_id=1, is_active=True)
+    data = user.to_dict()
+    assert "hashed_password" not in data
+    assert data["username"] == "ab"
+    assert model_to_dict(user, exclude_fields=["hashed_password"]) == data
+
+
+def test_oauth_client_secrets_are_excluded():
+    client = OAuthClient(client_name="web", client_id="web-client", client_secret="s3cret-value",
+                         created_at=datetime(2026, 1, 1))
+    data = client.to_dict()
+    assert "client_secret" not in data and "hash_client_secret" not in data
+    assert data["created_at"] == "2026-01-01T00:00:00"
+
+
+def test_decimal_and_enum_conversion():
+    pricing = AppPricing(id=3, app_id=uuid.uuid4(), price=Decimal("3999.50"),
+                         currency=CurrencyEnum.INR, country=CountryEnum.IN, is_active=True)
+    data = serialize_many([pricing], fields=("price", "currency", "country"))[0]
+    assert data == {"price": 3999.5, "currency": "INR", "country": "IN"}
+
+
+def test_serializer_is_cached_per_field_set():
+    assert get_serializer(Tenant, fields=("id",)) is get_serializer(Tenant, fields=("id",))
+    assert get_serializer(Tenant, fields=("id",)) is not get_serializer(Tenant)
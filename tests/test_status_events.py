@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers.account_controller import AccountController
+from app.core.status_cache import onboarding_status_cache
+from app.routers import accounts
+from app.services.status_events import (
+    ORDER_CREATED,
+    PAYMENT_CAPTURED,
+    SUBSCRIPTION_ACTIVE,
+    StatusBroker,
+    StatusEvent,
+    StreamLimitExceeded,
+    format_sse,
+    status_broker,
+)
+
+
+def test_sse_framing_and_notify_payload_round_trip():
+    event = StatusEvent(1700000000000001, 7, PAYMENT_CAPTURED, {"transaction_id": uuid.UUID(int=1)})
+    assert event.to_sse() == (
+        b'id: 1700000000000001\nevent: payment.captured\n'
+        b'data: {"transaction_id":"00000000-0000-0000-0000-000000000001"}\n\n'
+    )
+    assert StatusEvent.from_json(event.to_json()).id == event.id
+    assert format_sse("status", {"a": 1}) == b'event: status\ndata: {"a":1}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_broker_fans_out_resumes_and_caps_streams():
+    broker = StatusBroker(max_streams_per_tenant=2)
+    first = await broker.publish(7, ORDER_CREATED, {"status": "PENDING"})
+    await broker.publish(8, ORDER_CREATED)
+
+    async with broker.subscribe(7, last_event_id=first.id - 1) as replayed, broker.subscribe(7) as live:
+        assert replayed.get_nowait() == first
+        assert live.empty()
+
+        captured = await broker.publish(7, PAYMENT_CAPTURED)
+        assert await asyncio.wait_for(live.get(), 1) == captured
+        assert await asyncio.wait_for(replayed.get(), 1) == captured
+
+        with pytest.raises(StreamLimitExceeded):
+            async with broker.subscribe(7):
+                pass
+    assert broker.stream_count(7) == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatch_invalidates_cached_status_etags():
+    onboarding_status_cache.store(("tenant", 1), 42, '"abc"')
+    await StatusBroker().publish(42, PAYMENT_CAPTURED)
+    assert onboarding_status_cache.current_etag(("tenant", 1)) is None
+
+
+def test_stream_sends_snapshot_then_replays_until_terminal(monkeypatch):
+    async def check_onboarding_status(self, request_id):
+        self.tenant_id = 9
+        return {"status": "PENDING", "subscription_status": "inactive"}
+
+    monkeypatch.setattr(AccountController, "check_onboarding_status", check_onboarding_status)
+    status_broker.dispatch(StatusEvent(100, 9, PAYMENT_CAPTURED, {"status": "SUCCESS"}))
+    status_broker.dispatch(StatusEvent(101, 9, SUBSCRIPTION_ACTIVE, {}))
+
+    app = FastAPI()
+    app.include_router(accounts.router)
+    client = TestClient(app)
+    response = client.get(
+        "/account/onboarding-status/stream",
+        params={"tenant_uuid": str(uuid.uuid4()), "request_id": 5},
+        headers={"Last-Event-ID": "99"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = response.text.split("\n\n")
+    assert messages[0] == "retry: 3000"
+    assert messages[1].startswith("event: status")
+    assert messages[2].startswith("id: 100\nevent: payment.captured")
+    assert messages[3].startswith("id: 101\nevent: subscription.active")
+
+
+def test_new_stream_gets_events_published_while_the_snapshot_is_read(monkeypatch):
+    async def check_onboarding_status(self, request_id):
+        self.tenant_id = 10
+        # Published after the snapshot query ran, before the stream subscribes
+        await status_broker.publish(10, SUBSCRIPTION_ACTIVE, {})
+        return {"status": "SUCCESS", "subscription_status": "inactive"}
+
+    monkeypatch.setattr(AccountController, "check_onboarding_status", check_onboarding_status)
+    app = FastAPI()
+    app.include_router(accounts.router)
+    response = TestClient(app).get(
+        "/account/onboarding-status/stream",
+        params={"tenant_uuid": str(uuid.uuid4()), "request_id": 5},
+    )
+    messages = response.text.split("\n\n")
+    assert messages[1].startswith("event: status")
+    assert "event: subscription.active" in messages[2]
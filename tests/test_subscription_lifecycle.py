@@ -0,0 +1,157 @@
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.controllers.payment_webhook_controller import PaymentWebhookController
+from app.jobs import CHARGE_RENEWAL, SEND_LIFECYCLE_EMAIL, handlers
+from app.models.plans import CurrencyEnum
+from app.models.subscriptions import PaymentStatus, SubscriptionBilling, SubscriptionStatus
+from app.services import subscription_lifecycle as lifecycle
+from app.services.subscription_lifecycle import EXPIRE, GRACE, RENEW
+
+TODAY = date(2026, 10, 19)
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+def _row(end_date=date(2026, 10, 18), cycle_status=SubscriptionStatus.active,
+         subscription_status=SubscriptionStatus.active, auto_renew=True, unpaid=False):
+    return SimpleNamespace(
+        id=uuid.uuid4(), subscription_id=uuid.uuid4(), cycle_status=cycle_status, end_date=end_date,
+        plan_code="pro", tenant_id=7, subscription_status=subscription_status, auto_renew=auto_renew,
+        unpaid=unpaid, tenant_email="owner@example.com", tenant_name="Acme",
+    )
+
+
+def key_of(jobs, event):
+    return next(key for payload, key in jobs if payload["event"] == event)
+
+
+def test_next_action():
+    assert lifecycle.next_action(_row(), TODAY, 7) == RENEW
+    assert lifecycle.next_action(_row(auto_renew=False), TODAY, 7) == GRACE
+    assert lifecycle.next_action(_row(auto_renew=False, end_date=date(2026, 10, 1)), TODAY, 7) == EXPIRE
+    assert lifecycle.next_action(_row(cycle_status=SubscriptionStatus.grace), TODAY, 7) == EXPIRE
+    assert lifecycle.next_action(_row(subscription_status=SubscriptionStatus.cancelled), TODAY, 7) == EXPIRE
+    # An auto-renewal whose invoice was never paid goes to grace, then expires
+    assert lifecycle.next_action(_row(unpaid=True), TODAY, 7) == GRACE
+    assert lifecycle.next_action(_row(unpaid=True, end_date=date(2026, 10, 1)), TODAY, 7) == EXPIRE
+
+    sql = _sql(lifecycle.due_cycles_query(TODAY, 7, 100))
+    assert "ORDER BY subscription_cycles.end_date" in sql
+    assert "FOR UPDATE OF subscription_cycles SKIP LOCKED" in sql
+    assert "EXISTS (SELECT saas_subscription_billings.id" in sql
+    assert "saas_subscription_billings.billing_date >= subscription_cycles.start_date" in sql
+
+
+@pytest.mark.asyncio
+async def test_batch_is_set_based(monkeypatch):
+    renew, free, grace, expire = _row(), _row(), _row(auto_renew=False), _row(cycle_status=SubscriptionStatus.grace)
+    new_cycle = SimpleNamespace(id=uuid.uuid4(), subscription_id=renew.subscription_id, end_date=date(2026, 11, 18))
+    free_cycle = SimpleNamespace(id=uuid.uuid4(), subscription_id=free.subscription_id, end_date=date(2026, 11, 18))
+    invoice = SimpleNamespace(
+        id=uuid.uuid4(), subscription_id=renew.subscription_id, created_at=datetime(2026, 10, 19, tzinfo=timezone.utc),
+        total_amount=Decimal("1179.82"), currency=CurrencyEnum.INR,
+    )
+    results = iter([[renew, free, grace, expire], [new_cycle, free_cycle], [invoice]])
+    statements = []
+
+    async def execute(stmt):
+        statements.append(stmt)
+        return MagicMock(all=MagicMock(side_effect=lambda: next(results, [])))
+
+    enqueue_many = AsyncMock()
+    monkeypatch.setattr(lifecycle, "enqueue_many", enqueue_many)
+    db = MagicMock(execute=execute, commit=AsyncMock())
+    counts = await lifecycle.process_batch(db, TODAY, grace_days=7, batch_size=100)
+
+    assert counts == {RENEW: 2, GRACE: 1, EXPIRE: 1}
+    db.commit.assert_awaited_once()
+    sql = [_sql(stmt) for stmt in statements]
+    assert sql[1].startswith("INSERT INTO subscription_cycles") and "interval '1 year'" in sql[1]
+    assert sql[2].startswith("INSERT INTO saas_subscription_billings") and "saas_plan_versions.price > " in sql[2]
+    assert sum(s.startswith("UPDATE subscription_cycles SET status=") for s in sql) == 3
+    assert sum(s.startswith("UPDATE subscriptions SET status=") for s in sql) == 2
+
+    calls = {}
+    for call in enqueue_many.await_args_list:
+        calls.setdefault(call.args[1], []).extend(call.args[2])
+    [(charge, charge_key)] = calls[CHARGE_RENEWAL]
+    assert charge["billing_id"] == invoice.id and charge_key == f"renewal-charge:{invoice.id}"
+    # The paid renewal is emailed by its charge job, with the order to pay
+    assert charge["email"]["event"] == "renewed" and charge["email"]["next_end_date"] == date(2026, 11, 18)
+    events = {payload["event"]: payload for payload, key in calls[SEND_LIFECYCLE_EMAIL]}
+    assert set(events) == {"renewed", "grace", "expired"}
+    assert key_of(calls[SEND_LIFECYCLE_EMAIL], "renewed") == f"lifecycle:renewed:{free.id}"
+
+
+@pytest.mark.asyncio
+async def test_charge_opens_an_order_and_emails_its_payment_link(monkeypatch):
+    billing = SubscriptionBilling(
+        id=uuid.uuid4(), subscription_id=uuid.uuid4(), total_amount=Decimal("1179.82"), currency=CurrencyEnum.INR,
+        payment_status=PaymentStatus.pending,
+    )
+    db = MagicMock(execute=AsyncMock(return_value=MagicMock(scalars=lambda: MagicMock(first=lambda: billing))),
+                   commit=AsyncMock())
+    monkeypatch.setattr(handlers.payment_gateway, "create_order", AsyncMock(return_value={"id": "order_R1"}))
+    enqueue = AsyncMock()
+    monkeypatch.setattr(handlers, "enqueue", enqueue)
+    monkeypatch.setenv("DOMAIN_NAME", "https://app.example.com")
+
+    email = {"event": "renewed", "tenant_email": "owner@example.com", "tenant_name": "Acme", "plan_name": "pro"}
+    await handlers.charge_renewal(db, {
+        "billing_id": str(billing.id), "billing_created_at": "2026-10-19T00:00:00+00:00", "email": email,
+    })
+    assert billing.payment_reference == "order_R1"
+    (_, kind, sent), kwargs = enqueue.await_args
+    assert kind == SEND_LIFECYCLE_EMAIL and kwargs["idempotency_key"] == f"lifecycle:renewed:{billing.id}"
+    assert sent["payment_url"] == "https://app.example.com/billing/pay/order_R1" and sent["amount"] == Decimal("1179.82")
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_captured_renewal_order_settles_its_invoice(monkeypatch):
+    billing = SubscriptionBilling(id=uuid.uuid4(), subscription_id=uuid.uuid4(), payment_status=PaymentStatus.pending)
+    found = {"Transaction": None, "SubscriptionBilling": billing}
+
+    async def first_recent(db, stmt, model, **kwargs):
+        return found[model.__name__]
+
+    monkeypatch.setattr("app.controllers.payment_webhook_controller.first_recent", first_recent)
+    statements = []
+    db = MagicMock(execute=AsyncMock(side_effect=lambda stmt: statements.append(_sql(stmt))), commit=AsyncMock())
+    await PaymentWebhookController(db).handle_payment_success({"id": "pay_1", "order_id": "order_R1"}, {})
+
+    assert billing.payment_status == PaymentStatus.paid
+    # A subscription in grace waiting for this payment is active again
+    assert statements[0].startswith("UPDATE subscription_cycles SET status=") and "subscription_cycles.status = " in statements[0]
+    assert statements[1].startswith("UPDATE subscriptions SET status=")
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_run_stops_on_short_batch_and_reports_rate(monkeypatch):
+    batches = iter([{RENEW: 2, GRACE: 1, EXPIRE: 0}, {RENEW: 0, GRACE: 0, EXPIRE: 1}])
+
+    async def process_batch(db, today, grace_days, batch_size):
+        return next(batches)
+
+    class Session:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(lifecycle, "process_batch", process_batch)
+    report = await lifecycle.run_lifecycle(Session, today=TODAY, batch_size=3)
+    assert (report.renewed, report.graced, report.expired, report.batches) == (2, 1, 1, 2)
+    assert report.cycles == 4 and report.cycles_per_second > 0
+    assert "cycles/s" in str(report)
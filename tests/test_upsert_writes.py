@@ -0,0 +1,144 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.controllers.account_controller import AccountController
+from app.controllers.application_controller import create_oauth_client
+from app.routers.apps import _register_app_statement
+from app.schemas.apps import AppCreate
+from app.schemas.auth_schemas import UserRegisterSchema
+from app.schemas.client import OAuthClientCreate
+from app.schemas.tanent import TenantCreate, TenantProfileCreate
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+def _session(returned=None, first=None, error=None):
+    """AsyncSession stand-in recording every executed statement."""
+    db = MagicMock()
+    db.statements = []
+
+    async def execute(stmt, *args, **kwargs):
+        db.statements.append(stmt)
+        if error is not None:
+            raise error
+        result = MagicMock()
+        result.scalars.return_value.first.return_value = returned
+        result.first.return_value = first
+        return result
+
+    db.execute = execute
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    return db
+
+
+def _integrity_error(pgcode):
+    orig = Exception("constraint violated")
+    orig.pgcode = pgcode
+    return IntegrityError("INSERT ...", {}, orig)
+
+
+def _user(**overrides):
+    values = dict(
+        first_name="Ada", last_name="Lovelace", username="ada", email="ada@acme.io",
+        password="Sup3r$ecret", tenant_name="acme", profile={"bio": "hi", "city": "Pune"},
+    )
+    values.update(overrides)
+    return UserRegisterSchema(**values)
+
+
+@pytest.mark.asyncio
+async def test_create_tenant_is_one_insert_and_maps_conflict():
+    db = _session(returned=None)
+    with pytest.raises(ValueError, match="already exists"):
+        await AccountController(db).create_tenant(TenantCreate(tenant_name="Acme", tenant_email="ops@acme.io"))
+
+    assert len(db.statements) == 1
+    assert "ON CONFLICT DO NOTHING RETURNING" in _sql(db.statements[0])
+    db.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_register_user_writes_user_and_profile_in_one_statement():
+    user = object()
+    db = _session(returned=user)
+    assert await AccountController(db).register_user(_user()) is user
+
+    assert len(db.statements) == 1
+    sql = _sql(db.statements[0])
+    assert "WITH new_user AS" in sql and "new_user_profile AS" in sql
+    assert "INSERT INTO auth_user_profiles" in sql
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_register_user_conflicts_keep_existing_error_payloads():
+    db = _session(returned=None)
+    with pytest.raises(ValueError) as exc:
+        await AccountController(db).register_user(_user(profile=None))
+    assert set(exc.value.args[0]["value"]) == {"username", "email"}
+    assert "auth_user_profiles" not in _sql(db.statements[0])
+
+    db = _session(error=_integrity_error("23502"))
+    with pytest.raises(ValueError) as exc:
+        await AccountController(db).register_user(_user())
+    assert exc.value.args[0] == {"value": {"tenant_name": {"msg": "Invalid tenant name or May not found"}}}
+    db.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_upsert_tenant_profile_outcomes():
+    profile = object()
+    db = _session(first=(profile, True, True))
+    assert await AccountController(db).upsert_tenant_profile(3, TenantProfileCreate(city="Pune")) == (profile, "created")
+    sql = _sql(db.statements[0])
+    assert "ON CONFLICT (tenant_id) DO UPDATE SET city = excluded.city, updated_at = now()" in sql
+    assert "IS DISTINCT FROM excluded.city" in sql
+
+    db = _session(first=(profile, False, False))
+    assert await AccountController(db).upsert_tenant_profile(3, TenantProfileCreate(city="Pune")) == (profile, "unchanged")
+    db.commit.assert_not_awaited()
+
+    db = _session(error=_integrity_error("23503"))
+    with pytest.raises(LookupError):
+        await AccountController(db).upsert_tenant_profile(99, TenantProfileCreate())
+
+
+@pytest.mark.asyncio
+async def test_create_oauth_client_hashes_secret_and_maps_conflict():
+    payload = OAuthClientCreate(
+        client_name="portal", client_id="portal-web", client_secret="s3cret-value", client_type="confidential",
+        authorization_grant_types=["authorization_code"], redirect_urls=["https://portal/cb"],
+        token_endpoint_auth_method="client_secret_post", scope=["openid"], response_types=["code"],
+        grant_types=["authorization_code"],
+    )
+    db = _session(returned=None)
+    with pytest.raises(ValueError) as exc:
+        await create_oauth_client(db, payload)
+    assert exc.value.args[0] == {"value": {"client_id": {"msg": "Client ID already exists"}}}
+
+    stmt = db.statements[0]
+    assert "ON CONFLICT (client_id) DO NOTHING" in _sql(stmt)
+    params = stmt.compile(dialect=postgresql.asyncpg.dialect()).params
+    assert params["hash_client_secret"].startswith("$2")
+
+
+def test_register_app_statement_inserts_children_from_the_app_cte():
+    app_data = AppCreate(
+        code="CRM", name="CRM Suite",
+        pricing=[{"price": "3999.00"}, {"price": "49.00", "currency": "USD", "country": "US"}],
+        features=[{"code": "crm:leads", "name": "Leads"}],
+    )
+    sql = _sql(_register_app_statement(app_data))
+    assert sql.startswith("WITH new_app AS")
+    assert "ON CONFLICT (code) DO NOTHING" in sql
+    assert "INSERT INTO saas_app_pricing" in sql and "FROM new_app, (VALUES" in sql
+    assert "INSERT INTO saas_features" in sql
+
+    sql = _sql(_register_app_statement(AppCreate(code="CRM", name="CRM Suite")))
+    assert "saas_app_pricing" not in sql and "saas_features" not in sql
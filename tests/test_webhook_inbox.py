@@ -0,0 +1,76 @@
+import hashlib
+import hmac
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.database import get_db
+from app.jobs import JobError
+from app.models.webhooks import WebhookEventStatus
+from app.routers import webhooks
+from app.services import webhook_inbox
+
+SECRET = "whsec"
+BODY = json.dumps({
+    "event": "payment.captured",
+    "created_at": 1760000000,
+    "payload": {"payment": {"entity": {"id": "pay_1", "order_id": "order_1"}}},
+}).encode()
+
+
+def _sign(body):
+    return hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_signature_and_inbox_keys():
+    assert webhook_inbox.verify_signature(BODY, _sign(BODY), SECRET)
+    assert not webhook_inbox.verify_signature(BODY + b" ", _sign(BODY), SECRET)
+    assert not webhook_inbox.verify_signature(BODY, None, SECRET)
+
+    fields = webhook_inbox.inbox_fields(json.loads(BODY))
+    assert fields["event_id"] == "payment.captured:pay_1"
+    assert fields["order_key"] == "order_1"
+    assert webhook_inbox.inbox_fields(json.loads(BODY), "evt_9")["event_id"] == "evt_9"
+
+
+def test_route_stores_and_acks_without_processing(monkeypatch):
+    record = AsyncMock(side_effect=[11, None])
+    monkeypatch.setattr(webhooks, "record_event", record)
+    monkeypatch.setattr(webhooks, "RAZORPAY_WEBHOOK_SECRET", SECRET)
+    app = FastAPI()
+    app.include_router(webhooks.router)
+    app.dependency_overrides[get_db] = lambda: None
+    client = TestClient(app)
+
+    headers = {"X-Razorpay-Signature": _sign(BODY), "X-Razorpay-Event-Id": "evt_1"}
+    assert client.post("/webhooks/razorpay", content=BODY, headers=headers).json()["data"] == {"inbox_id": 11}
+    # Redelivery is acked too, but nothing new is stored
+    assert client.post("/webhooks/razorpay", content=BODY, headers=headers).json()["data"] == {"inbox_id": None}
+    assert record.await_args.args[1:] == (BODY, "evt_1")
+
+    bad = client.post("/webhooks/razorpay", content=BODY, headers={"X-Razorpay-Signature": "0" * 64})
+    assert bad.status_code == 400 and record.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_event_blocks_its_order_until_parked(monkeypatch):
+    event = SimpleNamespace(id=5, event_type="payment.captured", payload={}, status=None, attempts=0, processed_at=None)
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalars=lambda: MagicMock(first=lambda: event)))
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    monkeypatch.setattr(webhook_inbox, "dispatch_event", AsyncMock(side_effect=RuntimeError("db down")))
+
+    monkeypatch.setattr(webhook_inbox, "_record_failure", AsyncMock(return_value=WebhookEventStatus.received))
+    with pytest.raises(JobError, match="Webhook event 5"):
+        await webhook_inbox.process_order_events(db, "order_1")
+
+    # Once parked, the loop moves on; here the next read finds nothing left
+    results = iter([event, None])
+    db.execute = AsyncMock(return_value=MagicMock(scalars=lambda: MagicMock(first=lambda: next(results))))
+    monkeypatch.setattr(webhook_inbox, "_record_failure", AsyncMock(return_value=WebhookEventStatus.failed))
+    assert await webhook_inbox.process_order_events(db, "order_1") == 0